@@ -1,22 +1,26 @@
+import asyncio
 import datetime
+import functools
 import inspect
 import traceback
-from typing import List, Literal, Optional, Tuple, Union
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Any, Callable, Generator, List, Literal, Optional, Tuple, Union
 
-from tqdm import tqdm
-
-from memgpt.agent_store.storage import StorageConnector
 from memgpt.constants import (
     CLI_WARNING_PREFIX,
     FIRST_MESSAGE_ATTEMPTS,
+    IN_CONTEXT_MEMORY_HEADER,
     IN_CONTEXT_MEMORY_KEYWORD,
     LLM_MAX_TOKENS,
     MESSAGE_SUMMARY_TRUNC_KEEP_N_LAST,
     MESSAGE_SUMMARY_TRUNC_TOKEN_FRAC,
     MESSAGE_SUMMARY_WARNING_FRAC,
+    PARALLEL_SAFE_TOOL_TAG,
 )
+from memgpt.functions.executor import run_tool_calls
 from memgpt.interface import AgentInterface
-from memgpt.llm_api.llm_api_tools import create, is_context_overflow_error
+from memgpt.llm_api.llm_api_tools import acreate, create, is_context_overflow_error
 from memgpt.memory import ArchivalMemory, RecallMemory, summarize_messages
 from memgpt.metadata import MetadataStore
 from memgpt.persistence_manager import LocalStateManager
@@ -30,16 +34,17 @@ from memgpt.schemas.openai.chat_completion_response import ChatCompletionRespons
 from memgpt.schemas.openai.chat_completion_response import (
     Message as ChatCompletionMessage,
 )
-from memgpt.schemas.passage import Passage
+from memgpt.schemas.openai.chat_completion_response import ToolCall
 from memgpt.schemas.tool import Tool
+from memgpt.settings import settings
 from memgpt.system import (
     get_initial_boot_messages,
     get_login_event,
     package_function_response,
     package_summarize_message,
 )
+from memgpt.token_ledger import TokenLedger
 from memgpt.utils import (
-    count_tokens,
     get_local_time,
     get_tool_call_id,
     get_utc_time,
@@ -56,6 +61,56 @@ from memgpt.utils import (
 from .errors import LLMError
 
 
+@dataclass
+class ParsedToolCall:
+    """A tool call from a model response, resolved to the agent's python function"""
+
+    tool_call_id: str
+    function_name: str
+    function_to_call: Optional[Callable] = None
+    function_args: Optional[dict] = None  # without request_heartbeat
+    heartbeat_request: Optional[bool] = None
+    response_string: Optional[str] = None
+    error: Optional[str] = None  # set if the call couldn't be parsed or the function failed
+
+
+def run_step_steps(steps: Generator[dict, ChatCompletionResponse, Any]) -> Any:
+    """Run a step generator (see Agent._step_steps), making the LLM calls it yields with the blocking client"""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                response = create(**request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+def _advance_steps(steps: Generator, response: Any = None, error: Optional[Exception] = None) -> Tuple[bool, Any]:
+    """Run a step generator up to its next LLM call, returns (done, next request or return value)"""
+    try:
+        return False, steps.throw(error) if error is not None else steps.send(response)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+async def arun_step_steps(steps: Generator[dict, ChatCompletionResponse, Any], executor: Optional[Executor] = None) -> Any:
+    """Run a step generator on the event loop: the LLM calls are awaited, the code between them runs on the executor"""
+    loop = asyncio.get_running_loop()
+    done, value = await loop.run_in_executor(executor, _advance_steps, steps)
+    while not done:
+        try:
+            response = await acreate(**value)
+        except Exception as e:
+            done, value = await loop.run_in_executor(executor, functools.partial(_advance_steps, steps, error=e))
+        else:
+            done, value = await loop.run_in_executor(executor, functools.partial(_advance_steps, steps, response=response))
+    return value
+
+
 def compile_memory_metadata_block(
     memory_edit_timestamp: datetime.datetime,
     archival_memory: Optional[ArchivalMemory] = None,
@@ -67,9 +122,9 @@ def compile_memory_metadata_block(
     # Create a metadata block of info so the agent knows about the metadata of out-of-context memories
     memory_metadata_block = "\n".join(
         [
-            f"### Memory [last modified: {timestamp_str}]",
-            f"{len(recall_memory) if recall_memory else 0} previous messages between you and the user are stored in recall memory (use functions to access them)",
-            f"{len(archival_memory) if archival_memory else 0} total memories you created are stored in archival memory (use functions to access them)",
+            f"{IN_CONTEXT_MEMORY_HEADER} {timestamp_str}]",
+            f"{len(recall_memory) if recall_memory is not None else 0} previous messages between you and the user are stored in recall memory (use functions to access them)",
+            f"{len(archival_memory) if archival_memory is not None else 0} total memories you created are stored in archival memory (use functions to access them)",
             "\nCore memory shown below (limited in size, additional information stored in archival / recall memory):",
         ]
     )
@@ -205,6 +260,9 @@ class Agent(object):
         self.agent_state = agent_state
         assert isinstance(self.agent_state.memory, Memory), f"Memory object is not of type Memory: {type(self.agent_state.memory)}"
 
+        # Running token count of the context window (functions + in-context messages)
+        self.token_ledger = TokenLedger(model=self.agent_state.llm_config.model)
+
         try:
             self.link_tools(tools)
         except Exception as e:
@@ -221,6 +279,9 @@ class Agent(object):
         assert isinstance(self.memory, Memory), f"Memory object is not of type Memory: {type(self.memory)}"
         printd("Initialized memory object", self.memory.compile())
 
+        # Snapshot of the state last written by save_agent (None until the first save, which writes everything)
+        self._persisted_snapshot: Optional[dict] = None
+
         # Interface must implement:
         # - internal_monologue
         # - assistant_message
@@ -310,6 +371,8 @@ class Agent(object):
         # Store the functions schemas (this is passed as an argument to ChatCompletion)
         self.functions = []
         self.functions_python = {}
+        # tools declared safe to run concurrently with each other (see _handle_ai_response)
+        self.parallel_safe_tools = {tool.name for tool in tools if PARALLEL_SAFE_TOOL_TAG in (tool.tags or [])}
         env = {}
         env.update(globals())
         for tool in tools:
@@ -321,6 +384,7 @@ class Agent(object):
             self.functions_python[tool.name] = env[tool.name]
             self.functions.append(tool.json_schema)
         assert all([callable(f) for k, f in self.functions_python.items()]), self.functions_python
+        self.token_ledger.set_functions(self.functions)
 
     def _load_messages_from_recall(self, message_ids: List[str]) -> List[Message]:
         """Load a list of messages from recall storage"""
@@ -348,6 +412,7 @@ class Agent(object):
 
         # set the objects in the buffer
         self._messages = message_objs
+        self.token_ledger.reset(message_objs)
 
         # bugfix for old agents that may not have had UTC specified in their timestamps
         if force_utc:
@@ -359,6 +424,7 @@ class Agent(object):
     def _trim_messages(self, num):
         """Trim messages from the front, not including the system message"""
         self.persistence_manager.trim_messages(num)
+        self.token_ledger.remove(self._messages[1:num])
 
         new_messages = [self._messages[0]] + self._messages[num:]
         self._messages = new_messages
@@ -368,6 +434,7 @@ class Agent(object):
         assert all([isinstance(msg, Message) for msg in added_messages])
 
         self.persistence_manager.prepend_to_messages(added_messages)
+        self.token_ledger.add(added_messages)
 
         new_messages = [self._messages[0]] + added_messages + self._messages[1:]  # prepend (no system)
         self._messages = new_messages
@@ -378,6 +445,7 @@ class Agent(object):
         assert all([isinstance(msg, Message) for msg in added_messages])
 
         self.persistence_manager.append_to_messages(added_messages)
+        self.token_ledger.add(added_messages)
 
         # strip extra metadata if it exists
         # for msg in added_messages:
@@ -410,39 +478,168 @@ class Agent(object):
         inner_thoughts_in_kwargs: OptionState = OptionState.DEFAULT,
     ) -> ChatCompletionResponse:
         """Get response from LLM API"""
-        try:
-            response = create(
-                # agent_state=self.agent_state,
-                llm_config=self.agent_state.llm_config,
-                user_id=self.agent_state.user_id,
-                messages=message_sequence,
-                functions=self.functions,
-                functions_python=self.functions_python,
-                function_call=function_call,
-                # hint
-                first_message=first_message,
-                # streaming
-                stream=stream,
-                stream_inferface=self.interface,
-                # putting inner thoughts in func args or not
-                inner_thoughts_in_kwargs=inner_thoughts_in_kwargs,
-            )
+        request = self._ai_reply_request(
+            message_sequence=message_sequence,
+            function_call=function_call,
+            first_message=first_message,
+            stream=stream,
+            inner_thoughts_in_kwargs=inner_thoughts_in_kwargs,
+        )
+        return self._check_ai_reply(create(**request))
 
-            if len(response.choices) == 0:
-                raise Exception(f"API call didn't return a message: {response}")
+    def _ai_reply_request(
+        self,
+        message_sequence: List[Message],
+        function_call: str = "auto",
+        first_message: bool = False,  # hint
+        stream: bool = False,  # TODO move to config?
+        inner_thoughts_in_kwargs: OptionState = OptionState.DEFAULT,
+    ) -> dict:
+        """Arguments of the LLM API call (for create / acreate)"""
+        return dict(
+            # agent_state=self.agent_state,
+            llm_config=self.agent_state.llm_config,
+            user_id=self.agent_state.user_id,
+            messages=message_sequence,
+            functions=self.functions,
+            functions_python=self.functions_python,
+            function_call=function_call,
+            # hint
+            first_message=first_message,
+            # streaming
+            stream=stream,
+            stream_inferface=self.interface,
+            # putting inner thoughts in func args or not
+            inner_thoughts_in_kwargs=inner_thoughts_in_kwargs,
+        )
 
-            # special case for 'length'
-            if response.choices[0].finish_reason == "length":
-                raise Exception("Finish reason was length (maximum context length)")
+    def _check_ai_reply(self, response: ChatCompletionResponse) -> ChatCompletionResponse:
+        """Raise on LLM API responses the agent can't use"""
+        if len(response.choices) == 0:
+            raise Exception(f"API call didn't return a message: {response}")
 
-            # catches for soft errors
-            if response.choices[0].finish_reason not in ["stop", "function_call", "tool_calls"]:
-                raise Exception(f"API call finish with bad finish reason: {response}")
+        # special case for 'length'
+        if response.choices[0].finish_reason == "length":
+            raise Exception("Finish reason was length (maximum context length)")
 
-            # unpack with response.choices[0].message.content
-            return response
-        except Exception as e:
-            raise e
+        # catches for soft errors
+        if response.choices[0].finish_reason not in ["stop", "function_call", "tool_calls"]:
+            raise Exception(f"API call finish with bad finish reason: {response}")
+
+        # unpack with response.choices[0].message.content
+        return response
+
+    def _parse_tool_call(self, tool_call: ToolCall) -> ParsedToolCall:
+        """Look up the python function of a tool call and parse its arguments (failures are recorded in the error field)"""
+        function_name = tool_call.function.name
+        parsed = ParsedToolCall(tool_call_id=tool_call.id, function_name=function_name)
+        printd(f"Request to call function {function_name} with tool_call_id: {tool_call.id}")
+
+        # Failure case 1: function name is wrong
+        try:
+            function_to_call = self.functions_python[function_name]
+        except KeyError:
+            parsed.error = f"No function named {function_name}"
+            return parsed
+
+        # Failure case 2: function name is OK, but function args are bad JSON
+        try:
+            function_args = parse_json(tool_call.function.arguments)
+        except Exception:
+            parsed.error = f"Error parsing JSON for function '{function_name}' arguments: {tool_call.function.arguments}"
+            return parsed
+
+        # (Still parsing function args)
+        # Handle requests for immediate heartbeat
+        heartbeat_request = function_args.pop("request_heartbeat", None)
+        if not (isinstance(heartbeat_request, bool) or heartbeat_request is None):
+            printd(
+                f"{CLI_WARNING_PREFIX}'request_heartbeat' arg parsed was not a bool or None, type={type(heartbeat_request)}, value={heartbeat_request}"
+            )
+            heartbeat_request = False
+
+        parsed.function_to_call = function_to_call
+        parsed.function_args = function_args
+        parsed.heartbeat_request = heartbeat_request
+        return parsed
+
+    def _call_function(self, tool_call: ParsedToolCall) -> str:
+        """Run the python function of a parsed tool call, returns the validated response string"""
+        spec = inspect.getfullargspec(tool_call.function_to_call).annotations
+        function_args = dict(tool_call.function_args)
+        for name, arg in function_args.items():
+            if isinstance(arg, dict):
+                function_args[name] = spec[name](**arg)
+
+        function_args["self"] = self  # need to attach self to arg since it's dynamically linked
+
+        function_response = tool_call.function_to_call(**function_args)
+        if tool_call.function_name in ["conversation_search", "conversation_search_date", "archival_memory_search"]:
+            # with certain functions we rely on the paging mechanism to handle overflow
+            truncate = False
+        else:
+            # but by default, we add a truncation safeguard to prevent bad functions from
+            # overflow the agent context window
+            truncate = True
+        return validate_function_response(function_response, truncate=truncate)
+
+    def _execute_tool_calls(self, tool_calls: List[ParsedToolCall], assistant_message: Message, parallel: bool = False) -> List[Message]:
+        """Run parsed tool calls (concurrently on the tool pool if parallel), returns the tool messages in the order of the calls"""
+        if not tool_calls:
+            return []
+        runnable = [tool_call for tool_call in tool_calls if tool_call.error is None]
+
+        # Failure case 3: function failed during execution
+        # NOTE: the msg_obj associated with the "Running " message is the prior assistant message, not the function/tool role message
+        #       this is because the function/tool role message is only created once the function/tool has executed/returned
+        for tool_call in runnable:
+            self.interface.function_message(f"Running {tool_call.function_name}({tool_call.function_args})", msg_obj=assistant_message)
+        if parallel:
+            results = run_tool_calls(
+                [functools.partial(self._call_function, tool_call) for tool_call in runnable], timeout=settings.tool_execution_timeout
+            )
+        else:
+            results = []
+            for tool_call in runnable:
+                try:
+                    results.append((self._call_function(tool_call), None))
+                except Exception as e:
+                    results.append((None, e))
+
+        for tool_call, (function_response_string, error) in zip(runnable, results):
+            if error is not None:
+                # Less detailed - don't provide full args, idea is that it should be in recent context so no need (just adds noise)
+                tool_call.error = f"Error calling function {tool_call.function_name}: {str(error)}"
+                printd(f"{tool_call.error}\n{''.join(traceback.format_exception(type(error), error, error.__traceback__))}")
+            else:
+                tool_call.response_string = function_response_string
+
+        messages = []
+        for tool_call in tool_calls:
+            if tool_call.error is not None:
+                function_response = package_function_response(False, tool_call.error)
+            else:
+                function_response = package_function_response(True, tool_call.response_string)
+            messages.append(
+                Message.dict_to_message(
+                    agent_id=self.agent_state.id,
+                    user_id=self.agent_state.user_id,
+                    model=self.model,
+                    openai_message_dict={
+                        "role": "tool",
+                        "name": tool_call.function_name,
+                        "content": function_response,
+                        "tool_call_id": tool_call.tool_call_id,
+                    },
+                )
+            )  # extend conversation with function response
+            if tool_call.function_args is not None:
+                self.interface.function_message(f"Ran {tool_call.function_name}({tool_call.function_args})", msg_obj=messages[-1])
+            if tool_call.error is not None:
+                self.interface.function_message(f"Error: {tool_call.error}", msg_obj=messages[-1])
+            else:
+                self.interface.function_message(f"Success: {tool_call.response_string}", msg_obj=messages[-1])
+        return messages
 
     def _handle_ai_response(
         self,
@@ -465,26 +662,16 @@ class Agent(object):
         if response_message.function_call or (response_message.tool_calls is not None and len(response_message.tool_calls) > 0):
             if response_message.function_call:
                 raise DeprecationWarning(response_message)
-            if response_message.tool_calls is not None and len(response_message.tool_calls) > 1:
-                # raise NotImplementedError(f">1 tool call not supported")
-                # TODO eventually support sequential tool calling
-                printd(f">1 tool call not supported, using index=0 only\n{response_message.tool_calls}")
-                response_message.tool_calls = [response_message.tool_calls[0]]
             assert response_message.tool_calls is not None and len(response_message.tool_calls) > 0
 
-            # generate UUID for tool call
-            if override_tool_call_id or response_message.function_call:
-                tool_call_id = get_tool_call_id()  # needs to be a string for JSON
-                response_message.tool_calls[0].id = tool_call_id
-            else:
-                tool_call_id = response_message.tool_calls[0].id
-                assert tool_call_id is not None  # should be defined
-
-            # only necessary to add the tool_cal_id to a function call (antipattern)
-            # response_message_dict = response_message.model_dump()
-            # response_message_dict["tool_call_id"] = tool_call_id
+            # generate UUIDs for the tool calls
+            for tool_call in response_message.tool_calls:
+                if override_tool_call_id:
+                    tool_call.id = get_tool_call_id()  # needs to be a string for JSON
+                else:
+                    assert tool_call.id is not None  # should be defined
 
-            # role: assistant (requesting tool call, set tool call ID)
+            # role: assistant (requesting tool calls, set tool call IDs)
             messages.append(
                 # NOTE: we're recreating the message here
                 # TODO should probably just overwrite the fields?
@@ -501,135 +688,23 @@ class Agent(object):
             # The content if then internal monologue, not chat
             self.interface.internal_monologue(response_message.content, msg_obj=messages[-1])
 
-            # Step 3: call the function
-            # Note: the JSON response may not always be valid; be sure to handle errors
-
-            # Failure case 1: function name is wrong
-            function_call = (
-                response_message.function_call if response_message.function_call is not None else response_message.tool_calls[0].function
-            )
-            function_name = function_call.name
-            printd(f"Request to call function {function_name} with tool_call_id: {tool_call_id}")
-            try:
-                function_to_call = self.functions_python[function_name]
-            except KeyError:
-                error_msg = f"No function named {function_name}"
-                function_response = package_function_response(False, error_msg)
-                messages.append(
-                    Message.dict_to_message(
-                        agent_id=self.agent_state.id,
-                        user_id=self.agent_state.user_id,
-                        model=self.model,
-                        openai_message_dict={
-                            "role": "tool",
-                            "name": function_name,
-                            "content": function_response,
-                            "tool_call_id": tool_call_id,
-                        },
-                    )
-                )  # extend conversation with function response
-                self.interface.function_message(f"Error: {error_msg}", msg_obj=messages[-1])
-                return messages, False, True  # force a heartbeat to allow agent to handle error
-
-            # Failure case 2: function name is OK, but function args are bad JSON
-            try:
-                raw_function_args = function_call.arguments
-                function_args = parse_json(raw_function_args)
-            except Exception:
-                error_msg = f"Error parsing JSON for function '{function_name}' arguments: {function_call.arguments}"
-                function_response = package_function_response(False, error_msg)
-                messages.append(
-                    Message.dict_to_message(
-                        agent_id=self.agent_state.id,
-                        user_id=self.agent_state.user_id,
-                        model=self.model,
-                        openai_message_dict={
-                            "role": "tool",
-                            "name": function_name,
-                            "content": function_response,
-                            "tool_call_id": tool_call_id,
-                        },
-                    )
-                )  # extend conversation with function response
-                self.interface.function_message(f"Error: {error_msg}", msg_obj=messages[-1])
-                return messages, False, True  # force a heartbeat to allow agent to handle error
-
-            # (Still parsing function args)
-            # Handle requests for immediate heartbeat
-            heartbeat_request = function_args.pop("request_heartbeat", None)
-            if not (isinstance(heartbeat_request, bool) or heartbeat_request is None):
-                printd(
-                    f"{CLI_WARNING_PREFIX}'request_heartbeat' arg parsed was not a bool or None, type={type(heartbeat_request)}, value={heartbeat_request}"
-                )
-                heartbeat_request = False
-
-            # Failure case 3: function failed during execution
-            # NOTE: the msg_obj associated with the "Running " message is the prior assistant message, not the function/tool role message
-            #       this is because the function/tool role message is only created once the function/tool has executed/returned
-            self.interface.function_message(f"Running {function_name}({function_args})", msg_obj=messages[-1])
-            try:
-                spec = inspect.getfullargspec(function_to_call).annotations
-
-                for name, arg in function_args.items():
-                    if isinstance(function_args[name], dict):
-                        function_args[name] = spec[name](**function_args[name])
-
-                function_args["self"] = self  # need to attach self to arg since it's dynamically linked
+            # Step 3: call the functions
+            # Consecutive calls to parallel-safe tools run together on the tool pool, all other calls run one at a time in the
+            # step thread. Either way the tool responses are appended in the order of the calls.
+            tool_calls = [self._parse_tool_call(tool_call) for tool_call in response_message.tool_calls]
+            batch = []
+            for tool_call in tool_calls:
+                if tool_call.error is None and tool_call.function_name in self.parallel_safe_tools:
+                    batch.append(tool_call)
+                    continue
+                messages.extend(self._execute_tool_calls(batch, assistant_message=messages[0], parallel=True))
+                messages.extend(self._execute_tool_calls([tool_call], assistant_message=messages[0]))
+                batch = []
+            messages.extend(self._execute_tool_calls(batch, assistant_message=messages[0], parallel=True))
 
-                function_response = function_to_call(**function_args)
-                if function_name in ["conversation_search", "conversation_search_date", "archival_memory_search"]:
-                    # with certain functions we rely on the paging mechanism to handle overflow
-                    truncate = False
-                else:
-                    # but by default, we add a truncation safeguard to prevent bad functions from
-                    # overflow the agent context window
-                    truncate = True
-                function_response_string = validate_function_response(function_response, truncate=truncate)
-                function_args.pop("self", None)
-                function_response = package_function_response(True, function_response_string)
-                function_failed = False
-            except Exception as e:
-                function_args.pop("self", None)
-                # error_msg = f"Error calling function {function_name} with args {function_args}: {str(e)}"
-                # Less detailed - don't provide full args, idea is that it should be in recent context so no need (just adds noise)
-                error_msg = f"Error calling function {function_name}: {str(e)}"
-                error_msg_user = f"{error_msg}\n{traceback.format_exc()}"
-                printd(error_msg_user)
-                function_response = package_function_response(False, error_msg)
-                messages.append(
-                    Message.dict_to_message(
-                        agent_id=self.agent_state.id,
-                        user_id=self.agent_state.user_id,
-                        model=self.model,
-                        openai_message_dict={
-                            "role": "tool",
-                            "name": function_name,
-                            "content": function_response,
-                            "tool_call_id": tool_call_id,
-                        },
-                    )
-                )  # extend conversation with function response
-                self.interface.function_message(f"Ran {function_name}({function_args})", msg_obj=messages[-1])
-                self.interface.function_message(f"Error: {error_msg}", msg_obj=messages[-1])
-                return messages, False, True  # force a heartbeat to allow agent to handle error
-
-            # If no failures happened along the way: ...
-            # Step 4: send the info on the function call and function response to GPT
-            messages.append(
-                Message.dict_to_message(
-                    agent_id=self.agent_state.id,
-                    user_id=self.agent_state.user_id,
-                    model=self.model,
-                    openai_message_dict={
-                        "role": "tool",
-                        "name": function_name,
-                        "content": function_response,
-                        "tool_call_id": tool_call_id,
-                    },
-                )
-            )  # extend conversation with function response
-            self.interface.function_message(f"Ran {function_name}({function_args})", msg_obj=messages[-1])
-            self.interface.function_message(f"Success: {function_response_string}", msg_obj=messages[-1])
+            # if a call failed, a heartbeat is forced to allow agent to handle error
+            function_failed = any(tool_call.error is not None for tool_call in tool_calls)
+            heartbeat_request = not function_failed and any(tool_call.heartbeat_request for tool_call in tool_calls)
 
         else:
             # Standard non-function reply
@@ -666,6 +741,43 @@ class Agent(object):
         ms: Optional[MetadataStore] = None,
     ) -> Tuple[List[Union[dict, Message]], bool, bool, bool]:
         """Top-level event message handler for the MemGPT agent"""
+        return run_step_steps(
+            self._step_steps(
+                user_message,
+                first_message=first_message,
+                first_message_retry_limit=first_message_retry_limit,
+                skip_verify=skip_verify,
+                return_dicts=return_dicts,
+                recreate_message_timestamp=recreate_message_timestamp,
+                stream=stream,
+                timestamp=timestamp,
+                inner_thoughts_in_kwargs=inner_thoughts_in_kwargs,
+                ms=ms,
+            )
+        )
+
+    async def astep(self, *args, executor: Optional[Executor] = None, **kwargs) -> Tuple[List[Union[dict, Message]], bool, bool, bool]:
+        """Async version of step (same arguments): LLM calls are awaited (see acreate), the rest of the step runs on the executor"""
+        return await arun_step_steps(self._step_steps(*args, **kwargs), executor=executor)
+
+    def _step_steps(
+        self,
+        user_message: Union[Message, str],  # NOTE: should be json.dump(dict)
+        first_message: bool = False,
+        first_message_retry_limit: int = FIRST_MESSAGE_ATTEMPTS,
+        skip_verify: bool = False,
+        return_dicts: bool = True,  # if True, return dicts, if False, return Message objects
+        recreate_message_timestamp: bool = True,  # if True, when input is a Message type, recreated the 'created_at' field
+        stream: bool = False,  # TODO move to config?
+        timestamp: Optional[datetime.datetime] = None,
+        inner_thoughts_in_kwargs: OptionState = OptionState.DEFAULT,
+        ms: Optional[MetadataStore] = None,
+    ) -> Generator[dict, ChatCompletionResponse, Tuple[List[Union[dict, Message]], bool, bool, bool]]:
+        """The agent step, written as a generator that yields its LLM API calls (create arguments) and is sent the responses
+
+        This keeps the step logic independent of how the LLM is called: step makes the calls with the blocking client,
+        astep awaits them on the event loop.
+        """
 
         def strip_name_field_from_user_message(user_message_text: str) -> Tuple[str, Optional[str]]:
             """If 'name' exists in the JSON string, remove it and return the cleaned text + name value"""
@@ -749,6 +861,20 @@ class Agent(object):
             else:
                 input_message_sequence = self._messages
 
+            # Summarize ahead of time if the prompt would not fit in the context window (instead of waiting for an overflow error)
+            context_window = self.agent_state.llm_config.context_window
+            if context_window is not None and len(self._messages) > MESSAGE_SUMMARY_TRUNC_KEEP_N_LAST + 1:
+                new_input_messages = input_message_sequence[len(self._messages) :]
+                prompt_tokens = self.token_ledger.total_tokens + sum(self.token_ledger.message_token_counts(new_input_messages))
+                if prompt_tokens > int(context_window):
+                    printd(f"Prompt ({prompt_tokens} tokens) exceeds the context window ({context_window} tokens), summarizing")
+                    try:
+                        self.summarize_messages_inplace()
+                        input_message_sequence = self._messages + new_input_messages
+                    except LLMError as e:
+                        # fall back to sending the prompt as is (overflow errors are handled below)
+                        printd(f"Summarize before step failed: {e}")
+
             if len(input_message_sequence) > 1 and input_message_sequence[-1].role != "user":
                 printd(f"{CLI_WARNING_PREFIX}Attempting to run ChatCompletion without user as the last message in the queue")
 
@@ -757,12 +883,13 @@ class Agent(object):
                 printd(f"This is the first message. Running extra verifier on AI response.")
                 counter = 0
                 while True:
-                    response = self._get_ai_reply(
+                    response = yield self._ai_reply_request(
                         message_sequence=input_message_sequence,
                         first_message=True,  # passed through to the prompt formatter
                         stream=stream,
                         inner_thoughts_in_kwargs=inner_thoughts_in_kwargs,
                     )
+                    self._check_ai_reply(response)
                     if verify_first_message_correctness(response, require_monologue=self.first_message_verify_mono):
                         break
 
@@ -771,11 +898,12 @@ class Agent(object):
                         raise Exception(f"Hit first message retry limit ({first_message_retry_limit})")
 
             else:
-                response = self._get_ai_reply(
+                response = yield self._ai_reply_request(
                     message_sequence=input_message_sequence,
                     stream=stream,
                     inner_thoughts_in_kwargs=inner_thoughts_in_kwargs,
                 )
+                self._check_ai_reply(response)
 
             # Step 3: check if LLM wanted to call a function
             # (if yes) Step 4: call the function
@@ -850,17 +978,19 @@ class Agent(object):
                 self.summarize_messages_inplace()
 
                 # Try step again
-                return self.step(
-                    user_message,
-                    first_message=first_message,
-                    first_message_retry_limit=first_message_retry_limit,
-                    skip_verify=skip_verify,
-                    return_dicts=return_dicts,
-                    recreate_message_timestamp=recreate_message_timestamp,
-                    stream=stream,
-                    timestamp=timestamp,
-                    inner_thoughts_in_kwargs=inner_thoughts_in_kwargs,
-                    ms=ms,
+                return (
+                    yield from self._step_steps(
+                        user_message,
+                        first_message=first_message,
+                        first_message_retry_limit=first_message_retry_limit,
+                        skip_verify=skip_verify,
+                        return_dicts=return_dicts,
+                        recreate_message_timestamp=recreate_message_timestamp,
+                        stream=stream,
+                        timestamp=timestamp,
+                        inner_thoughts_in_kwargs=inner_thoughts_in_kwargs,
+                        ms=ms,
+                    )
                 )
 
             else:
@@ -873,7 +1003,7 @@ class Agent(object):
         # Start at index 1 (past the system message),
         # and collect messages for summarization until we reach the desired truncation token fraction (eg 50%)
         # Do not allow truncation of the last N messages, since these are needed for in-context examples of function calling
-        token_counts = [count_tokens(str(msg)) for msg in self.messages]
+        token_counts = self.token_ledger.message_token_counts(self._messages)
         message_buffer_token_count = sum(token_counts[1:])  # no system message
         desired_token_count_to_summarize = int(message_buffer_token_count * MESSAGE_SUMMARY_TRUNC_TOKEN_FRAC)
         candidate_messages_to_summarize = self.messages[1:]
@@ -1005,6 +1135,8 @@ class Agent(object):
         assert self._messages[0].role == "system", self._messages
 
         self.persistence_manager.swap_system_message(new_system_message_obj)
+        self.token_ledger.remove([self._messages[0]])
+        self.token_ledger.add([new_system_message_obj])
 
         new_messages = [new_system_message_obj] + self._messages[1:]  # swap index 0 (system)
         self._messages = new_messages
@@ -1155,76 +1287,80 @@ class Agent(object):
         # TODO: recall memory
         raise NotImplementedError()
 
-    def attach_source(self, source_id: str, source_connector: StorageConnector, ms: MetadataStore):
-        """Attach data with name `source_name` to the agent from source_connector."""
-        # TODO: eventually, adding a data source should just give access to the retriever the source table, rather than modifying archival memory
-
-        filters = {"user_id": self.agent_state.user_id, "source_id": source_id}
-        size = source_connector.size(filters)
-        page_size = 100
-        generator = source_connector.get_all_paginated(filters=filters, page_size=page_size)  # yields List[Passage]
-        all_passages = []
-        for i in tqdm(range(0, size, page_size)):
-            passages = next(generator)
-
-            # need to associated passage with agent (for filtering)
-            for passage in passages:
-                assert isinstance(passage, Passage), f"Generate yielded bad non-Passage type: {type(passage)}"
-                passage.agent_id = self.agent_state.id
-
-                # regenerate passage ID (avoid duplicates)
-                # TODO: need to find another solution to the text duplication issue
-                # passage.id = create_uuid_from_string(f"{source_id}_{str(passage.agent_id)}_{passage.text}")
-
-            # insert into agent archival memory
-            self.persistence_manager.archival_memory.storage.insert_many(passages)
-            all_passages += passages
-
-        assert size == len(all_passages), f"Expected {size} passages, but only got {len(all_passages)}"
+    def attach_source(self, source_id: str, ms: MetadataStore):
+        """Attach data source `source_id` to the agent.
 
-        # save destination storage
-        self.persistence_manager.archival_memory.storage.save()
-
-        # attach to agent
+        The source passages stay in the shared passages table and are searched in place by archival memory,
+        so attaching a source only records the agent -> source mapping.
+        """
         source = ms.get_source(source_id=source_id)
         assert source is not None, f"Source {source_id} not found in metadata store"
         ms.attach_source(agent_id=self.agent_state.id, source_id=source_id, user_id=self.agent_state.user_id)
+        self.persistence_manager.archival_memory.attach_source(source_id)
 
-        total_agent_passages = self.persistence_manager.archival_memory.storage.size()
+        printd(f"Attached data source {source.name} to agent {self.agent_state.name}")
 
-        printd(
-            f"Attached data source {source.name} to agent {self.agent_state.name}, consisting of {len(all_passages)}. Agent now has {total_agent_passages} embeddings in archival memory.",
-        )
+    def detach_source(self, source_id: str, ms: MetadataStore):
+        """Detach data source `source_id` from the agent"""
+        ms.detach_source(agent_id=self.agent_state.id, source_id=source_id)
+        self.persistence_manager.archival_memory.detach_source(source_id)
+
+    def load_attached_sources(self, ms: MetadataStore):
+        """Sync the sources searched by archival memory with the agent -> source mappings in the metadata store"""
+        sources = ms.list_attached_sources(agent_id=self.agent_state.id)
+        self.persistence_manager.archival_memory.set_attached_sources([source.id for source in sources])
 
 
 def save_agent(agent: Agent, ms: MetadataStore):
-    """Save agent to metadata store"""
+    """Save agent to metadata store
+
+    Only the agent fields and memory blocks that changed since the last save are written (in a single transaction).
+    """
 
     agent.update_state()
     agent_state = agent.agent_state
-    agent_id = agent_state.id
     assert isinstance(agent_state.memory, Memory), f"Memory is not a Memory object: {type(agent_state.memory)}"
 
-    # NOTE: we're saving agent memory before persisting the agent to ensure
+    # NOTE: blocks are written in the same transaction as the agent to ensure
     # that allocated block_ids for each memory block are present in the agent model
-    save_agent_memory(agent=agent, ms=ms)
-
-    if ms.get_agent(agent_id=agent.agent_state.id):
-        ms.update_agent(agent_state)
+    blocks = get_agent_memory_blocks(agent)
+    snapshot = {
+        "fields": agent_state.model_dump(exclude={"id"}),
+        "blocks": {block.id: block.model_dump() for block in blocks},
+    }
+
+    # time of the latest in-context message, denormalized onto the agent row for listings
+    last_run = agent._messages[-1].created_at if agent._messages else None
+
+    previous = agent._persisted_snapshot
+    if previous is None:
+        # nothing is known about what is stored yet, so write everything
+        ms.save_agent_changes(agent_state, blocks=blocks, last_run=last_run)
     else:
-        ms.create_agent(agent_state)
+        changed_fields = [name for name, value in snapshot["fields"].items() if previous["fields"].get(name) != value]
+        changed_blocks = [block for block in blocks if previous["blocks"].get(block.id) != snapshot["blocks"][block.id]]
+        if not changed_fields and not changed_blocks:
+            return
+        new_block_ids = [block.id for block in changed_blocks if block.id not in previous["blocks"]]
+        ms.save_agent_changes(
+            agent_state,
+            fields=changed_fields,
+            blocks=changed_blocks,
+            new_block_ids=new_block_ids,
+            last_run=last_run if "message_ids" in changed_fields else None,
+        )
 
-    agent.agent_state = ms.get_agent(agent_id=agent_id)
-    assert isinstance(agent.agent_state.memory, Memory), f"Memory is not a Memory object: {type(agent_state.memory)}"
+    agent._persisted_snapshot = snapshot
 
 
-def save_agent_memory(agent: Agent, ms: MetadataStore):
+def get_agent_memory_blocks(agent: Agent) -> List[Block]:
     """
-    Save agent memory to metadata store. Memory is a collection of blocks and each block is persisted to the block table.
+    Get the blocks of the agent memory as they are persisted to the block table.
 
     NOTE: we are assuming agent.update_state has already been called.
     """
 
+    blocks = []
     for block_dict in agent.memory.to_dict().values():
         # TODO: block creation should happen in one place to enforce these sort of constraints consistently.
         if block_dict.get("user_id", None) is None:
@@ -1234,4 +1370,16 @@ def save_agent_memory(agent: Agent, ms: MetadataStore):
         # the case in some tests, if so we should relax the DB constraint.
         if block.value is None:
             block.value = ""
+        blocks.append(block)
+    return blocks
+
+
+def save_agent_memory(agent: Agent, ms: MetadataStore):
+    """
+    Save agent memory to metadata store. Memory is a collection of blocks and each block is persisted to the block table.
+
+    NOTE: we are assuming agent.update_state has already been called.
+    """
+
+    for block in get_agent_memory_blocks(agent):
         ms.update_or_create_block(block)
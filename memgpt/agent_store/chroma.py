@@ -1,9 +1,10 @@
 from typing import Dict, List, Optional, Tuple, cast
 
 import chromadb
+import numpy as np
 from chromadb.api.types import Include
 
-from memgpt.agent_store.storage import StorageConnector, TableType
+from memgpt.agent_store.storage import StorageConnector, TableType, cursor_record_id
 from memgpt.config import MemGPTConfig
 from memgpt.schemas.embedding_config import EmbeddingConfig
 from memgpt.schemas.passage import Passage
@@ -155,7 +156,7 @@ class ChromaStorageConnector(StorageConnector):
             recs.append(cast(Passage, record))
             ids.append(str(record.id))
             documents.append(record.text)
-            embeddings.append(record.embedding)
+            embeddings.append(record.embedding.tolist() if record.embedding is not None else None)
 
         # collect/format record metadata
         metadatas = []
@@ -217,7 +218,9 @@ class ChromaStorageConnector(StorageConnector):
 
     def query(self, query: str, query_vec: List[float], top_k: int = 10, filters: Optional[Dict] = {}):
         ids, filters = self.get_filters(filters)
-        results = self.collection.query(query_embeddings=[query_vec], n_results=top_k, include=self.include, where=filters)
+        results = self.collection.query(
+            query_embeddings=[np.asarray(query_vec).tolist()], n_results=top_k, include=self.include, where=filters
+        )
 
         # flatten, since we only have one query vector
         flattened_results = {}
@@ -263,6 +266,7 @@ class ChromaStorageConnector(StorageConnector):
         reverse: bool = False,
     ):
         records = self.get_all(filters=filters)
+        after, before = cursor_record_id(after), cursor_record_id(before)
 
         # WARNING: very hacky and slow implementation
         def get_index(id, record_list):
@@ -1,7 +1,9 @@
 import base64
 import os
+import re
+import threading
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import numpy as np
 from sqlalchemy import (
@@ -12,13 +14,12 @@ from sqlalchemy import (
     Index,
     String,
     TypeDecorator,
-    and_,
     asc,
-    create_engine,
     desc,
-    or_,
+    literal_column,
     select,
     text,
+    tuple_,
 )
 from sqlalchemy.orm import declarative_base, mapped_column, sessionmaker
 from sqlalchemy.orm.session import close_all_sessions
@@ -26,9 +27,16 @@ from sqlalchemy.sql import func
 from sqlalchemy_json import MutableJson
 from tqdm import tqdm
 
-from memgpt.agent_store.storage import StorageConnector, TableType
+from memgpt.agent_store.engines import get_engine, reset_setup, run_once
+from memgpt.agent_store.storage import (
+    StorageConnector,
+    TableType,
+    decode_cursor,
+    encode_cursor,
+)
 from memgpt.config import MemGPTConfig
 from memgpt.constants import MAX_EMBEDDING_DIM
+from memgpt.errors import InvalidCursorError
 from memgpt.metadata import EmbeddingConfigColumn
 
 # from memgpt.schemas.message import Message, Passage, Record, RecordType, ToolCall
@@ -37,6 +45,9 @@ from memgpt.schemas.openai.chat_completion_request import ToolCall, ToolCallFunc
 from memgpt.schemas.passage import Passage
 from memgpt.settings import settings
 
+# rows written by older versions hold the base64 encoding of the float32 buffer
+_BASE64_BYTES = re.compile(rb"[A-Za-z0-9+/]*={0,2}")
+
 
 class CommonVector(TypeDecorator):
     """Common type for representing vectors in SQLite"""
@@ -50,23 +61,147 @@ class CommonVector(TypeDecorator):
     def process_bind_param(self, value, dialect):
         if value is None:
             return value
-        # Ensure value is a numpy array
-        if isinstance(value, list):
-            value = np.array(value, dtype=np.float32)
-        # Serialize numpy array to bytes, then encode to base64 for universal compatibility
-        return base64.b64encode(value.tobytes())
+        # Store the raw float32 buffer (no base64), so rows can be loaded straight into a numpy matrix
+        return np.asarray(value, dtype=np.float32).tobytes()
 
     def process_result_value(self, value, dialect):
         if not value:
             return value
-        # Check database type and deserialize accordingly
-        if dialect.name == "sqlite":
-            # Decode from base64 and convert back to numpy array
+        # embeddings are stored padded to MAX_EMBEDDING_DIM, so a raw buffer of any other size is a legacy base64 row
+        if len(value) != 4 * MAX_EMBEDDING_DIM and len(value) % 4 == 0 and _BASE64_BYTES.fullmatch(value):
             value = base64.b64decode(value)
-        # For PostgreSQL, value is already in bytes
         return np.frombuffer(value, dtype=np.float32)
 
 
+class SQLiteVectorIndex:
+    """In-memory nearest-neighbour index over the embeddings of one table partition (e.g. one agent's archival memory)
+
+    Embeddings are kept in a contiguous float32 matrix (one row per passage) so a query is a single matrix-vector product.
+    The index is built lazily from the table on first query. Writes made in this process (through any connector) are
+    applied to it, and signature (the partition's row count and max rowid) detects writes made by other processes.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.signature: Optional[Tuple] = None
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._sq_norms = np.zeros((0,), dtype=np.float32)
+        self._ids: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _reserve(self, n_rows: int, dim: int):
+        """Grow the backing matrix (amortized doubling) so it holds at least n_rows rows of width dim"""
+        capacity, cur_dim = self._matrix.shape
+        if n_rows <= capacity and dim <= cur_dim:
+            return
+        new_capacity = max(n_rows, 2 * capacity, 1024) if n_rows > capacity else capacity
+        matrix = np.zeros((new_capacity, max(dim, cur_dim)), dtype=np.float32)
+        matrix[: len(self._ids), :cur_dim] = self._matrix[: len(self._ids)]
+        sq_norms = np.zeros((new_capacity,), dtype=np.float32)
+        sq_norms[: len(self._ids)] = self._sq_norms[: len(self._ids)]
+        self._matrix, self._sq_norms = matrix, sq_norms
+
+    def add(self, ids: List[str], embeddings: np.ndarray):
+        """Insert or replace the rows for ids (embeddings is an (n, dim) float32 array)"""
+        if len(ids) == 0:
+            return
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        # embeddings are zero-padded to MAX_EMBEDDING_DIM, only keep the columns that are actually used
+        # (dropping all-zero columns shifts every distance by the same constant, so rankings are unchanged)
+        used_cols = np.flatnonzero(embeddings.any(axis=0))
+        dim = int(used_cols[-1]) + 1 if len(used_cols) > 0 else 1
+        with self.lock:
+            self._reserve(len(self._ids) + len(ids), dim)
+            embeddings = embeddings[:, : self._matrix.shape[1]]
+            rows = np.empty((len(ids),), dtype=np.int64)
+            for i, id in enumerate(ids):
+                row = self._id_to_row.get(id)
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(id)
+                    self._id_to_row[id] = row
+                rows[i] = row
+            self._matrix[rows] = 0
+            self._matrix[rows, : embeddings.shape[1]] = embeddings
+            self._sq_norms[rows] = np.einsum("ij,ij->i", embeddings, embeddings)
+
+    def remove(self, ids: Iterable[str]):
+        """Remove rows by swapping the last row into the freed slot"""
+        with self.lock:
+            for id in ids:
+                row = self._id_to_row.pop(id, None)
+                if row is None:
+                    continue
+                last = len(self._ids) - 1
+                if row != last:
+                    moved_id = self._ids[last]
+                    self._matrix[row] = self._matrix[last]
+                    self._sq_norms[row] = self._sq_norms[last]
+                    self._ids[row] = moved_id
+                    self._id_to_row[moved_id] = row
+                self._ids.pop()
+
+    def clear(self):
+        with self.lock:
+            self.loaded = False
+            self.signature = None
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+            self._sq_norms = np.zeros((0,), dtype=np.float32)
+            self._ids = []
+            self._id_to_row = {}
+
+    def query(self, query_vec: List[float], top_k: int, allowed_ids: Optional[Iterable[str]] = None) -> List[str]:
+        """Return the ids of the top_k rows closest (L2) to query_vec, optionally restricted to allowed_ids"""
+        with self.lock:
+            n = len(self._ids)
+            if n == 0 or top_k <= 0:
+                return []
+            dim = self._matrix.shape[1]
+            query_vec = np.asarray(query_vec, dtype=np.float32)[:dim]
+            q = np.zeros((dim,), dtype=np.float32)
+            q[: len(query_vec)] = query_vec
+
+            if allowed_ids is None:
+                rows = None
+                # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2, and ||q||^2 is the same for every row
+                scores = self._sq_norms[:n] - 2.0 * (self._matrix[:n] @ q)
+            else:
+                rows = np.fromiter((self._id_to_row[id] for id in allowed_ids if id in self._id_to_row), dtype=np.int64)
+                if len(rows) == 0:
+                    return []
+                scores = self._sq_norms[rows] - 2.0 * (self._matrix[rows] @ q)
+
+            k = min(top_k, len(scores))
+            candidates = np.argpartition(scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+            ranked = candidates[np.argsort(scores[candidates], kind="stable")]
+            if rows is not None:
+                ranked = rows[ranked]
+            return [self._ids[row] for row in ranked]
+
+
+# indexes are shared by every connector pointing at the same (database, table, partition)
+_sqlite_vector_indexes: Dict[Tuple, SQLiteVectorIndex] = {}
+_sqlite_vector_indexes_lock = threading.Lock()
+
+
+def get_sqlite_vector_index(path: str, table_name: str, filters: Dict) -> SQLiteVectorIndex:
+    key = (path, table_name, tuple(sorted((k, str(v)) for k, v in filters.items())))
+    with _sqlite_vector_indexes_lock:
+        if key not in _sqlite_vector_indexes:
+            _sqlite_vector_indexes[key] = SQLiteVectorIndex()
+        return _sqlite_vector_indexes[key]
+
+
+def get_sqlite_vector_indexes(path: str, table_name: str) -> List[Tuple[Dict[str, str], SQLiteVectorIndex]]:
+    """(filters, index) of every partition of a table that has an index"""
+    with _sqlite_vector_indexes_lock:
+        return [(dict(key[2]), index) for key, index in _sqlite_vector_indexes.items() if key[:2] == (path, table_name)]
+
+
 # Custom serialization / de-serialization for JSON columns
 
 
@@ -81,11 +216,15 @@ def get_db_model(
     agent_id: Optional[str] = None,
     dialect="postgresql",
 ):
+    # records are listed per agent (per user for source passages) ordered by (created_at, id), see get_all_cursor
+    owner_column = "user_id" if table_type == TableType.PASSAGES else "agent_id"
+
     # Define a helper function to create or get the model class
     def create_or_get_model(class_name, base_model, table_name):
         if class_name in globals():
             return globals()[class_name]
-        Model = type(class_name, (base_model,), {"__tablename__": table_name, "__table_args__": {"extend_existing": True}})
+        table_args = (Index(f"{table_name}_idx_keyset", owner_column, "created_at", "id"), {"extend_existing": True})
+        Model = type(class_name, (base_model,), {"__tablename__": table_name, "__table_args__": table_args})
         globals()[class_name] = Model
         return Model
 
@@ -208,6 +347,24 @@ def get_db_model(
         raise ValueError(f"Table type {table_type} not implemented")
 
 
+def create_vector_extension(engine):
+    with engine.connect() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))  # Enables the vector extension
+        conn.commit()
+
+
+def create_table_once(uri: str, table):
+    """Create a table and its indexes if they don't exist (checked once per process, until the table is dropped)"""
+
+    def create(engine):
+        Base.metadata.create_all(engine, tables=[table])
+        # tables created by an earlier version miss the indexes added since
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+    run_once(uri, f"table:{table.name}", create)
+
+
 class SQLStorageConnector(StorageConnector):
     def __init__(self, table_type: str, config: MemGPTConfig, user_id, agent_id=None):
         super().__init__(table_type=table_type, config=config, user_id=user_id, agent_id=agent_id)
@@ -221,22 +378,25 @@ class SQLStorageConnector(StorageConnector):
         all_filters = [getattr(self.db_model, key) == value for key, value in filter_conditions.items()]
         return all_filters
 
-    def get_all_paginated(self, filters: Optional[Dict] = {}, page_size: Optional[int] = 1000, offset=0):
-        filters = self.get_filters(filters)
+    def get_all_paginated(self, filters: Optional[Dict] = {}, page_size: Optional[int] = 1000, offset=0, reverse: bool = False):
+        """Iterate over the records in pages, ordered by (created_at, id)
+
+        Only the first page is located with offset, every next page continues from the last record of the previous one
+        (see get_all_cursor), so it costs the same however deep into the table it is.
+        """
+        cursor = None
         while True:
-            # Retrieve a chunk of records with the given page_size
-            with self.session_maker() as session:
-                db_record_chunk = session.query(self.db_model).filter(*filters).offset(offset).limit(page_size).all()
+            if cursor is None:
+                cursor, records = self._get_page(filters, limit=page_size, offset=offset, reverse=reverse)
+            elif reverse:
+                cursor, records = self.get_all_cursor(filters, before=cursor, limit=page_size, reverse=True)
+            else:
+                cursor, records = self.get_all_cursor(filters, after=cursor, limit=page_size)
 
-            # If the chunk is empty, we've retrieved all records
-            if not db_record_chunk:
+            # If the page is empty, we've retrieved all records
+            if not records:
                 break
-
-            # Yield a list of Record objects converted from the chunk
-            yield [record.to_record() for record in db_record_chunk]
-
-            # Increment the offset to get the next chunk in the next iteration
-            offset += page_size
+            yield records
 
     def get_all_cursor(
         self,
@@ -247,42 +407,60 @@ class SQLStorageConnector(StorageConnector):
         order_by: str = "created_at",
         reverse: bool = False,
     ):
-        """Get all that returns a cursor (record.id) and records"""
+        """Get a page of records ordered by (order_by, id), and the cursor of its last record
+
+        after / before are cursors returned by an earlier call (record IDs are also accepted, at the cost of looking the
+        record up). The page is read with a (keyset) range condition on the ordering, which the (owner, created_at, id)
+        index answers without scanning the records before the cursor.
+        """
+        return self._get_page(filters, after=after, before=before, limit=limit, order_by=order_by, reverse=reverse)
+
+    def _get_page(
+        self,
+        filters: Optional[Dict] = {},
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        limit: Optional[int] = 1000,
+        offset: int = 0,
+        order_by: str = "created_at",
+        reverse: bool = False,
+    ) -> Tuple[Optional[str], list]:
         filters = self.get_filters(filters)
+        column = getattr(self.db_model, order_by)
+        key = tuple_(column, self.db_model.id)
 
-        # generate query
         with self.session_maker() as session:
             query = session.query(self.db_model).filter(*filters)
-            # query = query.order_by(asc(self.db_model.id))
-
-            # records are sorted by the order_by field first, and then by the ID if two fields are the same
+            # the ID breaks ties in the same direction, so reverse order is exactly the ascending order backwards
             if reverse:
-                query = query.order_by(desc(getattr(self.db_model, order_by)), asc(self.db_model.id))
+                query = query.order_by(desc(column), desc(self.db_model.id))
             else:
-                query = query.order_by(asc(getattr(self.db_model, order_by)), asc(self.db_model.id))
-
-            # cursor logic: filter records based on before/after ID
+                query = query.order_by(asc(column), asc(self.db_model.id))
             if after:
-                after_value = getattr(self.get(id=after), order_by)
-                sort_exp = getattr(self.db_model, order_by) > after_value
-                query = query.filter(
-                    or_(sort_exp, and_(getattr(self.db_model, order_by) == after_value, self.db_model.id > after))  # tiebreaker case
-                )
+                query = query.filter(key > tuple_(*self._cursor_position(session, after, order_by)))
             if before:
-                before_value = getattr(self.get(id=before), order_by)
-                sort_exp = getattr(self.db_model, order_by) < before_value
-                query = query.filter(or_(sort_exp, and_(getattr(self.db_model, order_by) == before_value, self.db_model.id < before)))
-
-            # get records
+                query = query.filter(key < tuple_(*self._cursor_position(session, before, order_by)))
+            if offset:
+                query = query.offset(offset)
             db_record_chunk = query.limit(limit).all()
+
         if not db_record_chunk:
             return (None, [])
-        records = [record.to_record() for record in db_record_chunk]
-        next_cursor = db_record_chunk[-1].id
-        assert isinstance(next_cursor, str)
-
-        # return (cursor, list[records])
-        return (next_cursor, records)
+        last = db_record_chunk[-1]
+        return (encode_cursor(order_by, getattr(last, order_by), last.id), [record.to_record() for record in db_record_chunk])
+
+    def _cursor_position(self, session, cursor: str, order_by: str) -> Tuple:
+        """(order_by value, id) of the record a cursor points at"""
+        decoded = decode_cursor(cursor)
+        if decoded is not None:
+            cursor_order_by, value, id = decoded
+            if cursor_order_by != order_by:
+                raise InvalidCursorError(f"Cursor is for records ordered by {cursor_order_by}, not {order_by}")
+            return value, id
+        row = session.query(getattr(self.db_model, order_by)).filter(self.db_model.id == cursor).first()
+        if row is None:
+            raise InvalidCursorError(f"Cursor record {cursor} does not exist")
+        return row[0], cursor
 
     def get_all(self, filters: Optional[Dict] = {}, limit=None):
         filters = self.get_filters(filters)
@@ -306,6 +484,24 @@ class SQLStorageConnector(StorageConnector):
         with self.session_maker() as session:
             return session.query(self.db_model).filter(*filters).count()
 
+    def size_by(self, field: str, filters: Optional[Dict] = {}) -> Dict[str, int]:
+        filters = self.get_filters(filters)
+        column = getattr(self.db_model, field)
+        with self.session_maker() as session:
+            rows = session.query(column, func.count()).filter(*filters).group_by(column).all()
+        return {value: count for value, count in rows}
+
+    def size_by_agent(self, agent_ids: List[str], agent_users: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+        # agent IDs are unique across users, so the agents can belong to anyone
+        with self.session_maker() as session:
+            rows = (
+                session.query(self.db_model.agent_id, func.count())
+                .filter(self.db_model.agent_id.in_(agent_ids))
+                .group_by(self.db_model.agent_id)
+                .all()
+            )
+        return {**{agent_id: 0 for agent_id in agent_ids}, **dict(rows)}
+
     def insert(self, record):
         raise NotImplementedError
 
@@ -365,12 +561,15 @@ class SQLStorageConnector(StorageConnector):
         with self.session_maker() as session:
             self.db_model.__table__.drop(session.bind)
             session.commit()
+        reset_setup(self.uri, f"table:{self.db_model.__table__.name}")
 
-    def delete(self, filters: Optional[Dict] = {}):
+    def delete(self, filters: Optional[Dict] = {}) -> int:
+        """Delete matching records, returns the number of records deleted"""
         filters = self.get_filters(filters)
         with self.session_maker() as session:
-            session.query(self.db_model).filter(*filters).delete()
+            deleted = session.query(self.db_model).filter(*filters).delete()
             session.commit()
+        return deleted
 
 
 class PostgresStorageConnector(SQLStorageConnector):
@@ -403,19 +602,18 @@ class PostgresStorageConnector(SQLStorageConnector):
             else:
                 raise ValueError(f"Table type {table_type} not implemented")
 
-        # create engine
-        self.engine = create_engine(self.uri)
+        # engine (and connection pool) shared with all other connectors using this database
+        self.engine = get_engine(self.uri)
 
         for c in self.db_model.__table__.columns:
             if c.name == "embedding":
                 assert isinstance(c.type, Vector), f"Embedding column must be of type Vector, got {c.type}"
 
         self.session_maker = sessionmaker(bind=self.engine)
-        with self.session_maker() as session:
-            session.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))  # Enables the vector extension
+        run_once(self.uri, "vector_extension", create_vector_extension)
 
         # create table
-        Base.metadata.create_all(self.engine, tables=[self.db_model.__table__])  # Create the table if it doesn't exist
+        create_table_once(self.uri, self.db_model.__table__)
 
     def query(self, query: str, query_vec: List[float], top_k: int = 10, filters: Optional[Dict] = {}):
         filters = self.get_filters(filters)
@@ -506,7 +704,9 @@ class SQLLiteStorageConnector(SQLStorageConnector):
 
         # get storage URI
         if table_type == TableType.ARCHIVAL_MEMORY or table_type == TableType.PASSAGES:
-            raise ValueError(f"Table type {table_type} not implemented")
+            self.path = self.config.archival_storage_path
+            if self.path is None:
+                raise ValueError(f"Must specifiy archival_storage_path in config {self.config.config_path}")
         elif table_type == TableType.RECALL_MEMORY:
             # TODO: eventually implement URI option
             self.path = self.config.recall_storage_path
@@ -519,10 +719,17 @@ class SQLLiteStorageConnector(SQLStorageConnector):
 
         # Create the SQLAlchemy engine
         self.db_model = get_db_model(config, self.table_name, table_type, user_id, agent_id, dialect="sqlite")
-        self.engine = create_engine(f"sqlite:///{self.path}")
-        Base.metadata.create_all(self.engine, tables=[self.db_model.__table__])  # Create the table if it doesn't exist
+        self.uri = f"sqlite:///{self.path}"
+        self.engine = get_engine(self.uri)
+        create_table_once(self.uri, self.db_model.__table__)
         self.session_maker = sessionmaker(bind=self.engine)
 
+        # vector index for passage tables (built lazily on first query)
+        if self.type == Passage:
+            self.vector_index = get_sqlite_vector_index(self.path, self.table_name, self.filters)
+        else:
+            self.vector_index = None
+
         # import sqlite3
 
         # sqlite3.register_adapter(uuid.UUID, lambda u: u.bytes_le)
@@ -546,6 +753,7 @@ class SQLLiteStorageConnector(SQLStorageConnector):
                 else:
                     conn.execute(stmt)
                 conn.commit()
+            self._add_to_vector_index(records)
         else:
             with self.session_maker() as session:
                 iterable = tqdm(records) if show_progress else records
@@ -558,6 +766,95 @@ class SQLLiteStorageConnector(SQLStorageConnector):
     def insert(self, record, exists_ok=True):
         self.insert_many([record], exists_ok=exists_ok)
 
+    def _partition_signature(self, session) -> Tuple:
+        """Row count and max rowid of the connector's partition (both read from the partition's index)"""
+        return tuple(session.query(func.count(), func.max(literal_column("rowid"))).filter(*self.get_filters({})).one())
+
+    def _load_vector_index(self, batch_size: int = 10000):
+        """Build the in-memory vector index from the table, or rebuild it if another process wrote to the partition"""
+        with self.vector_index.lock, self.session_maker() as session:
+            signature = self._partition_signature(session)
+            if self.vector_index.loaded:
+                if self.vector_index.signature is None:
+                    # changed in this process since it was last checked
+                    self.vector_index.signature = signature
+                if self.vector_index.signature == signature:
+                    return
+                self.vector_index.clear()
+            rows = session.query(self.db_model.id, self.db_model.embedding).filter(*self.get_filters({})).yield_per(batch_size)
+            ids, embeddings = [], []
+            for id, embedding in rows:
+                if embedding is None:
+                    continue
+                ids.append(id)
+                embeddings.append(embedding)
+                if len(ids) == batch_size:
+                    self.vector_index.add(ids, np.stack(embeddings))
+                    ids, embeddings = [], []
+            if ids:
+                self.vector_index.add(ids, np.stack(embeddings))
+            self.vector_index.loaded = True
+            self.vector_index.signature = signature
+
+    def _loaded_vector_indexes(self) -> List[Tuple[Dict[str, str], SQLiteVectorIndex]]:
+        """Built indexes of all the partitions of the table (any of them can hold the rows a connector writes)"""
+        if self.vector_index is None:
+            return []
+        return [(filters, index) for filters, index in get_sqlite_vector_indexes(self.path, self.table_name) if index.loaded]
+
+    def _add_to_vector_index(self, records: List[Passage]):
+        for filters, index in self._loaded_vector_indexes():
+            in_partition = [record for record in records if all(str(getattr(record, k, None)) == v for k, v in filters.items())]
+            with_embedding = [record for record in in_partition if record.embedding is not None]
+            # taking the lock waits out an in-progress build; if the index hasn't been built yet, new rows are picked up when it is
+            with index.lock:
+                if not index.loaded:
+                    continue
+                if with_embedding:
+                    index.add([record.id for record in with_embedding], np.stack([record.embedding for record in with_embedding]))
+                # records that moved out of the partition (or lost their embedding)
+                in_index = {record.id for record in with_embedding}
+                index.remove([record.id for record in records if record.id not in in_index])
+                index.signature = None
+
+    def query(self, query: str, query_vec: List[float], top_k: int = 10, filters: Optional[Dict] = {}):
+        if self.vector_index is None:
+            raise NotImplementedError(f"Vector query not implemented for table type {self.table_type}")
+        self._load_vector_index()
+
+        with self.session_maker() as session:
+            # extra filters (e.g. source_id) are resolved in SQL and used to mask the index
+            allowed_ids = None
+            if filters:
+                allowed_ids = [id for (id,) in session.query(self.db_model.id).filter(*self.get_filters(filters)).all()]
+            ids = self.vector_index.query(query_vec, top_k, allowed_ids=allowed_ids)
+            if not ids:
+                return []
+            results = {result.id: result for result in session.query(self.db_model).filter(self.db_model.id.in_(ids)).all()}
+
+        # return in ranked order
+        return [results[id].to_record() for id in ids if id in results]
+
+    def delete(self, filters: Optional[Dict] = {}) -> int:
+        indexes = self._loaded_vector_indexes()
+        if not indexes:
+            return super().delete(filters)
+        with self.session_maker() as session:
+            ids = [id for (id,) in session.query(self.db_model.id).filter(*self.get_filters(filters)).all()]
+        deleted = super().delete(filters)
+        for _, index in indexes:
+            with index.lock:
+                index.remove(ids)
+                index.signature = None
+        return deleted
+
+    # Should be used only in tests!
+    def delete_table(self):
+        super().delete_table()
+        if self.vector_index is not None:
+            for _, index in get_sqlite_vector_indexes(self.path, self.table_name):
+                index.clear()
+
     def update(self, record):
         """
         Updates an existing record in the database with values from the provided record object.
@@ -580,3 +877,6 @@ class SQLLiteStorageConnector(SQLStorageConnector):
 
             # Commit the changes to the database
             session.commit()
+
+        if isinstance(record, Passage):
+            self._add_to_vector_index([record])
@@ -0,0 +1,84 @@
+import threading
+from typing import Callable, Dict, Set, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from memgpt.settings import settings
+
+# database URI -> engine, shared by the metadata store and all storage connectors
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+# (database URI, setup key) pairs that have already run in this process
+_setup_done: Set[Tuple[str, str]] = set()
+_setup_lock = threading.Lock()
+
+
+def _engine_options(uri: str) -> dict:
+    if uri.startswith("sqlite"):
+        # sqlite has no server side connection limit, keep the SQLAlchemy defaults
+        return {}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+
+def get_engine(uri: str) -> Engine:
+    """Get the process-wide engine (and connection pool) for a database URI"""
+    with _engines_lock:
+        engine = _engines.get(uri)
+        if engine is None:
+            engine = create_engine(uri, **_engine_options(uri))
+            _engines[uri] = engine
+        return engine
+
+
+def run_once(uri: str, key: str, setup: Callable[[Engine], None]):
+    """Run one-time setup (e.g. DDL) against a database once per process
+
+    If setup raises it is retried on the next call.
+    """
+    if (uri, key) in _setup_done:
+        return
+    with _setup_lock:
+        if (uri, key) in _setup_done:
+            return
+        setup(get_engine(uri))
+        _setup_done.add((uri, key))
+
+
+def reset_setup(uri: str, key: str):
+    """Forget that a setup step ran (e.g. after dropping the table it created)"""
+    with _setup_lock:
+        _setup_done.discard((uri, key))
+
+
+def get_pool_stats() -> Dict[str, dict]:
+    """Connection pool usage per database (URIs without credentials)"""
+    with _engines_lock:
+        engines = list(_engines.values())
+    stats = {}
+    for engine in engines:
+        pool = engine.pool
+        stats[engine.url.render_as_string(hide_password=True)] = {
+            "pool": type(pool).__name__,
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        }
+    return stats
+
+
+def dispose_engines():
+    """Close all pooled connections and forget the engines (e.g. between tests or after a fork)"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+    with _setup_lock:
+        _setup_done.clear()
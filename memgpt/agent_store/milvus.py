@@ -2,6 +2,7 @@ import uuid
 from copy import deepcopy
 from typing import Dict, Iterator, List, Optional, cast
 
+import numpy as np
 from pymilvus import DataType, MilvusClient
 from pymilvus.client.constants import ConsistencyLevel
 
@@ -126,7 +127,11 @@ class MilvusStorageConnector(StorageConnector):
         if not self.client.has_collection(self.table_name):
             return []
         search_res = self.client.search(
-            collection_name=self.table_name, data=[query_vec], filter=self.get_milvus_filter(filters), limit=top_k, output_fields=["*"]
+            collection_name=self.table_name,
+            data=[np.asarray(query_vec).tolist()],
+            filter=self.get_milvus_filter(filters),
+            limit=top_k,
+            output_fields=["*"],
         )[0]
         entity_res = [res["entity"] for res in search_res]
         return self._list_to_records(entity_res)
@@ -164,7 +169,7 @@ class MilvusStorageConnector(StorageConnector):
                 **record_metadata,
                 "id": str(_id),
                 "text": text,
-                "embedding": embedding,
+                "embedding": embedding.tolist(),
             }
             for key, value in record_dict.items():
                 if key in self.uuid_fields:
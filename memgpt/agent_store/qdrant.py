@@ -177,7 +177,7 @@ class QdrantStorageConnector(StorageConnector):
             points.append(
                 models.PointStruct(
                     id=str(_id),
-                    vector=embedding,
+                    vector=embedding.tolist(),
                     payload={
                         TEXT_PAYLOAD_KEY: text,
                         METADATA_PAYLOAD_KEY: metadata,
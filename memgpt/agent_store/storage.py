@@ -3,13 +3,17 @@
 We originally tried to use Llama Index VectorIndex, but their limited API was extremely problematic.
 """
 
+import base64
+import json
 import uuid
 from abc import abstractmethod
-from typing import Dict, List, Optional, Tuple, Type, Union
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
 
 from pydantic import BaseModel
 
 from memgpt.config import MemGPTConfig
+from memgpt.errors import InvalidCursorError
 from memgpt.schemas.document import Document
 from memgpt.schemas.message import Message
 from memgpt.schemas.passage import Passage
@@ -35,6 +39,39 @@ ARCHIVAL_TABLE_NAME = "memgpt_archival_memory_agent"  # agent memory
 PASSAGE_TABLE_NAME = "memgpt_passages"  # chunked/embedded passages (from source)
 DOCUMENT_TABLE_NAME = "memgpt_documents"  # original documents (from source)
 
+# prefix of the pagination cursors made by encode_cursor (anything else passed as a cursor is a record ID)
+CURSOR_PREFIX = "c1."
+
+
+def encode_cursor(order_by: str, value: Any, id: str) -> str:
+    """Opaque pagination cursor for the position of a record in a listing ordered by (order_by, id)"""
+    if isinstance(value, datetime):
+        value = {"datetime": value.isoformat()}
+    payload = json.dumps([order_by, value, id], separators=(",", ":")).encode("utf-8")
+    return CURSOR_PREFIX + base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[str, Any, str]]:
+    """(order_by, value, id) of a cursor made by encode_cursor, or None if the cursor is a record ID"""
+    if not cursor.startswith(CURSOR_PREFIX):
+        return None
+    token = cursor[len(CURSOR_PREFIX) :]
+    try:
+        order_by, value, id = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (TypeError, ValueError):
+        raise InvalidCursorError(f"Invalid cursor {cursor}")
+    if isinstance(value, dict):
+        value = datetime.fromisoformat(value["datetime"])
+    return order_by, value, id
+
+
+def cursor_record_id(cursor: Optional[str]) -> Optional[str]:
+    """ID of the record a cursor points at"""
+    if cursor is None:
+        return None
+    decoded = decode_cursor(cursor)
+    return cursor if decoded is None else decoded[2]
+
 
 class StorageConnector:
     """Defines a DB connection that is user-specific to access data: Documents, Passages, Archival/Recall Memory"""
@@ -127,12 +164,12 @@ class StorageConnector:
 
     @staticmethod
     def get_archival_storage_connector(user_id, agent_id):
-        config = MemGPTConfig.load()
+        config = MemGPTConfig.load_cached()
         return StorageConnector.get_storage_connector(TableType.ARCHIVAL_MEMORY, config, user_id, agent_id)
 
     @staticmethod
     def get_recall_storage_connector(user_id, agent_id):
-        config = MemGPTConfig.load()
+        config = MemGPTConfig.load_cached()
         return StorageConnector.get_storage_connector(TableType.RECALL_MEMORY, config, user_id, agent_id)
 
     @abstractmethod
@@ -155,6 +192,21 @@ class StorageConnector:
     def size(self, filters: Optional[Dict] = {}) -> int:
         pass
 
+    def size_by(self, field: str, filters: Optional[Dict] = {}) -> Dict[str, int]:
+        """Number of records for each value of a field"""
+        raise NotImplementedError
+
+    def size_by_agent(self, agent_ids: List[str], agent_users: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+        """Number of records of each of the given agents (not only the connector's agent)
+
+        agent_users maps agents that aren't the connector user's to their user
+        """
+        agent_users = agent_users or {}
+        sizes = {}
+        for agent_id in agent_ids:
+            sizes[agent_id] = self.size(filters={"user_id": agent_users.get(agent_id, self.user_id), "agent_id": agent_id})
+        return sizes
+
     @abstractmethod
     def insert(self, record):
         pass
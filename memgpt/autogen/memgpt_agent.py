@@ -15,7 +15,6 @@ import memgpt.system as system
 import memgpt.utils as utils
 from memgpt.agent import Agent as MemGPTAgent
 from memgpt.agent import save_agent
-from memgpt.agent_store.storage import StorageConnector, TableType
 from memgpt.autogen.interface import AutoGenInterface
 from memgpt.cli.cli_load import load_directory, load_vector_database
 from memgpt.config import MemGPTConfig
@@ -78,9 +77,7 @@ class MemGPTConversableAgent(ConversableAgent):
 
     def attach(self, data_source: str):
         # attach new data
-        config = MemGPTConfig.load()
-        source_connector = StorageConnector.get_storage_connector(TableType.PASSAGES, config, user_id=self.agent.agent_state.user_id)
-        self.agent.attach_source(data_source, source_connector, ms=self.ms)
+        self.agent.attach_source(data_source, ms=self.ms)
 
     def load_and_attach(self, name: str, type: str, force=False, **kwargs):
         # check if data source already exists
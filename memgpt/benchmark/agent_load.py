@@ -0,0 +1,63 @@
+# type: ignore
+
+import time
+from typing import Annotated
+
+import numpy as np
+import typer
+
+from memgpt.constants import BASE_TOOLS
+from memgpt.schemas.agent import CreateAgent
+from memgpt.schemas.memory import ChatMemory
+from memgpt.schemas.user import UserCreate
+from memgpt.server.server import SyncServer
+
+app = typer.Typer()
+
+
+@app.command()
+def bench(
+    n_agents: Annotated[int, typer.Option("--n-agents", help="Number of agents to create and load.")] = 20,
+    n_rounds: Annotated[int, typer.Option("--n-rounds", help="Cold loads per agent.")] = 5,
+):
+    """Latency of cold (not cached) and warm (cached) agent loads through SyncServer._get_or_load_agent
+
+    Uses the storage backends from the MemGPT config (~/.memgpt/config).
+    """
+    server = SyncServer()
+    user = server.create_user(UserCreate(name="agent_load_benchmark"))
+    agent_ids = []
+    try:
+        for i in range(n_agents):
+            agent_state = server.create_agent(
+                request=CreateAgent(
+                    name=f"agent_load_benchmark_{i}", tools=BASE_TOOLS, memory=ChatMemory(human="human", persona="persona")
+                ),
+                user_id=user.id,
+            )
+            agent_ids.append(agent_state.id)
+
+        cold, warm = [], []
+        for _ in range(n_rounds):
+            for agent_id in agent_ids:
+                server.active_agents.remove(agent_id)
+                start = time.perf_counter()
+                server._get_or_load_agent(agent_id=agent_id)
+                cold.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                server._get_or_load_agent(agent_id=agent_id)
+                warm.append(time.perf_counter() - start)
+
+        print(f"{n_agents} agents x {n_rounds} rounds ({server.config.metadata_storage_type} metadata store)")
+        for label, latencies in (("cold load", cold), ("warm load (cached)", warm)):
+            latencies_ms = np.array(latencies) * 1000
+            print(f"\t-> {label:<20} p50={np.percentile(latencies_ms, 50):.3f}ms p95={np.percentile(latencies_ms, 95):.3f}ms")
+    finally:
+        for agent_id in agent_ids:
+            server.delete_agent(user.id, agent_id)
+        server.delete_user(user.id)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,109 @@
+# type: ignore
+
+import tempfile
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Annotated
+
+import typer
+from sqlalchemy import event
+
+from memgpt.agent import Agent, save_agent, save_agent_memory
+from memgpt.config import MemGPTConfig
+from memgpt.metadata import MetadataStore
+from memgpt.schemas.agent import AgentState
+from memgpt.schemas.embedding_config import EmbeddingConfig
+from memgpt.schemas.llm_config import LLMConfig
+from memgpt.schemas.memory import ChatMemory
+
+app = typer.Typer()
+
+
+class StubAgent:
+    """The parts of Agent that save_agent touches (no LLM, interface or storage connectors)"""
+
+    def __init__(self, agent_state: AgentState):
+        self.agent_state = agent_state
+        self.memory = agent_state.memory
+        self.system = agent_state.system
+        self._messages = []
+        self._persisted_snapshot = None
+
+    def update_state(self) -> AgentState:
+        return Agent.update_state(self)
+
+
+def legacy_save_agent(agent: StubAgent, ms: MetadataStore):
+    """save_agent before dirty tracking: every block, then get / update / reload the agent"""
+    agent.update_state()
+    save_agent_memory(agent=agent, ms=ms)
+    if ms.get_agent(agent_id=agent.agent_state.id):
+        ms.update_agent(agent.agent_state)
+    else:
+        ms.create_agent(agent.agent_state)
+    agent.agent_state = ms.get_agent(agent_id=agent.agent_state.id)
+
+
+def create_agent(user_id: str) -> StubAgent:
+    agent_state = AgentState(
+        name=f"bench_{uuid.uuid4().hex[:8]}",
+        user_id=user_id,
+        system="You are MemGPT. {CORE_MEMORY}",
+        tools=["send_message", "core_memory_append", "archival_memory_insert"],
+        memory=ChatMemory(persona="I am a helpful assistant.", human="The user's name is Sam."),
+        llm_config=LLMConfig(model="gpt-4", model_endpoint_type="openai", model_endpoint="https://api.openai.com/v1", context_window=8192),
+        embedding_config=EmbeddingConfig(embedding_endpoint_type="openai", embedding_model="text-embedding-ada-002", embedding_dim=1536),
+    )
+    return StubAgent(agent_state)
+
+
+@app.command()
+def bench(
+    n_requests: Annotated[int, typer.Option("--n-requests", help="Number of user messages.")] = 50,
+    chain_length: Annotated[int, typer.Option("--chain-length", help="Chained (heartbeat) steps per user message.")] = 3,
+    memory_edit_every: Annotated[int, typer.Option("--memory-edit-every", help="Edit core memory every N steps (0 to never).")] = 4,
+):
+    """DB statements and time per agent step, with legacy full saves, incremental saves and write-behind saves"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ms = MetadataStore(MemGPTConfig(metadata_storage_type="sqlite", metadata_storage_path=tmpdir))
+        statements = [0]
+
+        @event.listens_for(ms.engine, "before_cursor_execute")
+        def count_statement(*args):
+            statements[0] += 1
+
+        user_id = str(uuid.uuid4())
+        modes = {
+            "legacy (full save per step)": (legacy_save_agent, False),
+            "incremental save per step": (save_agent, False),
+            "write-behind (one save per request)": (save_agent, True),
+        }
+        for label, (save, write_behind) in modes.items():
+            agent = create_agent(user_id)
+            save(agent, ms)
+
+            statements[0] = 0
+            step = 0
+            start = time.perf_counter()
+            for _ in range(n_requests):
+                for _ in range(chain_length):
+                    step += 1
+                    # a step adds the assistant message and the function response to the context
+                    agent._messages += [SimpleNamespace(id=str(uuid.uuid4())), SimpleNamespace(id=str(uuid.uuid4()))]
+                    if memory_edit_every and step % memory_edit_every == 0:
+                        agent.memory.update_block_value("human", agent.memory.get_block("human").value + f"\nfact {step}")
+                    if not write_behind:
+                        save(agent, ms)
+                if write_behind:
+                    save(agent, ms)
+            elapsed = time.perf_counter() - start
+
+            assert ms.get_agent(agent_id=agent.agent_state.id).message_ids == [msg.id for msg in agent._messages]
+            print(f"{label}: {statements[0] / step:.2f} statements/step, {elapsed / step * 1000:.2f}ms/step")
+
+        print(f"({n_requests} requests x {chain_length} steps, core memory edited every {memory_edit_every} steps, sqlite)")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,164 @@
+# type: ignore
+
+import asyncio
+import json
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, List
+
+import numpy as np
+import typer
+import uvicorn
+from fastapi import FastAPI
+
+from memgpt.constants import BASE_TOOLS
+from memgpt.schemas.agent import CreateAgent
+from memgpt.schemas.llm_config import LLMConfig
+from memgpt.schemas.memory import ChatMemory
+from memgpt.schemas.user import UserCreate
+from memgpt.server.async_server import AsyncServer
+from memgpt.server.server import SyncServer
+from memgpt.settings import settings
+
+app = typer.Typer()
+
+
+def create_stub_llm(latency: float) -> FastAPI:
+    """OpenAI-compatible endpoint that answers every request with a send_message call after `latency` seconds"""
+    api = FastAPI()
+    api.state.in_flight = 0
+    api.state.peak = 0
+
+    @api.post("/v1/chat/completions")
+    async def chat_completions():
+        api.state.in_flight += 1
+        api.state.peak = max(api.state.peak, api.state.in_flight)
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            api.state.in_flight -= 1
+        return {
+            "id": str(uuid.uuid4()),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "tool_calls",
+                    "message": {
+                        "role": "assistant",
+                        "content": "Replying to the user.",
+                        "tool_calls": [
+                            {
+                                "id": f"call_{uuid.uuid4().hex[:20]}",
+                                "type": "function",
+                                "function": {"name": "send_message", "arguments": json.dumps({"message": "hi"})},
+                            }
+                        ],
+                    },
+                }
+            ],
+            "usage": {"prompt_tokens": 1000, "completion_tokens": 20, "total_tokens": 1020},
+        }
+
+    return api
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentiles(values_s: List[float]) -> str:
+    values_ms = np.array(values_s) * 1000
+    return f"p50={np.percentile(values_ms, 50):.1f}ms p95={np.percentile(values_ms, 95):.1f}ms"
+
+
+def timed(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+async def timed_async(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+@app.command()
+def bench(
+    n_agents: Annotated[int, typer.Option("--n-agents", help="Number of agents, each gets one turn per round.")] = 200,
+    n_rounds: Annotated[int, typer.Option("--n-rounds", help="Rounds of concurrent turns.")] = 3,
+    latency_ms: Annotated[float, typer.Option("--latency-ms", help="Stub LLM response time.")] = 500.0,
+):
+    """Concurrent turns and throughput of SyncServer (turn per thread) vs AsyncServer (turns on the event loop)
+
+    Every agent sends one message per round against a stub LLM, all at the same time. Uses the storage backends from the
+    MemGPT config (~/.memgpt/config).
+    """
+    port = free_port()
+    stub = create_stub_llm(latency_ms / 1000)
+    stub_server = uvicorn.Server(uvicorn.Config(stub, port=port, log_level="error"))
+    threading.Thread(target=stub_server.run, daemon=True).start()
+    while not stub_server.started:
+        time.sleep(0.01)
+    llm_config = LLMConfig(model="stub", model_endpoint_type="openai", model_endpoint=f"http://127.0.0.1:{port}/v1", context_window=8192)
+
+    for server_cls in (SyncServer, AsyncServer):
+        server = server_cls()
+        user = server.create_user(UserCreate(name="async_server_benchmark"))
+        agent_ids = []
+        try:
+            for i in range(n_agents):
+                agent_state = server.create_agent(
+                    request=CreateAgent(
+                        name=f"async_server_benchmark_{i}",
+                        tools=BASE_TOOLS,
+                        memory=ChatMemory(human="human", persona="persona"),
+                        llm_config=llm_config,
+                    ),
+                    user_id=user.id,
+                )
+                agent_ids.append(agent_state.id)
+
+            stub.state.peak = 0
+            latencies = []
+            start = time.perf_counter()
+            if server_cls is AsyncServer:
+
+                async def run_rounds():
+                    # (all rounds on one event loop, the server's semaphore and HTTP client belong to it)
+                    for _ in range(n_rounds):
+                        latencies.extend(
+                            await asyncio.gather(
+                                *[timed_async(server.user_message_async(user.id, agent_id, "hi")) for agent_id in agent_ids]
+                            )
+                        )
+
+                asyncio.run(run_rounds())
+            else:
+                with ThreadPoolExecutor(max_workers=settings.max_concurrent_steps) as pool:
+                    for _ in range(n_rounds):
+                        latencies += list(pool.map(lambda agent_id: timed(server.user_message, user.id, agent_id, "hi"), agent_ids))
+            elapsed = time.perf_counter() - start
+
+            print(f"{server_cls.__name__}: {n_agents} agents x {n_rounds} rounds (stub LLM: {latency_ms}ms per call)")
+            print(f"\t-> peak concurrent LLM calls: {stub.state.peak}")
+            print(f"\t-> throughput: {len(latencies) / elapsed:.1f} turns/s")
+            print(f"\t-> turn latency: {percentiles(latencies)}")
+        finally:
+            for agent_id in agent_ids:
+                server.delete_agent(user.id, agent_id)
+            server.delete_user(user.id)
+
+    stub_server.should_exit = True
+
+
+if __name__ == "__main__":
+    app()
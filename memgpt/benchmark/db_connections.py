@@ -0,0 +1,92 @@
+# type: ignore
+
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Optional
+
+import typer
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from memgpt.agent_store.engines import get_engine, get_pool_stats
+from memgpt.agent_store.storage import StorageConnector, TableType
+from memgpt.config import MemGPTConfig
+from memgpt.metadata import MetadataStore
+from memgpt.settings import settings
+
+app = typer.Typer()
+
+
+def count_server_connections(uri: str) -> Optional[int]:
+    """Number of open connections to the postgres database (None for sqlite)"""
+    if uri.startswith("sqlite"):
+        return None
+    # use a separate, unpooled engine so the measurement doesn't hold a pooled connection
+    engine = create_engine(uri, poolclass=NullPool)
+    try:
+        with engine.connect() as conn:
+            # minus this connection
+            return conn.execute(text("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")).scalar() - 1
+    finally:
+        engine.dispose()
+
+
+@app.command()
+def bench(
+    n_agents: Annotated[int, typer.Option("--n-agents", help="Number of agents (each gets an archival and a recall connector).")] = 200,
+    n_threads: Annotated[int, typer.Option("--n-threads", help="Threads querying the connectors concurrently.")] = 32,
+    pg_uri: Annotated[Optional[str], typer.Option("--pg-uri", help="Postgres URI (defaults to MEMGPT_PG_URI, sqlite if unset).")] = None,
+):
+    """Load many agents' storage connectors, query them concurrently, and report how many DB connections are open"""
+    pg_uri = pg_uri or settings.memgpt_pg_uri_no_default
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if pg_uri:
+            config = MemGPTConfig(
+                archival_storage_type="postgres",
+                archival_storage_uri=pg_uri,
+                recall_storage_type="postgres",
+                recall_storage_uri=pg_uri,
+                metadata_storage_type="postgres",
+                metadata_storage_uri=pg_uri,
+            )
+            uri = pg_uri
+        else:
+            config = MemGPTConfig(
+                archival_storage_type="sqlite",
+                archival_storage_path=tmpdir,
+                recall_storage_type="sqlite",
+                recall_storage_path=tmpdir,
+                metadata_storage_type="sqlite",
+                metadata_storage_path=tmpdir,
+            )
+            uri = f"sqlite:///{tmpdir}/sqlite.db"
+
+        MetadataStore(config)
+        baseline = count_server_connections(uri)
+
+        user_id = str(uuid.uuid4())
+        connectors = []
+        for _ in range(n_agents):
+            agent_id = str(uuid.uuid4())
+            connectors.append(StorageConnector.get_storage_connector(TableType.ARCHIVAL_MEMORY, config, user_id, agent_id))
+            connectors.append(StorageConnector.get_storage_connector(TableType.RECALL_MEMORY, config, user_id, agent_id))
+
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            sizes = list(executor.map(lambda connector: connector.size(), connectors * 5))
+        assert all(size == 0 for size in sizes)
+
+        engines = {id(connector.engine) for connector in connectors}
+        peak = count_server_connections(uri)
+        print(f"{n_agents} agents ({len(connectors)} storage connectors), {n_threads} concurrent threads, {uri.split(':')[0]}")
+        print(f"\t-> engines (connection pools): {len(engines)}")
+        if peak is not None:
+            print(
+                f"\t-> open connections: {peak - baseline} (limit: pool_size={settings.db_pool_size} + max_overflow={settings.db_max_overflow})"
+            )
+        print(f"\t-> pools: {get_pool_stats()}")
+        get_engine(uri).dispose()
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,97 @@
+# type: ignore
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Annotated
+
+import typer
+
+from memgpt.embeddings import CachedEmbedding, EmbeddingCache, EmbeddingEndpoint
+from memgpt.schemas.embedding_config import EmbeddingConfig
+
+app = typer.Typer()
+
+
+def fake_embedding_server(dim: int, latency: float) -> ThreadingHTTPServer:
+    """OpenAI-compatible /embeddings server that sleeps `latency` seconds per request (simulates a network round trip)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            time.sleep(latency)
+            data = []
+            for i, text in enumerate(inputs):
+                digest = hashlib.sha256(text.encode()).digest()
+                data.append({"object": "embedding", "index": i, "embedding": [digest[j % len(digest)] / 255 for j in range(dim)]})
+            payload = json.dumps({"object": "list", "data": data}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@app.command()
+def bench(
+    n_passages: Annotated[int, typer.Option("--n-passages", help="Number of passages to embed.")] = 2000,
+    dim: Annotated[int, typer.Option("--dim", help="Embedding dimension.")] = 384,
+    latency_ms: Annotated[float, typer.Option("--latency-ms", help="Simulated server latency per request.")] = 20.0,
+    batch_size: Annotated[int, typer.Option("--batch-size", help="Texts per embedding request.")] = 32,
+    concurrency: Annotated[int, typer.Option("--concurrency", help="Embedding requests in flight.")] = 4,
+):
+    server = fake_embedding_server(dim, latency_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    passages = [f"passage number {i} " * 20 for i in range(n_passages)]
+
+    try:
+        model = EmbeddingEndpoint(model="fake", base_url=base_url, user="benchmark", batch_size=batch_size, concurrency=concurrency)
+
+        start = time.perf_counter()
+        for passage in passages:
+            model.get_text_embedding(passage)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        embeddings = model.get_text_embeddings(passages)
+        batched = time.perf_counter() - start
+        assert len(embeddings) == n_passages
+
+        # second load of the same passages through a fresh embedding cache
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config = EmbeddingConfig(
+                embedding_endpoint_type="hugging-face", embedding_model="fake", embedding_endpoint=base_url, embedding_dim=dim
+            )
+            cache = EmbeddingCache(os.path.join(tmpdir, "embedding_cache.db"), lru_size=n_passages)
+            cached_model = CachedEmbedding(model, config, cache)
+            cached_model.get_text_embeddings(passages)
+            start = time.perf_counter()
+            cached_model.get_text_embeddings(passages)
+            cached = time.perf_counter() - start
+            cache_stats = cache.stats()
+    finally:
+        server.shutdown()
+
+    print(f"{n_passages} passages, dim={dim}, {latency_ms}ms per request")
+    print(f"\t-> one request per passage:            {n_passages / sequential:.1f} passages/sec ({sequential:.2f}s)")
+    print(f"\t-> batch_size={batch_size} concurrency={concurrency}: {n_passages / batched:.1f} passages/sec ({batched:.2f}s)")
+    print(f"\t-> reload through embedding cache:      {n_passages / cached:.1f} passages/sec ({cached:.2f}s)")
+    print(f"\t-> cache hit rate: {cache_stats['hit_rate']:.0%} ({cache_stats})")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,53 @@
+# type: ignore
+
+import time
+from typing import Annotated, Callable, List
+
+import numpy as np
+import typer
+
+import memgpt.functions.function_sets.base as base_functions
+from memgpt.constants import BASE_TOOLS
+from memgpt.local_llm.chat_completion_proxy import (
+    build_grammar_and_documentation,
+    generate_grammar_and_documentation,
+)
+from memgpt.local_llm.utils import get_available_wrappers
+
+app = typer.Typer()
+
+
+def time_calls(call: Callable[[], None], n_calls: int) -> List[float]:
+    latencies = []
+    for _ in range(n_calls):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+@app.command()
+def bench(
+    n_calls: Annotated[int, typer.Option("--n-calls", help="Calls per variant.")] = 100,
+):
+    """Per-step cost of building the grammar and picking the wrapper for a local LLM call, uncached vs cached"""
+    functions_python = {name: getattr(base_functions, name) for name in BASE_TOOLS}
+    flags = dict(add_inner_thoughts_top_level=False, add_inner_thoughts_param_level=True, allow_only_inner_thoughts=False)
+
+    results = {
+        "grammar build (uncached)": time_calls(
+            lambda: build_grammar_and_documentation(functions_python=functions_python, **flags), n_calls
+        ),
+        "grammar (cached)": time_calls(lambda: generate_grammar_and_documentation(functions_python=functions_python, **flags), n_calls),
+        "wrapper registry (uncached)": time_calls(get_available_wrappers.__wrapped__, n_calls),
+        "wrapper registry (cached)": time_calls(get_available_wrappers, n_calls),
+    }
+
+    print(f"{len(functions_python)} functions, {n_calls} calls per variant")
+    for label, latencies in results.items():
+        latencies_ms = np.array(latencies) * 1000
+        print(f"\t-> {label:<28} p50={np.percentile(latencies_ms, 50):.3f}ms p95={np.percentile(latencies_ms, 95):.3f}ms")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,91 @@
+# type: ignore
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Annotated, Callable, List
+
+import httpx
+import numpy as np
+import requests
+import typer
+
+from memgpt.http_pool import get_httpx_client, get_session
+from memgpt.local_llm.utils import post_json_auth_request
+
+app = typer.Typer()
+
+
+def stub_server() -> ThreadingHTTPServer:
+    """Local keep-alive server that answers every POST with a small chat completion style JSON payload"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            payload = json.dumps({"choices": [{"text": "hello"}], "usage": {"prompt_tokens": 1, "completion_tokens": 1}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def time_calls(call: Callable[[], None], n_calls: int) -> List[float]:
+    call()  # warm up (the pooled clients open their connection here)
+    latencies = []
+    for _ in range(n_calls):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def httpx_client_per_call(url: str, payload: dict):
+    with httpx.Client() as client:
+        client.post(url, json=payload).raise_for_status()
+
+
+@app.command()
+def bench(
+    n_calls: Annotated[int, typer.Option("--n-calls", help="Requests per client.")] = 500,
+):
+    """Per-call latency against a local stub server, with a new connection per call vs the shared pools in memgpt.http_pool
+
+    The stub is plain HTTP on localhost, so this only measures TCP setup: TLS handshakes to remote APIs widen the gap.
+    """
+    server = stub_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}/completion"
+    payload = {"prompt": "hello " * 100}
+
+    results = {}
+    try:
+        results["requests.post (new connection per call)"] = time_calls(
+            lambda: requests.post(url, json=payload).raise_for_status(), n_calls
+        )
+        results["pooled requests session"] = time_calls(lambda: get_session().post(url, json=payload).raise_for_status(), n_calls)
+        results["post_json_auth_request (pooled)"] = time_calls(
+            lambda: post_json_auth_request(url, payload, auth_type=None, auth_key=None).raise_for_status(), n_calls
+        )
+        results["httpx.Client per call (old _sse_post)"] = time_calls(lambda: httpx_client_per_call(url, payload), n_calls)
+        results["pooled httpx client"] = time_calls(lambda: get_httpx_client().post(url, json=payload).raise_for_status(), n_calls)
+    finally:
+        server.shutdown()
+
+    print(f"{n_calls} POST requests per client against a local stub server")
+    for label, latencies in results.items():
+        latencies_ms = np.array(latencies) * 1000
+        print(f"\t-> {label:<42} p50={np.percentile(latencies_ms, 50):.3f}ms p95={np.percentile(latencies_ms, 95):.3f}ms")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,75 @@
+# type: ignore
+
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from typing import Annotated
+
+import typer
+
+from memgpt.agent_store.db import SQLLiteStorageConnector
+from memgpt.agent_store.storage import TableType, encode_cursor
+from memgpt.benchmark.async_server import percentiles, timed
+from memgpt.config import MemGPTConfig
+from memgpt.utils import get_utc_time
+
+app = typer.Typer()
+
+
+def fill_recall_memory(storage: SQLLiteStorageConnector, n_messages: int, batch_size: int = 50000):
+    """Insert n_messages rows straight into the recall table (the connector's insert_many is far too slow for millions)"""
+    start = get_utc_time() - timedelta(seconds=n_messages)
+    with storage.engine.begin() as conn:
+        for i in range(0, n_messages, batch_size):
+            rows = [
+                {
+                    "id": f"message-{uuid.uuid4()}",
+                    "user_id": storage.user_id,
+                    "agent_id": storage.agent_id,
+                    "role": "user",
+                    "text": f"message {j}",
+                    # every other message shares its timestamp with the previous one, as within a step
+                    "created_at": start + timedelta(seconds=j // 2),
+                }
+                for j in range(i, min(i + batch_size, n_messages))
+            ]
+            conn.execute(storage.db_model.__table__.insert(), rows)
+
+
+@app.command()
+def bench(
+    n_messages: Annotated[int, typer.Option("--n-messages", help="Recall messages of the agent.")] = 1_000_000,
+    page_size: Annotated[int, typer.Option("--page-size", help="Messages per page.")] = 100,
+    n_queries: Annotated[int, typer.Option("--n-queries", help="Page reads timed at each depth.")] = 20,
+):
+    """Latency of reading a page of recall memory at increasing depth, with OFFSET vs with a keyset cursor
+
+    Uses a throwaway SQLite database. "offset" skips to the page with OFFSET (what get_all_paginated did for every page),
+    "cursor" continues from the token of the previous page, and "record id" from a message ID (one extra lookup).
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config = MemGPTConfig(recall_storage_type="sqlite", recall_storage_path=tmpdir)
+        storage = SQLLiteStorageConnector(TableType.RECALL_MEMORY, config, str(uuid.uuid4()), str(uuid.uuid4()))
+        start = time.perf_counter()
+        fill_recall_memory(storage, n_messages)
+        print(f"Inserted {n_messages} messages in {time.perf_counter() - start:.1f}s")
+
+        depths = sorted({0, n_messages // 100, n_messages // 10, n_messages // 2, max(n_messages - page_size - 1, 0)})
+        for depth in depths:
+            # the message just before the page, as the previous page would have returned it
+            _, (previous,) = storage._get_page(offset=depth, limit=1)
+            cursor = encode_cursor("created_at", previous.created_at, previous.id)
+
+            offset_timings = [timed(storage._get_page, offset=depth + 1, limit=page_size) for _ in range(n_queries)]
+            cursor_timings = [timed(storage.get_all_cursor, after=cursor, limit=page_size) for _ in range(n_queries)]
+            id_timings = [timed(storage.get_all_cursor, after=previous.id, limit=page_size) for _ in range(n_queries)]
+
+            print(f"page at message {depth}:")
+            print(f"\t-> offset:    {percentiles(offset_timings)}")
+            print(f"\t-> cursor:    {percentiles(cursor_timings)}")
+            print(f"\t-> record id: {percentiles(id_timings)}")
+
+
+if __name__ == "__main__":
+    app()
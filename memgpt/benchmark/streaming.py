@@ -0,0 +1,112 @@
+# type: ignore
+
+import json
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Annotated, List
+
+import httpx
+import numpy as np
+import typer
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from memgpt.schemas.openai.chat_completion_response import (
+    ChatCompletionChunkResponse,
+    ChunkChoice,
+    MessageDelta,
+)
+from memgpt.server.rest_api.interface import StreamingServerInterface
+from memgpt.server.rest_api.utils import sse_async_generator
+
+app = typer.Typer()
+
+
+def stub_llm(interface: StreamingServerInterface, n_tokens: int, first_token_delay: float, token_interval: float):
+    """Stands in for the agent thread: streams n_tokens chunks into the interface, each carrying its send time"""
+    message_id = str(uuid.uuid4())
+    time.sleep(first_token_delay)
+    for _ in range(n_tokens):
+        chunk = ChatCompletionChunkResponse(
+            id=message_id,
+            choices=[ChunkChoice(index=0, delta=MessageDelta(content=repr(time.perf_counter())))],
+            created=datetime.now(timezone.utc),
+            model="stub",
+        )
+        interface.process_chunk(chunk, message_id=message_id, message_date=chunk.created)
+        time.sleep(token_interval)
+    interface.step_complete()
+    interface.step_yield()
+
+
+def create_app(n_tokens: int, first_token_delay: float, token_interval: float) -> FastAPI:
+    api = FastAPI()
+
+    @api.post("/stream")
+    async def stream():
+        interface = StreamingServerInterface()
+        interface.streaming_mode = True
+        interface.stream_start()
+        threading.Thread(target=stub_llm, args=(interface, n_tokens, first_token_delay, token_interval), daemon=True).start()
+        return StreamingResponse(sse_async_generator(interface.get_generator()), media_type="text/event-stream")
+
+    return api
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentiles(values_s: List[float]) -> str:
+    values_ms = np.array(values_s) * 1000
+    return f"p50={np.percentile(values_ms, 50):.2f}ms p95={np.percentile(values_ms, 95):.2f}ms max={values_ms.max():.2f}ms"
+
+
+@app.command()
+def bench(
+    n_requests: Annotated[int, typer.Option("--n-requests", help="Number of streamed responses.")] = 20,
+    n_tokens: Annotated[int, typer.Option("--n-tokens", help="Tokens per response.")] = 100,
+    first_token_ms: Annotated[float, typer.Option("--first-token-ms", help="Stub LLM delay before the first token.")] = 50.0,
+    token_interval_ms: Annotated[float, typer.Option("--token-interval-ms", help="Stub LLM delay between tokens.")] = 5.0,
+):
+    """Time-to-first-token and inter-token gaps through an SSE endpoint backed by StreamingServerInterface"""
+    port = free_port()
+    api = create_app(n_tokens, first_token_ms / 1000, token_interval_ms / 1000)
+    server = uvicorn.Server(uvicorn.Config(api, port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    ttfts, gaps, delivery_lags = [], [], []
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            for _ in range(n_requests):
+                start = time.perf_counter()
+                arrivals = []
+                with client.stream("POST", "/stream") as response:
+                    for line in response.iter_lines():
+                        if not line.startswith("data: {"):
+                            continue
+                        now = time.perf_counter()
+                        sent = float(json.loads(line[len("data: ") :])["internal_monologue"])
+                        arrivals.append(now)
+                        delivery_lags.append(now - sent)
+                ttfts.append(arrivals[0] - start)
+                gaps += list(np.diff(arrivals))
+    finally:
+        server.should_exit = True
+
+    print(f"{n_requests} requests x {n_tokens} tokens (stub LLM: {first_token_ms}ms to first token, {token_interval_ms}ms between tokens)")
+    print(f"\t-> time to first token: {percentiles(ttfts)}")
+    print(f"\t-> inter-token gap:     {percentiles(gaps)}")
+    print(f"\t-> delivery lag (token produced -> received by client): {percentiles(delivery_lags)}")
+
+
+if __name__ == "__main__":
+    app()
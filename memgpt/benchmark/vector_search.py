@@ -0,0 +1,109 @@
+# type: ignore
+
+import tempfile
+import time
+import uuid
+from typing import Annotated, List
+
+import numpy as np
+import typer
+
+from memgpt.agent_store.db import SQLiteVectorIndex, SQLLiteStorageConnector
+from memgpt.agent_store.storage import TableType
+from memgpt.config import MemGPTConfig
+from memgpt.schemas.embedding_config import EmbeddingConfig
+from memgpt.schemas.passage import Passage
+
+app = typer.Typer()
+
+
+def random_embeddings(n: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    embeddings = rng.standard_normal((n, dim), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings
+
+
+def latency_stats(timings: List[float]) -> str:
+    timings_ms = np.array(timings) * 1000
+    return f"p50={np.percentile(timings_ms, 50):.2f}ms p95={np.percentile(timings_ms, 95):.2f}ms mean={timings_ms.mean():.2f}ms"
+
+
+def bench_index(n: int, dim: int, top_k: int, n_queries: int, rng: np.random.Generator):
+    """Build time and query latency of the in-memory index on its own"""
+    ids = [str(i) for i in range(n)]
+    index = SQLiteVectorIndex()
+    start = time.perf_counter()
+    for i in range(0, n, 10000):
+        index.add(ids[i : i + 10000], random_embeddings(min(10000, n - i), dim, rng))
+    build_time = time.perf_counter() - start
+
+    queries = random_embeddings(n_queries, dim, rng)
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        index.query(q, top_k)
+        timings.append(time.perf_counter() - start)
+
+    # filtered query over 10% of the rows (e.g. a single source)
+    allowed_ids = ids[::10]
+    filtered_timings = []
+    for q in queries:
+        start = time.perf_counter()
+        index.query(q, top_k, allowed_ids=allowed_ids)
+        filtered_timings.append(time.perf_counter() - start)
+
+    print(f"[index] n={n} dim={dim}: build {build_time:.2f}s")
+    print(f"\t-> query:          {latency_stats(timings)}")
+    print(f"\t-> filtered (10%): {latency_stats(filtered_timings)}")
+
+
+def bench_connector(n: int, dim: int, top_k: int, n_queries: int, rng: np.random.Generator):
+    """End-to-end archival search through SQLLiteStorageConnector (insert, lazy index build, query)"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config = MemGPTConfig(archival_storage_type="sqlite", archival_storage_path=tmpdir)
+        user_id, agent_id = str(uuid.uuid4()), str(uuid.uuid4())
+        embedding_config = EmbeddingConfig(embedding_endpoint_type="hugging-face", embedding_model="benchmark", embedding_dim=dim)
+        storage = SQLLiteStorageConnector(TableType.ARCHIVAL_MEMORY, config, user_id, agent_id)
+
+        start = time.perf_counter()
+        for i in range(0, n, 1000):
+            embeddings = random_embeddings(min(1000, n - i), dim, rng)
+            passages = [
+                Passage(text=f"passage {i + j}", embedding=e, embedding_config=embedding_config, user_id=user_id, agent_id=agent_id)
+                for j, e in enumerate(embeddings.tolist())
+            ]
+            storage.insert_many(passages)
+        insert_time = time.perf_counter() - start
+
+        queries = random_embeddings(n_queries + 1, dim, rng)
+        start = time.perf_counter()
+        storage.query("", queries[0].tolist(), top_k=top_k)
+        first_query_time = time.perf_counter() - start
+
+        timings = []
+        for q in queries[1:]:
+            start = time.perf_counter()
+            storage.query("", q.tolist(), top_k=top_k)
+            timings.append(time.perf_counter() - start)
+
+        print(f"[connector] n={n} dim={dim}: insert {insert_time:.2f}s, first query (builds index) {first_query_time:.2f}s")
+        print(f"\t-> query:          {latency_stats(timings)}")
+
+
+@app.command()
+def bench(
+    sizes: Annotated[List[int], typer.Option("--size", help="Number of stored vectors (repeatable).")] = [10_000, 100_000, 1_000_000],
+    dim: Annotated[int, typer.Option("--dim", help="Embedding dimension.")] = 384,
+    top_k: Annotated[int, typer.Option("--top-k", help="Number of results per query.")] = 10,
+    n_queries: Annotated[int, typer.Option("--n-queries", help="Number of queries per size.")] = 100,
+    connector_size: Annotated[int, typer.Option("--connector-size", help="Rows for the end-to-end SQLite run (0 to skip).")] = 10_000,
+):
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        bench_index(n, dim, top_k, n_queries, rng)
+    if connector_size > 0:
+        bench_connector(connector_size, dim, top_k, n_queries, rng)
+
+
+if __name__ == "__main__":
+    app()
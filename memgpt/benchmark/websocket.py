@@ -0,0 +1,116 @@
+# type: ignore
+
+import asyncio
+import threading
+import time
+from typing import Annotated, List
+
+import typer
+import uvicorn
+import websockets
+
+import memgpt.server.ws_api.protocol as protocol
+from memgpt.benchmark.async_server import create_stub_llm, free_port, percentiles
+from memgpt.constants import BASE_TOOLS
+from memgpt.schemas.agent import CreateAgent
+from memgpt.schemas.llm_config import LLMConfig
+from memgpt.schemas.memory import ChatMemory
+from memgpt.schemas.user import UserCreate
+from memgpt.server.ws_api.server import WebSocketServer
+from memgpt.settings import settings
+from memgpt.utils import json_loads
+
+app = typer.Typer()
+
+
+async def run_client(uri: str, user_id: str, agent_ids: List[str], n_rounds: int, latencies: List[float], errors: List[str]):
+    """One connection, sending a message to each of its agents at once every round and waiting for all the end markers"""
+    async with websockets.connect(uri, max_size=None) as websocket:
+        for _ in range(n_rounds):
+            sent, started = {}, set()
+            for agent_id in agent_ids:
+                sent[agent_id] = time.perf_counter()
+                await websocket.send(protocol.client_user_message("hi", agent_id=agent_id, user_id=user_id))
+            while sent:
+                response = json_loads(await websocket.recv())
+                agent_id = response.get("agent_id")
+                if response["type"] == "agent_response_start":
+                    started.add(agent_id)
+                elif response["type"] == "agent_response_error":
+                    errors.append(response["message"])
+                    if agent_id not in started:
+                        del sent[agent_id]  # rejected, no turn was started
+                elif response["type"] == "agent_response_end":
+                    latencies.append(time.perf_counter() - sent.pop(agent_id))
+
+
+@app.command()
+def bench(
+    n_clients: Annotated[int, typer.Option("--n-clients", help="Number of concurrent websocket connections.")] = 100,
+    agents_per_client: Annotated[int, typer.Option("--agents-per-client", help="Agents each connection talks to at once.")] = 2,
+    n_rounds: Annotated[int, typer.Option("--n-rounds", help="Rounds of concurrent turns.")] = 3,
+    latency_ms: Annotated[float, typer.Option("--latency-ms", help="Stub LLM response time.")] = 500.0,
+    max_concurrent_steps: Annotated[int, typer.Option("--max-concurrent-steps", help="Step worker pool size.")] = 64,
+):
+    """Many websocket clients served at once, each multiplexing several agents over its connection
+
+    Every client sends one message to each of its agents per round (without waiting in between) against a stub LLM.
+    Uses the storage backends from the MemGPT config (~/.memgpt/config).
+    """
+    port = free_port()
+    stub = create_stub_llm(latency_ms / 1000)
+    stub_server = uvicorn.Server(uvicorn.Config(stub, port=port, log_level="error"))
+    threading.Thread(target=stub_server.run, daemon=True).start()
+    while not stub_server.started:
+        time.sleep(0.01)
+    llm_config = LLMConfig(model="stub", model_endpoint_type="openai", model_endpoint=f"http://127.0.0.1:{port}/v1", context_window=8192)
+
+    settings.max_concurrent_steps = max_concurrent_steps
+    settings.max_queued_steps = max(settings.max_queued_steps, n_clients * agents_per_client)
+    ws = WebSocketServer(host="127.0.0.1", port=free_port())
+    server = ws.server
+    user = server.create_user(UserCreate(name="websocket_benchmark"))
+    agent_ids = []
+    try:
+        for i in range(n_clients * agents_per_client):
+            agent_state = server.create_agent(
+                request=CreateAgent(
+                    name=f"websocket_benchmark_{i}",
+                    tools=BASE_TOOLS,
+                    memory=ChatMemory(human="human", persona="persona"),
+                    llm_config=llm_config,
+                ),
+                user_id=user.id,
+            )
+            agent_ids.append(agent_state.id)
+
+        latencies, errors = [], []
+
+        async def run_clients():
+            async with websockets.serve(ws.handle_client, ws.host, ws.port):
+                uri = f"ws://{ws.host}:{ws.port}"
+                clients = [agent_ids[i * agents_per_client : (i + 1) * agents_per_client] for i in range(n_clients)]
+                await asyncio.gather(*[run_client(uri, user.id, ids, n_rounds, latencies, errors) for ids in clients])
+
+        stub.state.peak = 0
+        start = time.perf_counter()
+        asyncio.run(run_clients())
+        elapsed = time.perf_counter() - start
+
+        print(f"{n_clients} clients x {agents_per_client} agents x {n_rounds} rounds (stub LLM: {latency_ms}ms per call)")
+        print(f"\t-> peak concurrent LLM calls: {stub.state.peak} (step workers: {max_concurrent_steps})")
+        print(f"\t-> throughput: {len(latencies) / elapsed:.1f} turns/s ({len(errors)} errors)")
+        print(f"\t-> turn latency: {percentiles(latencies)}")
+        print(f"\t-> step queue: {server.step_scheduler.stats()}")
+        # the previous server ran one turn at a time on the event loop, with a 1s pause before each end marker
+        serial = len(agent_ids) * n_rounds * (latency_ms / 1000 + 1)
+        print(f"\t-> serialized turns with the 1s end-marker delay would take >= {serial:.0f}s (took {elapsed:.1f}s)")
+    finally:
+        for agent_id in agent_ids:
+            server.delete_agent(user.id, agent_id)
+        server.delete_user(user.id)
+        stub_server.should_exit = True
+
+
+if __name__ == "__main__":
+    app()
@@ -604,6 +604,7 @@ def run(
 
         # create agent
         memgpt_agent = Agent(agent_state=agent_state, interface=interface(), tools=tools)
+        memgpt_agent.load_attached_sources(ms)
 
     else:  # create new agent
         # create new agent config: override defaults with args if provided
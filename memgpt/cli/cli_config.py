@@ -910,7 +910,7 @@ def configure_embedding_endpoint(config: MemGPTConfig, credentials: MemGPTCreden
 
 def configure_archival_storage(config: MemGPTConfig, credentials: MemGPTCredentials):
     # Configure archival storage backend
-    archival_storage_options = ["postgres", "chroma", "milvus", "qdrant"]
+    archival_storage_options = ["postgres", "chroma", "milvus", "qdrant", "sqlite"]
     archival_storage_type = questionary.select(
         "Select storage backend for archival data:", archival_storage_options, default=config.archival_storage_type
     ).ask()
@@ -960,6 +960,10 @@ def configure_archival_storage(config: MemGPTConfig, credentials: MemGPTCredenti
         if qdrant_type == "local":
             archival_storage_path = os.path.join(MEMGPT_DIR, "qdrant")
 
+    # configure sqlite (shares the sqlite.db file with recall storage by default)
+    if archival_storage_type == "sqlite":
+        archival_storage_path = MEMGPT_DIR
+
     if archival_storage_type == "milvus":
         default_milvus_uri = archival_storage_path = os.path.join(MEMGPT_DIR, "milvus.db")
         archival_storage_uri = questionary.text(
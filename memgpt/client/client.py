@@ -31,6 +31,7 @@ from memgpt.schemas.memgpt_response import MemGPTResponse
 from memgpt.schemas.memory import (
     ArchivalMemorySummary,
     ChatMemory,
+    ContextWindowSummary,
     CreateArchivalMemory,
     Memory,
     RecallMemorySummary,
@@ -367,6 +368,12 @@ class RESTClient(AbstractClient):
             raise ValueError(f"Failed to get recall memory summary: {response.text}")
         return RecallMemorySummary(**response.json())
 
+    def get_context_window_summary(self, agent_id: str) -> ContextWindowSummary:
+        response = requests.get(f"{self.base_url}/api/agents/{agent_id}/memory/context", headers=self.headers)
+        if response.status_code != 200:
+            raise ValueError(f"Failed to get context window summary: {response.text}")
+        return ContextWindowSummary(**response.json())
+
     def get_in_context_messages(self, agent_id: str) -> List[Message]:
         response = requests.get(f"{self.base_url}/api/agents/{agent_id}/memory/messages", headers=self.headers)
         if response.status_code != 200:
@@ -593,7 +600,7 @@ class RESTClient(AbstractClient):
                 if job.status == JobStatus.completed:
                     break
                 elif job.status == JobStatus.failed:
-                    raise ValueError(f"Job failed: {job.metadata}")
+                    raise ValueError(f"Job failed: {job.metadata_}")
                 time.sleep(1)
         return job
 
@@ -946,6 +953,9 @@ class LocalClient(AbstractClient):
     def get_recall_memory_summary(self, agent_id: str) -> RecallMemorySummary:
         return self.server.get_recall_memory_summary(agent_id=agent_id)
 
+    def get_context_window_summary(self, agent_id: str) -> ContextWindowSummary:
+        return self.server.get_context_window_summary(agent_id=agent_id)
+
     def get_in_context_messages(self, agent_id: str) -> List[Message]:
         return self.server.get_in_context_messages(agent_id=agent_id)
 
@@ -1183,7 +1193,9 @@ class LocalClient(AbstractClient):
         job = self.server.create_job(user_id=self.user_id)
 
         # TODO: implement blocking vs. non-blocking
-        self.server.load_file_to_source(source_id=source_id, file_path=filename, job_id=job.id)
+        job = self.server.load_file_to_source(source_id=source_id, file_path=filename, job_id=job.id)
+        if job.status == JobStatus.failed:
+            raise ValueError(f"Job failed: {job.metadata_}")
         return job
 
     def get_job(self, job_id: str):
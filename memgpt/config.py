@@ -1,4 +1,5 @@
 import configparser
+import copy
 import inspect
 import json
 import os
@@ -23,6 +24,9 @@ from memgpt.schemas.llm_config import LLMConfig
 
 logger = get_logger(__name__)
 
+# ((config path, modification time), config) of the last config read by MemGPTConfig.load_cached
+_config_snapshot = None
+
 
 # helper functions for writing to configs
 def get_field(config, section, field):
@@ -206,6 +210,20 @@ class MemGPTConfig:
 
         return config
 
+    @classmethod
+    def load_cached(cls) -> "MemGPTConfig":
+        """Like load(), but the config file is only re-read when it changed (for hot paths such as loading agents)"""
+        global _config_snapshot
+        config_path = os.getenv("MEMGPT_CONFIG_PATH") or MemGPTConfig.config_path
+        try:
+            key = (config_path, os.stat(config_path).st_mtime_ns)
+        except OSError:
+            key = (config_path, None)
+        if _config_snapshot is None or _config_snapshot[0] != key:
+            _config_snapshot = (key, cls.load())
+        # shallow copy so callers can't change the snapshot's fields
+        return copy.copy(_config_snapshot[1])
+
     def save(self):
         import memgpt
 
@@ -10,6 +10,11 @@ OPENAI_CONTEXT_WINDOW_ERROR_SUBSTRING = "maximum context length"
 
 # System prompt templating
 IN_CONTEXT_MEMORY_KEYWORD = "CORE_MEMORY"
+# start of the (per-step changing) memory block inside the compiled system prompt
+IN_CONTEXT_MEMORY_HEADER = "### Memory [last modified:"
+
+# tools with this tag don't modify the agent, so several calls to them in one response can run concurrently
+PARALLEL_SAFE_TOOL_TAG = "parallel-safe"
 
 # OpenAI error message: Invalid 'messages[1].tool_calls[0].id': string too long. Expected a string with maximum length 29, but got a string with length 36 instead.
 TOOL_CALL_ID_MAX_LEN = 29
@@ -1,14 +1,17 @@
-from typing import Dict, Iterator, List, Optional, Tuple
+import queue
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 import typer
 from llama_index.core import Document as LlamaIndexDocument
 
 from memgpt.agent_store.storage import StorageConnector
-from memgpt.embeddings import embedding_model
+from memgpt.embeddings import embedding_model, get_embedding_cache
 from memgpt.schemas.document import Document
 from memgpt.schemas.passage import Passage
 from memgpt.schemas.source import Source
-from memgpt.utils import create_uuid_from_string
+from memgpt.settings import settings
+from memgpt.utils import create_uuid_from_string, printd
 
 
 class DataConnector:
@@ -19,91 +22,227 @@ class DataConnector:
         pass
 
 
+def embed_passages(embed_model, passage_texts: List[str]) -> List[Optional[List[float]]]:
+    """Embed passages with the batch API, falling back to one at a time if a batch fails (failed passages get None)"""
+    try:
+        return embed_model.get_text_embeddings(passage_texts)
+    except Exception:
+        embeddings = []
+        for passage_text in passage_texts:
+            try:
+                embeddings.append(embed_model.get_text_embedding(passage_text))
+            except Exception as e:
+                typer.secho(
+                    f"Warning: Failed to get embedding for {passage_text} (error: {str(e)}), skipping insert into VectorDB.",
+                    fg=typer.colors.YELLOW,
+                )
+                embeddings.append(None)
+        return embeddings
+
+
+class _PipelineStopped(Exception):
+    """Raised in a pipeline stage when another stage failed"""
+
+
+def _put(q: queue.Queue, item, stop: threading.Event):
+    """Blocking put (backpressure from the next stage), that gives up once the pipeline is stopped"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+    raise _PipelineStopped()
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    raise _PipelineStopped()
+
+
 def load_data(
     connector: DataConnector,
     source: Source,
     passage_store: StorageConnector,
     document_store: Optional[StorageConnector] = None,
+    resume_from: Optional[Dict] = None,
+    on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
 ):
-    """Load data from a connector (generates documents and passages) into a specified source_id, associatedw with a user_id."""
+    """Load data from a connector (generates documents and passages) into a specified source_id, associatedw with a user_id.
+
+    The load runs as a pipeline: documents are parsed and chunked, passages are embedded in batches and then inserted, each
+    stage in its own thread, connected by bounded queues (a slow stage holds back the others instead of the whole source
+    piling up in memory).
+
+    on_progress is called with the progress counters after every embedded batch. "num_documents" / "num_passages" only
+    count documents whose passages are all stored (and their passages), so a load that stopped midway can be continued by passing its last counters as resume_from
+    (the documents already stored are skipped, passage IDs are deterministic so re-inserted passages are overwritten).
+    """
     embedding_config = source.embedding_config
 
     # embedding model
     embed_model = embedding_model(embedding_config)
-
-    # insert passages/documents
-    passages = []
-    embedding_to_document_name = {}
-    passage_count = 0
-    document_count = 0
-    for document_text, document_metadata in connector.generate_documents():
-        # insert document into storage
-        document = Document(
-            text=document_text,
-            metadata_=document_metadata,
-            source_id=source.id,
-            user_id=source.user_id,
-        )
-        document_count += 1
-        if document_store:
-            document_store.insert(document)
-
-        # generate passages
-        for passage_text, passage_metadata in connector.generate_passages([document], chunk_size=embedding_config.embedding_chunk_size):
-
-            # for some reason, llama index parsers sometimes return empty strings
-            if len(passage_text) == 0:
-                typer.secho(
-                    f"Warning: Llama index parser returned empty string, skipping insert of passage with metadata '{passage_metadata}' into VectorDB. You can usually ignore this warning.",
-                    fg=typer.colors.YELLOW,
-                )
-                continue
-
-            # get embedding
-            try:
-                embedding = embed_model.get_text_embedding(passage_text)
-            except Exception as e:
-                typer.secho(
-                    f"Warning: Failed to get embedding for {passage_text} (error: {str(e)}), skipping insert into VectorDB.",
-                    fg=typer.colors.YELLOW,
-                )
+    embedding_cache = get_embedding_cache()
+    cache_stats_before = embedding_cache.stats() if embedding_cache else None
+
+    # passages are embedded in groups large enough to keep every concurrent embedding request full
+    embedding_group_size = settings.embedding_batch_size * settings.embedding_concurrency
+
+    resume_from = resume_from or {}
+    skip_documents = resume_from.get("num_documents", 0)
+    progress = {
+        "num_documents_parsed": skip_documents,
+        "num_passages_embedded": resume_from.get("num_passages", 0),
+        "num_passages": resume_from.get("num_passages", 0),
+        "num_documents": skip_documents,
+    }
+
+    # chunks: (passage_text, passage_metadata, document), or the index of a document once all its chunks are queued
+    chunks = queue.Queue(maxsize=embedding_group_size * settings.ingestion_queue_size)
+    # groups: lists of passages and document indexes, in the same order
+    groups = queue.Queue(maxsize=settings.ingestion_queue_size)
+    stop = threading.Event()
+    errors = []
+
+    def parse():
+        for index, (document_text, document_metadata) in enumerate(connector.generate_documents()):
+            if index < skip_documents:
                 continue
 
-            passage = Passage(
-                id=create_uuid_from_string(f"{str(source.id)}_{passage_text}"),
-                text=passage_text,
-                doc_id=document.id,
+            # insert document into storage
+            document = Document(
+                text=document_text,
+                metadata_=document_metadata,
                 source_id=source.id,
-                metadata_=passage_metadata,
                 user_id=source.user_id,
-                embedding_config=source.embedding_config,
-                embedding=embedding,
             )
-
-            hashable_embedding = tuple(passage.embedding)
-            document_name = document.metadata_.get("file_path", document.id)
-            if hashable_embedding in embedding_to_document_name:
-                typer.secho(
-                    f"Warning: Duplicate embedding found for passage in {document_name} (already exists in {embedding_to_document_name[hashable_embedding]}), skipping insert into VectorDB.",
-                    fg=typer.colors.YELLOW,
+            if document_store:
+                document_store.insert(document)
+
+            # generate passages
+            for passage_text, passage_metadata in connector.generate_passages([document], chunk_size=embedding_config.embedding_chunk_size):
+                # for some reason, llama index parsers sometimes return empty strings
+                if len(passage_text) == 0:
+                    typer.secho(
+                        f"Warning: Llama index parser returned empty string, skipping insert of passage with metadata '{passage_metadata}' into VectorDB. You can usually ignore this warning.",
+                        fg=typer.colors.YELLOW,
+                    )
+                    continue
+                _put(chunks, (passage_text, passage_metadata, document), stop)
+
+            progress["num_documents_parsed"] += 1
+            _put(chunks, index, stop)
+        _put(chunks, None, stop)
+
+    def embed():
+        done = False
+        while not done:
+            # take what is queued (up to a full group), so embedding requests are batched without waiting on the parser
+            items = [_get(chunks, stop)]
+            n_chunks = int(isinstance(items[0], tuple))
+            while items[-1] is not None and n_chunks < embedding_group_size:
+                try:
+                    items.append(chunks.get_nowait())
+                except queue.Empty:
+                    break
+                n_chunks += isinstance(items[-1], tuple)
+            done = items[-1] is None
+            if done:
+                items.pop()
+
+            pending = [item for item in items if isinstance(item, tuple)]
+            embeddings = iter(embed_passages(embed_model, [passage_text for passage_text, _, _ in pending]) if pending else [])
+            group = []
+            for item in items:
+                if isinstance(item, int):
+                    group.append(item)
+                    continue
+                passage_text, passage_metadata, document = item
+                embedding = next(embeddings)
+                if embedding is None:
+                    continue
+                group.append(
+                    Passage(
+                        id=create_uuid_from_string(f"{str(source.id)}_{passage_text}"),
+                        text=passage_text,
+                        doc_id=document.id,
+                        source_id=source.id,
+                        metadata_=passage_metadata,
+                        user_id=source.user_id,
+                        embedding_config=source.embedding_config,
+                        embedding=embedding,
+                    )
                 )
+            progress["num_passages_embedded"] += len(pending)
+            if group:
+                _put(groups, group, stop)
+        _put(groups, None, stop)
+
+    def run_stage(stage: Callable[[], None]):
+        try:
+            stage()
+        except _PipelineStopped:
+            pass
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    stages = []
+    for stage in (parse, embed):
+        stages.append(threading.Thread(target=run_stage, args=(stage,), name=f"memgpt-load-{stage.__name__}", daemon=True))
+        stages[-1].start()
+
+    def insert(passages: List[Passage]) -> int:
+        # the same text gives the same passage ID, which can only be upserted once per statement
+        unique = {}
+        for passage in passages:
+            if passage.id in unique:
+                printd(f"Skipping duplicate passage {passage.id} (same text as another passage in this batch)")
                 continue
-
-            passages.append(passage)
-            embedding_to_document_name[hashable_embedding] = document_name
-            if len(passages) >= 100:
-                # insert passages into passage store
-                passage_store.insert_many(passages)
-
-                passage_count += len(passages)
-                passages = []
-
-    if len(passages) > 0:
-        # insert passages into passage store
-        passage_store.insert_many(passages)
-        passage_count += len(passages)
-
-    return passage_count, document_count
+            unique[passage.id] = passage
+        if unique:
+            passage_store.insert_many(list(unique.values()))
+        return len(unique)
+
+    try:
+        passages = []  # embedded, not stored yet
+        stored = 0  # passages of the current document stored so far (counted once the document is done)
+        while True:
+            try:
+                group = _get(groups, stop)
+            except _PipelineStopped:
+                raise errors[0]
+            if group is None:
+                break
+            for item in group:
+                if isinstance(item, int):
+                    # every passage of the document is embedded: store them, then count the document as done
+                    progress["num_passages"] += stored + insert(passages)
+                    progress["num_documents"] = item + 1
+                    passages, stored = [], 0
+                else:
+                    passages.append(item)
+                    if len(passages) >= settings.ingestion_insert_batch_size:
+                        stored += insert(passages)
+                        passages = []
+            if on_progress:
+                on_progress(dict(progress))
+    finally:
+        stop.set()
+        for thread in stages:
+            thread.join()
+
+    if embedding_cache is not None:
+        cache_stats = embedding_cache.stats()
+        lookups = cache_stats["lookups"] - cache_stats_before["lookups"]
+        misses = cache_stats["misses"] - cache_stats_before["misses"]
+        printd(f"Embedding cache: {lookups - misses}/{lookups} passage embeddings served from cache")
+
+    return progress["num_passages"], progress["num_documents"]
 
 
 class DirectoryConnector(DataConnector):
@@ -130,12 +269,13 @@ class DirectoryConnector(DataConnector):
             assert self.input_files is not None, "Must provide input files if input_dir is None"
             reader = SimpleDirectoryReader(input_files=[str(f) for f in self.input_files])
 
-        llama_index_docs = reader.load_data(show_progress=True)
-        for llama_index_doc in llama_index_docs:
-            # TODO: add additional metadata?
-            # doc = Document(text=llama_index_doc.text, metadata=llama_index_doc.metadata)
-            # docs.append(doc)
-            yield llama_index_doc.text, llama_index_doc.metadata
+        # read one file at a time, so the first documents are chunked and embedded while later files are still being read
+        for llama_index_docs in reader.iter_data(show_progress=True):
+            for llama_index_doc in llama_index_docs:
+                # TODO: add additional metadata?
+                # doc = Document(text=llama_index_doc.text, metadata=llama_index_doc.metadata)
+                # docs.append(doc)
+                yield llama_index_doc.text, llama_index_doc.metadata
 
     def generate_passages(self, documents: List[Document], chunk_size: int = 1024) -> Iterator[Tuple[str, Dict]]:  # -> Iterator[Passage]:
         # use llama index to run embeddings code
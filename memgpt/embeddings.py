@@ -1,6 +1,10 @@
+import hashlib
 import os
+import sqlite3
+import threading
 import uuid
-from typing import Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
 
 import numpy as np
 
@@ -19,11 +23,13 @@ from llama_index.core.node_parser import SentenceSplitter
 from memgpt.constants import (
     EMBEDDING_TO_TOKENIZER_DEFAULT,
     EMBEDDING_TO_TOKENIZER_MAP,
-    MAX_EMBEDDING_DIM,
+    MEMGPT_DIR,
 )
 from memgpt.credentials import MemGPTCredentials
+from memgpt.http_pool import get_httpx_client
 from memgpt.schemas.embedding_config import EmbeddingConfig
-from memgpt.utils import is_valid_url, printd
+from memgpt.settings import settings
+from memgpt.utils import LRUCache, is_valid_url, pad_embedding, printd
 
 
 def parse_and_chunk_text(text: str, chunk_size: int) -> List[str]:
@@ -70,6 +76,19 @@ def check_and_split_text(text: str, embedding_model: str) -> List[str]:
     return [text]
 
 
+def embed_in_batches(
+    embed_batch: Callable[[List[str]], List[List[float]]], texts: List[str], batch_size: int, concurrency: int = 1
+) -> List[List[float]]:
+    """Embed texts in batches of batch_size, with up to concurrency batches in flight (order is preserved)"""
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    if concurrency <= 1 or len(batches) <= 1:
+        results = [embed_batch(batch) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(batches))) as executor:
+            results = list(executor.map(embed_batch, batches))
+    return [embedding for batch in results for embedding in batch]
+
+
 class EmbeddingEndpoint:
     """Implementation for OpenAI compatible endpoint"""
 
@@ -85,6 +104,8 @@ class EmbeddingEndpoint:
         base_url: str,
         user: str,
         timeout: float = 60.0,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
         **kwargs: Any,
     ):
         if not is_valid_url(base_url):
@@ -95,45 +116,205 @@ class EmbeddingEndpoint:
         self._user = user
         self._base_url = base_url
         self._timeout = timeout
+        self._batch_size = batch_size or settings.embedding_batch_size
+        self._concurrency = concurrency or settings.embedding_concurrency
 
-    def _call_api(self, text: str) -> List[float]:
+        # keep-alive connections to the endpoint are shared with other embedding models and LLM calls
+        self._client = get_httpx_client()
+
+    def _call_api(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
+        """Embed a single text, or a list of texts in one request"""
         if not is_valid_url(self._base_url):
             raise ValueError(
                 f"Embeddings endpoint does not have a valid URL (set to: '{self._base_url}'). Make sure embedding_endpoint is set correctly in your MemGPT config."
             )
-        import httpx
 
         headers = {"Content-Type": "application/json"}
         json_data = {"input": text, "model": self.model_name, "user": self._user}
 
-        with httpx.Client() as client:
-            response = client.post(
-                f"{self._base_url}/embeddings",
-                headers=headers,
-                json=json_data,
-                timeout=self._timeout,
-            )
+        response = self._client.post(
+            f"{self._base_url}/embeddings",
+            headers=headers,
+            json=json_data,
+            timeout=self._timeout,
+        )
 
         response_json = response.json()
 
         if isinstance(response_json, list):
-            # embedding directly in response
-            embedding = response_json
+            # embedding(s) directly in response
+            embeddings = response_json if isinstance(text, list) else [response_json]
         elif isinstance(response_json, dict):
             # TEI embedding packaged inside openai-style response
             try:
-                embedding = response_json["data"][0]["embedding"]
-            except (KeyError, IndexError):
+                data = sorted(response_json["data"], key=lambda d: d.get("index", 0))
+                embeddings = [d["embedding"] for d in data]
+            except (KeyError, TypeError):
                 raise TypeError(f"Got back an unexpected payload from text embedding function, response=\n{response_json}")
         else:
             # unknown response, can't parse
             raise TypeError(f"Got back an unexpected payload from text embedding function, response=\n{response_json}")
 
-        return embedding
+        expected = len(text) if isinstance(text, list) else 1
+        if len(embeddings) != expected:
+            raise TypeError(f"Expected {expected} embeddings from text embedding function, got {len(embeddings)}")
+
+        return embeddings if isinstance(text, list) else embeddings[0]
 
     def get_text_embedding(self, text: str) -> List[float]:
         return self._call_api(text)
 
+    def get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return embed_in_batches(self._call_api, texts, batch_size=self._batch_size, concurrency=self._concurrency)
+
+
+class LlamaIndexEmbedding:
+    """Adds the batch embedding API to a LlamaIndex embedding model"""
+
+    def __init__(self, model, batch_size: Optional[int] = None, concurrency: Optional[int] = None):
+        self.model = model
+        self._batch_size = batch_size or settings.embedding_batch_size
+        self._concurrency = concurrency or settings.embedding_concurrency
+        # LlamaIndex splits a batch call into requests of embed_batch_size texts
+        self.model.embed_batch_size = self._batch_size
+
+    def __getattr__(self, name):
+        # only called for attributes not found on the wrapper, forward them to the wrapped model
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def get_text_embedding(self, text: str) -> List[float]:
+        return self.model.get_text_embedding(text)
+
+    def get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return embed_in_batches(self.model.get_text_embedding_batch, texts, batch_size=self._batch_size, concurrency=self._concurrency)
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache shared by every agent and source in the process
+
+    Embeddings are keyed by a hash of (embedding model, endpoint, text) and stored as raw float32 in a local sqlite file,
+    with an in-process LRU in front of it.
+    """
+
+    def __init__(self, path: str, lru_size: int):
+        self.path = path
+        self.lru = LRUCache(max_size=lru_size)
+        self.db_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, embedding BLOB NOT NULL)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(model_key: str, text: str) -> str:
+        return hashlib.sha256(f"{model_key}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Look up keys in the LRU, then in the sqlite file (missing keys are left out of the result)"""
+        found = {}
+        missing = []
+        for key in keys:
+            embedding = self.lru.get(key)
+            if embedding is None:
+                missing.append(key)
+            else:
+                found[key] = embedding
+
+        if missing:
+            with self._lock:
+                rows = []
+                # stay under sqlite's bound parameter limit
+                for i in range(0, len(missing), 500):
+                    chunk = missing[i : i + 500]
+                    rows += self._conn.execute(
+                        f"SELECT key, embedding FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+            for key, blob in rows:
+                embedding = np.frombuffer(blob, dtype=np.float32)
+                self.lru.put(key, embedding)
+                found[key] = embedding
+            self.db_hits += len(rows)
+            self.misses += len(missing) - len(rows)
+        return found
+
+    def put_many(self, embeddings: Dict[str, np.ndarray]):
+        embeddings = {key: np.asarray(embedding, dtype=np.float32) for key, embedding in embeddings.items()}
+        for key, embedding in embeddings.items():
+            self.lru.put(key, embedding)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding) VALUES (?, ?)",
+                [(key, embedding.tobytes()) for key, embedding in embeddings.items()],
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        lookups = self.lru.hits + self.db_hits + self.misses
+        return {
+            "lookups": lookups,
+            "memory_hits": self.lru.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": (self.lru.hits + self.db_hits) / lookups if lookups else 0.0,
+        }
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process-wide embedding cache (None if disabled)"""
+    global _embedding_cache
+    if settings.embedding_cache_size <= 0:
+        return None
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            path = settings.embedding_cache_path or os.path.join(MEMGPT_DIR, "embedding_cache.db")
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            _embedding_cache = EmbeddingCache(str(path), lru_size=settings.embedding_cache_size)
+        return _embedding_cache
+
+
+class CachedEmbedding:
+    """Wraps an embedding model so that every embedding goes through the shared embedding cache"""
+
+    def __init__(self, model, config: EmbeddingConfig, cache: EmbeddingCache):
+        self.model = model
+        self.cache = cache
+        self.model_key = f"{config.embedding_endpoint_type}:{config.embedding_model}:{config.embedding_endpoint}:{config.embedding_dim}"
+
+    def __getattr__(self, name):
+        # only called for attributes not found on the wrapper, forward them to the wrapped model
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def get_text_embedding(self, text: str) -> np.ndarray:
+        return self.get_text_embeddings([text])[0]
+
+    def get_text_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        """Embeddings are returned as float32 arrays (as they are stored in the cache)"""
+        keys = [self.cache.key(self.model_key, text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        # only embed each missing text once, even if it is repeated in the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            embeddings = self.model.get_text_embeddings(list(missing.values()))
+            new = {key: np.asarray(embedding, dtype=np.float32) for key, embedding in zip(missing.keys(), embeddings)}
+            self.cache.put_many(new)
+            found.update(new)
+
+        return [found[key] for key in keys]
+
 
 def default_embedding_model():
     # default to hugging face model running local
@@ -142,18 +323,25 @@ def default_embedding_model():
 
     os.environ["TOKENIZERS_PARALLELISM"] = "False"
     model = "BAAI/bge-small-en-v1.5"
-    return HuggingFaceEmbedding(model_name=model)
+    # local model, batches are already parallelized by the model itself
+    return LlamaIndexEmbedding(HuggingFaceEmbedding(model_name=model), concurrency=1)
 
 
-def query_embedding(embedding_model, query_text: str):
-    """Generate padded embedding for querying database"""
-    query_vec = embedding_model.get_text_embedding(query_text)
-    query_vec = np.array(query_vec)
-    query_vec = np.pad(query_vec, (0, MAX_EMBEDDING_DIM - query_vec.shape[0]), mode="constant").tolist()
-    return query_vec
+def query_embedding(embedding_model, query_text: str) -> np.ndarray:
+    """Generate padded (float32) embedding for querying database"""
+    return pad_embedding(embedding_model.get_text_embedding(query_text))
 
 
 def embedding_model(config: EmbeddingConfig, user_id: Optional[uuid.UUID] = None):
+    """Return embedding model to use for embeddings (backed by the shared embedding cache, if enabled)"""
+    model = _embedding_model(config, user_id)
+    cache = get_embedding_cache()
+    if cache is None:
+        return model
+    return CachedEmbedding(model, config, cache)
+
+
+def _embedding_model(config: EmbeddingConfig, user_id: Optional[uuid.UUID] = None):
     """Return LlamaIndex embedding model to use for embeddings"""
 
     endpoint_type = config.embedding_endpoint_type
@@ -170,7 +358,7 @@ def embedding_model(config: EmbeddingConfig, user_id: Optional[uuid.UUID] = None
             api_key=credentials.openai_key,
             additional_kwargs=additional_kwargs,
         )
-        return model
+        return LlamaIndexEmbedding(model)
 
     elif endpoint_type == "azure":
         assert all(
@@ -185,12 +373,14 @@ def embedding_model(config: EmbeddingConfig, user_id: Optional[uuid.UUID] = None
         # https://learn.microsoft.com/en-us/azure/ai-services/openai/reference#embeddings
         model = "text-embedding-ada-002"
         deployment = credentials.azure_embedding_deployment if credentials.azure_embedding_deployment is not None else model
-        return AzureOpenAIEmbedding(
-            model=model,
-            deployment_name=deployment,
-            api_key=credentials.azure_key,
-            azure_endpoint=credentials.azure_endpoint,
-            api_version=credentials.azure_version,
+        return LlamaIndexEmbedding(
+            AzureOpenAIEmbedding(
+                model=model,
+                deployment_name=deployment,
+                api_key=credentials.azure_key,
+                azure_endpoint=credentials.azure_endpoint,
+                api_version=credentials.azure_version,
+            )
         )
 
     elif endpoint_type == "hugging-face":
@@ -212,7 +402,7 @@ def embedding_model(config: EmbeddingConfig, user_id: Optional[uuid.UUID] = None
             ollama_additional_kwargs=ollama_additional_kwargs or {},
             callback_manager=callback_manager or None,
         )
-        return model
+        return LlamaIndexEmbedding(model)
 
     else:
         return default_embedding_model()
@@ -24,3 +24,15 @@ class LocalLLMConnectionError(LLMError):
     def __init__(self, message="Could not connect to local LLM"):
         self.message = message
         super().__init__(self.message)
+
+
+class InvalidCursorError(ValueError):
+    """Error for a pagination cursor that is malformed or points at a record that doesn't exist"""
+
+
+class ServerOverloadedError(Exception):
+    """Error for when the server has too many queued requests to accept another one"""
+
+    def __init__(self, message="Server is overloaded, try again later"):
+        self.message = message
+        super().__init__(self.message)
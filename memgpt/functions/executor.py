@@ -0,0 +1,42 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, List, Optional, Tuple
+
+from memgpt.settings import settings
+
+# process-wide pool for parallel-safe tool calls, shared by all agents so the number of tool threads stays bounded
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.tool_execution_workers, thread_name_prefix="memgpt-tool")
+        return _executor
+
+
+def run_tool_calls(calls: List[Callable[[], Any]], timeout: Optional[float] = None) -> List[Tuple[Any, Optional[Exception]]]:
+    """Run independent tool calls concurrently, returns (result, error) per call in the order of the calls
+
+    A call that hasn't finished after timeout seconds (including the wait for a free worker) gets a TimeoutError. It can't be
+    interrupted, so it's left to finish in the background - which is why only parallel-safe tools are run this way.
+    """
+    executor = get_tool_executor()
+    futures = [executor.submit(call) for call in calls]
+    deadline = time.monotonic() + timeout if timeout else None
+
+    results = []
+    for future in futures:
+        try:
+            remaining = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            results.append((future.result(timeout=remaining), None))
+        except FutureTimeoutError:
+            future.cancel()
+            results.append((None, TimeoutError(f"Timed out after {timeout} seconds")))
+        except Exception as e:
+            results.append((None, e))
+    return results
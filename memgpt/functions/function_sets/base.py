@@ -10,6 +10,9 @@ from memgpt.utils import json_dumps
 # All functions should return a response string (or None)
 # If the function fails, throw an exception
 
+# Functions that only read from the agent (several calls to them in one response can run concurrently)
+PARALLEL_SAFE_FUNCTIONS = ["conversation_search", "conversation_search_date", "archival_memory_search"]
+
 
 def send_message(self: Agent, message: str) -> Optional[str]:
     """
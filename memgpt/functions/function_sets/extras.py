@@ -12,6 +12,9 @@ from memgpt.llm_api.llm_api_tools import create
 from memgpt.schemas.message import Message
 from memgpt.utils import json_dumps, json_loads
 
+# Functions that don't touch the agent's state (several calls to them in one response can run concurrently)
+PARALLEL_SAFE_FUNCTIONS = ["message_chatgpt", "read_from_text_file", "http_request"]
+
 
 def message_chatgpt(self, message: str):
     """
@@ -0,0 +1,94 @@
+"""Shared keep-alive HTTP connection pools for calls to LLM and embedding APIs
+
+Creating a new client per call pays connection (and TLS) setup on every request. The clients here are created once
+per process and keep a pool of connections per endpoint (scheme + host + port).
+"""
+
+import asyncio
+import importlib.util
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from memgpt.settings import settings
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_httpx_client: Optional[httpx.Client] = None
+# async clients are bound to the event loop they are used on (one per loop)
+_async_httpx_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def http2_available() -> bool:
+    """httpx only speaks HTTP/2 if the h2 package is installed"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def get_session() -> requests.Session:
+    """Process-wide requests session (for blocking JSON requests)"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.http_pool_endpoints, pool_maxsize=settings.http_pool_connections_per_endpoint
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def _httpx_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.http_pool_endpoints * settings.http_pool_connections_per_endpoint,
+        max_keepalive_connections=settings.http_pool_connections_per_endpoint,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+
+
+def get_httpx_client() -> httpx.Client:
+    """Process-wide httpx client (for streaming requests, HTTP/2 where the server and the h2 package support it)"""
+    global _httpx_client
+    if _httpx_client is None:
+        with _lock:
+            if _httpx_client is None:
+                _httpx_client = httpx.Client(
+                    limits=_httpx_limits(), timeout=settings.http_timeout, http2=settings.http2 and http2_available()
+                )
+    return _httpx_client
+
+
+def get_async_httpx_client() -> httpx.AsyncClient:
+    """httpx async client for the running event loop (for the AsyncServer, no thread is held while waiting on the response)"""
+    loop = asyncio.get_running_loop()
+    client = _async_httpx_clients.get(loop)
+    if client is None:
+        # no lock needed, only code running on this loop gets here
+        client = httpx.AsyncClient(limits=_httpx_limits(), timeout=settings.http_timeout, http2=settings.http2 and http2_available())
+        _async_httpx_clients[loop] = client
+    return client
+
+
+async def close_async_httpx_client():
+    """Close the running event loop's async client (it is re-created on next use)"""
+    client = _async_httpx_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def close_http_pools():
+    """Close all pooled connections (they are re-created on next use)"""
+    global _session, _httpx_client
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        if _httpx_client is not None:
+            _httpx_client.close()
+            _httpx_client = None
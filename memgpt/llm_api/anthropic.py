@@ -4,6 +4,7 @@ from typing import List, Optional, Union
 
 import requests
 
+from memgpt.http_pool import get_session
 from memgpt.schemas.message import Message
 from memgpt.schemas.openai.chat_completion_request import ChatCompletionRequest, Tool
 from memgpt.schemas.openai.chat_completion_response import (
@@ -362,7 +363,7 @@ def anthropic_chat_completions_request(
 
     printd(f"Sending request to {url}")
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = get_session().post(url, headers=headers, json=data)
         printd(f"response = {response}")
         response.raise_for_status()  # Raises HTTPError for 4XX/5XX status
         response = response.json()  # convert to dict from string
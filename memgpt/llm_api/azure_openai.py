@@ -2,6 +2,7 @@ from typing import Union
 
 import requests
 
+from memgpt.http_pool import get_session
 from memgpt.schemas.openai.chat_completion_response import ChatCompletionResponse
 from memgpt.schemas.openai.embedding_response import EmbeddingResponse
 from memgpt.utils import smart_urljoin
@@ -40,7 +41,7 @@ def azure_openai_get_model_list(url: str, api_key: Union[str, None], api_version
 
     printd(f"Sending request to {url}")
     try:
-        response = requests.get(url, headers=headers)
+        response = get_session().get(url, headers=headers)
         response.raise_for_status()  # Raises HTTPError for 4XX/5XX status
         response = response.json()  # convert to dict from string
         printd(f"response = {response}")
@@ -98,7 +99,7 @@ def azure_openai_chat_completions_request(
     printd(f"Sending request to {url}")
     try:
         data["messages"] = [i.to_openai_dict() for i in data["messages"]]
-        response = requests.post(url, headers=headers, json=data)
+        response = get_session().post(url, headers=headers, json=data)
         printd(f"response = {response}")
         response.raise_for_status()  # Raises HTTPError for 4XX/5XX status
         response = response.json()  # convert to dict from string
@@ -134,7 +135,7 @@ def azure_openai_embeddings_request(
 
     printd(f"Sending request to {url}")
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = get_session().post(url, headers=headers, json=data)
         printd(f"response = {response}")
         response.raise_for_status()  # Raises HTTPError for 4XX/5XX status
         response = response.json()  # convert to dict from string
@@ -4,6 +4,7 @@ from typing import List, Optional, Union
 
 import requests
 
+from memgpt.http_pool import get_session
 from memgpt.local_llm.utils import count_tokens
 from memgpt.schemas.message import Message
 from memgpt.schemas.openai.chat_completion_request import ChatCompletionRequest, Tool
@@ -39,7 +40,7 @@ def cohere_get_model_details(url: str, api_key: Union[str, None], model: str) ->
 
     printd(f"Sending request to {url}")
     try:
-        response = requests.get(url, headers=headers)
+        response = get_session().get(url, headers=headers)
         printd(f"response = {response}")
         response.raise_for_status()  # Raises HTTPError for 4XX/5XX status
         response = response.json()  # convert to dict from string
@@ -75,7 +76,7 @@ def cohere_get_model_list(url: str, api_key: Union[str, None]) -> dict:
 
     printd(f"Sending request to {url}")
     try:
-        response = requests.get(url, headers=headers)
+        response = get_session().get(url, headers=headers)
         printd(f"response = {response}")
         response.raise_for_status()  # Raises HTTPError for 4XX/5XX status
         response = response.json()  # convert to dict from string
@@ -375,7 +376,7 @@ def cohere_chat_completions_request(
 
     printd(f"Sending request to {url}")
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = get_session().post(url, headers=headers, json=data)
         printd(f"response = {response}")
         response.raise_for_status()  # Raises HTTPError for 4XX/5XX status
         response = response.json()  # convert to dict from string
@@ -5,6 +5,7 @@ from typing import List, Optional
 import requests
 
 from memgpt.constants import NON_USER_MSG_PREFIX
+from memgpt.http_pool import get_session
 from memgpt.local_llm.json_parser import clean_json_string_extra_backslash
 from memgpt.local_llm.utils import count_tokens
 from memgpt.schemas.openai.chat_completion_request import Tool
@@ -38,7 +39,7 @@ def google_ai_get_model_details(service_endpoint: str, api_key: str, model: str,
         headers = {"Content-Type": "application/json"}
 
     try:
-        response = requests.get(url, headers=headers)
+        response = get_session().get(url, headers=headers)
         printd(f"response = {response}")
         response.raise_for_status()  # Raises HTTPError for 4XX/5XX status
         response = response.json()  # convert to dict from string
@@ -88,7 +89,7 @@ def google_ai_get_model_list(service_endpoint: str, api_key: str, key_in_header:
         headers = {"Content-Type": "application/json"}
 
     try:
-        response = requests.get(url, headers=headers)
+        response = get_session().get(url, headers=headers)
         printd(f"response = {response}")
         response.raise_for_status()  # Raises HTTPError for 4XX/5XX status
         response = response.json()  # convert to dict from string
@@ -435,7 +436,7 @@ def google_ai_chat_completions_request(
 
     printd(f"Sending request to {url}")
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = get_session().post(url, headers=headers, json=data)
         printd(f"response = {response}")
         response.raise_for_status()  # Raises HTTPError for 4XX/5XX status
         response = response.json()  # convert to dict from string
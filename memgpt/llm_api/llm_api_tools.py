@@ -1,11 +1,13 @@
+import asyncio
 import copy
 import json
 import os
 import random
 import time
 import warnings
-from typing import List, Optional, Union
+from typing import Iterator, List, Optional, Tuple, Union
 
+import httpx
 import requests
 
 from memgpt.constants import CLI_WARNING_PREFIX, OPENAI_CONTEXT_WINDOW_ERROR_SUBSTRING
@@ -23,6 +25,7 @@ from memgpt.llm_api.google_ai import (
 from memgpt.llm_api.openai import (
     openai_chat_completions_process_stream,
     openai_chat_completions_request,
+    openai_chat_completions_request_async,
 )
 from memgpt.local_llm.chat_completion_proxy import get_chat_completion
 from memgpt.local_llm.constants import (
@@ -129,7 +132,7 @@ def unpack_inner_thoughts_from_kwargs(
     return new_response
 
 
-def is_context_overflow_error(exception: requests.exceptions.RequestException) -> bool:
+def is_context_overflow_error(exception: Union[requests.exceptions.RequestException, httpx.HTTPStatusError]) -> bool:
     """Checks if an exception is due to context overflow (based on common OpenAI response messages)"""
     from memgpt.utils import printd
 
@@ -141,7 +144,8 @@ def is_context_overflow_error(exception: requests.exceptions.RequestException) -
         return True
 
     # Based on python requests + OpenAI REST API (/v1)
-    elif isinstance(exception, requests.exceptions.HTTPError):
+    # (httpx errors come from the async client, see acreate)
+    elif isinstance(exception, (requests.exceptions.HTTPError, httpx.HTTPStatusError)):
         if exception.response is not None and "application/json" in exception.response.headers.get("Content-Type", ""):
             try:
                 error_details = exception.response.json()
@@ -171,6 +175,22 @@ def is_context_overflow_error(exception: requests.exceptions.RequestException) -
         return False
 
 
+def backoff_delays(initial_delay: float = 1, exponential_base: float = 2, jitter: bool = True, max_retries: int = 20) -> Iterator[float]:
+    """Delays to wait before each retry of a rate limited LLM request (raises once max_retries is exceeded)"""
+    delay = initial_delay
+    for _ in range(max_retries):
+        delay *= exponential_base * (1 + jitter * random.random())
+        yield delay
+    raise Exception(f"Maximum number of retries ({max_retries}) exceeded.")
+
+
+def next_retry_delay(delays: Iterator[float], error: Exception) -> float:
+    """Delay before retrying the request that failed with error, taken from delays (see backoff_delays)"""
+    delay = next(delays)
+    print(f"{CLI_WARNING_PREFIX}Got a rate limit error ('{error}') on LLM backend request, waiting {int(delay)}s then retrying...")
+    return delay
+
+
 def retry_with_exponential_backoff(
     func,
     initial_delay: float = 1,
@@ -184,11 +204,7 @@ def retry_with_exponential_backoff(
     """Retry a function with exponential backoff."""
 
     def wrapper(*args, **kwargs):
-        pass
-
-        # Initialize variables
-        num_retries = 0
-        delay = initial_delay
+        delays = backoff_delays(initial_delay=initial_delay, exponential_base=exponential_base, jitter=jitter, max_retries=max_retries)
 
         # Loop until a successful response or max_retries is hit or an exception is raised
         while True:
@@ -196,35 +212,73 @@ def retry_with_exponential_backoff(
                 return func(*args, **kwargs)
 
             except requests.exceptions.HTTPError as http_err:
-                # Retry on specified errors
-                if http_err.response.status_code in error_codes:
-                    # Increment retries
-                    num_retries += 1
-
-                    # Check if max retries has been reached
-                    if num_retries > max_retries:
-                        raise Exception(f"Maximum number of retries ({max_retries}) exceeded.")
-
-                    # Increment the delay
-                    delay *= exponential_base * (1 + jitter * random.random())
-
-                    # Sleep for the delay
-                    # printd(f"Got a rate limit error ('{http_err}') on LLM backend request, waiting {int(delay)}s then retrying...")
-                    print(
-                        f"{CLI_WARNING_PREFIX}Got a rate limit error ('{http_err}') on LLM backend request, waiting {int(delay)}s then retrying..."
-                    )
-                    time.sleep(delay)
-                else:
-                    # For other HTTP errors, re-raise the exception
+                # Retry on specified errors, re-raise other HTTP errors
+                if http_err.response.status_code not in error_codes:
                     raise
-
-            # Raise exceptions for any errors not specified
-            except Exception as e:
-                raise e
+                time.sleep(next_retry_delay(delays, http_err))
 
     return wrapper
 
 
+def build_openai_chat_completion_request(
+    llm_config: LLMConfig,
+    messages: List[Message],
+    credentials: MemGPTCredentials,
+    user_id: Optional[str] = None,
+    functions: Optional[list] = None,
+    function_call: str = "auto",
+    use_tool_naming: bool = True,
+    inner_thoughts_in_kwargs: OptionState = OptionState.DEFAULT,
+) -> Tuple[ChatCompletionRequest, bool]:
+    """Build the request for an OpenAI(-compatible) endpoint, returns it with whether inner thoughts are put in the kwargs"""
+    if inner_thoughts_in_kwargs == OptionState.DEFAULT:
+        # model that are known to not use `content` fields on tool calls
+        inner_thoughts_in_kwargs = "gpt-4o" in llm_config.model or "gpt-4-turbo" in llm_config.model or "gpt-3.5-turbo" in llm_config.model
+    else:
+        inner_thoughts_in_kwargs = True if inner_thoughts_in_kwargs == OptionState.YES else False
+
+    if not isinstance(inner_thoughts_in_kwargs, bool):
+        warnings.warn(f"Bad type detected: {type(inner_thoughts_in_kwargs)}")
+        inner_thoughts_in_kwargs = bool(inner_thoughts_in_kwargs)
+    if inner_thoughts_in_kwargs:
+        functions = add_inner_thoughts_to_functions(
+            functions=functions,
+            inner_thoughts_key=INNER_THOUGHTS_KWARG,
+            inner_thoughts_description=INNER_THOUGHTS_KWARG_DESCRIPTION,
+        )
+
+    openai_message_list = [
+        cast_message_to_subtype(m.to_openai_dict(put_inner_thoughts_in_kwargs=inner_thoughts_in_kwargs)) for m in messages
+    ]
+
+    # TODO do the same for Azure?
+    if credentials.openai_key is None and llm_config.model_endpoint == "https://api.openai.com/v1":
+        # only is a problem if we are *not* using an openai proxy
+        raise ValueError(f"OpenAI key is missing from MemGPT config file")
+    if use_tool_naming:
+        data = ChatCompletionRequest(
+            model=llm_config.model,
+            messages=openai_message_list,
+            tools=[{"type": "function", "function": f} for f in functions] if functions else None,
+            tool_choice=function_call,
+            user=str(user_id),
+        )
+    else:
+        data = ChatCompletionRequest(
+            model=llm_config.model,
+            messages=openai_message_list,
+            functions=functions,
+            function_call=function_call,
+            user=str(user_id),
+        )
+        # https://platform.openai.com/docs/guides/text-generation/json-mode
+        # only supported by gpt-4o, gpt-4-turbo, or gpt-3.5-turbo
+        if "gpt-4o" in llm_config.model or "gpt-4-turbo" in llm_config.model or "gpt-3.5-turbo" in llm_config.model:
+            data.response_format = {"type": "json_object"}
+
+    return data, inner_thoughts_in_kwargs
+
+
 @retry_with_exponential_backoff
 def create(
     # agent_state: AgentState,
@@ -261,53 +315,16 @@ def create(
 
     # openai
     if llm_config.model_endpoint_type == "openai":
-
-        if inner_thoughts_in_kwargs == OptionState.DEFAULT:
-            # model that are known to not use `content` fields on tool calls
-            inner_thoughts_in_kwargs = (
-                "gpt-4o" in llm_config.model or "gpt-4-turbo" in llm_config.model or "gpt-3.5-turbo" in llm_config.model
-            )
-        else:
-            inner_thoughts_in_kwargs = True if inner_thoughts_in_kwargs == OptionState.YES else False
-
-        if not isinstance(inner_thoughts_in_kwargs, bool):
-            warnings.warn(f"Bad type detected: {type(inner_thoughts_in_kwargs)}")
-            inner_thoughts_in_kwargs = bool(inner_thoughts_in_kwargs)
-        if inner_thoughts_in_kwargs:
-            functions = add_inner_thoughts_to_functions(
-                functions=functions,
-                inner_thoughts_key=INNER_THOUGHTS_KWARG,
-                inner_thoughts_description=INNER_THOUGHTS_KWARG_DESCRIPTION,
-            )
-
-        openai_message_list = [
-            cast_message_to_subtype(m.to_openai_dict(put_inner_thoughts_in_kwargs=inner_thoughts_in_kwargs)) for m in messages
-        ]
-
-        # TODO do the same for Azure?
-        if credentials.openai_key is None and llm_config.model_endpoint == "https://api.openai.com/v1":
-            # only is a problem if we are *not* using an openai proxy
-            raise ValueError(f"OpenAI key is missing from MemGPT config file")
-        if use_tool_naming:
-            data = ChatCompletionRequest(
-                model=llm_config.model,
-                messages=openai_message_list,
-                tools=[{"type": "function", "function": f} for f in functions] if functions else None,
-                tool_choice=function_call,
-                user=str(user_id),
-            )
-        else:
-            data = ChatCompletionRequest(
-                model=llm_config.model,
-                messages=openai_message_list,
-                functions=functions,
-                function_call=function_call,
-                user=str(user_id),
-            )
-            # https://platform.openai.com/docs/guides/text-generation/json-mode
-            # only supported by gpt-4o, gpt-4-turbo, or gpt-3.5-turbo
-            if "gpt-4o" in llm_config.model or "gpt-4-turbo" in llm_config.model or "gpt-3.5-turbo" in llm_config.model:
-                data.response_format = {"type": "json_object"}
+        data, inner_thoughts_in_kwargs = build_openai_chat_completion_request(
+            llm_config=llm_config,
+            messages=messages,
+            credentials=credentials,
+            user_id=user_id,
+            functions=functions,
+            function_call=function_call,
+            use_tool_naming=use_tool_naming,
+            inner_thoughts_in_kwargs=inner_thoughts_in_kwargs,
+        )
 
         if stream:  # Client requested token streaming
             data.stream = True
@@ -457,8 +474,6 @@ def create(
 
     # local model
     else:
-        if stream:
-            raise NotImplementedError(f"Streaming not yet implemented for {llm_config.model_endpoint_type}")
         return get_chat_completion(
             model=llm_config.model,
             messages=messages,
@@ -475,4 +490,90 @@ def create(
             # auth-related
             auth_type=credentials.openllm_auth_type,
             auth_key=credentials.openllm_key,
+            # streaming
+            stream=stream,
+            stream_interface=stream_inferface,
+        )
+
+
+async def acreate(
+    llm_config: LLMConfig,
+    messages: List[Message],
+    user_id: Optional[str] = None,
+    functions: Optional[list] = None,
+    functions_python: Optional[list] = None,
+    function_call: str = "auto",
+    first_message: bool = False,
+    use_tool_naming: bool = True,
+    stream: bool = False,
+    stream_inferface: Optional[Union[AgentRefreshStreamingInterface, AgentChunkStreamingInterface]] = None,
+    inner_thoughts_in_kwargs: OptionState = OptionState.DEFAULT,
+    max_retries: int = 20,
+) -> ChatCompletionResponse:
+    """Async version of create
+
+    Non-streaming requests to OpenAI(-compatible) endpoints are awaited on the event loop's httpx client, so no thread is
+    held during the round trip. Other providers (and token streaming) run the blocking create on a worker thread.
+    """
+    from memgpt.utils import printd
+
+    if llm_config.model_endpoint_type != "openai" or stream:
+        return await asyncio.to_thread(
+            create,
+            llm_config=llm_config,
+            messages=messages,
+            user_id=user_id,
+            functions=functions,
+            functions_python=functions_python,
+            function_call=function_call,
+            first_message=first_message,
+            use_tool_naming=use_tool_naming,
+            stream=stream,
+            stream_inferface=stream_inferface,
+            inner_thoughts_in_kwargs=inner_thoughts_in_kwargs,
         )
+
+    printd(f"Using model {llm_config.model_endpoint_type}, endpoint: {llm_config.model_endpoint}")
+    credentials = await asyncio.to_thread(MemGPTCredentials.load)
+
+    if function_call and not functions:
+        printd("unsetting function_call because functions is None")
+        function_call = None
+
+    data, inner_thoughts_in_kwargs = build_openai_chat_completion_request(
+        llm_config=llm_config,
+        messages=messages,
+        credentials=credentials,
+        user_id=user_id,
+        functions=functions,
+        function_call=function_call,
+        use_tool_naming=use_tool_naming,
+        inner_thoughts_in_kwargs=inner_thoughts_in_kwargs,
+    )
+    data.stream = False
+
+    if isinstance(stream_inferface, AgentChunkStreamingInterface):
+        stream_inferface.stream_start()
+    try:
+        # same backoff as retry_with_exponential_backoff
+        delays = backoff_delays(max_retries=max_retries)
+        while True:
+            try:
+                response = await openai_chat_completions_request_async(
+                    url=llm_config.model_endpoint,
+                    api_key=credentials.openai_key,
+                    chat_completion_request=data,
+                )
+                break
+            except httpx.HTTPStatusError as http_err:
+                if http_err.response.status_code != 429:
+                    raise
+                await asyncio.sleep(next_retry_delay(delays, http_err))
+    finally:
+        if isinstance(stream_inferface, AgentChunkStreamingInterface):
+            stream_inferface.stream_end()
+
+    if inner_thoughts_in_kwargs:
+        response = unpack_inner_thoughts_from_kwargs(response=response, inner_thoughts_key=INNER_THOUGHTS_KWARG)
+
+    return response
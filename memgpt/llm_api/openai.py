@@ -1,13 +1,13 @@
 import json
 from typing import Generator, Optional, Union
 
-import httpx
 import requests
 from httpx_sse import connect_sse
 from httpx_sse._exceptions import SSEError
 
 from memgpt.constants import OPENAI_CONTEXT_WINDOW_ERROR_SUBSTRING
 from memgpt.errors import LLMError
+from memgpt.http_pool import get_async_httpx_client, get_httpx_client, get_session
 from memgpt.local_llm.utils import num_tokens_from_functions, num_tokens_from_messages
 from memgpt.schemas.message import Message as _Message
 from memgpt.schemas.message import MessageRole as _MessageRole
@@ -22,6 +22,7 @@ from memgpt.schemas.openai.chat_completion_response import (
     UsageStatistics,
 )
 from memgpt.schemas.openai.embedding_response import EmbeddingResponse
+from memgpt.settings import settings
 from memgpt.streaming_interface import (
     AgentChunkStreamingInterface,
     AgentRefreshStreamingInterface,
@@ -50,7 +51,7 @@ def openai_get_model_list(url: str, api_key: Union[str, None], fix_url: Optional
 
     printd(f"Sending request to {url}")
     try:
-        response = requests.get(url, headers=headers)
+        response = get_session().get(url, headers=headers)
         response.raise_for_status()  # Raises HTTPError for 4XX/5XX status
         response = response.json()  # convert to dict from string
         printd(f"response = {response}")
@@ -209,12 +210,14 @@ def openai_chat_completions_process_stream(
 
                     # If this is the first tool call showing up in a chunk, initialize the list with it
                     if accum_message.tool_calls is None:
-                        accum_message.tool_calls = [
-                            ToolCall(id=TEMP_STREAM_TOOL_CALL_ID, function=FunctionCall(name="", arguments=""))
-                            for _ in range(len(tool_calls_delta))
-                        ]
+                        accum_message.tool_calls = []
 
                     for tool_call_delta in tool_calls_delta:
+                        # with parallel tool calls, later calls show up in later chunks (with a higher index)
+                        while len(accum_message.tool_calls) <= tool_call_delta.index:
+                            accum_message.tool_calls.append(
+                                ToolCall(id=TEMP_STREAM_TOOL_CALL_ID, function=FunctionCall(name="", arguments=""))
+                            )
                         if tool_call_delta.id is not None:
                             # TODO assert that we're not overwriting?
                             # TODO += instead of =?
@@ -272,75 +275,75 @@ def openai_chat_completions_process_stream(
 
 def _sse_post(url: str, data: dict, headers: dict) -> Generator[ChatCompletionChunkResponse, None, None]:
 
-    with httpx.Client() as client:
-        with connect_sse(client, method="POST", url=url, json=data, headers=headers) as event_source:
-
-            # Inspect for errors before iterating (see https://github.com/florimondmanca/httpx-sse/pull/12)
-            if not event_source.response.is_success:
-                # handle errors
-                from memgpt.utils import printd
-
-                printd("Caught error before iterating SSE request:", vars(event_source.response))
-                printd(event_source.response.read())
-
-                try:
-                    response_bytes = event_source.response.read()
-                    response_dict = json.loads(response_bytes.decode("utf-8"))
-                    error_message = response_dict["error"]["message"]
-                    # e.g.: This model's maximum context length is 8192 tokens. However, your messages resulted in 8198 tokens (7450 in the messages, 748 in the functions). Please reduce the length of the messages or functions.
-                    if OPENAI_CONTEXT_WINDOW_ERROR_SUBSTRING in error_message:
-                        raise LLMError(error_message)
-                except LLMError:
-                    raise
-                except:
-                    print(f"Failed to parse SSE message, throwing SSE HTTP error up the stack")
-                    event_source.response.raise_for_status()
+    client = get_httpx_client()
+    with connect_sse(client, method="POST", url=url, json=data, headers=headers) as event_source:
+
+        # Inspect for errors before iterating (see https://github.com/florimondmanca/httpx-sse/pull/12)
+        if not event_source.response.is_success:
+            # handle errors
+            from memgpt.utils import printd
+
+            printd("Caught error before iterating SSE request:", vars(event_source.response))
+            printd(event_source.response.read())
 
             try:
-                for sse in event_source.iter_sse():
-                    # printd(sse.event, sse.data, sse.id, sse.retry)
-                    if sse.data == OPENAI_SSE_DONE:
-                        # print("finished")
-                        break
-                    else:
-                        chunk_data = json.loads(sse.data)
-                        # print("chunk_data::", chunk_data)
-                        chunk_object = ChatCompletionChunkResponse(**chunk_data)
-                        # print("chunk_object::", chunk_object)
-                        # id=chunk_data["id"],
-                        # choices=[ChunkChoice],
-                        # model=chunk_data["model"],
-                        # system_fingerprint=chunk_data["system_fingerprint"]
-                        # )
-                        yield chunk_object
-
-            except SSEError as e:
-                print("Caught an error while iterating the SSE stream:", str(e))
-                if "application/json" in str(e):  # Check if the error is because of JSON response
-                    # TODO figure out a better way to catch the error other than re-trying with a POST
-                    response = client.post(url=url, json=data, headers=headers)  # Make the request again to get the JSON response
-                    if response.headers["Content-Type"].startswith("application/json"):
-                        error_details = response.json()  # Parse the JSON to get the error message
-                        print("Request:", vars(response.request))
-                        print("POST Error:", error_details)
-                        print("Original SSE Error:", str(e))
-                    else:
-                        print("Failed to retrieve JSON error message via retry.")
+                response_bytes = event_source.response.read()
+                response_dict = json.loads(response_bytes.decode("utf-8"))
+                error_message = response_dict["error"]["message"]
+                # e.g.: This model's maximum context length is 8192 tokens. However, your messages resulted in 8198 tokens (7450 in the messages, 748 in the functions). Please reduce the length of the messages or functions.
+                if OPENAI_CONTEXT_WINDOW_ERROR_SUBSTRING in error_message:
+                    raise LLMError(error_message)
+            except LLMError:
+                raise
+            except:
+                print(f"Failed to parse SSE message, throwing SSE HTTP error up the stack")
+                event_source.response.raise_for_status()
+
+        try:
+            for sse in event_source.iter_sse():
+                # printd(sse.event, sse.data, sse.id, sse.retry)
+                if sse.data == OPENAI_SSE_DONE:
+                    # print("finished")
+                    break
+                else:
+                    chunk_data = json.loads(sse.data)
+                    # print("chunk_data::", chunk_data)
+                    chunk_object = ChatCompletionChunkResponse(**chunk_data)
+                    # print("chunk_object::", chunk_object)
+                    # id=chunk_data["id"],
+                    # choices=[ChunkChoice],
+                    # model=chunk_data["model"],
+                    # system_fingerprint=chunk_data["system_fingerprint"]
+                    # )
+                    yield chunk_object
+
+        except SSEError as e:
+            print("Caught an error while iterating the SSE stream:", str(e))
+            if "application/json" in str(e):  # Check if the error is because of JSON response
+                # TODO figure out a better way to catch the error other than re-trying with a POST
+                response = client.post(url=url, json=data, headers=headers)  # Make the request again to get the JSON response
+                if response.headers["Content-Type"].startswith("application/json"):
+                    error_details = response.json()  # Parse the JSON to get the error message
+                    print("Request:", vars(response.request))
+                    print("POST Error:", error_details)
+                    print("Original SSE Error:", str(e))
                 else:
-                    print("SSEError not related to 'application/json' content type.")
+                    print("Failed to retrieve JSON error message via retry.")
+            else:
+                print("SSEError not related to 'application/json' content type.")
 
-                # Optionally re-raise the exception if you need to propagate it
-                raise e
+            # Optionally re-raise the exception if you need to propagate it
+            raise e
 
-            except Exception as e:
-                if event_source.response.request is not None:
-                    print("HTTP Request:", vars(event_source.response.request))
-                if event_source.response is not None:
-                    print("HTTP Status:", event_source.response.status_code)
-                    print("HTTP Headers:", event_source.response.headers)
-                    # print("HTTP Body:", event_source.response.text)
-                print("Exception message:", str(e))
-                raise e
+        except Exception as e:
+            if event_source.response.request is not None:
+                print("HTTP Request:", vars(event_source.response.request))
+            if event_source.response is not None:
+                print("HTTP Status:", event_source.response.status_code)
+                print("HTTP Headers:", event_source.response.headers)
+                # print("HTTP Body:", event_source.response.text)
+            print("Exception message:", str(e))
+            raise e
 
 
 def openai_chat_completions_request_stream(
@@ -353,6 +356,8 @@ def openai_chat_completions_request_stream(
     url = smart_urljoin(url, "chat/completions")
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
     data = chat_completion_request.model_dump(exclude_none=True)
+    if chat_completion_request.tools is not None:
+        data["parallel_tool_calls"] = settings.parallel_tool_calls
 
     printd("Request:\n", json.dumps(data, indent=2))
 
@@ -382,27 +387,15 @@ def openai_chat_completions_request_stream(
         raise e
 
 
-def openai_chat_completions_request(
-    url: str,
-    api_key: str,
-    chat_completion_request: ChatCompletionRequest,
-) -> ChatCompletionResponse:
-    """Send a ChatCompletion request to an OpenAI-compatible server
-
-    If request.stream == True, will yield ChatCompletionChunkResponses
-    If request.stream == False, will return a ChatCompletionResponse
-
-    https://platform.openai.com/docs/guides/text-generation?lang=curl
-    """
+def build_chat_completions_payload(chat_completion_request: ChatCompletionRequest) -> dict:
+    """JSON body of a (non-streaming) ChatCompletion request"""
     from memgpt.utils import printd
 
-    url = smart_urljoin(url, "chat/completions")
-    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
     data = chat_completion_request.model_dump(exclude_none=True)
 
     # add check otherwise will cause error: "Invalid value for 'parallel_tool_calls': 'parallel_tool_calls' is only allowed when 'tools' are specified."
     if chat_completion_request.tools is not None:
-        data["parallel_tool_calls"] = False
+        data["parallel_tool_calls"] = settings.parallel_tool_calls
 
     printd("Request:\n", json.dumps(data, indent=2))
 
@@ -415,9 +408,30 @@ def openai_chat_completions_request(
         data.pop("tools")
         data.pop("tool_choice", None)  # extra safe,  should exist always (default="auto")
 
+    return data
+
+
+def openai_chat_completions_request(
+    url: str,
+    api_key: str,
+    chat_completion_request: ChatCompletionRequest,
+) -> ChatCompletionResponse:
+    """Send a ChatCompletion request to an OpenAI-compatible server
+
+    If request.stream == True, will yield ChatCompletionChunkResponses
+    If request.stream == False, will return a ChatCompletionResponse
+
+    https://platform.openai.com/docs/guides/text-generation?lang=curl
+    """
+    from memgpt.utils import printd
+
+    url = smart_urljoin(url, "chat/completions")
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
+    data = build_chat_completions_payload(chat_completion_request)
+
     printd(f"Sending request to {url}")
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = get_session().post(url, headers=headers, json=data)
         printd(f"response = {response}, response.text = {response.text}")
         response.raise_for_status()  # Raises HTTPError for 4XX/5XX status
 
@@ -440,6 +454,28 @@ def openai_chat_completions_request(
         raise e
 
 
+async def openai_chat_completions_request_async(
+    url: str,
+    api_key: str,
+    chat_completion_request: ChatCompletionRequest,
+) -> ChatCompletionResponse:
+    """Async version of openai_chat_completions_request (on the event loop's pooled httpx client)
+
+    HTTP errors are raised as httpx.HTTPStatusError.
+    """
+    from memgpt.utils import printd
+
+    url = smart_urljoin(url, "chat/completions")
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
+    data = build_chat_completions_payload(chat_completion_request)
+
+    printd(f"Sending request to {url}")
+    response = await get_async_httpx_client().post(url, headers=headers, json=data)
+    printd(f"response = {response}, response.text = {response.text}")
+    response.raise_for_status()  # Raises HTTPStatusError for 4XX/5XX status
+    return ChatCompletionResponse(**response.json())
+
+
 def openai_embeddings_request(url: str, api_key: str, data: dict) -> EmbeddingResponse:
     """https://platform.openai.com/docs/api-reference/embeddings/create"""
     from memgpt.utils import printd
@@ -449,7 +485,7 @@ def openai_embeddings_request(url: str, api_key: str, data: dict) -> EmbeddingRe
 
     printd(f"Sending request to {url}")
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = get_session().post(url, headers=headers, json=data)
         printd(f"response = {response}")
         response.raise_for_status()  # Raises HTTPError for 4XX/5XX status
         response = response.json()  # convert to dict from string
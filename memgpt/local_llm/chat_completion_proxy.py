@@ -1,42 +1,78 @@
 """Key idea: create drop-in replacement for agent's ChatCompletion call that runs on an OpenLLM backend"""
 
+import inspect
 import uuid
 
 import requests
 
 from memgpt.constants import CLI_WARNING_PREFIX
 from memgpt.errors import LocalLLMConnectionError, LocalLLMError
-from memgpt.local_llm.constants import DEFAULT_WRAPPER
+from memgpt.local_llm.constants import DEFAULT_WRAPPER_NAME
 from memgpt.local_llm.function_parser import patch_function
 from memgpt.local_llm.grammars.gbnf_grammar_generator import (
     create_dynamic_model_from_function,
     generate_gbnf_grammar_and_documentation,
 )
-from memgpt.local_llm.groq.api import get_groq_completion
-from memgpt.local_llm.koboldcpp.api import get_koboldcpp_completion
-from memgpt.local_llm.llamacpp.api import get_llamacpp_completion
+from memgpt.local_llm.groq.api import get_groq_completion, get_groq_completion_stream
+from memgpt.local_llm.koboldcpp.api import (
+    get_koboldcpp_completion,
+    get_koboldcpp_completion_stream,
+)
+from memgpt.local_llm.llamacpp.api import (
+    get_llamacpp_completion,
+    get_llamacpp_completion_stream,
+)
 from memgpt.local_llm.llm_chat_completion_wrappers import simple_summary_wrapper
-from memgpt.local_llm.lmstudio.api import get_lmstudio_completion
-from memgpt.local_llm.ollama.api import get_ollama_completion
+from memgpt.local_llm.lmstudio.api import (
+    get_lmstudio_completion,
+    get_lmstudio_completion_stream,
+)
+from memgpt.local_llm.ollama.api import (
+    get_ollama_completion,
+    get_ollama_completion_stream,
+)
+from memgpt.local_llm.prompt_cache import (
+    cache_friendly_messages,
+    get_slot_id,
+    prompt_prefix_tracker,
+)
+from memgpt.local_llm.stream_parser import (
+    StreamingFunctionCallParser,
+    get_assistant_prefix,
+)
 from memgpt.local_llm.utils import count_tokens, get_available_wrappers
-from memgpt.local_llm.vllm.api import get_vllm_completion
-from memgpt.local_llm.webui.api import get_webui_completion
+from memgpt.local_llm.vllm.api import get_vllm_completion, get_vllm_completion_stream
+from memgpt.local_llm.webui.api import get_webui_completion, get_webui_completion_stream
 from memgpt.local_llm.webui.legacy_api import (
     get_webui_completion as get_webui_completion_legacy,
 )
 from memgpt.prompts.gpt_summarize import SYSTEM as SUMMARIZE_SYSTEM_MESSAGE
 from memgpt.schemas.openai.chat_completion_response import (
+    ChatCompletionChunkResponse,
     ChatCompletionResponse,
     Choice,
+    ChunkChoice,
+    FunctionCall,
     Message,
     ToolCall,
     UsageStatistics,
 )
-from memgpt.utils import get_tool_call_id, get_utc_time, json_dumps
+from memgpt.settings import settings as memgpt_settings
+from memgpt.streaming_interface import (
+    AgentChunkStreamingInterface,
+    AgentRefreshStreamingInterface,
+)
+from memgpt.utils import LRUCache, get_tool_call_id, get_utc_time, json_dumps
 
 has_shown_warning = False
 grammar_supported_backends = ["koboldcpp", "llamacpp", "webui", "webui-legacy"]
 
+# wrappers are stateless, so the summarizer wrapper is shared like the ones in get_available_wrappers()
+summary_wrapper = simple_summary_wrapper.SimpleSummaryWrapper()
+
+# (tool set fingerprint, inner thoughts flags) -> (grammar, documentation)
+grammar_cache = LRUCache(max_size=64)
+
 
 def get_chat_completion(
     model,
@@ -59,6 +95,9 @@ def get_chat_completion(
     # optional auth headers
     auth_type=None,
     auth_key=None,
+    # token streaming
+    stream=False,
+    stream_interface=None,
 ) -> ChatCompletionResponse:
     from memgpt.utils import printd
 
@@ -69,7 +108,9 @@ def get_chat_completion(
     grammar = None
 
     # TODO: eventually just process Message object
+    conversation_key = None
     if not isinstance(messages[0], dict):
+        conversation_key = str(messages[0].agent_id) if getattr(messages[0], "agent_id", None) else None
         messages = [m.to_openai_dict() for m in messages]
 
     if function_call is not None and function_call != "auto":
@@ -80,7 +121,7 @@ def get_chat_completion(
 
     # Special case for if the call we're making is coming from the summarizer
     if messages[0]["role"] == "system" and messages[0]["content"].strip() == SUMMARIZE_SYSTEM_MESSAGE.strip():
-        llm_wrapper = simple_summary_wrapper.SimpleSummaryWrapper()
+        llm_wrapper = summary_wrapper
 
     # Select a default prompt formatter
     elif wrapper is None:
@@ -91,7 +132,7 @@ def get_chat_completion(
             )
             has_shown_warning = True
 
-        llm_wrapper = DEFAULT_WRAPPER()
+        llm_wrapper = available_wrappers[DEFAULT_WRAPPER_NAME]
 
     # User provided an incorrect prompt formatter
     elif wrapper not in available_wrappers:
@@ -136,15 +177,22 @@ def get_chat_completion(
         )
         grammar = None
 
+    # keep the changing memory block out of the prompt prefix, so the backend can reuse its KV cache across steps
+    # (the original messages are still used below to patch the response)
+    prompt_messages = cache_friendly_messages(messages) if memgpt_settings.local_llm_cache_friendly_prompt else messages
+    slot_id = get_slot_id(conversation_key, memgpt_settings.local_llm_cache_slots)
+
     # First step: turn the message sequence into a prompt that the model expects
     try:
         # if hasattr(llm_wrapper, "supports_first_message"):
         if hasattr(llm_wrapper, "supports_first_message") and llm_wrapper.supports_first_message:
             prompt = llm_wrapper.chat_completion_to_prompt(
-                messages=messages, functions=functions, first_message=first_message, function_documentation=documentation
+                messages=prompt_messages, functions=functions, first_message=first_message, function_documentation=documentation
             )
         else:
-            prompt = llm_wrapper.chat_completion_to_prompt(messages=messages, functions=functions, function_documentation=documentation)
+            prompt = llm_wrapper.chat_completion_to_prompt(
+                messages=prompt_messages, functions=functions, function_documentation=documentation
+            )
 
         printd(prompt)
     except Exception as e:
@@ -153,8 +201,27 @@ def get_chat_completion(
             f"Failed to convert ChatCompletion messages into prompt string with wrapper {str(llm_wrapper)} - error: {str(e)}"
         )
 
+    reused_prefix_ratio = prompt_prefix_tracker.record(conversation_key, prompt)
+    if reused_prefix_ratio is not None:
+        printd(f"Prompt prefix shared with the previous step: {reused_prefix_ratio:.1%}")
+
+    # streamed responses need a message ID up front (the chunks carry it)
+    response_id = f"message-{uuid.uuid4()}" if stream else str(uuid.uuid4())
+    tool_call_id = get_tool_call_id()
+    created = get_utc_time()
+
     try:
-        if endpoint_type == "webui":
+        if stream:
+            assert stream_interface is not None, "Token streaming requires a streaming interface"
+            text_stream = get_completion_stream(
+                endpoint_type, endpoint, auth_type, auth_key, model, prompt, context_window, user=user, grammar=grammar, slot_id=slot_id
+            )
+            parser = StreamingFunctionCallParser(
+                assistant_prefix=get_assistant_prefix(llm_wrapper, first_message=first_message), tool_call_id=tool_call_id
+            )
+            result = process_completion_stream(text_stream, parser, stream_interface, response_id=response_id, created=created, model=model)
+            usage = {"prompt_tokens": None, "completion_tokens": None, "total_tokens": None}
+        elif endpoint_type == "webui":
             result, usage = get_webui_completion(endpoint, auth_type, auth_key, prompt, context_window, grammar=grammar)
         elif endpoint_type == "webui-legacy":
             result, usage = get_webui_completion_legacy(endpoint, auth_type, auth_key, prompt, context_window, grammar=grammar)
@@ -163,7 +230,16 @@ def get_chat_completion(
         elif endpoint_type == "lmstudio-legacy":
             result, usage = get_lmstudio_completion(endpoint, auth_type, auth_key, prompt, context_window, api="chat")
         elif endpoint_type == "llamacpp":
-            result, usage = get_llamacpp_completion(endpoint, auth_type, auth_key, prompt, context_window, grammar=grammar)
+            result, usage = get_llamacpp_completion(
+                endpoint,
+                auth_type,
+                auth_key,
+                prompt,
+                context_window,
+                grammar=grammar,
+                cache_prompt=memgpt_settings.local_llm_cache_friendly_prompt,
+                slot_id=slot_id,
+            )
         elif endpoint_type == "koboldcpp":
             result, usage = get_koboldcpp_completion(endpoint, auth_type, auth_key, prompt, context_window, grammar=grammar)
         elif endpoint_type == "ollama":
@@ -221,7 +297,7 @@ def get_chat_completion(
 
     # unpack with response.choices[0].message.content
     response = ChatCompletionResponse(
-        id=str(uuid.uuid4()),  # TODO something better?
+        id=response_id,  # TODO something better?
         choices=[
             Choice(
                 finish_reason="stop",
@@ -230,14 +306,14 @@ def get_chat_completion(
                     role=chat_completion_result["role"],
                     content=chat_completion_result["content"],
                     tool_calls=(
-                        [ToolCall(id=get_tool_call_id(), type="function", function=chat_completion_result["function_call"])]
+                        [ToolCall(id=tool_call_id, type="function", function=chat_completion_result["function_call"])]
                         if "function_call" in chat_completion_result
                         else []
                     ),
                 ),
             )
         ],
-        created=get_utc_time(),
+        created=created,
         model=model,
         # "This fingerprint represents the backend configuration that the model runs with."
         # system_fingerprint=user if user is not None else "null",
@@ -249,18 +325,135 @@ def get_chat_completion(
     return response
 
 
+def get_completion_stream(
+    endpoint_type, endpoint, auth_type, auth_key, model, prompt, context_window, user=None, grammar=None, slot_id=None
+):
+    """Completion text from a local backend, yielded as it is generated"""
+    if endpoint_type == "webui":
+        return get_webui_completion_stream(endpoint, auth_type, auth_key, prompt, context_window, grammar=grammar)
+    elif endpoint_type == "webui-legacy":
+        # the legacy API has no streaming endpoint, the whole completion arrives as one piece
+        result, _ = get_webui_completion_legacy(endpoint, auth_type, auth_key, prompt, context_window, grammar=grammar)
+        return iter([result])
+    elif endpoint_type == "lmstudio":
+        return get_lmstudio_completion_stream(endpoint, auth_type, auth_key, prompt, context_window, api="completions")
+    elif endpoint_type == "lmstudio-legacy":
+        return get_lmstudio_completion_stream(endpoint, auth_type, auth_key, prompt, context_window, api="chat")
+    elif endpoint_type == "llamacpp":
+        return get_llamacpp_completion_stream(
+            endpoint,
+            auth_type,
+            auth_key,
+            prompt,
+            context_window,
+            grammar=grammar,
+            cache_prompt=memgpt_settings.local_llm_cache_friendly_prompt,
+            slot_id=slot_id,
+        )
+    elif endpoint_type == "koboldcpp":
+        return get_koboldcpp_completion_stream(endpoint, auth_type, auth_key, prompt, context_window, grammar=grammar)
+    elif endpoint_type == "ollama":
+        return get_ollama_completion_stream(endpoint, auth_type, auth_key, model, prompt, context_window)
+    elif endpoint_type == "vllm":
+        return get_vllm_completion_stream(endpoint, auth_type, auth_key, model, prompt, context_window, user)
+    elif endpoint_type == "groq":
+        return get_groq_completion_stream(endpoint, auth_type, auth_key, model, prompt, context_window)
+    else:
+        raise LocalLLMError(
+            f"Invalid endpoint type {endpoint_type}, please set variable depending on your backend (webui, lmstudio, llamacpp, koboldcpp)"
+        )
+
+
+def process_completion_stream(
+    text_stream,
+    parser: StreamingFunctionCallParser,
+    stream_interface,
+    response_id: str,
+    created,
+    model: str,
+) -> str:
+    """Feed a completion stream through the wrapper output parser to the streaming interface, returns the full completion text"""
+    assert isinstance(stream_interface, (AgentChunkStreamingInterface, AgentRefreshStreamingInterface)), type(stream_interface)
+
+    # partial message so far (for interfaces that redraw the whole message)
+    partial_response = ChatCompletionResponse(
+        id=response_id,
+        choices=[Choice(finish_reason="stop", index=0, message=Message(role="assistant"))],
+        created=created,
+        model=model,
+        usage=UsageStatistics(),
+    )
+    partial_message = partial_response.choices[0].message
+
+    def push(deltas):
+        for delta in deltas:
+            if isinstance(stream_interface, AgentChunkStreamingInterface):
+                chunk = ChatCompletionChunkResponse(
+                    id=response_id,
+                    choices=[ChunkChoice(index=0, delta=delta)],
+                    created=created,
+                    model=model,
+                )
+                stream_interface.process_chunk(chunk, message_id=response_id, message_date=created)
+            else:
+                if delta.content is not None:
+                    partial_message.content = (partial_message.content or "") + delta.content
+                for tool_call_delta in delta.tool_calls or []:
+                    if partial_message.tool_calls is None:
+                        partial_message.tool_calls = [ToolCall(id=parser.tool_call_id, function=FunctionCall(name="", arguments=""))]
+                    function = partial_message.tool_calls[0].function
+                    function.name += tool_call_delta.function.name or ""
+                    function.arguments += tool_call_delta.function.arguments
+                stream_interface.process_refresh(partial_response)
+
+    stream_interface.stream_start()
+    try:
+        for text in text_stream:
+            push(parser.feed(text))
+        push(parser.finish())
+    finally:
+        stream_interface.stream_end()
+
+    return parser.text
+
+
+def functions_fingerprint(functions_python: dict) -> tuple:
+    """Everything the generated grammar depends on: the name, signature and docstring of each function"""
+    return tuple((name, str(inspect.signature(func)), func.__doc__) for name, func in functions_python.items())
+
+
 def generate_grammar_and_documentation(
     functions_python: dict,
     add_inner_thoughts_top_level: bool,
     add_inner_thoughts_param_level: bool,
     allow_only_inner_thoughts: bool,
 ):
-    from memgpt.utils import printd
-
+    """Grammar and documentation for a set of functions, built once per distinct tool set"""
     assert not (
         add_inner_thoughts_top_level and add_inner_thoughts_param_level
     ), "Can only place inner thoughts in one location in the grammar generator"
 
+    key = (functions_fingerprint(functions_python), add_inner_thoughts_top_level, add_inner_thoughts_param_level, allow_only_inner_thoughts)
+    result = grammar_cache.get(key)
+    if result is None:
+        result = build_grammar_and_documentation(
+            functions_python=functions_python,
+            add_inner_thoughts_top_level=add_inner_thoughts_top_level,
+            add_inner_thoughts_param_level=add_inner_thoughts_param_level,
+            allow_only_inner_thoughts=allow_only_inner_thoughts,
+        )
+        grammar_cache.put(key, result)
+    return result
+
+
+def build_grammar_and_documentation(
+    functions_python: dict,
+    add_inner_thoughts_top_level: bool,
+    add_inner_thoughts_param_level: bool,
+    allow_only_inner_thoughts: bool,
+):
+    from memgpt.utils import printd
+
     grammar_function_models = []
     # create_dynamic_model_from_function will add inner thoughts to the function parameters if add_inner_thoughts is True.
     # generate_gbnf_grammar_and_documentation will add inner thoughts to the outer object of the function parameters if add_inner_thoughts is True.
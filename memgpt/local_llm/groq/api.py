@@ -1,18 +1,16 @@
-from typing import Tuple
+from typing import Iterator, Tuple
 from urllib.parse import urljoin
 
 from memgpt.local_llm.settings.settings import get_completions_settings
-from memgpt.local_llm.utils import post_json_auth_request
+from memgpt.local_llm.utils import iter_stream_events, post_json_auth_request
 from memgpt.utils import count_tokens
 
 API_CHAT_SUFFIX = "/v1/chat/completions"
 # LMSTUDIO_API_COMPLETIONS_SUFFIX = "/v1/completions"
 
 
-def get_groq_completion(endpoint: str, auth_type: str, auth_key: str, model: str, prompt: str, context_window: int) -> Tuple[str, dict]:
-    """TODO no support for function calling OR raw completions, so we need to route the request into /chat/completions instead"""
-    from memgpt.utils import printd
-
+def build_groq_request(endpoint: str, model: str, prompt: str, context_window: int) -> Tuple[str, dict, int]:
+    """Returns the URI, request payload and prompt token count for a Groq chat completion"""
     prompt_tokens = count_tokens(prompt)
     if prompt_tokens > context_window:
         raise Exception(f"Request exceeds maximum context length ({prompt_tokens} > {context_window} tokens)")
@@ -62,6 +60,15 @@ def get_groq_completion(endpoint: str, auth_type: str, auth_key: str, model: str
     if not endpoint.startswith(("http://", "https://")):
         raise ValueError(f"Provided OPENAI_API_BASE value ({endpoint}) must begin with http:// or https://")
 
+    return URI, request, prompt_tokens
+
+
+def get_groq_completion(endpoint: str, auth_type: str, auth_key: str, model: str, prompt: str, context_window: int) -> Tuple[str, dict]:
+    """TODO no support for function calling OR raw completions, so we need to route the request into /chat/completions instead"""
+    from memgpt.utils import printd
+
+    URI, request, prompt_tokens = build_groq_request(endpoint, model, prompt, context_window)
+
     try:
         response = post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key)
         if response.status_code == 200:
@@ -95,3 +102,23 @@ def get_groq_completion(endpoint: str, auth_type: str, auth_key: str, model: str
     }
 
     return result, usage
+
+
+def get_groq_completion_stream(endpoint: str, auth_type: str, auth_key: str, model: str, prompt: str, context_window: int) -> Iterator[str]:
+    """Streaming version of get_groq_completion, yields the completion text as it is generated"""
+    URI, request, _ = build_groq_request(endpoint, model, prompt, context_window)
+    request["stream"] = True
+
+    with post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key, stream=True) as response:
+        if response.status_code != 200:
+            raise Exception(
+                f"API call got non-200 response code (code={response.status_code}, msg={response.text}) for address: {URI}."
+                + f" Make sure that the inference server is running and reachable at {URI}."
+            )
+        for event in iter_stream_events(response):
+            if not event.get("choices"):
+                continue
+            choice = event["choices"][0]
+            text = choice["delta"].get("content") if "delta" in choice else choice.get("text")
+            if text:
+                yield text
@@ -1,15 +1,19 @@
+from typing import Iterator
 from urllib.parse import urljoin
 
 from memgpt.local_llm.settings.settings import get_completions_settings
-from memgpt.local_llm.utils import count_tokens, post_json_auth_request
+from memgpt.local_llm.utils import (
+    count_tokens,
+    iter_stream_events,
+    post_json_auth_request,
+)
 
 KOBOLDCPP_API_SUFFIX = "/api/v1/generate"
+KOBOLDCPP_STREAM_API_SUFFIX = "/api/extra/generate/stream"
 
 
-def get_koboldcpp_completion(endpoint, auth_type, auth_key, prompt, context_window, grammar=None):
-    """See https://lite.koboldai.net/koboldcpp_api for API spec"""
-    from memgpt.utils import printd
-
+def build_koboldcpp_request(endpoint, prompt, context_window, grammar=None, api_suffix=KOBOLDCPP_API_SUFFIX):
+    """Returns the URI, request payload and prompt token count for a koboldcpp generation"""
     prompt_tokens = count_tokens(prompt)
     if prompt_tokens > context_window:
         raise Exception(f"Request exceeds maximum context length ({prompt_tokens} > {context_window} tokens)")
@@ -28,10 +32,19 @@ def get_koboldcpp_completion(endpoint, auth_type, auth_key, prompt, context_wind
     if not endpoint.startswith(("http://", "https://")):
         raise ValueError(f"Provided OPENAI_API_BASE value ({endpoint}) must begin with http:// or https://")
 
+    URI = urljoin(endpoint.strip("/") + "/", api_suffix.strip("/"))
+    return URI, request, prompt_tokens
+
+
+def get_koboldcpp_completion(endpoint, auth_type, auth_key, prompt, context_window, grammar=None):
+    """See https://lite.koboldai.net/koboldcpp_api for API spec"""
+    from memgpt.utils import printd
+
+    URI, request, prompt_tokens = build_koboldcpp_request(endpoint, prompt, context_window, grammar=grammar)
+
     try:
         # NOTE: llama.cpp server returns the following when it's out of context
         # curl: (52) Empty reply from server
-        URI = urljoin(endpoint.strip("/") + "/", KOBOLDCPP_API_SUFFIX.strip("/"))
         response = post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key)
         if response.status_code == 200:
             result_full = response.json()
@@ -60,3 +73,18 @@ def get_koboldcpp_completion(endpoint, auth_type, auth_key, prompt, context_wind
     }
 
     return result, usage
+
+
+def get_koboldcpp_completion_stream(endpoint, auth_type, auth_key, prompt, context_window, grammar=None) -> Iterator[str]:
+    """Streaming version of get_koboldcpp_completion, yields the completion text as it is generated"""
+    URI, request, _ = build_koboldcpp_request(endpoint, prompt, context_window, grammar=grammar, api_suffix=KOBOLDCPP_STREAM_API_SUFFIX)
+
+    with post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key, stream=True) as response:
+        if response.status_code != 200:
+            raise Exception(
+                f"API call got non-200 response code (code={response.status_code}, msg={response.text}) for address: {URI}."
+                + f" Make sure that the koboldcpp server is running and reachable at {URI}."
+            )
+        for event in iter_stream_events(response):
+            if event.get("token"):
+                yield event["token"]
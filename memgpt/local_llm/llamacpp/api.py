@@ -1,15 +1,18 @@
+from typing import Iterator
 from urllib.parse import urljoin
 
 from memgpt.local_llm.settings.settings import get_completions_settings
-from memgpt.local_llm.utils import count_tokens, post_json_auth_request
+from memgpt.local_llm.utils import (
+    count_tokens,
+    iter_stream_events,
+    post_json_auth_request,
+)
 
 LLAMACPP_API_SUFFIX = "/completion"
 
 
-def get_llamacpp_completion(endpoint, auth_type, auth_key, prompt, context_window, grammar=None):
-    """See https://github.com/ggerganov/llama.cpp/blob/master/examples/server/README.md for instructions on how to run the LLM web server"""
-    from memgpt.utils import printd
-
+def build_llamacpp_request(endpoint, prompt, context_window, grammar=None, cache_prompt=False, slot_id=None):
+    """Returns the URI, request payload and prompt token count for a llama.cpp server completion"""
     prompt_tokens = count_tokens(prompt)
     if prompt_tokens > context_window:
         raise Exception(f"Request exceeds maximum context length ({prompt_tokens} > {context_window} tokens)")
@@ -23,13 +26,30 @@ def get_llamacpp_completion(endpoint, auth_type, auth_key, prompt, context_windo
     if grammar is not None:
         request["grammar"] = grammar
 
+    # Reuse the KV cache of the previous request's common prefix (and keep each agent on its own slot)
+    if cache_prompt:
+        request["cache_prompt"] = True
+    if slot_id is not None:
+        request["id_slot"] = slot_id
+
     if not endpoint.startswith(("http://", "https://")):
         raise ValueError(f"Provided OPENAI_API_BASE value ({endpoint}) must begin with http:// or https://")
 
+    URI = urljoin(endpoint.strip("/") + "/", LLAMACPP_API_SUFFIX.strip("/"))
+    return URI, request, prompt_tokens
+
+
+def get_llamacpp_completion(endpoint, auth_type, auth_key, prompt, context_window, grammar=None, cache_prompt=False, slot_id=None):
+    """See https://github.com/ggerganov/llama.cpp/blob/master/examples/server/README.md for instructions on how to run the LLM web server"""
+    from memgpt.utils import printd
+
+    URI, request, prompt_tokens = build_llamacpp_request(
+        endpoint, prompt, context_window, grammar=grammar, cache_prompt=cache_prompt, slot_id=slot_id
+    )
+
     try:
         # NOTE: llama.cpp server returns the following when it's out of context
         # curl: (52) Empty reply from server
-        URI = urljoin(endpoint.strip("/") + "/", LLAMACPP_API_SUFFIX.strip("/"))
         response = post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key)
         if response.status_code == 200:
             result_full = response.json()
@@ -56,3 +76,23 @@ def get_llamacpp_completion(endpoint, auth_type, auth_key, prompt, context_windo
     }
 
     return result, usage
+
+
+def get_llamacpp_completion_stream(
+    endpoint, auth_type, auth_key, prompt, context_window, grammar=None, cache_prompt=False, slot_id=None
+) -> Iterator[str]:
+    """Streaming version of get_llamacpp_completion, yields the completion text as it is generated"""
+    URI, request, _ = build_llamacpp_request(endpoint, prompt, context_window, grammar=grammar, cache_prompt=cache_prompt, slot_id=slot_id)
+    request["stream"] = True
+
+    with post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key, stream=True) as response:
+        if response.status_code != 200:
+            raise Exception(
+                f"API call got non-200 response code (code={response.status_code}, msg={response.text}) for address: {URI}."
+                + f" Make sure that the llama.cpp server is running and reachable at {URI}."
+            )
+        for event in iter_stream_events(response):
+            if event.get("content"):
+                yield event["content"]
+            if event.get("stop"):
+                return
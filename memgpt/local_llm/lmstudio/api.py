@@ -1,17 +1,16 @@
+from typing import Iterator
 from urllib.parse import urljoin
 
 from memgpt.local_llm.settings.settings import get_completions_settings
-from memgpt.local_llm.utils import post_json_auth_request
+from memgpt.local_llm.utils import iter_stream_events, post_json_auth_request
 from memgpt.utils import count_tokens
 
 LMSTUDIO_API_CHAT_SUFFIX = "/v1/chat/completions"
 LMSTUDIO_API_COMPLETIONS_SUFFIX = "/v1/completions"
 
 
-def get_lmstudio_completion(endpoint, auth_type, auth_key, prompt, context_window, api="completions"):
-    """Based on the example for using LM Studio as a backend from https://github.com/lmstudio-ai/examples/tree/main/Hello%2C%20world%20-%20OpenAI%20python%20client"""
-    from memgpt.utils import printd
-
+def build_lmstudio_request(endpoint, prompt, context_window, api="completions"):
+    """Returns the URI, request payload and prompt token count for an LM Studio completion (or chat completion)"""
     prompt_tokens = count_tokens(prompt)
     if prompt_tokens > context_window:
         raise Exception(f"Request exceeds maximum context length ({prompt_tokens} > {context_window} tokens)")
@@ -61,6 +60,15 @@ def get_lmstudio_completion(endpoint, auth_type, auth_key, prompt, context_windo
     if not endpoint.startswith(("http://", "https://")):
         raise ValueError(f"Provided OPENAI_API_BASE value ({endpoint}) must begin with http:// or https://")
 
+    return URI, request, prompt_tokens
+
+
+def get_lmstudio_completion(endpoint, auth_type, auth_key, prompt, context_window, api="completions"):
+    """Based on the example for using LM Studio as a backend from https://github.com/lmstudio-ai/examples/tree/main/Hello%2C%20world%20-%20OpenAI%20python%20client"""
+    from memgpt.utils import printd
+
+    URI, request, prompt_tokens = build_lmstudio_request(endpoint, prompt, context_window, api=api)
+
     try:
         response = post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key)
         if response.status_code == 200:
@@ -98,3 +106,23 @@ def get_lmstudio_completion(endpoint, auth_type, auth_key, prompt, context_windo
     }
 
     return result, usage
+
+
+def get_lmstudio_completion_stream(endpoint, auth_type, auth_key, prompt, context_window, api="completions") -> Iterator[str]:
+    """Streaming version of get_lmstudio_completion, yields the completion text as it is generated"""
+    URI, request, _ = build_lmstudio_request(endpoint, prompt, context_window, api=api)
+    request["stream"] = True
+
+    with post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key, stream=True) as response:
+        if response.status_code != 200:
+            raise Exception(
+                f"API call got non-200 response code (code={response.status_code}, msg={response.text}) for address: {URI}."
+                + f" Make sure that the LM Studio local inference server is running and reachable at {URI}."
+            )
+        for event in iter_stream_events(response):
+            if not event.get("choices"):
+                continue
+            choice = event["choices"][0]
+            text = choice["delta"].get("content") if "delta" in choice else choice.get("text")
+            if text:
+                yield text
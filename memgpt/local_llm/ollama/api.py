@@ -1,17 +1,16 @@
+from typing import Iterator
 from urllib.parse import urljoin
 
 from memgpt.errors import LocalLLMError
 from memgpt.local_llm.settings.settings import get_completions_settings
-from memgpt.local_llm.utils import post_json_auth_request
+from memgpt.local_llm.utils import iter_stream_events, post_json_auth_request
 from memgpt.utils import count_tokens
 
 OLLAMA_API_SUFFIX = "/api/generate"
 
 
-def get_ollama_completion(endpoint, auth_type, auth_key, model, prompt, context_window, grammar=None):
-    """See https://github.com/jmorganca/ollama/blob/main/docs/api.md for instructions on how to run the LLM web server"""
-    from memgpt.utils import printd
-
+def build_ollama_request(endpoint, model, prompt, context_window, grammar=None):
+    """Returns the URI, request payload and prompt token count for an ollama generation"""
     prompt_tokens = count_tokens(prompt)
     if prompt_tokens > context_window:
         raise Exception(f"Request exceeds maximum context length ({prompt_tokens} > {context_window} tokens)")
@@ -56,8 +55,17 @@ def get_ollama_completion(endpoint, auth_type, auth_key, model, prompt, context_
     if not endpoint.startswith(("http://", "https://")):
         raise ValueError(f"Provided OPENAI_API_BASE value ({endpoint}) must begin with http:// or https://")
 
+    URI = urljoin(endpoint.strip("/") + "/", OLLAMA_API_SUFFIX.strip("/"))
+    return URI, request, prompt_tokens
+
+
+def get_ollama_completion(endpoint, auth_type, auth_key, model, prompt, context_window, grammar=None):
+    """See https://github.com/jmorganca/ollama/blob/main/docs/api.md for instructions on how to run the LLM web server"""
+    from memgpt.utils import printd
+
+    URI, request, prompt_tokens = build_ollama_request(endpoint, model, prompt, context_window, grammar=grammar)
+
     try:
-        URI = urljoin(endpoint.strip("/") + "/", OLLAMA_API_SUFFIX.strip("/"))
         response = post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key)
         if response.status_code == 200:
             # https://github.com/jmorganca/ollama/blob/main/docs/api.md
@@ -86,3 +94,22 @@ def get_ollama_completion(endpoint, auth_type, auth_key, model, prompt, context_
     }
 
     return result, usage
+
+
+def get_ollama_completion_stream(endpoint, auth_type, auth_key, model, prompt, context_window, grammar=None) -> Iterator[str]:
+    """Streaming version of get_ollama_completion, yields the completion text as it is generated"""
+    URI, request, _ = build_ollama_request(endpoint, model, prompt, context_window, grammar=grammar)
+    request["stream"] = True
+
+    with post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key, stream=True) as response:
+        if response.status_code != 200:
+            raise Exception(
+                f"API call got non-200 response code (code={response.status_code}, msg={response.text}) for address: {URI}."
+                + f" Make sure that the ollama API server is running and reachable at {URI}."
+            )
+        # https://github.com/jmorganca/ollama/blob/main/docs/api.md#generate-a-completion (newline-delimited JSON)
+        for event in iter_stream_events(response):
+            if event.get("response"):
+                yield event["response"]
+            if event.get("done"):
+                return
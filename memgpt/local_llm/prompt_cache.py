@@ -0,0 +1,85 @@
+"""KV-cache friendly prompt assembly for local LLM backends
+
+The compiled system message starts with the system prompt, followed by the memory block (edit timestamp, recall /
+archival sizes and core memory) which changes on almost every step. Since the wrappers put the system message at the
+very front of the prompt, the backend can't reuse any of its cached prefix past that point.
+
+In cache friendly mode the memory block is moved out of the system message into a message at the end of the
+conversation, so the prompt starts with a byte-identical prefix (system prompt + function docs + message history)
+from one step to the next. llama.cpp additionally gets `cache_prompt` and (optionally) a slot per agent.
+"""
+
+import os
+import threading
+import zlib
+from typing import List, Optional, Tuple
+
+from memgpt.constants import IN_CONTEXT_MEMORY_HEADER
+from memgpt.utils import LRUCache, json_dumps
+
+
+def split_system_message(system_message: str) -> Tuple[str, str]:
+    """Split a compiled system message into its stable part and the memory block (empty if there is none)"""
+    index = system_message.find(IN_CONTEXT_MEMORY_HEADER)
+    if index == -1:
+        return system_message, ""
+    return system_message[:index].rstrip(), system_message[index:]
+
+
+def cache_friendly_messages(messages: List[dict]) -> List[dict]:
+    """Move the memory block from the system message to a system alert after the last message"""
+    if not messages or messages[0]["role"] != "system":
+        return messages
+    stable, memory = split_system_message(messages[0]["content"])
+    if not memory:
+        return messages
+    memory_message = {"role": "user", "content": json_dumps({"type": "system_alert", "message": memory})}
+    return [{**messages[0], "content": stable}] + messages[1:] + [memory_message]
+
+
+def get_slot_id(conversation_key: Optional[str], n_slots: int) -> Optional[int]:
+    """Pin a conversation to one of the server's slots, so its cached prompt isn't evicted by other conversations"""
+    if not n_slots or conversation_key is None:
+        return None
+    return zlib.crc32(conversation_key.encode("utf-8")) % n_slots
+
+
+class PromptPrefixTracker:
+    """Measures how much of each prompt repeats the previous prompt of the same conversation (the part a backend can serve from its KV cache)"""
+
+    def __init__(self, max_conversations: int = 256):
+        self._last_prompts = LRUCache(max_size=max_conversations)
+        self._lock = threading.Lock()
+        self.steps = 0
+        self.prompt_chars = 0
+        self.reused_chars = 0
+        self.last_ratio = None
+
+    def record(self, conversation_key: Optional[str], prompt: str) -> Optional[float]:
+        """Returns the fraction of the prompt that is a prefix of the conversation's previous prompt (None on the first step)"""
+        if conversation_key is None:
+            return None
+        previous = self._last_prompts.get(conversation_key)
+        self._last_prompts.put(conversation_key, prompt)
+        if previous is None:
+            return None
+
+        reused = len(os.path.commonprefix([previous, prompt]))
+        ratio = reused / len(prompt) if prompt else 0.0
+        with self._lock:
+            self.steps += 1
+            self.prompt_chars += len(prompt)
+            self.reused_chars += reused
+            self.last_ratio = ratio
+        return ratio
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "steps": self.steps,
+                "last_reused_prefix_ratio": self.last_ratio,
+                "reused_prefix_ratio": self.reused_chars / self.prompt_chars if self.prompt_chars else None,
+            }
+
+
+prompt_prefix_tracker = PromptPrefixTracker()
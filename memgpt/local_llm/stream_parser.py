@@ -0,0 +1,228 @@
+"""Incremental parsing of the JSON function calls that the local LLM wrappers prompt for
+
+The wrappers ask the model for output like:
+{
+  "function": "send_message",
+  "params": {
+    "inner_thoughts": "...",
+    "message": "..."
+  }
+}
+(or with "inner_thoughts" at the top level for the "noforce" wrappers). While the completion streams in, the parser turns
+the partial output into OpenAI-style message deltas: inner thoughts as `content`, and the function call as a tool call
+whose `arguments` are the params (minus inner thoughts) as a JSON string.
+"""
+
+import json
+from typing import List, Optional
+
+from memgpt.local_llm.constants import INNER_THOUGHTS_KWARG
+from memgpt.schemas.openai.chat_completion_response import (
+    FunctionCallDelta,
+    MessageDelta,
+    ToolCallDelta,
+)
+from memgpt.utils import get_tool_call_id
+
+WHITESPACE = " \t\n\r"
+
+
+def get_assistant_prefix(llm_wrapper, first_message: bool = False) -> str:
+    """The part of the JSON response that the wrapper already put at the end of the prompt (mirrors output_to_chat_completion_response)"""
+    if getattr(llm_wrapper, "supports_first_message", False) and first_message:
+        prefix = getattr(llm_wrapper, "assistant_prefix_extra_first_message", None)
+        if prefix:
+            return prefix
+    prefix = getattr(llm_wrapper, "assistant_prefix_extra", None)
+    if prefix:
+        return prefix
+    if getattr(llm_wrapper, "include_opening_brance_in_prefix", False):
+        return "{"
+    return ""
+
+
+class _Frame:
+    def __init__(self, container: str):
+        self.container = container  # "{" or "["
+        self.key = None  # current key (objects only)
+        self.expect_key = container == "{"
+
+
+class StreamingFunctionCallParser:
+    """Turns streamed wrapper output into message deltas (inner thoughts, function name, function arguments)"""
+
+    def __init__(self, assistant_prefix: str = "", tool_call_id: Optional[str] = None):
+        self.assistant_prefix = assistant_prefix
+        # output is held back until we know whether the model repeated the prefix from the prompt
+        self._head = "" if assistant_prefix else None
+        self.text = ""
+
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._string_is_key = False
+        self._string = ""
+        self._escape = None  # characters after a backslash inside a string
+
+        # function name (emitted together with the first arguments delta)
+        self.function_name = None
+        self._name_emitted = False
+        # params member value currently being copied into the arguments
+        self._capturing = False
+        self._params_members = 0
+        self._pending_arguments = ""
+        self.tool_call_id = tool_call_id or get_tool_call_id()
+
+        self._deltas = []
+
+    def feed(self, text: str) -> List[MessageDelta]:
+        """Parse the next piece of model output, returns the deltas it completes"""
+        self.text += text
+        if self._head is not None:
+            self._head += text
+            if len(self._head) < len(self.assistant_prefix) and self.assistant_prefix.startswith(self._head):
+                return []
+            text = self._release_head()
+
+        for ch in text:
+            self._scan(ch)
+        return self._flush()
+
+    def finish(self) -> List[MessageDelta]:
+        """Flush whatever is left once the stream is done"""
+        if self._head is not None:
+            for ch in self._release_head():
+                self._scan(ch)
+        if self.function_name is not None and not self._name_emitted:
+            self._emit_arguments("")
+        return self._flush()
+
+    def _release_head(self) -> str:
+        head, self._head = self._head, None
+        return head if head.startswith(self.assistant_prefix) else self.assistant_prefix + head
+
+    @property
+    def path(self) -> tuple:
+        return tuple(frame.key for frame in self._stack)
+
+    def _in_params(self) -> bool:
+        """At the top level of the params object (where the members are)"""
+        return len(self._stack) == 2 and self._stack[0].key == "params" and self._stack[1].container == "{"
+
+    def _scan(self, ch: str):
+        if self._capturing and not (ch in ",}" and self._in_params() and not self._in_string):
+            self._emit_arguments(ch)
+
+        if self._in_string:
+            if self._escape is not None:
+                self._escape += ch
+                if self._escape[0] == "u" and len(self._escape) < 5:
+                    return
+                try:
+                    decoded = json.loads(f'"\\{self._escape}"')
+                except ValueError:
+                    decoded = "\\" + self._escape
+                self._escape = None
+                self._string_char(decoded)
+            elif ch == "\\":
+                self._escape = ""
+            elif ch == '"':
+                self._in_string = False
+                self._string_end()
+            else:
+                self._string_char(ch)
+            return
+
+        if ch in WHITESPACE:
+            return
+        frame = self._stack[-1] if self._stack else None
+
+        if ch == '"':
+            self._in_string = True
+            self._string_is_key = frame is not None and frame.expect_key
+            self._string = ""
+            if not self._string_is_key:
+                self._value_start(ch)
+        elif ch in "{[":
+            self._value_start(ch)
+            self._stack.append(_Frame(ch))
+        elif ch in "}]":
+            if self._stack:
+                closed_params = self._in_params()
+                self._stack.pop()
+                if closed_params:
+                    self._capturing = False
+                    self._emit_arguments("}" if self._params_members else "{}")
+                elif self._capturing and self._in_params():
+                    self._capturing = False
+        elif ch == ":":
+            pass
+        elif ch == ",":
+            if self._capturing and self._in_params():
+                self._capturing = False
+            if frame is not None and frame.container == "{":
+                frame.expect_key = True
+                frame.key = None
+        else:
+            # number / true / false / null
+            if frame is not None and frame.container == "{" and frame.expect_key:
+                return
+            self._value_start(ch)
+
+    def _value_start(self, ch: str):
+        if self._in_params() and not self._capturing and self._stack[-1].key != INNER_THOUGHTS_KWARG:
+            self._capturing = True
+            self._emit_arguments(("{" if self._params_members == 0 else ", ") + json.dumps(self._stack[-1].key) + ": " + ch)
+            self._params_members += 1
+
+    def _string_char(self, ch: str):
+        if self._string_is_key:
+            self._string += ch
+        elif self.path in ((INNER_THOUGHTS_KWARG,), ("params", INNER_THOUGHTS_KWARG)):
+            self._emit_content(ch)
+        elif self.path == ("function",):
+            self._string += ch
+
+    def _string_end(self):
+        frame = self._stack[-1] if self._stack else None
+        if self._string_is_key:
+            frame.key = self._string
+            frame.expect_key = False
+        elif self.path == ("function",):
+            self.function_name = self._string
+            if self._pending_arguments:
+                self._emit_arguments("")
+        if self._capturing and self._in_params():
+            self._capturing = False
+
+    def _emit_content(self, text: str):
+        if self._deltas and self._deltas[-1][0] == "content":
+            self._deltas[-1][1] += text
+        else:
+            self._deltas.append(["content", text])
+
+    def _emit_arguments(self, text: str):
+        if self.function_name is None:
+            # params came before the function name
+            self._pending_arguments += text
+            return
+        text, self._pending_arguments = self._pending_arguments + text, ""
+        if not self._name_emitted:
+            self._name_emitted = True
+            self._deltas.append(["name", self.function_name])
+        if self._deltas and self._deltas[-1][0] == "arguments":
+            self._deltas[-1][1] += text
+        else:
+            self._deltas.append(["arguments", text])
+
+    def _flush(self) -> List[MessageDelta]:
+        deltas = []
+        for kind, text in self._deltas:
+            if kind == "content":
+                deltas.append(MessageDelta(content=text))
+            elif kind == "name":
+                function = FunctionCallDelta(name=text, arguments="")
+                deltas.append(MessageDelta(tool_calls=[ToolCallDelta(index=0, id=self.tool_call_id, function=function)]))
+            elif text:
+                deltas.append(MessageDelta(tool_calls=[ToolCallDelta(index=0, function=FunctionCallDelta(arguments=text))]))
+        self._deltas = []
+        return deltas
@@ -1,9 +1,8 @@
+import json
 import os
 import warnings
-from typing import List
-
-import requests
-import tiktoken
+from functools import lru_cache
+from typing import Iterator, List, Tuple
 
 import memgpt.local_llm.llm_chat_completion_wrappers.airoboros as airoboros
 import memgpt.local_llm.llm_chat_completion_wrappers.chatml as chatml
@@ -11,28 +10,30 @@ import memgpt.local_llm.llm_chat_completion_wrappers.configurable_wrapper as con
 import memgpt.local_llm.llm_chat_completion_wrappers.dolphin as dolphin
 import memgpt.local_llm.llm_chat_completion_wrappers.llama3 as llama3
 import memgpt.local_llm.llm_chat_completion_wrappers.zephyr as zephyr
+from memgpt.http_pool import get_session
+from memgpt.utils import LRUCache, get_encoding
 
 
-def post_json_auth_request(uri, json_payload, auth_type, auth_key):
-    """Send a POST request with a JSON payload and optional authentication"""
+def post_json_auth_request(uri, json_payload, auth_type, auth_key, stream=False):
+    """Send a POST request with a JSON payload and optional authentication (stream=True to read the response incrementally)"""
 
     # By default most local LLM inference servers do not have authorization enabled
     if auth_type is None:
-        response = requests.post(uri, json=json_payload)
+        response = get_session().post(uri, json=json_payload, stream=stream)
 
     # Used by OpenAI, together.ai, Mistral AI
     elif auth_type == "bearer_token":
         if auth_key is None:
             raise ValueError(f"auth_type is {auth_type}, but auth_key is null")
         headers = {"Content-Type": "application/json", "Authorization": f"Bearer {auth_key}"}
-        response = requests.post(uri, json=json_payload, headers=headers)
+        response = get_session().post(uri, json=json_payload, headers=headers, stream=stream)
 
     # Used by OpenAI Azure
     elif auth_type == "api_key":
         if auth_key is None:
             raise ValueError(f"auth_type is {auth_type}, but auth_key is null")
         headers = {"Content-Type": "application/json", "api-key": f"{auth_key}"}
-        response = requests.post(uri, json=json_payload, headers=headers)
+        response = get_session().post(uri, json=json_payload, headers=headers, stream=stream)
 
     else:
         raise ValueError(f"Unsupport authentication type: {auth_type}")
@@ -40,6 +41,19 @@ def post_json_auth_request(uri, json_payload, auth_type, auth_key):
     return response
 
 
+def iter_stream_events(response) -> Iterator[dict]:
+    """JSON payloads of a streamed response, sent either as server-sent events ("data: {...}") or as newline-delimited JSON"""
+    for line in response.iter_lines():
+        line = line.decode("utf-8").strip()
+        if not line or line.startswith((":", "event:", "id:", "retry:")):
+            continue
+        if line.startswith("data:"):
+            line = line[len("data:") :].strip()
+            if line == "[DONE]":
+                return
+        yield json.loads(line)
+
+
 # deprecated for Box
 class DotDict(dict):
     """Allow dot access on properties similar to OpenAI response object"""
@@ -75,8 +89,11 @@ def load_grammar_file(grammar):
 
 # TODO: support tokenizers/tokenizer apis available in local models
 def count_tokens(s: str, model: str = "gpt-4") -> int:
-    encoding = tiktoken.encoding_for_model(model)
-    return len(encoding.encode(s))
+    return len(get_encoding(model).encode(s))
+
+
+# (model, json of the function schemas) -> number of tokens
+_function_token_counts = LRUCache(max_size=256)
 
 
 def num_tokens_from_functions(functions: List[dict], model: str = "gpt-4"):
@@ -84,11 +101,12 @@ def num_tokens_from_functions(functions: List[dict], model: str = "gpt-4"):
 
     Copied from https://community.openai.com/t/how-to-calculate-the-tokens-when-using-function-call/266573/11
     """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        print("Warning: model not found. Using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
+    key = (model, json.dumps(functions, sort_keys=True))
+    num_tokens = _function_token_counts.get(key)
+    if num_tokens is not None:
+        return num_tokens
+
+    encoding = get_encoding(model)
 
     num_tokens = 0
     for function in functions:
@@ -120,6 +138,7 @@ def num_tokens_from_functions(functions: List[dict], model: str = "gpt-4"):
         num_tokens += function_tokens
 
     num_tokens += 12
+    _function_token_counts.put(key, num_tokens)
     return num_tokens
 
 
@@ -136,11 +155,7 @@ def num_tokens_from_tool_calls(tool_calls: List[dict], model: str = "gpt-4"):
         }
     }]
     """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        # print("Warning: model not found. Using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
+    encoding = get_encoding(model)
 
     num_tokens = 0
     for tool_call in tool_calls:
@@ -156,22 +171,8 @@ def num_tokens_from_tool_calls(tool_calls: List[dict], model: str = "gpt-4"):
     return num_tokens
 
 
-def num_tokens_from_messages(messages: List[dict], model: str = "gpt-4") -> int:
-    """Return the number of tokens used by a list of messages.
-
-    From: https://github.com/openai/openai-cookbook/blob/main/examples/How_to_count_tokens_with_tiktoken.ipynb
-
-    For counting tokens in function calling RESPONSES, see:
-        https://hmarr.com/blog/counting-openai-tokens/, https://github.com/hmarr/openai-chat-tokens
-
-    For counting tokens in function calling REQUESTS, see:
-        https://community.openai.com/t/how-to-calculate-the-tokens-when-using-function-call/266573/11
-    """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        # print("Warning: model not found. Using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
+def get_message_token_overhead(model: str) -> Tuple[str, int, int]:
+    """Return (model to count as, tokens_per_message, tokens_per_name) for the chat format of a model"""
     if model in {
         "gpt-3.5-turbo-0613",
         "gpt-3.5-turbo-16k-0613",
@@ -180,52 +181,70 @@ def num_tokens_from_messages(messages: List[dict], model: str = "gpt-4") -> int:
         "gpt-4-0613",
         "gpt-4-32k-0613",
     }:
-        tokens_per_message = 3
-        tokens_per_name = 1
+        return model, 3, 1
     elif model == "gpt-3.5-turbo-0301":
-        tokens_per_message = 4  # every message follows <|start|>{role/name}\n{content}<|end|>\n
-        tokens_per_name = -1  # if there's a name, the role is omitted
+        # every message follows <|start|>{role/name}\n{content}<|end|>\n, if there's a name, the role is omitted
+        return model, 4, -1
     elif "gpt-3.5-turbo" in model:
         # print("Warning: gpt-3.5-turbo may update over time. Returning num tokens assuming gpt-3.5-turbo-0613.")
-        return num_tokens_from_messages(messages, model="gpt-3.5-turbo-0613")
+        return get_message_token_overhead("gpt-3.5-turbo-0613")
     elif "gpt-4" in model:
         # print("Warning: gpt-4 may update over time. Returning num tokens assuming gpt-4-0613.")
-        return num_tokens_from_messages(messages, model="gpt-4-0613")
+        return get_message_token_overhead("gpt-4-0613")
     else:
         warnings.warn(
             f"""num_tokens_from_messages() is not implemented for model {model}. See https://github.com/openai/openai-python/blob/main/chatml.md for information on how messages are converted to tokens."""
         )
-        return num_tokens_from_messages(messages, model="gpt-4-0613")
-        # raise NotImplementedError(
-        # f"""num_tokens_from_messages() is not implemented for model {model}. See https://github.com/openai/openai-python/blob/main/chatml.md for information on how messages are converted to tokens."""
-        # )
-    num_tokens = 0
-    for message in messages:
-        num_tokens += tokens_per_message
-        for key, value in message.items():
-            try:
+        return get_message_token_overhead("gpt-4-0613")
 
-                if isinstance(value, list) and key == "tool_calls":
-                    num_tokens += num_tokens_from_tool_calls(tool_calls=value, model=model)
-                    # special case for tool calling (list)
-                    # num_tokens += len(encoding.encode(value["name"]))
-                    # num_tokens += len(encoding.encode(value["arguments"]))
 
-                else:
-                    num_tokens += len(encoding.encode(value))
+def num_tokens_from_message(message: dict, model: str = "gpt-4") -> int:
+    """Return the number of tokens used by a single message (not including the reply priming, see num_tokens_from_messages)"""
+    model, tokens_per_message, tokens_per_name = get_message_token_overhead(model)
+    encoding = get_encoding(model)
 
-                if key == "name":
-                    num_tokens += tokens_per_name
+    num_tokens = tokens_per_message
+    for key, value in message.items():
+        try:
 
-            except TypeError as e:
-                print(f"tiktoken encoding failed on: {value}")
-                raise e
+            if isinstance(value, list) and key == "tool_calls":
+                num_tokens += num_tokens_from_tool_calls(tool_calls=value, model=model)
+                # special case for tool calling (list)
+                # num_tokens += len(encoding.encode(value["name"]))
+                # num_tokens += len(encoding.encode(value["arguments"]))
 
+            else:
+                num_tokens += len(encoding.encode(value))
+
+            if key == "name":
+                num_tokens += tokens_per_name
+
+        except TypeError as e:
+            print(f"tiktoken encoding failed on: {value}")
+            raise e
+
+    return num_tokens
+
+
+def num_tokens_from_messages(messages: List[dict], model: str = "gpt-4") -> int:
+    """Return the number of tokens used by a list of messages.
+
+    From: https://github.com/openai/openai-cookbook/blob/main/examples/How_to_count_tokens_with_tiktoken.ipynb
+
+    For counting tokens in function calling RESPONSES, see:
+        https://hmarr.com/blog/counting-openai-tokens/, https://github.com/hmarr/openai-chat-tokens
+
+    For counting tokens in function calling REQUESTS, see:
+        https://community.openai.com/t/how-to-calculate-the-tokens-when-using-function-call/266573/11
+    """
+    num_tokens = sum(num_tokens_from_message(message, model=model) for message in messages)
     num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
     return num_tokens
 
 
+@lru_cache(maxsize=None)
 def get_available_wrappers() -> dict:
+    """Wrapper name -> wrapper (wrappers are stateless, so the instances are created once and shared)"""
     return {
         "llama3": llama3.LLaMA3InnerMonologueWrapper(),
         "llama3-grammar": llama3.LLaMA3InnerMonologueWrapper(),
@@ -1,15 +1,18 @@
+from typing import Iterator
 from urllib.parse import urljoin
 
 from memgpt.local_llm.settings.settings import get_completions_settings
-from memgpt.local_llm.utils import count_tokens, post_json_auth_request
+from memgpt.local_llm.utils import (
+    count_tokens,
+    iter_stream_events,
+    post_json_auth_request,
+)
 
 WEBUI_API_SUFFIX = "/v1/completions"
 
 
-def get_vllm_completion(endpoint, auth_type, auth_key, model, prompt, context_window, user, grammar=None):
-    """https://github.com/vllm-project/vllm/blob/main/examples/api_client.py"""
-    from memgpt.utils import printd
-
+def build_vllm_request(endpoint, model, prompt, context_window, user, grammar=None):
+    """Returns the URI, request payload and prompt token count for a vLLM (OpenAI-compatible) completion"""
     prompt_tokens = count_tokens(prompt)
     if prompt_tokens > context_window:
         raise Exception(f"Request exceeds maximum context length ({prompt_tokens} > {context_window} tokens)")
@@ -32,8 +35,17 @@ def get_vllm_completion(endpoint, auth_type, auth_key, model, prompt, context_wi
     if not endpoint.startswith(("http://", "https://")):
         raise ValueError(f"Endpoint ({endpoint}) must begin with http:// or https://")
 
+    URI = urljoin(endpoint.strip("/") + "/", WEBUI_API_SUFFIX.strip("/"))
+    return URI, request, prompt_tokens
+
+
+def get_vllm_completion(endpoint, auth_type, auth_key, model, prompt, context_window, user, grammar=None):
+    """https://github.com/vllm-project/vllm/blob/main/examples/api_client.py"""
+    from memgpt.utils import printd
+
+    URI, request, prompt_tokens = build_vllm_request(endpoint, model, prompt, context_window, user, grammar=grammar)
+
     try:
-        URI = urljoin(endpoint.strip("/") + "/", WEBUI_API_SUFFIX.strip("/"))
         response = post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key)
         if response.status_code == 200:
             result_full = response.json()
@@ -61,3 +73,19 @@ def get_vllm_completion(endpoint, auth_type, auth_key, model, prompt, context_wi
     }
 
     return result, usage
+
+
+def get_vllm_completion_stream(endpoint, auth_type, auth_key, model, prompt, context_window, user, grammar=None) -> Iterator[str]:
+    """Streaming version of get_vllm_completion, yields the completion text as it is generated"""
+    URI, request, _ = build_vllm_request(endpoint, model, prompt, context_window, user, grammar=grammar)
+    request["stream"] = True
+
+    with post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key, stream=True) as response:
+        if response.status_code != 200:
+            raise Exception(
+                f"API call got non-200 response code (code={response.status_code}, msg={response.text}) for address: {URI}."
+                + f" Make sure that the vLLM server is running and reachable at {URI}."
+            )
+        for event in iter_stream_events(response):
+            if event.get("choices") and event["choices"][0].get("text"):
+                yield event["choices"][0]["text"]
@@ -1,15 +1,18 @@
+from typing import Iterator
 from urllib.parse import urljoin
 
 from memgpt.local_llm.settings.settings import get_completions_settings
-from memgpt.local_llm.utils import count_tokens, post_json_auth_request
+from memgpt.local_llm.utils import (
+    count_tokens,
+    iter_stream_events,
+    post_json_auth_request,
+)
 
 WEBUI_API_SUFFIX = "/v1/completions"
 
 
-def get_webui_completion(endpoint, auth_type, auth_key, prompt, context_window, grammar=None):
-    """Compatibility for the new OpenAI API: https://github.com/oobabooga/text-generation-webui/wiki/12-%E2%80%90-OpenAI-API#examples"""
-    from memgpt.utils import printd
-
+def build_webui_request(endpoint, prompt, context_window, grammar=None):
+    """Returns the URI, request payload and prompt token count for a web UI (OpenAI-compatible) completion"""
     prompt_tokens = count_tokens(prompt)
     if prompt_tokens > context_window:
         raise Exception(f"Request exceeds maximum context length ({prompt_tokens} > {context_window} tokens)")
@@ -29,8 +32,17 @@ def get_webui_completion(endpoint, auth_type, auth_key, prompt, context_window,
     if not endpoint.startswith(("http://", "https://")):
         raise ValueError(f"Endpoint value ({endpoint}) must begin with http:// or https://")
 
+    URI = urljoin(endpoint.strip("/") + "/", WEBUI_API_SUFFIX.strip("/"))
+    return URI, request, prompt_tokens
+
+
+def get_webui_completion(endpoint, auth_type, auth_key, prompt, context_window, grammar=None):
+    """Compatibility for the new OpenAI API: https://github.com/oobabooga/text-generation-webui/wiki/12-%E2%80%90-OpenAI-API#examples"""
+    from memgpt.utils import printd
+
+    URI, request, prompt_tokens = build_webui_request(endpoint, prompt, context_window, grammar=grammar)
+
     try:
-        URI = urljoin(endpoint.strip("/") + "/", WEBUI_API_SUFFIX.strip("/"))
         response = post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key)
         if response.status_code == 200:
             result_full = response.json()
@@ -58,3 +70,19 @@ def get_webui_completion(endpoint, auth_type, auth_key, prompt, context_window,
     }
 
     return result, usage
+
+
+def get_webui_completion_stream(endpoint, auth_type, auth_key, prompt, context_window, grammar=None) -> Iterator[str]:
+    """Streaming version of get_webui_completion, yields the completion text as it is generated"""
+    URI, request, _ = build_webui_request(endpoint, prompt, context_window, grammar=grammar)
+    request["stream"] = True
+
+    with post_json_auth_request(uri=URI, json_payload=request, auth_type=auth_type, auth_key=auth_key, stream=True) as response:
+        if response.status_code != 200:
+            raise Exception(
+                f"API call got non-200 response code (code={response.status_code}, msg={response.text}) for address: {URI}."
+                + f" Make sure that the web UI server is running and reachable at {URI}."
+            )
+        for event in iter_stream_events(response):
+            if event.get("choices") and event["choices"][0].get("text"):
+                yield event["choices"][0]["text"]
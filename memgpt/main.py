@@ -171,6 +171,7 @@ def run_agent_loop(
 
                     # attach new data
                     client.attach_source_to_agent(agent_id=memgpt_agent.agent_state.id, source_name=data_source)
+                    memgpt_agent.load_attached_sources(ms)
 
                     continue
 
@@ -218,8 +219,9 @@ def run_agent_loop(
                         for _ in range(min(pop_amount, len(memgpt_agent._messages))):
                             # remove the message from the internal state of the agent
                             deleted_message = memgpt_agent._messages.pop()
+                            memgpt_agent.token_ledger.remove([deleted_message])
                             # then also remove it from recall storage
-                            memgpt_agent.persistence_manager.recall_memory.storage.delete(filters={"id": deleted_message.id})
+                            memgpt_agent.persistence_manager.recall_memory.delete(filters={"id": deleted_message.id})
                     continue
 
                 elif user_input.lower() == "/retry":
@@ -229,12 +231,14 @@ def run_agent_loop(
                             # we want to pop up to the last user message and send it again
                             user_message = memgpt_agent._messages[-1].text
                             deleted_message = memgpt_agent._messages.pop()
+                            memgpt_agent.token_ledger.remove([deleted_message])
                             # then also remove it from recall storage
-                            memgpt_agent.persistence_manager.recall_memory.storage.delete(filters={"id": deleted_message.id})
+                            memgpt_agent.persistence_manager.recall_memory.delete(filters={"id": deleted_message.id})
                             break
                         deleted_message = memgpt_agent._messages.pop()
+                        memgpt_agent.token_ledger.remove([deleted_message])
                         # then also remove it from recall storage
-                        memgpt_agent.persistence_manager.recall_memory.storage.delete(filters={"id": deleted_message.id})
+                        memgpt_agent.persistence_manager.recall_memory.delete(filters={"id": deleted_message.id})
 
                 elif user_input.lower() == "/rethink" or user_input.lower().startswith("/rethink "):
                     if len(user_input) < len("/rethink "):
@@ -245,6 +249,7 @@ def run_agent_loop(
                         if msg_obj.role == "assistant":
                             clean_new_text = user_input[len("/rethink ") :].strip()
                             msg_obj.text = clean_new_text
+                            memgpt_agent.token_ledger.recount([msg_obj])
                             # To persist to the database, all we need to do is "re-insert" into recall memory
                             memgpt_agent.persistence_manager.recall_memory.storage.update(record=msg_obj)
                             break
@@ -279,6 +284,7 @@ def run_agent_loop(
                                 args_json["message"] = text
                                 new_args_string = json_dumps(args_json)
                                 message_obj.tool_calls[0].function["arguments"] = new_args_string
+                                memgpt_agent.token_ledger.recount([message_obj])
 
                                 # To persist to the database, all we need to do is "re-insert" into recall memory
                                 memgpt_agent.persistence_manager.recall_memory.storage.update(record=message_obj)
@@ -1,7 +1,10 @@
 import datetime
+import time
 import uuid
 from abc import ABC, abstractmethod
-from typing import List, Optional, Tuple, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
 
 from memgpt.constants import MESSAGE_SUMMARY_REQUEST_ACK, MESSAGE_SUMMARY_WARNING_FRAC
 from memgpt.embeddings import embedding_model, parse_and_chunk_text, query_embedding
@@ -11,7 +14,9 @@ from memgpt.schemas.agent import AgentState
 from memgpt.schemas.memory import Memory
 from memgpt.schemas.message import Message
 from memgpt.schemas.passage import Passage
+from memgpt.settings import settings
 from memgpt.utils import (
+    LRUCache,
     count_tokens,
     extract_date_from_timestamp,
     get_local_time,
@@ -284,6 +289,39 @@ def summarize_messages(
     return reply
 
 
+class RecordCount:
+    """Running count of the records in a storage connector, so reading it (on every system message rebuild) doesn't query the database
+
+    Counted in the database on first read, after a change of unknown size, and at most every `reconcile_interval` seconds.
+    """
+
+    def __init__(self, count: Callable[[], int], reconcile_interval: Optional[float] = None):
+        self.count = count
+        self.reconcile_interval = reconcile_interval
+        self._value = None
+        self._counted_at = None
+
+    def get(self) -> int:
+        if self._value is None or (self.reconcile_interval and time.monotonic() - self._counted_at > self.reconcile_interval):
+            self._value = self.count()
+            self._counted_at = time.monotonic()
+        return self._value
+
+    def add(self, n: int):
+        if self._value is not None:
+            self._value += n
+
+    def remove(self, n: Optional[int]):
+        """Record a delete (n=None if the number of deleted records is unknown)"""
+        if n is None:
+            self.invalidate()
+        elif self._value is not None:
+            self._value = max(self._value - n, 0)
+
+    def invalidate(self):
+        self._value = None
+
+
 class ArchivalMemory(ABC):
     @abstractmethod
     def insert(self, memory_string: str):
@@ -439,18 +477,28 @@ class BaseRecallMemory(RecallMemory):
         # If true, the pool of messages that can be queried are the automated summaries only
         # (generated when the conversation window needs to be shortened)
         self.restrict_search_to_summaries = restrict_search_to_summaries
-        from memgpt.agent_store.storage import StorageConnector
 
         self.agent_state = agent_state
-
-        # create embedding model
-        self.embed_model = embedding_model(agent_state.embedding_config)
         self.embedding_chunk_size = agent_state.embedding_config.embedding_chunk_size
 
-        # create storage backend
-        self.storage = StorageConnector.get_recall_storage_connector(user_id=agent_state.user_id, agent_id=agent_state.id)
-        # TODO: have some mechanism for cleanup otherwise will lead to OOM
-        self.cache = {}
+        # embedding model and storage backend are created on first use
+        self._embed_model = None
+        self._storage = None
+        self._size = RecordCount(lambda: self.storage.size(), reconcile_interval=settings.memory_size_reconcile_interval)
+
+    @property
+    def embed_model(self):
+        if self._embed_model is None:
+            self._embed_model = embedding_model(self.agent_state.embedding_config)
+        return self._embed_model
+
+    @property
+    def storage(self):
+        from memgpt.agent_store.storage import StorageConnector
+
+        if self._storage is None:
+            self._storage = StorageConnector.get_recall_storage_connector(user_id=self.agent_state.user_id, agent_id=self.agent_state.id)
+        return self._storage
 
     def get_all(self, start=0, count=None):
         results = self.storage.get_all(start, count)
@@ -467,12 +515,17 @@ class BaseRecallMemory(RecallMemory):
         results_json = [message.to_openai_dict_search_results() for message in results]
         return results_json, len(results)
 
+    def size_by_role(self) -> Dict[str, int]:
+        """Number of messages per role (one GROUP BY query)"""
+        return self.storage.size_by("role")
+
     def __repr__(self) -> str:
-        total = self.storage.size()
-        system_count = self.storage.size(filters={"role": "system"})
-        user_count = self.storage.size(filters={"role": "user"})
-        assistant_count = self.storage.size(filters={"role": "assistant"})
-        function_count = self.storage.size(filters={"role": "function"})
+        counts = self.size_by_role()
+        total = sum(counts.values())
+        system_count = counts.get("system", 0)
+        user_count = counts.get("user", 0)
+        assistant_count = counts.get("assistant", 0)
+        function_count = counts.get("function", 0)
         other_count = total - (system_count + user_count + assistant_count + function_count)
 
         memory_str = (
@@ -488,15 +541,21 @@ class BaseRecallMemory(RecallMemory):
 
     def insert(self, message: Message):
         self.storage.insert(message)
+        self._size.add(1)
 
     def insert_many(self, messages: List[Message]):
         self.storage.insert_many(messages)
+        self._size.add(len(messages))
+
+    def delete(self, filters: Optional[Dict] = {}):
+        self._size.remove(self.storage.delete(filters=filters))
 
     def save(self):
-        self.storage.save()
+        if self._storage is not None:
+            self._storage.save()
 
     def __len__(self):
-        return self.storage.size()
+        return self._size.get()
 
 
 class EmbeddingArchivalMemory(ArchivalMemory):
@@ -508,20 +567,87 @@ class EmbeddingArchivalMemory(ArchivalMemory):
         :param archival_memory_database: name of dataset to pre-fill archival with
         :type archival_memory_database: str
         """
-        from memgpt.agent_store.storage import StorageConnector
-
         self.top_k = top_k
         self.agent_state = agent_state
-
-        # create embedding model
-        self.embed_model = embedding_model(agent_state.embedding_config)
         self.embedding_chunk_size = agent_state.embedding_config.embedding_chunk_size
         assert self.embedding_chunk_size, f"Must set {agent_state.embedding_config.embedding_chunk_size}"
 
-        # create storage backend
-        self.storage = StorageConnector.get_archival_storage_connector(user_id=agent_state.user_id, agent_id=agent_state.id)
-        # TODO: have some mechanism for cleanup otherwise will lead to OOM
-        self.cache = {}
+        # embedding model and storage backend are created on first use (many turns never touch archival memory)
+        self._embed_model = None
+        self._storage = None
+        self._size = RecordCount(lambda: self.storage.size(), reconcile_interval=settings.memory_size_reconcile_interval)
+        # search results for recent queries (so paging through results doesn't re-run the search)
+        self.cache = LRUCache(max_size=32)
+
+        # attached data sources are searched in place inside the shared passages table (not copied into archival memory)
+        self.attached_source_ids: List[str] = []
+        self._source_storage = None
+
+    @property
+    def embed_model(self):
+        if self._embed_model is None:
+            self._embed_model = embedding_model(self.agent_state.embedding_config)
+        return self._embed_model
+
+    @property
+    def storage(self):
+        from memgpt.agent_store.storage import StorageConnector
+
+        if self._storage is None:
+            self._storage = StorageConnector.get_archival_storage_connector(user_id=self.agent_state.user_id, agent_id=self.agent_state.id)
+        return self._storage
+
+    @property
+    def source_storage(self):
+        """Connector to the shared passages table, created on first use"""
+        from memgpt.agent_store.storage import StorageConnector, TableType
+        from memgpt.config import MemGPTConfig
+
+        if self._source_storage is None:
+            self._source_storage = StorageConnector.get_storage_connector(
+                TableType.PASSAGES, MemGPTConfig.load_cached(), user_id=self.agent_state.user_id
+            )
+        return self._source_storage
+
+    def set_attached_sources(self, source_ids: List[str]):
+        """Set the data sources whose passages are included in search results"""
+        self.attached_source_ids = list(source_ids)
+        self.cache.clear()
+
+    def attach_source(self, source_id: str):
+        if source_id not in self.attached_source_ids:
+            self.attached_source_ids.append(source_id)
+            self.cache.clear()
+
+    def detach_source(self, source_id: str):
+        if source_id in self.attached_source_ids:
+            self.attached_source_ids.remove(source_id)
+            self.cache.clear()
+
+    def _query(self, query_string: str, query_vec: List[float]) -> List[Passage]:
+        """Query the agent's own passages plus the passages of every attached source, merged by distance"""
+        results = self.storage.query(query_string, query_vec, top_k=self.top_k)
+        if not self.attached_source_ids:
+            return results
+
+        for source_id in self.attached_source_ids:
+            results += self.source_storage.query(query_string, query_vec, top_k=self.top_k, filters={"source_id": source_id})
+
+        query_arr = np.asarray(query_vec, dtype=np.float32)
+
+        def distance(passage: Passage) -> float:
+            if passage.embedding is None:
+                return float("inf")
+            return float(np.linalg.norm(np.asarray(passage.embedding, dtype=np.float32) - query_arr))
+
+        # agents that attached a source before sources were shared hold copies of its passages (with the same IDs)
+        merged, seen_ids = [], set()
+        for passage in sorted(results, key=distance):
+            if passage.id in seen_ids:
+                continue
+            seen_ids.add(passage.id)
+            merged.append(passage)
+        return merged[: self.top_k]
 
     def create_passage(self, text, embedding):
         return Passage(
@@ -534,7 +660,8 @@ class EmbeddingArchivalMemory(ArchivalMemory):
 
     def save(self):
         """Save the index to disk"""
-        self.storage.save()
+        if self._storage is not None:
+            self._storage.save()
 
     def insert(self, memory_string, return_ids=False) -> Union[bool, List[uuid.UUID]]:
         """Embed and save memory string"""
@@ -545,9 +672,9 @@ class EmbeddingArchivalMemory(ArchivalMemory):
         try:
             passages = []
 
-            # breakup string into passages
-            for text in parse_and_chunk_text(memory_string, self.embedding_chunk_size):
-                embedding = self.embed_model.get_text_embedding(text)
+            # breakup string into passages, and embed them in batches
+            texts = parse_and_chunk_text(memory_string, self.embedding_chunk_size)
+            for text, embedding in zip(texts, self.embed_model.get_text_embeddings(texts)):
                 # fixing weird bug where type returned isn't a list, but instead is an object
                 # eg: embedding={'object': 'list', 'data': [{'object': 'embedding', 'embedding': [-0.0071973633, -0.07893023,
                 if isinstance(embedding, dict):
@@ -565,6 +692,8 @@ class EmbeddingArchivalMemory(ArchivalMemory):
 
             # insert passages
             self.storage.insert_many(passages)
+            self._size.add(len(passages))
+            self.cache.clear()
 
             if return_ids:
                 return ids
@@ -581,16 +710,18 @@ class EmbeddingArchivalMemory(ArchivalMemory):
             return TypeError("query must be a string")
 
         try:
-            if query_string not in self.cache:
+            all_results = self.cache.get(query_string)
+            if all_results is None:
                 # self.cache[query_string] = self.retriever.retrieve(query_string)
                 query_vec = query_embedding(self.embed_model, query_string)
-                self.cache[query_string] = self.storage.query(query_string, query_vec, top_k=self.top_k)
+                all_results = self._query(query_string, query_vec)
+                self.cache.put(query_string, all_results)
 
             start = int(start if start else 0)
             count = int(count if count else self.top_k)
-            end = min(count + start, len(self.cache[query_string]))
+            end = min(count + start, len(all_results))
 
-            results = self.cache[query_string][start:end]
+            results = all_results[start:end]
             results = [{"timestamp": get_local_time(), "content": node.text} for node in results]
             return results, len(results)
         except Exception as e:
@@ -603,7 +734,11 @@ class EmbeddingArchivalMemory(ArchivalMemory):
         for passage in list(self.storage.get_all(limit=limit)):  # TODO: only get first 10
             passages.append(str(passage.text))
         memory_str = "\n".join(passages)
-        return f"\n### ARCHIVAL MEMORY ###" + f"\n{memory_str}" + f"\nSize: {self.storage.size()}"
+        return f"\n### ARCHIVAL MEMORY ###" + f"\n{memory_str}" + f"\nSize: {len(self)}"
+
+    def delete(self, filters: Optional[Dict] = {}):
+        self._size.remove(self.storage.delete(filters=filters))
+        self.cache.clear()
 
     def __len__(self):
-        return self.storage.size()
+        return self._size.get()
@@ -3,7 +3,9 @@
 import os
 import secrets
 import traceback
-from typing import List, Optional
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
 
 from sqlalchemy import (
     BIGINT,
@@ -14,16 +16,19 @@ from sqlalchemy import (
     Index,
     String,
     TypeDecorator,
-    create_engine,
     desc,
     func,
+    inspect,
+    or_,
+    text,
 )
 from sqlalchemy.exc import InterfaceError, OperationalError
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.sql import func
 
+from memgpt.agent_store.engines import get_engine, run_once
 from memgpt.config import MemGPTConfig
-from memgpt.schemas.agent import AgentState
+from memgpt.schemas.agent import AgentState, AgentSummary
 from memgpt.schemas.api_key import APIKey
 from memgpt.schemas.block import Block, Human, Persona
 from memgpt.schemas.embedding_config import EmbeddingConfig
@@ -162,6 +167,9 @@ class AgentModel(Base):
     # tools
     tools = Column(JSON)
 
+    # time of the latest in-context message, kept up to date when the agent is saved after a step (for listings)
+    last_run = Column(DateTime(timezone=True))
+
     Index(__tablename__ + "_idx_user", user_id),
 
     def __repr__(self) -> str:
@@ -336,6 +344,32 @@ class JobModel(Base):
         )
 
 
+def add_missing_columns(engine, table):
+    """Add the (nullable) columns added to a model since its table was created"""
+    existing = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    with engine.begin() as conn:
+        for column in table.columns:
+            if column.name not in existing:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"))
+
+
+def create_metadata_tables(engine):
+    Base.metadata.create_all(
+        engine,
+        tables=[
+            UserModel.__table__,
+            AgentModel.__table__,
+            SourceModel.__table__,
+            AgentSourceMappingModel.__table__,
+            APIKeyModel.__table__,
+            BlockModel.__table__,
+            ToolModel.__table__,
+            JobModel.__table__,
+        ],
+    )
+    add_missing_columns(engine, AgentModel.__table__)
+
+
 class MetadataStore:
     uri: Optional[str] = None
 
@@ -354,22 +388,10 @@ class MetadataStore:
         # Ensure valid URI
         assert self.uri, "Database URI is not provided or is invalid."
 
-        # Check if tables need to be created
-        self.engine = create_engine(self.uri)
+        # Check if tables need to be created (the engine and its connection pool are shared with the storage connectors)
+        self.engine = get_engine(self.uri)
         try:
-            Base.metadata.create_all(
-                self.engine,
-                tables=[
-                    UserModel.__table__,
-                    AgentModel.__table__,
-                    SourceModel.__table__,
-                    AgentSourceMappingModel.__table__,
-                    APIKeyModel.__table__,
-                    BlockModel.__table__,
-                    ToolModel.__table__,
-                    JobModel.__table__,
-                ],
-            )
+            run_once(self.uri, "metadata_tables", create_metadata_tables)
         except (InterfaceError, OperationalError) as e:
             traceback.print_exc()
             if config.metadata_storage_type == "postgres":
@@ -444,7 +466,7 @@ class MetadataStore:
         with self.session_maker() as session:
             if session.query(AgentModel).filter(AgentModel.name == agent.name).filter(AgentModel.user_id == agent.user_id).count() > 0:
                 raise ValueError(f"Agent with name {agent.name} already exists")
-            fields = vars(agent)
+            fields = vars(agent).copy()
             fields["memory"] = agent.memory.to_dict()
             session.add(AgentModel(**fields))
             session.commit()
@@ -496,12 +518,55 @@ class MetadataStore:
     @enforce_types
     def update_agent(self, agent: AgentState):
         with self.session_maker() as session:
-            fields = vars(agent)
+            fields = vars(agent).copy()
             if isinstance(agent.memory, Memory):  # TODO: this is nasty but this whole class will soon be removed so whatever
                 fields["memory"] = agent.memory.to_dict()
             session.query(AgentModel).filter(AgentModel.id == agent.id).update(fields)
             session.commit()
 
+    def save_agent_changes(
+        self,
+        agent: AgentState,
+        fields: Optional[List[str]] = None,
+        blocks: Optional[List[Block]] = None,
+        new_block_ids: Optional[List[str]] = None,
+        last_run: Optional[datetime] = None,
+    ):
+        """Write an agent and its memory blocks in a single transaction
+
+        If fields is None the agent and all blocks are upserted, otherwise only the given agent fields are updated and
+        the given blocks are updated (or inserted if their id is in new_block_ids). last_run is written if provided.
+        """
+        blocks = blocks or []
+        with self.session_maker() as session:
+            for block in blocks:
+                if fields is None or (new_block_ids and block.id in new_block_ids):
+                    session.merge(BlockModel(**vars(block)))
+                else:
+                    session.query(BlockModel).filter(BlockModel.id == block.id).update(vars(block))
+
+            if fields is None:
+                agent_fields = vars(agent).copy()
+                agent_fields["memory"] = agent.memory.to_dict()
+                if last_run is not None:
+                    agent_fields["last_run"] = last_run
+                if session.get(AgentModel, agent.id) is not None:
+                    session.query(AgentModel).filter(AgentModel.id == agent.id).update(agent_fields)
+                elif (
+                    session.query(AgentModel).filter(AgentModel.name == agent.name).filter(AgentModel.user_id == agent.user_id).count() > 0
+                ):
+                    raise ValueError(f"Agent with name {agent.name} already exists")
+                else:
+                    session.add(AgentModel(**agent_fields))
+            elif fields or last_run is not None:
+                agent_fields = {name: getattr(agent, name) for name in fields}
+                if "memory" in agent_fields:
+                    agent_fields["memory"] = agent.memory.to_dict()
+                if last_run is not None:
+                    agent_fields["last_run"] = last_run
+                session.query(AgentModel).filter(AgentModel.id == agent.id).update(agent_fields)
+            session.commit()
+
     @enforce_types
     def update_user(self, user: User):
         with self.session_maker() as session:
@@ -604,6 +669,65 @@ class MetadataStore:
             results = session.query(AgentModel).filter(AgentModel.user_id == user_id).all()
             return [r.to_record() for r in results]
 
+    def list_agent_summaries(self, user_id: Optional[str] = None) -> List[AgentSummary]:
+        """Summaries of the user's agents (of all agents if user_id is None), without their memory sizes
+
+        Reads only the agent columns listings need, and the tools and attached sources of all the agents at once.
+        """
+        with self.session_maker() as session:
+            query = session.query(
+                AgentModel.id,
+                AgentModel.user_id,
+                AgentModel.name,
+                AgentModel.description,
+                AgentModel.created_at,
+                AgentModel.last_run,
+                AgentModel.metadata_,
+                AgentModel.memory,
+                AgentModel.tools,
+            )
+            if user_id:
+                query = query.filter(AgentModel.user_id == user_id)
+            agents = query.all()
+
+            sources = defaultdict(list)
+            sources_query = session.query(AgentSourceMappingModel.agent_id, SourceModel).join(
+                SourceModel, SourceModel.id == AgentSourceMappingModel.source_id
+            )
+            if user_id:
+                sources_query = sources_query.filter(AgentSourceMappingModel.user_id == user_id)
+            for agent_id, source in sources_query.all():
+                sources[agent_id].append(source.to_record())
+
+            # global tools, and the agent owners' own tools (as in get_tool)
+            tool_names = {tool_name for agent in agents for tool_name in agent.tools or []}
+            tools_query = session.query(ToolModel).filter(ToolModel.name.in_(tool_names))
+            if user_id:
+                tools_query = tools_query.filter(or_(ToolModel.user_id == None, ToolModel.user_id == user_id))
+            tools = {(tool.user_id, tool.name): tool.to_record() for tool in tools_query.all()}
+
+        summaries = []
+        for agent in agents:
+            metadata = agent.metadata_ or {}
+            agent_tools = [tools.get((agent.user_id, name)) or tools.get((None, name)) for name in agent.tools or []]
+            summaries.append(
+                AgentSummary(
+                    id=agent.id,
+                    user_id=agent.user_id,
+                    name=agent.name,
+                    description=agent.description,
+                    created_at=agent.created_at,
+                    # agents that haven't been saved after a step since the column was added
+                    last_run=agent.last_run or agent.created_at,
+                    human=metadata.get("human"),
+                    persona=metadata.get("persona"),
+                    core_memory={label: block.get("value") for label, block in (agent.memory or {}).items() if block is not None},
+                    tools=[tool for tool in agent_tools if tool is not None],
+                    sources=sources[agent.id],
+                )
+            )
+        return summaries
+
     @enforce_types
     def list_sources(self, user_id: str) -> List[Source]:
         with self.session_maker() as session:
@@ -682,6 +806,20 @@ class MetadataStore:
             assert len(results) == 1, f"Expected 1 result, got {len(results)}"
             return results[0].to_record()
 
+    def get_tools_by_name(self, tool_names: List[str], user_id: Optional[str] = None) -> Dict[str, Tool]:
+        """Get several tools by name in one query (global tools, plus the user's own tools if user_id is provided)"""
+        with self.session_maker() as session:
+            query = session.query(ToolModel).filter(ToolModel.name.in_(tool_names))
+            if user_id:
+                query = query.filter(or_(ToolModel.user_id == None, ToolModel.user_id == user_id))
+            else:
+                query = query.filter(ToolModel.user_id == None)
+            tools = {}
+            for result in query.all():
+                assert result.name not in tools, f"Expected 1 tool named {result.name}, got more"
+                tools[result.name] = result.to_record()
+            return tools
+
     @enforce_types
     def get_block(self, block_id: str) -> Optional[Block]:
         with self.session_maker() as session:
@@ -794,15 +932,26 @@ class MetadataStore:
             results = session.query(JobModel).filter(JobModel.user_id == user_id).all()
             return [r.to_record() for r in results]
 
+    def list_jobs_by_status(self, statuses: List[JobStatus]) -> List[Job]:
+        """Jobs of all users with one of the given statuses, oldest first"""
+        with self.session_maker() as session:
+            results = (
+                session.query(JobModel)
+                .filter(JobModel.status.in_([status.value for status in statuses]))
+                .order_by(JobModel.created_at)
+                .all()
+            )
+            return [r.to_record() for r in results]
+
     def update_job(self, job: Job) -> Job:
         with self.session_maker() as session:
             session.query(JobModel).filter(JobModel.id == job.id).update(vars(job))
             session.commit()
-        return Job
+        return job
 
     def update_job_status(self, job_id: str, status: JobStatus):
         with self.session_maker() as session:
             session.query(JobModel).filter(JobModel.id == job_id).update({"status": status})
-            if status == JobStatus.COMPLETED:
+            if status == JobStatus.completed:
                 session.query(JobModel).filter(JobModel.id == job_id).update({"completed_at": get_utc_time()})
             session.commit()
@@ -2,12 +2,14 @@ import uuid
 from datetime import datetime
 from typing import Dict, List, Optional
 
-from pydantic import Field, field_validator
+from pydantic import BaseModel, Field, field_validator
 
 from memgpt.schemas.embedding_config import EmbeddingConfig
 from memgpt.schemas.llm_config import LLMConfig
 from memgpt.schemas.memgpt_base import MemGPTBase
 from memgpt.schemas.memory import Memory
+from memgpt.schemas.source import Source
+from memgpt.schemas.tool import Tool
 
 
 class BaseAgent(MemGPTBase, validate_assignment=True):
@@ -88,3 +90,21 @@ class UpdateAgentState(BaseAgent):
     # TODO: determine if these should be editable via this schema?
     message_ids: Optional[List[str]] = Field(None, description="The ids of the messages in the agent's in-context memory.")
     memory: Optional[Memory] = Field(None, description="The in-context memory of the agent.")
+
+
+class AgentSummary(BaseModel):
+    """What agent listings show about an agent (read from the database without loading the agent)"""
+
+    id: str = Field(..., description="The id of the agent.")
+    user_id: str = Field(..., description="The user id of the agent.")
+    name: str = Field(..., description="The name of the agent.")
+    description: Optional[str] = Field(None, description="The description of the agent.")
+    created_at: datetime = Field(..., description="The datetime the agent was created.")
+    last_run: datetime = Field(..., description="The datetime of the agent's latest in-context message.")
+    human: Optional[str] = Field(None, description="The name of the human the agent was created with.")
+    persona: Optional[str] = Field(None, description="The name of the persona the agent was created with.")
+    core_memory: Dict[str, Optional[str]] = Field(..., description="The value of each block of the agent's in-context memory.")
+    recall_memory_size: Optional[int] = Field(None, description="Number of messages in recall memory.")
+    archival_memory_size: Optional[int] = Field(None, description="Number of passages in archival memory.")
+    tools: List[Tool] = Field(..., description="The tools used by the agent.")
+    sources: List[Source] = Field(..., description="The sources attached to the agent.")
@@ -23,6 +23,7 @@ class JobStatus(str, Enum):
     completed = "completed"
     failed = "failed"
     pending = "pending"
+    cancelled = "cancelled"
 
 
 class MessageStreamStatus(str, Enum):
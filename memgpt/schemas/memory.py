@@ -138,5 +138,13 @@ class RecallMemorySummary(BaseModel):
     size: int = Field(..., description="Number of rows in recall memory")
 
 
+class ContextWindowSummary(BaseModel):
+    num_tokens: int = Field(..., description="Number of tokens in the context window (messages + functions)")
+    context_window: Optional[int] = Field(None, description="Maximum number of tokens the LLM accepts")
+    message_tokens: int = Field(..., description="Number of tokens used by the in-context messages")
+    function_tokens: int = Field(..., description="Number of tokens used by the function schemas")
+    num_messages: int = Field(..., description="Number of in-context messages")
+
+
 class CreateArchivalMemory(BaseModel):
     text: str = Field(..., description="Text to write to archival memory.")
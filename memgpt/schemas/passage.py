@@ -1,12 +1,21 @@
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Annotated, Dict, List, Optional
 
-from pydantic import Field, field_validator
+import numpy as np
+from pydantic import Field, PlainSerializer, PlainValidator, WithJsonSchema
 
-from memgpt.constants import MAX_EMBEDDING_DIM
 from memgpt.schemas.embedding_config import EmbeddingConfig
 from memgpt.schemas.memgpt_base import MemGPTBase
-from memgpt.utils import get_utc_time
+from memgpt.utils import get_utc_time, pad_embedding
+
+# Embeddings are held as float32 arrays zero-padded to MAX_EMBEDDING_DIM (so all stored embeddings are the same size),
+# and only turned into lists of floats when dumped (the storage connectors read the attributes, not the dump)
+EmbeddingVector = Annotated[
+    np.ndarray,
+    PlainValidator(pad_embedding),
+    PlainSerializer(lambda embedding: embedding.tolist(), return_type=List[float]),
+    WithJsonSchema({"type": "array", "items": {"type": "number"}}),
+]
 
 
 class PassageBase(MemGPTBase):
@@ -31,22 +40,22 @@ class Passage(PassageBase):
     text: str = Field(..., description="The text of the passage.")
 
     # embeddings
-    embedding: Optional[List[float]] = Field(..., description="The embedding of the passage.")
+    embedding: Optional[EmbeddingVector] = Field(..., description="The embedding of the passage.")
     embedding_config: Optional[EmbeddingConfig] = Field(..., description="The embedding configuration used by the passage.")
 
     created_at: datetime = Field(default_factory=get_utc_time, description="The creation date of the passage.")
 
-    @field_validator("embedding")
-    @classmethod
-    def pad_embeddings(cls, embedding: List[float]) -> List[float]:
-        """Pad embeddings to MAX_EMBEDDING_SIZE. This is necessary to ensure all stored embeddings are the same size."""
-        import numpy as np
-
-        if embedding and len(embedding) != MAX_EMBEDDING_DIM:
-            np_embedding = np.array(embedding)
-            padded_embedding = np.pad(np_embedding, (0, MAX_EMBEDDING_DIM - np_embedding.shape[0]), mode="constant")
-            return padded_embedding.tolist()
-        return embedding
+    def __eq__(self, other) -> bool:
+        # arrays compare elementwise, so the embeddings are compared apart from the other fields
+        if type(self) is not type(other):
+            return NotImplemented
+        if (self.embedding is None) != (other.embedding is None):
+            return False
+        if self.embedding is not None and not np.array_equal(self.embedding, other.embedding):
+            return False
+        fields = {k: v for k, v in self.__dict__.items() if k != "embedding"}
+        other_fields = {k: v for k, v in other.__dict__.items() if k != "embedding"}
+        return fields == other_fields
 
 
 class PassageCreate(PassageBase):
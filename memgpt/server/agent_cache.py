@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from memgpt.agent import Agent
+
+
+def get_process_rss() -> Optional[int]:
+    """Resident set size of the current process in bytes (None if it can't be determined)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+
+        # peak RSS, in kilobytes on linux and bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if os.uname().sysname == "Darwin" else maxrss * 1024
+    except Exception:
+        return None
+
+
+class AgentCache:
+    """In-memory store of loaded agents, keyed by (user_id, agent_id)
+
+    Once more than max_size agents are loaded the least recently used one is evicted, and agents that have not been
+    used for idle_ttl seconds are evicted on the next access. Evicted agents are passed to on_evict (e.g. to be saved).
+
+    try_lock is called before evicting an agent and should lock it without waiting, returning False if the agent is busy
+    (e.g. in the middle of a step). Busy agents stay loaded (the cache can go over max_size until they are done), and
+    on_evict is called with the agent locked and is responsible for unlocking it.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        idle_ttl: Optional[float] = None,
+        on_evict: Optional[Callable[[Agent], None]] = None,
+        try_lock: Optional[Callable[[Agent], bool]] = None,
+    ):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl if idle_ttl and idle_ttl > 0 else None
+        self.on_evict = on_evict
+        self.try_lock = try_lock
+
+        # (user_id, agent_id) -> (agent, last used time), ordered from least to most recently used
+        self._agents: "OrderedDict[Tuple[str, str], Tuple[Agent, float]]" = OrderedDict()
+        self._keys_by_agent_id: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str, agent_id: str) -> Optional[Agent]:
+        key = (str(user_id), str(agent_id))
+        self.evict_idle()
+        with self._lock:
+            entry = self._agents.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._agents[key] = (entry[0], time.monotonic())
+            self._agents.move_to_end(key)
+            return entry[0]
+
+    def find(self, agent_id: str) -> Optional[Agent]:
+        """Get a loaded agent without knowing its user (counts as a use of the agent, but not as a cache lookup)"""
+        self.evict_idle()
+        with self._lock:
+            key = self._keys_by_agent_id.get(str(agent_id))
+            if key is None:
+                return None
+            agent = self._agents[key][0]
+            self._agents[key] = (agent, time.monotonic())
+            self._agents.move_to_end(key)
+            return agent
+
+    def put(self, user_id: str, agent_id: str, agent: Agent) -> bool:
+        """Add an agent (returns False if it was already loaded)"""
+        key = (str(user_id), str(agent_id))
+        evicted = []
+        with self._lock:
+            if key in self._agents:
+                return False
+            self._agents[key] = (agent, time.monotonic())
+            self._keys_by_agent_id[key[1]] = key
+            # from the least recently used, skipping busy agents (and the agent just added)
+            for candidate_key in list(self._agents)[:-1]:
+                if len(self._agents) <= self.max_size:
+                    break
+                candidate = self._agents[candidate_key][0]
+                if self.try_lock is not None and not self.try_lock(candidate):
+                    continue
+                del self._agents[candidate_key]
+                del self._keys_by_agent_id[candidate_key[1]]
+                evicted.append(candidate)
+        self._evict(evicted)
+        return True
+
+    def remove(self, agent_id: str) -> Optional[Agent]:
+        """Drop an agent without evicting it (e.g. because it was deleted)"""
+        with self._lock:
+            key = self._keys_by_agent_id.pop(str(agent_id), None)
+            return self._agents.pop(key)[0] if key is not None else None
+
+    def evict_idle(self):
+        if self.idle_ttl is None:
+            return
+        now = time.monotonic()
+        cutoff = now - self.idle_ttl
+        evicted = []
+        with self._lock:
+            # entries are ordered by last use, so stop at the first one that is still fresh
+            while self._agents:
+                key, (agent, last_used) = next(iter(self._agents.items()))
+                if last_used > cutoff:
+                    break
+                if self.try_lock is not None and not self.try_lock(agent):
+                    # busy, so it is in use right now
+                    self._agents[key] = (agent, now)
+                    self._agents.move_to_end(key)
+                    continue
+                del self._agents[key]
+                del self._keys_by_agent_id[key[1]]
+                evicted.append(agent)
+        self._evict(evicted)
+
+    def _evict(self, agents: List[Agent]):
+        for agent in agents:
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(agent)
+
+    def agents(self) -> List[Agent]:
+        with self._lock:
+            return [agent for agent, _ in self._agents.values()]
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._agents),
+            "max_size": self.max_size,
+            "idle_ttl": self.idle_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "resident_messages": sum(len(agent._messages) for agent in self.agents()),
+            "process_rss_bytes": get_process_rss(),
+        }
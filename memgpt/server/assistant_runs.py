@@ -0,0 +1,112 @@
+import uuid
+from typing import TYPE_CHECKING, List, Optional, Set
+
+from memgpt.log import get_logger
+from memgpt.schemas.enums import JobStatus
+from memgpt.schemas.job import Job
+from memgpt.schemas.message import Message
+from memgpt.schemas.openai.chat_completion_response import UsageStatistics
+from memgpt.server.jobs import TERMINAL_JOB_STATUSES, JobWorker
+from memgpt.utils import get_utc_time
+
+if TYPE_CHECKING:
+    from memgpt.server.server import SyncServer
+
+logger = get_logger(__name__)
+
+# OpenAI Assistants API runs (metadata_["type"]), on the thread (agent) in metadata_["thread_id"]
+ASSISTANT_RUN_JOB_TYPE = "assistant_run"
+
+
+def step_record(messages: List[Message], usage: UsageStatistics) -> dict:
+    """What is kept of an agent step in the run's metadata_["steps"]"""
+    return {
+        "id": f"step-{uuid.uuid4()}",
+        "created_at": int(get_utc_time().timestamp()),
+        "message_ids": [message.id for message in messages],
+        "assistant_message_id": next((message.id for message in messages if message.role == "assistant"), None),
+        "tool_calls": [
+            {"id": tool_call.id, "name": tool_call.function.name, "arguments": tool_call.function.arguments}
+            for message in messages
+            for tool_call in message.tool_calls or []
+        ],
+        "usage": usage.model_dump(),
+    }
+
+
+class AssistantRunWorker(JobWorker):
+    """Steps the agents of OpenAI Assistants API runs in the background
+
+    A run is a job (pending while queued) with the thread and the run parameters in its metadata. The worker steps the
+    thread's agent on the messages already added to it, and appends a record of every step to metadata_["steps"] as it
+    completes, so polling the run shows its progress. A running run is cancelled between two steps.
+    """
+
+    job_type = ASSISTANT_RUN_JOB_TYPE
+    thread_name = "memgpt-assistant-run"
+
+    def __init__(self, server: "SyncServer", n_workers: int):
+        super().__init__(server, n_workers)
+        self._running: Set[str] = set()
+        self._cancel_requested: Set[str] = set()
+
+    def resume_job(self, job: Job):
+        if job.status == JobStatus.running:
+            # it may have taken steps already, so it isn't started over
+            self._finish(job, JobStatus.failed, error="The run was interrupted by a server restart")
+        else:
+            self.submit(job.id)
+
+    def cancel(self, job_id: str) -> Job:
+        """Cancel a queued run right away, or have a running one stop before its next step"""
+        with self._lock:
+            job = self.server.ms.get_job(job_id)
+            if job_id in self._running:
+                self._cancel_requested.add(job_id)
+            elif job.status not in TERMINAL_JOB_STATUSES:
+                self._finish(job, JobStatus.cancelled)
+        return job
+
+    def is_cancelling(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._cancel_requested
+
+    def run_job(self, job_id: str):
+        with self._lock:
+            job = self.server.ms.get_job(job_id)
+            if job is None or job.status in TERMINAL_JOB_STATUSES:
+                return
+            self._running.add(job_id)
+            job.status = JobStatus.running
+            job.metadata_["started_at"] = int(get_utc_time().timestamp())
+            self.server.ms.update_job(job)
+
+        stopped = False
+
+        def on_step(messages: List[Message], usage: UsageStatistics) -> bool:
+            nonlocal stopped
+            job.metadata_["steps"].append(step_record(messages, usage))
+            self.server.ms.update_job(job)
+            stopped = self.is_cancelling(job_id)
+            return not stopped
+
+        try:
+            # the thread's messages are already in the agent, so the run steps without a new input message
+            self.server._step(user_id=job.user_id, agent_id=job.metadata_["thread_id"], input_message=None, timestamp=None, on_step=on_step)
+        except Exception as e:
+            logger.error(f"Assistant run {job_id} failed: {e}")
+            self._finish(job, JobStatus.failed, error=str(e))
+        else:
+            self._finish(job, JobStatus.cancelled if stopped else JobStatus.completed)
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+                self._cancel_requested.discard(job_id)
+
+    def _finish(self, job: Job, status: JobStatus, error: Optional[str] = None):
+        job.status = status
+        job.completed_at = get_utc_time()
+        job.metadata_[f"{status.value}_at"] = int(job.completed_at.timestamp())
+        if error is not None:
+            job.metadata_["error"] = error
+        self.server.ms.update_job(job)
@@ -0,0 +1,177 @@
+import asyncio
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Union
+
+from memgpt.agent import save_agent
+from memgpt.log import get_logger
+from memgpt.schemas.message import Message
+from memgpt.schemas.openai.chat_completion_response import UsageStatistics
+from memgpt.schemas.usage import MemGPTUsageStatistics
+from memgpt.server.server import SyncServer
+from memgpt.settings import settings
+
+logger = get_logger(__name__)
+
+
+def _release_acquired_lock(acquiring: asyncio.Future):
+    if not acquiring.cancelled() and acquiring.exception() is None:
+        acquiring.result().release()
+
+
+class AsyncServer(SyncServer):
+    """Server whose agent steps run on the event loop
+
+    The SyncServer runs each request on a worker thread, which is held for the whole turn, LLM round trips included.
+    Here the LLM calls of a step are awaited on an async HTTP client (see Agent.astep), and only the blocking parts of a
+    step (building the prompt, running tools, reading and writing the database) go to a small thread pool. One event loop
+    can then drive many more concurrent turns than there are threads.
+
+    Everything other than sending messages (agent / user / source management, ...) is inherited from the SyncServer.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # runs the blocking parts of the steps, which are short compared to the LLM calls
+        self.step_executor = ThreadPoolExecutor(max_workers=settings.max_concurrent_steps, thread_name_prefix="memgpt-async-step")
+
+        # (created on first use, so they belong to the loop the server is used on)
+        self._turns: Optional[asyncio.Semaphore] = None
+        # per-agent turn locks, dropped once no turn is holding or waiting on them (so at most one turn of an agent waits on
+        # its step lock in the step pool)
+        self._agent_turn_locks: Dict[str, asyncio.Lock] = {}
+        self._agent_turn_lock_users: Dict[str, int] = {}
+        self.running_turns = 0
+
+    async def _run_blocking(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.step_executor, partial(func, *args, **kwargs))
+
+    async def user_message_async(
+        self,
+        user_id: str,
+        agent_id: str,
+        message: Union[str, Message],
+        timestamp: Optional[datetime] = None,
+    ) -> MemGPTUsageStatistics:
+        """Async version of user_message"""
+        packaged_user_message = await self._run_blocking(
+            self._package_user_message, user_id=user_id, agent_id=agent_id, message=message, timestamp=timestamp
+        )
+        return await self._step_async(user_id=user_id, agent_id=agent_id, input_message=packaged_user_message, timestamp=timestamp)
+
+    async def system_message_async(
+        self,
+        user_id: str,
+        agent_id: str,
+        message: Union[str, Message],
+        timestamp: Optional[datetime] = None,
+    ) -> MemGPTUsageStatistics:
+        """Async version of system_message"""
+        packaged_system_message = await self._run_blocking(
+            self._package_system_message, user_id=user_id, agent_id=agent_id, message=message, timestamp=timestamp
+        )
+        return await self._step_async(user_id=user_id, agent_id=agent_id, input_message=packaged_system_message, timestamp=timestamp)
+
+    async def _acquire_agent_step_lock_async(self, agent_id: str) -> threading.Lock:
+        """Take the agent's step lock (shared with the blocking steps and agent changes of the SyncServer), waiting in the step pool"""
+        acquiring = asyncio.get_running_loop().run_in_executor(self.step_executor, self._acquire_agent_step_lock, agent_id)
+        try:
+            return await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # the lock is still taken by the pool, hand it back once it is
+            acquiring.add_done_callback(_release_acquired_lock)
+            raise
+
+    async def _step_async(
+        self, user_id: str, agent_id: str, input_message: Union[str, Message], timestamp: Optional[datetime]
+    ) -> MemGPTUsageStatistics:
+        """Send the input message through the agent (turns of the same agent run one at a time)
+
+        The turn holds the agent's step lock, so it also excludes blocking steps (SyncServer._step) and changes of the agent
+        """
+        if self._turns is None:
+            self._turns = asyncio.Semaphore(settings.max_concurrent_async_steps)
+        lock = self._agent_turn_locks.setdefault(agent_id, asyncio.Lock())
+        self._agent_turn_lock_users[agent_id] = self._agent_turn_lock_users.get(agent_id, 0) + 1
+        try:
+            async with lock, self._turns:
+                step_lock = await self._acquire_agent_step_lock_async(agent_id)
+                self.running_turns += 1
+                try:
+                    return await self._run_step_async(user_id=user_id, agent_id=agent_id, input_message=input_message, timestamp=timestamp)
+                finally:
+                    self.running_turns -= 1
+                    step_lock.release()
+        finally:
+            self._agent_turn_lock_users[agent_id] -= 1
+            if self._agent_turn_lock_users[agent_id] == 0:
+                del self._agent_turn_lock_users[agent_id]
+                del self._agent_turn_locks[agent_id]
+
+    async def _run_step_async(
+        self, user_id: str, agent_id: str, input_message: Union[str, Message], timestamp: Optional[datetime]
+    ) -> MemGPTUsageStatistics:
+        logger.debug(f"Got input message: {input_message}")
+        memgpt_agent = None
+        try:
+            # Get the agent object (loaded in memory)
+            memgpt_agent = await self._run_blocking(self._get_or_load_agent, agent_id=agent_id)
+            if memgpt_agent is None:
+                raise KeyError(f"Agent (user={user_id}, agent={agent_id}) is not loaded")
+
+            # Determine whether or not to token stream based on the capability of the interface
+            token_streaming = memgpt_agent.interface.streaming_mode if hasattr(memgpt_agent.interface, "streaming_mode") else False
+
+            logger.debug(f"Starting agent step")
+            next_input_message = input_message
+            counter = 0
+            total_usage = UsageStatistics()
+            step_count = 0
+            while True:
+                new_messages, heartbeat_request, function_failed, token_warning, usage = await memgpt_agent.astep(
+                    next_input_message,
+                    first_message=False,
+                    skip_verify=True,
+                    return_dicts=False,
+                    stream=token_streaming,
+                    timestamp=timestamp,
+                    ms=self.ms,
+                    executor=self.step_executor,
+                )
+                step_count += 1
+                total_usage += usage
+                counter += 1
+                memgpt_agent.interface.step_complete()
+
+                # save updated state (with write-behind enabled, saves are coalesced and flushed when the request ends)
+                if not settings.agent_write_behind:
+                    logger.debug("Saving agent state")
+                    await self._run_blocking(save_agent, memgpt_agent, self.ms)
+
+                next_input_message = self._next_chained_input(counter, token_warning, function_failed, heartbeat_request)
+                if next_input_message is None:
+                    break
+
+        except Exception as e:
+            logger.error(f"Error in server._step_async: {e}")
+            print(traceback.print_exc())
+            raise
+        finally:
+            if memgpt_agent is not None:
+                if settings.agent_write_behind:
+                    logger.debug("Flushing agent state")
+                    await self._run_blocking(save_agent, memgpt_agent, self.ms)
+                logger.debug("Calling step_yield()")
+                memgpt_agent.interface.step_yield()
+
+        return MemGPTUsageStatistics(**total_usage.dict(), step_count=step_count)
+
+    def get_metrics(self) -> dict:
+        """SyncServer metrics, plus the turns running on the event loop"""
+        metrics = super().get_metrics()
+        metrics["async_steps"] = {"max_concurrent": settings.max_concurrent_async_steps, "running": self.running_turns}
+        return metrics
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class IdentityCache:
+    """Short-lived cache of the lookups that authenticate a request and check its user / agent exist
+
+    Holds API key -> user ID, existing user IDs and existing (user ID, agent ID) pairs. Only lookups that found
+    something are cached (anything created is seen right away), entries expire after ttl seconds, and the entries of a
+    deleted API key, user or agent are dropped by the server when it deletes them. Other processes sharing the database
+    can see a deletion up to ttl seconds late.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+
+        # ("api_key", key) -> user_id, ("user", user_id) -> user_id, ("agent", user_id, agent_id) -> user_id
+        # each with its expiry time, ordered from least to most recently used
+        self._entries: "OrderedDict[Tuple[str, ...], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    def _get(self, key: Tuple[str, ...]) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _put(self, key: Tuple[str, ...], user_id: str):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (user_id, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_user_id(self, api_key: str) -> Optional[str]:
+        return self._get(("api_key", api_key))
+
+    def put_api_key(self, api_key: str, user_id: str):
+        self._put(("api_key", api_key), str(user_id))
+
+    def has_user(self, user_id: str) -> bool:
+        return self._get(("user", str(user_id))) is not None
+
+    def put_user(self, user_id: str):
+        self._put(("user", str(user_id)), str(user_id))
+
+    def has_agent(self, user_id: str, agent_id: str) -> bool:
+        return self._get(("agent", str(user_id), str(agent_id))) is not None
+
+    def put_agent(self, user_id: str, agent_id: str):
+        self._put(("agent", str(user_id), str(agent_id)), str(user_id))
+
+    def invalidate_api_key(self, api_key: str):
+        with self._lock:
+            self._entries.pop(("api_key", api_key), None)
+
+    def invalidate_user(self, user_id: str):
+        """Drop the user along with its API keys and agents"""
+        with self._lock:
+            for key in [key for key, (owner, _) in self._entries.items() if owner == str(user_id)]:
+                del self._entries[key]
+
+    def invalidate_agent(self, agent_id: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == "agent" and key[2] == str(agent_id)]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
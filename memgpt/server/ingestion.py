@@ -0,0 +1,39 @@
+import os
+import shutil
+
+from memgpt.log import get_logger
+from memgpt.schemas.job import Job
+from memgpt.server.jobs import TERMINAL_JOB_STATUSES, JobWorker
+
+logger = get_logger(__name__)
+
+# jobs the worker runs (metadata_["type"]), with the uploaded file in metadata_["file_path"]
+INGESTION_JOB_TYPE = "embedding"
+
+
+class IngestionWorker(JobWorker):
+    """Loads uploaded files into sources in the background
+
+    A job is created (pending) with the path of the uploaded file in its metadata, and the worker threads pick it up.
+    While a job runs its progress counters are saved to job.metadata_, which is also the checkpoint: unfinished jobs
+    are picked up again by resume() (e.g. on server start), and skip the documents that were already stored.
+    """
+
+    job_type = INGESTION_JOB_TYPE
+    thread_name = "memgpt-ingestion"
+
+    def resume_job(self, job: Job):
+        if job.metadata_.get("file_path"):
+            logger.info(f"Resuming ingestion job {job.id} ({job.metadata_.get('num_documents', 0)} documents already loaded)")
+            self.submit(job.id)
+
+    def run_job(self, job_id: str):
+        job = self.server.ms.get_job(job_id)
+        if job is None or job.status in TERMINAL_JOB_STATUSES:
+            return
+        file_path = job.metadata_["file_path"]
+        job = self.server.load_file_to_source(source_id=job.metadata_["source_id"], file_path=file_path, job_id=job_id)
+
+        # the upload is only kept to resume the job
+        if job.status in TERMINAL_JOB_STATUSES:
+            shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
@@ -0,0 +1,79 @@
+import queue
+import threading
+from typing import TYPE_CHECKING, List, Set
+
+from memgpt.log import get_logger
+from memgpt.schemas.enums import JobStatus
+from memgpt.schemas.job import Job
+
+if TYPE_CHECKING:
+    from memgpt.server.server import SyncServer
+
+logger = get_logger(__name__)
+
+# job statuses after which a job is never run again
+TERMINAL_JOB_STATUSES = (JobStatus.completed, JobStatus.failed, JobStatus.cancelled)
+
+
+class JobWorker:
+    """Runs one type of job in the background on a fixed number of threads
+
+    The jobs table is the queue: a job is created with metadata_["type"] set to job_type and submitted by ID, and the
+    worker threads pick it up. Jobs of that type that were still unfinished when the server last stopped are handed to
+    resume_job() by resume() (e.g. on server start).
+    """
+
+    job_type: str = None
+    thread_name: str = "memgpt-job"
+
+    def __init__(self, server: "SyncServer", n_workers: int):
+        self.server = server
+        self.n_workers = n_workers
+        self.queue: "queue.Queue[str]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._queued: Set[str] = set()  # queued or running
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.n_workers):
+                thread = threading.Thread(target=self._run, name=f"{self.thread_name}-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, job_id: str):
+        self.start()
+        with self._lock:
+            if job_id in self._queued:
+                return
+            self._queued.add(job_id)
+        self.queue.put(job_id)
+
+    def resume(self):
+        """Pick up the jobs that were pending or running when the server last stopped"""
+        for job in self.server.ms.list_jobs_by_status([JobStatus.created, JobStatus.pending, JobStatus.running]):
+            if (job.metadata_ or {}).get("type") == self.job_type:
+                self.resume_job(job)
+
+    def resume_job(self, job: Job):
+        self.submit(job.id)
+
+    def _run(self):
+        while True:
+            job_id = self.queue.get()
+            try:
+                self.run_job(job_id)
+            except Exception as e:
+                logger.error(f"{self.job_type} job {job_id} failed: {e}")
+            finally:
+                with self._lock:
+                    self._queued.discard(job_id)
+
+    def run_job(self, job_id: str):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": len(self._threads), "jobs": len(self._queued)}
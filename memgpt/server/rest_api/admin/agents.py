@@ -2,7 +2,7 @@ from typing import List
 
 from fastapi import APIRouter
 
-from memgpt.schemas.agent import AgentState
+from memgpt.schemas.agent import AgentState, AgentSummary
 from memgpt.server.rest_api.interface import QueuingInterface
 from memgpt.server.server import SyncServer
 
@@ -18,4 +18,12 @@ def setup_agents_admin_router(server: SyncServer, interface: QueuingInterface):
         interface.clear()
         return server.list_agents()
 
+    @router.get("/agents/summary", tags=["agents"], response_model=List[AgentSummary])
+    def get_all_agent_summaries():
+        """
+        Get summaries of all agents in the database, most recently run first
+        """
+        interface.clear()
+        return server.list_agent_summaries(user_id=None)
+
     return router
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+
+from memgpt.server.rest_api.interface import QueuingInterface
+from memgpt.server.server import SyncServer
+
+router = APIRouter()
+
+
+def setup_metrics_admin_router(server: SyncServer, interface: QueuingInterface):
+    @router.get("/metrics", tags=["admin"], response_model=dict)
+    def get_metrics():
+        """
+        Get runtime metrics of the server (e.g. agent cache hits, misses and evictions)
+        """
+        return server.get_metrics()
+
+    return router
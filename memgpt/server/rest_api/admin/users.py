@@ -47,7 +47,7 @@ def setup_admin_router(server: SyncServer, interface: QueuingInterface):
             user = server.ms.get_user(user_id=user_id)
             if user is None:
                 raise HTTPException(status_code=404, detail=f"User does not exist")
-            server.ms.delete_user(user_id=user_id)
+            server.delete_user(user_id=user_id)
         except HTTPException:
             raise
         except Exception as e:
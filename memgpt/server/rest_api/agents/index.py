@@ -3,7 +3,7 @@ from typing import List
 
 from fastapi import APIRouter, Body, Depends, HTTPException
 
-from memgpt.schemas.agent import AgentState, CreateAgent, UpdateAgentState
+from memgpt.schemas.agent import AgentState, AgentSummary, CreateAgent, UpdateAgentState
 from memgpt.schemas.source import Source
 from memgpt.server.rest_api.auth_token import get_current_user
 from memgpt.server.rest_api.interface import QueuingInterface
@@ -28,6 +28,19 @@ def setup_agents_index_router(server: SyncServer, interface: QueuingInterface, p
         agents_data = server.list_agents(user_id=user_id)
         return agents_data
 
+    # registered before /agents/{agent_id}, which would match it otherwise
+    @router.get("/agents/summary", tags=["agents"], response_model=List[AgentSummary])
+    def list_agent_summaries(
+        user_id: str = Depends(get_current_user_with_server),
+    ):
+        """
+        List summaries of all agents associated with a given user, most recently run first.
+
+        Returns the core memory, recall / archival memory sizes, tools and attached sources of each agent.
+        """
+        interface.clear()
+        return server.list_agent_summaries(user_id=user_id)
+
     @router.post("/agents", tags=["agents"], response_model=AgentState)
     def create_agent(
         request: CreateAgent = Body(...),
@@ -1,11 +1,13 @@
 from functools import partial
 from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response, status
 from fastapi.responses import JSONResponse
 
+from memgpt.errors import InvalidCursorError
 from memgpt.schemas.memory import (
     ArchivalMemorySummary,
+    ContextWindowSummary,
     CreateArchivalMemory,
     Memory,
     RecallMemorySummary,
@@ -14,12 +16,12 @@ from memgpt.schemas.message import Message
 from memgpt.schemas.passage import Passage
 from memgpt.server.rest_api.auth_token import get_current_user
 from memgpt.server.rest_api.interface import QueuingInterface
+from memgpt.server.rest_api.utils import NEXT_CURSOR_HEADER
 from memgpt.server.server import SyncServer
 
-router = APIRouter()
-
 
 def setup_agents_memory_router(server: SyncServer, interface: QueuingInterface, password: str):
+    router = APIRouter()
     get_current_user_with_server = partial(partial(get_current_user, server), password)
 
     @router.get("/agents/{agent_id}/memory/messages", tags=["agents"], response_model=List[Message])
@@ -83,6 +85,17 @@ def setup_agents_memory_router(server: SyncServer, interface: QueuingInterface,
         interface.clear()
         return server.get_archival_memory_summary(agent_id=agent_id)
 
+    @router.get("/agents/{agent_id}/memory/context", tags=["agents"], response_model=ContextWindowSummary)
+    def get_agent_context_window_summary(
+        agent_id: str,
+        user_id: str = Depends(get_current_user_with_server),
+    ):
+        """
+        Retrieve the current size (in tokens) of the context window of a specific agent.
+        """
+        interface.clear()
+        return server.get_context_window_summary(agent_id=agent_id)
+
     # @router.get("/agents/{agent_id}/archival/all", tags=["agents"], response_model=List[Passage])
     # def get_agent_archival_memory_all(
     #    agent_id: str,
@@ -97,22 +110,35 @@ def setup_agents_memory_router(server: SyncServer, interface: QueuingInterface,
     @router.get("/agents/{agent_id}/archival", tags=["agents"], response_model=List[Passage])
     def get_agent_archival_memory(
         agent_id: str,
-        after: Optional[int] = Query(None, description="Unique ID of the memory to start the query range at."),
-        before: Optional[int] = Query(None, description="Unique ID of the memory to end the query range at."),
+        response: Response,
+        after: Optional[str] = Query(None, description="Cursor (or unique ID) of the memory to start the query range at."),
+        before: Optional[str] = Query(None, description="Cursor (or unique ID) of the memory to end the query range at."),
         limit: Optional[int] = Query(None, description="How many results to include in the response."),
         user_id: str = Depends(get_current_user_with_server),
     ):
         """
         Retrieve the memories in an agent's archival memory store (paginated query).
+
+        The cursor of the last memory returned is in the X-Next-Cursor header, pass it as `after` to get the next page.
         """
         interface.clear()
-        return server.get_agent_archival_cursor(
-            user_id=user_id,
-            agent_id=agent_id,
-            after=after,
-            before=before,
-            limit=limit,
-        )
+        try:
+            cursor, passages = server.get_agent_archival_cursor(
+                user_id=user_id,
+                agent_id=agent_id,
+                after=after,
+                before=before,
+                limit=limit,
+                return_cursor=True,
+            )
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ValueError as e:
+            # user or agent does not exist
+            raise HTTPException(status_code=404, detail=str(e))
+        if cursor is not None:
+            response.headers[NEXT_CURSOR_HEADER] = cursor
+        return passages
 
     @router.post("/agents/{agent_id}/archival", tags=["agents"], response_model=List[Passage])
     def insert_agent_archival_memory(
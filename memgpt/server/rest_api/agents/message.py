@@ -1,24 +1,29 @@
 import asyncio
 from datetime import datetime
 from functools import partial
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
 from fastapi.responses import StreamingResponse
 
+from memgpt.errors import InvalidCursorError, ServerOverloadedError
 from memgpt.schemas.enums import MessageRole, MessageStreamStatus
 from memgpt.schemas.memgpt_message import LegacyMemGPTMessage, MemGPTMessage
 from memgpt.schemas.memgpt_request import MemGPTRequest
 from memgpt.schemas.memgpt_response import MemGPTResponse
 from memgpt.schemas.message import Message
+from memgpt.server.async_server import AsyncServer
 from memgpt.server.rest_api.auth_token import get_current_user
 from memgpt.server.rest_api.interface import QueuingInterface, StreamingServerInterface
-from memgpt.server.rest_api.utils import sse_async_generator
+from memgpt.server.rest_api.utils import (
+    NEXT_CURSOR_HEADER,
+    SSE_FINISH_MSG,
+    sse_async_generator,
+    sse_formatter,
+)
 from memgpt.server.server import SyncServer
 from memgpt.utils import deduplicate
 
-router = APIRouter()
-
 
 # TODO: cpacker should check this file
 # TODO: move this into server.py?
@@ -46,6 +51,9 @@ async def send_message_to_agent(
         message_func = server.system_message
     else:
         raise HTTPException(status_code=500, detail=f"Bad role {role}")
+    # the AsyncServer runs the step on the event loop instead of the worker pool
+    if isinstance(server, AsyncServer):
+        message_func = server.user_message_async if role == MessageRole.user else server.system_message_async
 
     if not stream_steps and stream_tokens:
         raise HTTPException(status_code=400, detail="stream_steps must be 'true' if stream_tokens is 'true'")
@@ -62,47 +70,68 @@ async def send_message_to_agent(
         if not isinstance(streaming_interface, StreamingServerInterface):
             raise ValueError(f"Agent has wrong type of interface: {type(streaming_interface)}")
 
-        # Enable token-streaming within the request if desired
-        streaming_interface.streaming_mode = stream_tokens
-        # "chatcompletion mode" does some remapping and ignores inner thoughts
-        streaming_interface.streaming_chat_completion_mode = chat_completion_mode
+        # Reject up front if too many steps are already queued
+        server.step_scheduler.check_capacity()
 
-        # streaming_interface.allow_assistant_message = stream
-        # streaming_interface.function_call_legacy_mode = stream
+        def start_step() -> Tuple[asyncio.Future, StreamingServerInterface]:
+            """Reset the agent's streaming interface and run message_func on the server's worker pool"""
+            # re-fetch the agent, in case it was unloaded while waiting for its turn
+            streaming_interface = server._get_or_load_agent(agent_id=agent_id).interface
 
-        # Offload the synchronous message_func to a separate thread
-        streaming_interface.stream_start()
-        task = asyncio.create_task(
-            asyncio.to_thread(message_func, user_id=user_id, agent_id=agent_id, message=message, timestamp=timestamp)
-        )
+            # Enable token-streaming within the request if desired
+            streaming_interface.streaming_mode = stream_tokens
+            # "chatcompletion mode" does some remapping and ignores inner thoughts
+            streaming_interface.streaming_chat_completion_mode = chat_completion_mode
+
+            # streaming_interface.allow_assistant_message = stream
+            # streaming_interface.function_call_legacy_mode = stream
+
+            streaming_interface.stream_start()
+            step = partial(message_func, user_id=user_id, agent_id=agent_id, message=message, timestamp=timestamp)
+            task = server.step_scheduler.run_async(step()) if isinstance(server, AsyncServer) else server.step_scheduler.run(step)
+            return task, streaming_interface
 
         if stream_steps:
             if return_message_object:
                 # TODO implement returning `Message`s in a stream, not just `MemGPTMessage` format
                 raise NotImplementedError
 
+            async def stream_step():
+                # hold the agent's turn until the stream is fully drained and the step is done, so the next request can't
+                # reset the interface early (or overlap the step, if the client disconnects)
+                try:
+                    async with server.step_scheduler.step_in_turn(agent_id, start_step) as (task, streaming_interface):
+                        async for chunk in sse_async_generator(streaming_interface.get_generator(), finish_message=include_final_message):
+                            yield chunk
+                        await asyncio.wait([task])
+                except ServerOverloadedError as e:
+                    # the response headers are already sent, so report it in the stream
+                    yield sse_formatter({"error": str(e), "status_code": 429})
+                    if include_final_message:
+                        yield sse_formatter(SSE_FINISH_MSG)
+
             # return a stream
-            return StreamingResponse(
-                sse_async_generator(streaming_interface.get_generator(), finish_message=include_final_message),
-                media_type="text/event-stream",
-            )
+            return StreamingResponse(stream_step(), media_type="text/event-stream")
 
         else:
-            # buffer the stream, then return the list
-            generated_stream = []
-            async for message in streaming_interface.get_generator():
-                assert (
-                    isinstance(message, MemGPTMessage)
-                    or isinstance(message, LegacyMemGPTMessage)
-                    or isinstance(message, MessageStreamStatus)
-                ), type(message)
-                generated_stream.append(message)
-                if message == MessageStreamStatus.done:
-                    break
-
-            # Get rid of the stream status messages
-            filtered_stream = [d for d in generated_stream if not isinstance(d, MessageStreamStatus)]
-            usage = await task
+            async with server.step_scheduler.agent_turn(agent_id):
+                task, streaming_interface = start_step()
+
+                # buffer the stream, then return the list
+                generated_stream = []
+                async for message in streaming_interface.get_generator():
+                    assert (
+                        isinstance(message, MemGPTMessage)
+                        or isinstance(message, LegacyMemGPTMessage)
+                        or isinstance(message, MessageStreamStatus)
+                    ), type(message)
+                    generated_stream.append(message)
+                    if message == MessageStreamStatus.done:
+                        break
+
+                # Get rid of the stream status messages
+                filtered_stream = [d for d in generated_stream if not isinstance(d, MessageStreamStatus)]
+                usage = await task
 
             # By default the stream will be messages of type MemGPTMessage or MemGPTLegacyMessage
             # If we want to convert these to Message, we can use the attached IDs
@@ -118,6 +147,8 @@ async def send_message_to_agent(
 
     except HTTPException:
         raise
+    except ServerOverloadedError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         print(e)
         import traceback
@@ -127,6 +158,7 @@ async def send_message_to_agent(
 
 
 def setup_agents_message_router(server: SyncServer, interface: QueuingInterface, password: str):
+    router = APIRouter()
     get_current_user_with_server = partial(partial(get_current_user, server), password)
 
     @router.get("/agents/{agent_id}/messages/context/", tags=["agents"], response_model=List[Message])
@@ -146,15 +178,29 @@ def setup_agents_message_router(server: SyncServer, interface: QueuingInterface,
     @router.get("/agents/{agent_id}/messages", tags=["agents"], response_model=List[Message])
     def get_agent_messages(
         agent_id: str,
-        before: Optional[str] = Query(None, description="Message before which to retrieve the returned messages."),
+        response: Response,
+        before: Optional[str] = Query(None, description="Cursor (or ID) of the message before which to retrieve the returned messages."),
         limit: int = Query(10, description="Maximum number of messages to retrieve."),
         user_id: str = Depends(get_current_user_with_server),
     ):
         """
-        Retrieve message history for an agent.
+        Retrieve message history for an agent, newest first.
+
+        The cursor of the oldest message returned is in the X-Next-Cursor header, pass it as `before` to get the next page.
         """
         interface.clear()
-        return server.get_agent_recall_cursor(user_id=user_id, agent_id=agent_id, before=before, limit=limit, reverse=True)
+        try:
+            cursor, messages = server.get_agent_recall_cursor(
+                user_id=user_id, agent_id=agent_id, before=before, limit=limit, reverse=True, return_cursor=True
+            )
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ValueError as e:
+            # user or agent does not exist
+            raise HTTPException(status_code=404, detail=str(e))
+        if cursor is not None:
+            response.headers[NEXT_CURSOR_HEADER] = cursor
+        return messages
 
     @router.post("/agents/{agent_id}/messages", tags=["agents"], response_model=MemGPTResponse)
     async def send_message(
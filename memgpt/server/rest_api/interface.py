@@ -1,9 +1,10 @@
 import asyncio
 import json
 import queue
+import threading
 from collections import deque
 from datetime import datetime
-from typing import AsyncGenerator, Literal, Optional, Union
+from typing import Any, AsyncGenerator, Literal, Optional, Union
 
 from memgpt.interface import AgentInterface
 from memgpt.schemas.enums import MessageStreamStatus
@@ -24,11 +25,70 @@ from memgpt.streaming_interface import AgentChunkStreamingInterface
 from memgpt.utils import is_utc_datetime
 
 
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AsyncStreamQueue:
+    """FIFO queue that is filled from worker threads and drained from the event loop
+
+    Producers can run on any thread. A consumer waiting in get() is woken on its own loop via call_soon_threadsafe as
+    soon as an item arrives, so there is no polling (assumes a single async consumer).
+    """
+
+    def __init__(self):
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._waiter: Optional[asyncio.Future] = None
+
+    def put(self, item: Any):
+        with self._lock:
+            self._items.append(item)
+            waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+
+    def get_nowait(self) -> Any:
+        with self._lock:
+            if not self._items:
+                raise queue.Empty
+            return self._items.popleft()
+
+    async def get(self) -> Any:
+        while True:
+            with self._lock:
+                if self._items:
+                    return self._items.popleft()
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiter = waiter
+            await waiter
+
+    def empty(self) -> bool:
+        with self._lock:
+            return not self._items
+
+    def qsize(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+    def last(self) -> Any:
+        """The most recently put item that is still queued"""
+        with self._lock:
+            if not self._items:
+                raise queue.Empty
+            return self._items[-1]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
 class QueuingInterface(AgentInterface):
     """Messages are queued inside an internal buffer and manually flushed"""
 
     def __init__(self, debug=True):
-        self.buffer = queue.Queue()
+        self.buffer = AsyncStreamQueue()
         self.debug = debug
 
     def _queue_push(self, message_api: Union[str, dict], message_obj: Union[Message, None]):
@@ -111,30 +171,25 @@ class QueuingInterface(AgentInterface):
 
     def clear(self):
         """Clear all messages from the queue."""
-        with self.buffer.mutex:
-            # Empty the queue
-            self.buffer.queue.clear()
+        self.buffer.clear()
 
     async def message_generator(self, style: Literal["obj", "api"] = "obj"):
         while True:
-            if not self.buffer.empty():
-                message = self.buffer.get()
-                message_obj = message["message_obj"]
-                message_api = message["message_api"]
+            # wakes up as soon as the agent thread pushes a message
+            message = await self.buffer.get()
+            message_obj = message["message_obj"]
+            message_api = message["message_api"]
 
-                if message_api == "STOP":
-                    break
-
-                # yield message
-                if style == "obj":
-                    yield message_obj
-                elif style == "api":
-                    yield message_api
-                else:
-                    raise ValueError(style)
+            if message_api == "STOP":
+                break
 
+            # yield message
+            if style == "obj":
+                yield message_obj
+            elif style == "api":
+                yield message_api
             else:
-                await asyncio.sleep(0.1)  # Small sleep to prevent a busy loop
+                raise ValueError(style)
 
     def step_yield(self):
         """Enqueue a special stop message"""
@@ -195,13 +250,13 @@ class QueuingInterface(AgentInterface):
         else:
             # FIXME this is a total hack
             assert self.buffer.qsize() > 1, "Tried to reach back to grab function call data, but couldn't find a buffer message."
-            # TODO also should not be accessing protected member here
+            last = self.buffer.last()
 
-            new_message["id"] = self.buffer.queue[-1]["message_api"]["id"]
+            new_message["id"] = last["message_api"]["id"]
             # assert is_utc_datetime(msg_obj.created_at), msg_obj.created_at
-            new_message["date"] = self.buffer.queue[-1]["message_api"]["date"]
+            new_message["date"] = last["message_api"]["date"]
 
-            msg_obj = self.buffer.queue[-1]["message_obj"]
+            msg_obj = last["message_obj"]
 
         self._queue_push(message_api=new_message, message_obj=msg_obj)
 
@@ -298,6 +353,10 @@ class FunctionArgumentsStreamHandler:
         return None
 
 
+# pushed after the last chunk of a stream
+_STREAM_END = object()
+
+
 class StreamingServerInterface(AgentChunkStreamingInterface):
     """Maintain a generator that is a proxy for self.process_chunk()
 
@@ -323,8 +382,8 @@ class StreamingServerInterface(AgentChunkStreamingInterface):
         # turn function argument to send_message into a normal text stream
         self.streaming_chat_completion_json_reader = FunctionArgumentsStreamHandler()
 
-        self._chunks = deque()
-        self._event = asyncio.Event()  # Use an event to notify when chunks are available
+        # chunks are pushed from the agent's worker thread and consumed on the event loop
+        self._chunks = AsyncStreamQueue()
         self._active = True  # This should be set to False to stop the generator
 
         # if multi_step = True, the stream ends when the agent yields
@@ -339,28 +398,16 @@ class StreamingServerInterface(AgentChunkStreamingInterface):
 
     async def _create_generator(self) -> AsyncGenerator[Union[MemGPTMessage, LegacyMemGPTMessage, MessageStreamStatus], None]:
         """An asynchronous generator that yields chunks as they become available."""
-        while self._active:
+        while True:
             try:
-                # Wait until there is an item in the deque or the stream is deactivated
-                await asyncio.wait_for(self._event.wait(), timeout=self.timeout)  # 30 second timeout
+                # Wait until there is an item in the queue (the stream end is signalled by a sentinel)
+                chunk = await asyncio.wait_for(self._chunks.get(), timeout=self.timeout)  # 30 second timeout
             except asyncio.TimeoutError:
                 break  # Exit the loop if we timeout
 
-            while self._chunks:
-                yield self._chunks.popleft()
-
-            # Reset the event until a new item is pushed
-            self._event.clear()
-
-        # while self._active:
-        #     # Wait until there is an item in the deque or the stream is deactivated
-        #     await self._event.wait()
-
-        #     while self._chunks:
-        #         yield self._chunks.popleft()
-
-        #     # Reset the event until a new item is pushed
-        #     self._event.clear()
+            if chunk is _STREAM_END:
+                break
+            yield chunk
 
     def get_generator(self) -> AsyncGenerator:
         """Get the generator that yields processed chunks."""
@@ -381,14 +428,13 @@ class StreamingServerInterface(AgentChunkStreamingInterface):
             ChatCompletionChunkResponse,
         ],
     ):
-        """Add an item to the deque"""
+        """Add an item to the stream queue"""
         assert self._active, "Generator is inactive"
         assert (
             isinstance(item, MemGPTMessage) or isinstance(item, LegacyMemGPTMessage) or isinstance(item, MessageStreamStatus)
         ), f"Wrong type: {type(item)}"
 
-        self._chunks.append(item)
-        self._event.set()  # Signal that new data is available
+        self._chunks.put(item)  # wakes up the generator
 
     def stream_start(self):
         """Initialize streaming by activating the generator and clearing any old chunks."""
@@ -397,7 +443,6 @@ class StreamingServerInterface(AgentChunkStreamingInterface):
         if not self._active:
             self._active = True
             self._chunks.clear()
-            self._event.clear()
 
     def stream_end(self):
         """Clean up the stream by deactivating and clearing chunks."""
@@ -406,24 +451,11 @@ class StreamingServerInterface(AgentChunkStreamingInterface):
         if not self.streaming_chat_completion_mode and not self.nonstreaming_legacy_mode:
             self._push_to_buffer(self.multi_step_gen_indicator)
 
-        # self._active = False
-        # self._event.set()  # Unblock the generator if it's waiting to allow it to complete
-
-        # if not self.multi_step:
-        #     # end the stream
-        #     self._active = False
-        #     self._event.set()  # Unblock the generator if it's waiting to allow it to complete
-        # else:
-        #     # signal that a new step has started in the stream
-        #     self._chunks.append(self.multi_step_indicator)
-        #     self._event.set()  # Signal that new data is available
-
     def step_complete(self):
         """Signal from the agent that one 'step' finished (step = LLM response + tool execution)"""
         if not self.multi_step:
             # end the stream
-            self._active = False
-            self._event.set()  # Unblock the generator if it's waiting to allow it to complete
+            self._end_stream()
         elif not self.streaming_chat_completion_mode and not self.nonstreaming_legacy_mode:
             # signal that a new step has started in the stream
             self._push_to_buffer(self.multi_step_indicator)
@@ -432,8 +464,13 @@ class StreamingServerInterface(AgentChunkStreamingInterface):
         """If multi_step, this is the true 'stream_end' function."""
         # if self.multi_step:
         # end the stream
-        self._active = False
-        self._event.set()  # Unblock the generator if it's waiting to allow it to complete
+        self._end_stream()
+
+    def _end_stream(self):
+        """Deactivate the stream and unblock the generator so it can complete"""
+        if self._active:
+            self._active = False
+            self._chunks.put(_STREAM_END)
 
     @staticmethod
     def clear():
@@ -1,29 +1,48 @@
 import uuid
+from functools import partial
 from typing import List, Optional
 
-from fastapi import APIRouter, Body, HTTPException, Path, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query
 from pydantic import BaseModel, Field
 
-from memgpt.constants import DEFAULT_PRESET
+from memgpt.constants import BASE_TOOLS, DEFAULT_HUMAN, DEFAULT_PERSONA, DEFAULT_PRESET
+from memgpt.schemas.agent import CreateAgent
+from memgpt.schemas.enums import JobStatus
+from memgpt.schemas.job import Job
+from memgpt.schemas.memory import ChatMemory
 from memgpt.schemas.message import Message
 from memgpt.schemas.openai.openai import (
     AssistantFile,
+    Function,
     MessageFile,
     MessageRoleType,
     OpenAIAssistant,
+    OpenAIError,
     OpenAIMessage,
+    OpenAIMessageCreationStep,
     OpenAIRun,
     OpenAIRunStep,
     OpenAIThread,
+    OpenAIToolCallsStep,
+    OpenAIUsage,
     Text,
     ToolCall,
     ToolCallOutput,
 )
+from memgpt.server.rest_api.auth_token import get_current_user
 from memgpt.server.rest_api.interface import QueuingInterface
 from memgpt.server.server import SyncServer
-from memgpt.utils import get_utc_time
+from memgpt.utils import get_human_text, get_persona_text, get_utc_time
 
-router = APIRouter()
+# run (job) status -> OpenAI run status
+RUN_STATUSES = {
+    JobStatus.created: "queued",
+    JobStatus.pending: "queued",
+    JobStatus.running: "in_progress",
+    JobStatus.completed: "completed",
+    JobStatus.failed: "failed",
+    JobStatus.cancelled: "cancelled",
+}
 
 
 class CreateAssistantRequest(BaseModel):
@@ -136,8 +155,70 @@ class SubmitToolOutputsToRunRequest(BaseModel):
     tools_outputs: List[ToolCallOutput] = Field(..., description="The tool outputs to submit.")
 
 
-# TODO: implement mechanism for creating/authenticating users associated with a bearer token
-def setup_openai_assistant_router(server: SyncServer, interface: QueuingInterface):
+def usage_of_steps(steps: List[dict]) -> OpenAIUsage:
+    return OpenAIUsage(**{key: sum(step["usage"][key] for step in steps) for key in ("completion_tokens", "prompt_tokens", "total_tokens")})
+
+
+def job_to_run(job: Job, cancelling: bool = False) -> OpenAIRun:
+    """OpenAI run of a run job (see AssistantRunWorker), cancelling if a cancel was requested while it is running"""
+    metadata = job.metadata_
+    created_at = int(job.created_at.timestamp())
+    return OpenAIRun(
+        id=job.id,
+        created_at=created_at,
+        thread_id=metadata["thread_id"],
+        assistant_id=metadata["assistant_id"],
+        status="cancelling" if cancelling and job.status == JobStatus.running else RUN_STATUSES[job.status],
+        last_error=OpenAIError(code="server_error", message=metadata["error"]) if "error" in metadata else None,
+        expires_at=created_at,
+        started_at=metadata.get("started_at"),
+        cancelled_at=metadata.get("cancelled_at"),
+        failed_at=metadata.get("failed_at"),
+        completed_at=metadata.get("completed_at"),
+        model=metadata["model"],
+        instructions=metadata["instructions"],
+        metadata=metadata.get("run_metadata"),
+        usage=usage_of_steps(metadata["steps"]),
+    )
+
+
+def step_to_run_step(job: Job, step: dict) -> OpenAIRunStep:
+    if step["tool_calls"]:
+        tool_calls = [
+            ToolCall(id=tool_call["id"], function=Function(name=tool_call["name"], arguments=tool_call["arguments"]))
+            for tool_call in step["tool_calls"]
+        ]
+        step_details = OpenAIToolCallsStep(tool_calls=tool_calls)
+    else:
+        step_details = OpenAIMessageCreationStep(message_id=step["assistant_message_id"] or step["message_ids"][0])
+    return OpenAIRunStep(
+        id=step["id"],
+        created_at=step["created_at"],
+        assistant_id=job.metadata_["assistant_id"],
+        thread_id=job.metadata_["thread_id"],
+        run_id=job.id,
+        type=step_details.type,
+        status="completed",
+        step_defaults=step_details,
+        completed_at=step["created_at"],
+        usage=OpenAIUsage(**step["usage"]),
+    )
+
+
+def paginate(items: list, limit: int, order: str, after: Optional[str], before: Optional[str]) -> list:
+    """Page of items (oldest first, with an id), after / before are item IDs"""
+    if order == "desc":
+        items = items[::-1]
+    ids = [item.id for item in items]
+    start = ids.index(after) + 1 if after in ids else 0
+    end = ids.index(before) if before in ids else len(items)
+    return items[start:end][:limit]
+
+
+def setup_openai_assistant_router(server: SyncServer, interface: QueuingInterface, password: str):
+    router = APIRouter()
+    get_current_user_with_server = partial(partial(get_current_user, server), password)
+
     # create assistant (MemGPT agent)
     @router.post("/assistants", tags=["assistants"], response_model=OpenAIAssistant)
     def create_assistant(request: CreateAssistantRequest = Body(...)):
@@ -234,14 +315,22 @@ def setup_openai_assistant_router(server: SyncServer, interface: QueuingInterfac
         raise HTTPException(status_code=404, detail="Not yet implemented (coming soon)")
 
     @router.post("/threads", tags=["threads"], response_model=OpenAIThread)
-    def create_thread(request: CreateThreadRequest = Body(...)):
+    def create_thread(
+        request: CreateThreadRequest = Body(...),
+        user_id: str = Depends(get_current_user_with_server),
+    ):
         # TODO: use requests.description and requests.metadata fields
         # TODO: handle requests.file_ids and requests.tools
         # TODO: eventually allow request to override embedding/llm model
 
         print("Create thread/agent", request)
-        # create a memgpt agent
+        # create a memgpt agent (with the defaults of a new client agent)
         agent_state = server.create_agent(
+            CreateAgent(
+                tools=BASE_TOOLS,
+                memory=ChatMemory(human=get_human_text(DEFAULT_HUMAN), persona=get_persona_text(DEFAULT_PERSONA)),
+                metadata_=request.metadata,
+            ),
             user_id=user_id,
         )
         # TODO: insert messages into recall memory
@@ -279,8 +368,11 @@ def setup_openai_assistant_router(server: SyncServer, interface: QueuingInterfac
     def create_message(
         thread_id: str = Path(..., description="The unique identifier of the thread."),
         request: CreateMessageRequest = Body(...),
+        user_id: str = Depends(get_current_user_with_server),
     ):
-        agent_id = uuid.UUID(thread_id)
+        agent_id = thread_id
+        if not server._agent_exists(user_id=user_id, agent_id=agent_id):
+            raise HTTPException(status_code=404, detail=f"Thread thread_id={thread_id} not found")
         # create message object
         message = Message(
             user_id=user_id,
@@ -288,9 +380,10 @@ def setup_openai_assistant_router(server: SyncServer, interface: QueuingInterfac
             role=request.role,
             text=request.content,
         )
-        agent = server._get_or_load_agent(user_id=user_id, agent_id=agent_id)
-        # add message to agent
-        agent._append_to_messages([message])
+        # add message to agent (waits for a run that is stepping the agent)
+        with server._agent_step_lock(agent_id):
+            agent = server._get_or_load_agent(agent_id=agent_id)
+            agent._append_to_messages([message])
 
         openai_message = OpenAIMessage(
             id=str(message.id),
@@ -315,37 +408,33 @@ def setup_openai_assistant_router(server: SyncServer, interface: QueuingInterfac
         before: str = Query(
             None, description="A cursor for use in pagination. `after` is an object ID that defines your place in the list."
         ),
+        user_id: str = Depends(get_current_user_with_server),
     ):
-        after_uuid = uuid.UUID(after) if before else None
-        before_uuid = uuid.UUID(before) if before else None
-        agent_id = uuid.UUID(thread_id)
         reverse = True if (order == "desc") else False
-        cursor, json_messages = server.get_agent_recall_cursor(
+        # after / before are relative to the listing order, so in descending order `after` is the newest message to skip
+        messages = server.get_agent_recall_cursor(
             user_id=user_id,
-            agent_id=agent_id,
+            agent_id=thread_id,
             limit=limit,
-            after=after_uuid,
-            before=before_uuid,
+            after=before if reverse else after,
+            before=after if reverse else before,
             order_by="created_at",
             reverse=reverse,
         )
-        print(json_messages[0]["text"])
         # convert to openai style messages
         openai_messages = [
             OpenAIMessage(
-                id=str(message["id"]),
-                created_at=int(message["created_at"].timestamp()),
-                content=[Text(text=message["text"])],
-                role=message["role"],
-                thread_id=str(message["agent_id"]),
+                id=str(message.id),
+                created_at=int(message.created_at.timestamp()),
+                content=[Text(text=message.text)],
+                role=message.role,
+                thread_id=str(message.agent_id),
                 assistant_id=DEFAULT_PRESET,  # TODO: update this
                 # file_ids=message.file_ids,
                 # metadata=message.metadata,
             )
-            for message in json_messages
+            for message in messages
         ]
-        print("MESSAGES", openai_messages)
-        # TODO: cast back to message objects
         return ListMessagesResponse(messages=openai_messages)
 
     router.get("/threads/{thread_id}/messages/{message_id}", tags=["messages"], response_model=OpenAIMessage)
@@ -390,24 +479,23 @@ def setup_openai_assistant_router(server: SyncServer, interface: QueuingInterfac
     def create_run(
         thread_id: str = Path(..., description="The unique identifier of the thread."),
         request: CreateRunRequest = Body(...),
+        user_id: str = Depends(get_current_user_with_server),
     ):
         # TODO: add request.instructions as a message?
-        agent_id = uuid.UUID(thread_id)
         # TODO: override preset of agent with request.assistant_id
-        agent = server._get_or_load_agent(user_id=user_id, agent_id=agent_id)
-        agent.step(user_message=None)  # already has messages added
-        run_id = str(uuid.uuid4())
-        create_time = int(get_utc_time().timestamp())
-        return OpenAIRun(
-            id=run_id,
-            created_at=create_time,
-            thread_id=str(agent_id),
-            assistant_id=DEFAULT_PRESET,  # TODO: update this
-            status="completed",  # TODO: eventaully allow offline execution
-            expires_at=create_time,
-            model=agent.agent_state.llm_config.model,
-            instructions=request.instructions,
-        )
+        # the run is queued, poll it with retrieve_run
+        try:
+            job = server.create_assistant_run(
+                user_id=user_id,
+                agent_id=thread_id,
+                assistant_id=request.assistant_id,
+                instructions=request.instructions,
+                model=request.model,
+                metadata=request.metadata,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        return job_to_run(job)
 
     @router.post("/threads/runs", tags=["runs"], response_model=OpenAIRun)
     def create_thread_and_run(
@@ -416,6 +504,12 @@ def setup_openai_assistant_router(server: SyncServer, interface: QueuingInterfac
         # TODO: add a bunch of messages and execute
         raise HTTPException(status_code=404, detail="Not yet implemented (coming soon)")
 
+    def get_run(user_id: str, thread_id: str, run_id: str) -> Job:
+        try:
+            return server.get_assistant_run(user_id=user_id, agent_id=thread_id, run_id=run_id)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
     @router.get("/threads/{thread_id}/runs", tags=["runs"], response_model=List[OpenAIRun])
     def list_runs(
         thread_id: str = Path(..., description="The unique identifier of the thread."),
@@ -427,9 +521,13 @@ def setup_openai_assistant_router(server: SyncServer, interface: QueuingInterfac
         before: str = Query(
             None, description="A cursor for use in pagination. `after` is an object ID that defines your place in the list."
         ),
+        user_id: str = Depends(get_current_user_with_server),
     ):
-        # TODO: store run information in a DB so it can be returned here
-        raise HTTPException(status_code=404, detail="Not yet implemented (coming soon)")
+        runs = [
+            job_to_run(job, server.assistant_run_worker.is_cancelling(job.id))
+            for job in server.list_assistant_runs(user_id=user_id, agent_id=thread_id)
+        ]
+        return paginate(runs, limit=limit, order=order, after=after, before=before)
 
     @router.get("/threads/{thread_id}/runs/{run_id}/steps", tags=["runs"], response_model=List[OpenAIRunStep])
     def list_run_steps(
@@ -443,24 +541,33 @@ def setup_openai_assistant_router(server: SyncServer, interface: QueuingInterfac
         before: str = Query(
             None, description="A cursor for use in pagination. `after` is an object ID that defines your place in the list."
         ),
+        user_id: str = Depends(get_current_user_with_server),
     ):
-        # TODO: store run information in a DB so it can be returned here
-        raise HTTPException(status_code=404, detail="Not yet implemented (coming soon)")
+        job = get_run(user_id, thread_id, run_id)
+        steps = [step_to_run_step(job, step) for step in job.metadata_["steps"]]
+        return paginate(steps, limit=limit, order=order, after=after, before=before)
 
     @router.get("/threads/{thread_id}/runs/{run_id}", tags=["runs"], response_model=OpenAIRun)
     def retrieve_run(
         thread_id: str = Path(..., description="The unique identifier of the thread."),
         run_id: str = Path(..., description="The unique identifier of the run."),
+        user_id: str = Depends(get_current_user_with_server),
     ):
-        raise HTTPException(status_code=404, detail="Not yet implemented (coming soon)")
+        job = get_run(user_id, thread_id, run_id)
+        return job_to_run(job, server.assistant_run_worker.is_cancelling(job.id))
 
     @router.get("/threads/{thread_id}/runs/{run_id}/steps/{step_id}", tags=["runs"], response_model=OpenAIRunStep)
     def retrieve_run_step(
         thread_id: str = Path(..., description="The unique identifier of the thread."),
         run_id: str = Path(..., description="The unique identifier of the run."),
         step_id: str = Path(..., description="The unique identifier of the run step."),
+        user_id: str = Depends(get_current_user_with_server),
     ):
-        raise HTTPException(status_code=404, detail="Not yet implemented (coming soon)")
+        job = get_run(user_id, thread_id, run_id)
+        for step in job.metadata_["steps"]:
+            if step["id"] == step_id:
+                return step_to_run_step(job, step)
+        raise HTTPException(status_code=404, detail=f"Run step step_id={step_id} does not exist")
 
     @router.post("/threads/{thread_id}/runs/{run_id}", tags=["runs"], response_model=OpenAIRun)
     def modify_run(
@@ -482,7 +589,13 @@ def setup_openai_assistant_router(server: SyncServer, interface: QueuingInterfac
     def cancel_run(
         thread_id: str = Path(..., description="The unique identifier of the thread."),
         run_id: str = Path(..., description="The unique identifier of the run."),
+        user_id: str = Depends(get_current_user_with_server),
     ):
-        raise HTTPException(status_code=404, detail="Not yet implemented (coming soon)")
+        job = get_run(user_id, thread_id, run_id)
+        if job.status in (JobStatus.completed, JobStatus.failed):
+            raise HTTPException(status_code=400, detail=f"Cannot cancel run with status '{RUN_STATUSES[job.status]}'")
+        # a running run stops before its next step, and is 'cancelling' until then
+        job = server.cancel_assistant_run(user_id=user_id, agent_id=thread_id, run_id=run_id)
+        return job_to_run(job, server.assistant_run_worker.is_cancelling(job.id))
 
     return router
@@ -11,8 +11,10 @@ from fastapi import Depends, FastAPI, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from starlette.middleware.cors import CORSMiddleware
 
+from memgpt.server.async_server import AsyncServer
 from memgpt.server.constants import REST_DEFAULT_PORT
 from memgpt.server.rest_api.admin.agents import setup_agents_admin_router
+from memgpt.server.rest_api.admin.metrics import setup_metrics_admin_router
 from memgpt.server.rest_api.admin.tools import setup_tools_index_router
 from memgpt.server.rest_api.admin.users import setup_admin_router
 from memgpt.server.rest_api.agents.index import setup_agents_index_router
@@ -33,6 +35,7 @@ from memgpt.server.rest_api.openai_chat_completions.chat_completions import (
 from memgpt.server.rest_api.sources.index import setup_sources_index_router
 from memgpt.server.rest_api.static_files import mount_static_files
 from memgpt.server.rest_api.tools.index import setup_user_tools_index_router
+from memgpt.server.rest_api.utils import NEXT_CURSOR_HEADER
 from memgpt.server.server import SyncServer
 from memgpt.settings import settings
 
@@ -47,7 +50,7 @@ Start the server with:
 # interface: QueuingInterface = QueuingInterface()
 # interface: StreamingServerInterface = StreamingServerInterface()
 interface: StreamingServerInterface = StreamingServerInterface
-server: SyncServer = SyncServer(default_interface_factory=lambda: interface())
+server: SyncServer = (AsyncServer if settings.async_server else SyncServer)(default_interface_factory=lambda: interface())
 
 if password := settings.server_pass:
     # if the pass was specified in the environment, use it
@@ -79,6 +82,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # /api/auth endpoints
@@ -88,8 +92,9 @@ app.include_router(setup_auth_router(server, interface, password), prefix=API_PR
 app.include_router(setup_admin_router(server, interface), prefix=ADMIN_PREFIX, dependencies=[Depends(verify_password)])
 app.include_router(setup_tools_index_router(server, interface), prefix=ADMIN_PREFIX, dependencies=[Depends(verify_password)])
 
-# /api/admin/agents endpoints
+# /api/admin/agents and /api/admin/metrics endpoints
 app.include_router(setup_agents_admin_router(server, interface), prefix=ADMIN_API_PREFIX, dependencies=[Depends(verify_password)])
+app.include_router(setup_metrics_admin_router(server, interface), prefix=ADMIN_API_PREFIX, dependencies=[Depends(verify_password)])
 
 # /api/agents endpoints
 app.include_router(setup_agents_index_router(server, interface, password), prefix=API_PREFIX)
@@ -105,7 +110,7 @@ app.include_router(setup_sources_index_router(server, interface, password), pref
 app.include_router(setup_config_index_router(server, interface, password), prefix=API_PREFIX)
 
 # /v1/assistants endpoints
-app.include_router(setup_openai_assistant_router(server, interface), prefix=OPENAI_API_PREFIX)
+app.include_router(setup_openai_assistant_router(server, interface, password), prefix=OPENAI_API_PREFIX)
 
 # /v1/chat/completions endpoints
 app.include_router(setup_openai_chat_completions_router(server, interface, password), prefix=OPENAI_API_PREFIX)
@@ -143,6 +148,10 @@ def on_startup():
         print(f"Writing out openapi_assistants.json file")
         json.dump(openai_assistants_api, file, indent=2)
 
+    # pick up file uploads that were still being loaded, and assistant runs that were queued, when the server last stopped
+    server.ingestion_worker.resume()
+    server.assistant_run_worker.resume()
+
 
 @app.on_event("shutdown")
 def on_shutdown():
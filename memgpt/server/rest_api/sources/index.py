@@ -1,17 +1,7 @@
-import os
-import tempfile
 from functools import partial
 from typing import List
 
-from fastapi import (
-    APIRouter,
-    BackgroundTasks,
-    Body,
-    Depends,
-    HTTPException,
-    Query,
-    UploadFile,
-)
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, UploadFile
 
 from memgpt.schemas.document import Document
 from memgpt.schemas.job import Job
@@ -64,16 +54,6 @@ Implement the following functions:
 #    documents: List[DocumentModel] = Field(..., description="List of documents from the source.")
 
 
-def load_file_to_source_async(server: SyncServer, source_id: str, job_id: str, file: UploadFile, bytes: bytes):
-    # write the file to a temporary directory (deleted after the context manager exits)
-    with tempfile.TemporaryDirectory() as tmpdirname:
-        file_path = os.path.join(tmpdirname, file.filename)
-        with open(file_path, "wb") as buffer:
-            buffer.write(bytes)
-
-        server.load_file_to_source(source_id, file_path, job_id)
-
-
 def setup_sources_index_router(server: SyncServer, interface: QueuingInterface, password: str):
     get_current_user_with_server = partial(partial(get_current_user, server), password)
 
@@ -213,27 +193,24 @@ def setup_sources_index_router(server: SyncServer, interface: QueuingInterface,
         # file: UploadFile = UploadFile(..., description="The file to upload."),
         file: UploadFile,
         source_id: str,
-        background_tasks: BackgroundTasks,
         user_id: str = Depends(get_current_user_with_server),
     ):
         """
         Upload a file to a data source.
+
+        The file is loaded by a background job, whose status and progress can be polled with the returned job ID.
         """
         interface.clear()
         source = server.ms.get_source(source_id=source_id, user_id=user_id)
+        if source is None:
+            raise HTTPException(status_code=404, detail=f"Source with id={source_id} not found.")
         bytes = file.file.read()
 
-        # create job
-        # TODO: create server function
-        job = Job(user_id=user_id, metadata_={"type": "embedding", "filename": file.filename, "source_id": source_id})
-        job_id = job.id
-        server.ms.create_job(job)
-
-        # create background task
-        background_tasks.add_task(load_file_to_source_async, server, source_id=source.id, job_id=job.id, file=file, bytes=bytes)
+        # create job (picked up by the ingestion worker)
+        job = server.submit_file_to_source(user_id=user_id, source_id=source.id, filename=file.filename, content=bytes)
 
         # return job information
-        job = server.ms.get_job(job_id=job_id)
+        job = server.ms.get_job(job_id=job.id)
         return job
 
     @router.get("/sources/{source_id}/passages ", tags=["sources"], response_model=List[Passage])
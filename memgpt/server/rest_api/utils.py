@@ -13,6 +13,9 @@ SSE_SUFFIX = "\n\n"
 SSE_FINISH_MSG = "[DONE]"  # mimic openai
 SSE_ARTIFICIAL_DELAY = 0.1
 
+# response header with the cursor of the next page of a paginated listing
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 
 def sse_formatter(data: Union[dict, str]) -> str:
     """Prefix with 'data: ', and always include double newlines"""
@@ -2,9 +2,11 @@
 import importlib
 import inspect
 import os
+import threading
 import traceback
 import warnings
 from abc import abstractmethod
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Callable, List, Optional, Tuple, Union
 
@@ -14,6 +16,7 @@ import memgpt.constants as constants
 import memgpt.server.utils as server_utils
 import memgpt.system as system
 from memgpt.agent import Agent, save_agent
+from memgpt.agent_store.engines import get_pool_stats
 from memgpt.agent_store.storage import StorageConnector, TableType
 from memgpt.cli.cli_config import get_model_options
 from memgpt.config import MemGPTConfig
@@ -35,10 +38,11 @@ from memgpt.functions.functions import generate_schema, load_function_set
 # TODO use custom interface
 from memgpt.interface import AgentInterface  # abstract
 from memgpt.interface import CLIInterface  # for printing to terminal
+from memgpt.local_llm.prompt_cache import prompt_prefix_tracker
 from memgpt.log import get_logger
 from memgpt.metadata import MetadataStore
 from memgpt.prompts import gpt_system
-from memgpt.schemas.agent import AgentState, CreateAgent, UpdateAgentState
+from memgpt.schemas.agent import AgentState, AgentSummary, CreateAgent, UpdateAgentState
 from memgpt.schemas.api_key import APIKey, APIKeyCreate
 from memgpt.schemas.block import (
     Block,
@@ -54,7 +58,12 @@ from memgpt.schemas.embedding_config import EmbeddingConfig
 from memgpt.schemas.enums import JobStatus
 from memgpt.schemas.job import Job
 from memgpt.schemas.llm_config import LLMConfig
-from memgpt.schemas.memory import ArchivalMemorySummary, Memory, RecallMemorySummary
+from memgpt.schemas.memory import (
+    ArchivalMemorySummary,
+    ContextWindowSummary,
+    Memory,
+    RecallMemorySummary,
+)
 from memgpt.schemas.message import Message
 from memgpt.schemas.openai.chat_completion_response import UsageStatistics
 from memgpt.schemas.passage import Passage
@@ -62,7 +71,13 @@ from memgpt.schemas.source import Source, SourceCreate, SourceUpdate
 from memgpt.schemas.tool import Tool, ToolCreate, ToolUpdate
 from memgpt.schemas.usage import MemGPTUsageStatistics
 from memgpt.schemas.user import User, UserCreate
-from memgpt.utils import create_random_username, json_dumps, json_loads
+from memgpt.server.agent_cache import AgentCache
+from memgpt.server.assistant_runs import ASSISTANT_RUN_JOB_TYPE, AssistantRunWorker
+from memgpt.server.identity_cache import IdentityCache
+from memgpt.server.ingestion import INGESTION_JOB_TYPE, IngestionWorker
+from memgpt.server.step_scheduler import StepScheduler
+from memgpt.settings import settings
+from memgpt.utils import create_random_username, get_utc_time, json_dumps, json_loads
 
 # from memgpt.llm_api_tools import openai_get_model_list, azure_openai_get_model_list, smart_urljoin
 
@@ -146,8 +161,29 @@ class SyncServer(Server):
     ):
         """Server process holds in-memory agents that are being run"""
 
-        # List of {'user_id': user_id, 'agent_id': agent_id, 'agent': agent_obj} dicts
-        self.active_agents = []
+        # Loaded agents, keyed by (user_id, agent_id)
+        self.active_agents = AgentCache(
+            max_size=settings.agent_cache_size,
+            idle_ttl=settings.agent_cache_idle_ttl,
+            on_evict=self._save_evicted_agent,
+            try_lock=self._lock_agent_for_eviction,
+        )
+
+        # Steps of the same agent run one at a time (agent_id -> lock)
+        self._agent_step_locks = {}
+        self._agent_step_locks_lock = threading.Lock()
+
+        # API key -> user and user / agent existence lookups done by every request
+        self.identity_cache = IdentityCache(ttl=settings.identity_cache_ttl, max_size=settings.identity_cache_size)
+
+        # API requests are queued per agent and run on a bounded worker pool
+        self.step_scheduler = StepScheduler(max_workers=settings.max_concurrent_steps, max_queued=settings.max_queued_steps)
+
+        # file uploads are loaded into sources by background workers (threads are started on the first upload)
+        self.ingestion_worker = IngestionWorker(self, n_workers=settings.ingestion_workers)
+
+        # OpenAI Assistants API runs are stepped by background workers
+        self.assistant_run_worker = AssistantRunWorker(self, n_workers=settings.assistant_run_workers)
 
         # chaining = whether or not to run again if request_heartbeat=true
         self.chaining = chaining
@@ -212,35 +248,94 @@ class SyncServer(Server):
 
     def save_agents(self):
         """Saves all the agents that are in the in-memory object store"""
-        for agent_d in self.active_agents:
+        for agent in self.active_agents.agents():
             try:
-                save_agent(agent_d["agent"], self.ms)
-                logger.info(f"Saved agent {agent_d['agent_id']}")
+                save_agent(agent, self.ms)
+                logger.info(f"Saved agent {agent.agent_state.id}")
             except Exception as e:
-                logger.exception(f"Error occurred while trying to save agent {agent_d['agent_id']}:\n{e}")
+                logger.exception(f"Error occurred while trying to save agent {agent.agent_state.id}:\n{e}")
+
+    def _lock_agent_for_eviction(self, agent: Agent) -> bool:
+        """Take the step lock of an agent about to be evicted, unless one of its steps holds it"""
+        with self._agent_step_locks_lock:
+            lock = self._agent_step_locks.setdefault(agent.agent_state.id, threading.Lock())
+        return lock.acquire(blocking=False)
+
+    def _save_evicted_agent(self, agent: Agent):
+        """Flush an agent that is being unloaded from the in-memory object store (its step lock is held)"""
+        agent_id = agent.agent_state.id
+        try:
+            save_agent(agent, self.ms)
+            logger.info(f"Saved and unloaded agent {agent_id}")
+        except Exception as e:
+            logger.exception(f"Error occurred while trying to save evicted agent {agent_id}:\n{e}")
+        finally:
+            # steps waiting on the dropped lock retry with a new one, and load the agent again now that it is saved
+            with self._agent_step_locks_lock:
+                lock = self._agent_step_locks.pop(agent_id)
+            lock.release()
 
     def _get_agent(self, user_id: str, agent_id: str) -> Union[Agent, None]:
         """Get the agent object from the in-memory object store"""
-        for d in self.active_agents:
-            if d["user_id"] == str(user_id) and d["agent_id"] == str(agent_id):
-                return d["agent"]
-        return None
-
-    def _add_agent(self, user_id: str, agent_id: str, agent_obj: Agent) -> None:
-        """Put an agent object inside the in-memory object store"""
-        # Make sure the agent doesn't already exist
-        if self._get_agent(user_id=user_id, agent_id=agent_id) is not None:
-            # Can be triggered on concucrent request, so don't throw a full error
-            logger.exception(f"Agent (user={user_id}, agent={agent_id}) is already loaded")
-            return
-        # Add Agent instance to the in-memory list
-        self.active_agents.append(
-            {
-                "user_id": str(user_id),
-                "agent_id": str(agent_id),
-                "agent": agent_obj,
-            }
-        )
+        return self.active_agents.get(user_id=user_id, agent_id=agent_id)
+
+    def _add_agent(self, user_id: str, agent_id: str, agent_obj: Agent) -> Agent:
+        """Put an agent object inside the in-memory object store (returns the resident agent object)"""
+        if not self.active_agents.put(user_id=user_id, agent_id=agent_id, agent=agent_obj):
+            # Can be triggered on concurrent loads, keep using the copy that is already loaded
+            logger.debug(f"Agent (user={user_id}, agent={agent_id}) is already loaded")
+            return self._get_agent(user_id=user_id, agent_id=agent_id) or agent_obj
+        return agent_obj
+
+    def _acquire_agent_step_lock(self, agent_id: str) -> threading.Lock:
+        """Take the agent's step lock (steps and other changes of the same agent run one at a time), returns it to release"""
+        agent_id = str(agent_id)
+        while True:
+            with self._agent_step_locks_lock:
+                lock = self._agent_step_locks.setdefault(agent_id, threading.Lock())
+            lock.acquire()
+            # the lock is dropped when the agent is evicted, so it may not be the agent's lock anymore
+            with self._agent_step_locks_lock:
+                if self._agent_step_locks.get(agent_id) is lock:
+                    return lock
+            lock.release()
+
+    @contextmanager
+    def _agent_step_lock(self, agent_id: str):
+        """Hold the agent's step lock"""
+        lock = self._acquire_agent_step_lock(agent_id)
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def get_metrics(self) -> dict:
+        """Runtime metrics for the in-memory object store, the step queue, background jobs, caches, DB pools and local LLM prompt reuse"""
+        return {
+            "agent_cache": self.active_agents.stats(),
+            "steps": self.step_scheduler.stats(),
+            "ingestion": self.ingestion_worker.stats(),
+            "assistant_runs": self.assistant_run_worker.stats(),
+            "identity_cache": self.identity_cache.stats(),
+            "db_pools": get_pool_stats(),
+            "local_llm_prompt_prefix": prompt_prefix_tracker.stats(),
+        }
+
+    def _user_exists(self, user_id: str) -> bool:
+        if self.identity_cache.has_user(user_id):
+            return True
+        if self.ms.get_user(user_id=user_id) is None:
+            return False
+        self.identity_cache.put_user(user_id)
+        return True
+
+    def _agent_exists(self, user_id: str, agent_id: str) -> bool:
+        if self.identity_cache.has_agent(user_id, agent_id):
+            return True
+        if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+            return False
+        self.identity_cache.put_agent(user_id, agent_id)
+        return True
 
     def _load_agent(self, user_id: str, agent_id: str, interface: Union[AgentInterface, None] = None) -> Agent:
         """Loads a saved agent into memory (if it doesn't exist, throw an error)"""
@@ -260,23 +355,23 @@ class SyncServer(Server):
 
             # Instantiate an agent object using the state retrieved
             logger.info(f"Creating an agent object")
+            tools = self.ms.get_tools_by_name(tool_names=agent_state.tools, user_id=user_id)
             tool_objs = []
             for name in agent_state.tools:
-                tool_obj = self.ms.get_tool(tool_name=name, user_id=user_id)
-                if not tool_obj:
+                if name not in tools:
                     logger.exception(f"Tool {name} does not exist for user {user_id}")
                     raise ValueError(f"Tool {name} does not exist for user {user_id}")
-                tool_objs.append(tool_obj)
+                tool_objs.append(tools[name])
 
             # Make sure the memory is a memory object
             assert isinstance(agent_state.memory, Memory)
 
             memgpt_agent = Agent(agent_state=agent_state, interface=interface, tools=tool_objs)
+            memgpt_agent.load_attached_sources(self.ms)
 
             # Add the agent to the in-memory store and return its reference
             logger.info(f"Adding agent to the agent cache: user_id={user_id}, agent_id={agent_id}")
-            self._add_agent(user_id=user_id, agent_id=agent_id, agent_obj=memgpt_agent)
-            return memgpt_agent
+            return self._add_agent(user_id=user_id, agent_id=agent_id, agent_obj=memgpt_agent)
 
         except Exception as e:
             logger.exception(f"Error occurred while trying to get agent {agent_id}:\n{e}")
@@ -284,6 +379,10 @@ class SyncServer(Server):
 
     def _get_or_load_agent(self, agent_id: str) -> Agent:
         """Check if the agent is in-memory, then load"""
+        memgpt_agent = self.active_agents.find(agent_id)
+        if memgpt_agent is not None:
+            return memgpt_agent
+
         agent_state = self.ms.get_agent(agent_id=agent_id)
         if not agent_state:
             raise ValueError(f"Agent does not exist")
@@ -298,10 +397,30 @@ class SyncServer(Server):
         return memgpt_agent
 
     def _step(
-        self, user_id: str, agent_id: str, input_message: Union[str, Message], timestamp: Optional[datetime]
+        self,
+        user_id: str,
+        agent_id: str,
+        input_message: Union[str, Message, None],
+        timestamp: Optional[datetime],
+        on_step: Optional[Callable[[List[Message], UsageStatistics], bool]] = None,
+    ) -> MemGPTUsageStatistics:
+        """Send the input message through the agent (steps of the same agent run one at a time)
+
+        on_step is called after every (chained) step with its new messages and usage, returning False ends the chain.
+        """
+        with self._agent_step_lock(agent_id):
+            return self._run_step(user_id=user_id, agent_id=agent_id, input_message=input_message, timestamp=timestamp, on_step=on_step)
+
+    def _run_step(
+        self,
+        user_id: str,
+        agent_id: str,
+        input_message: Union[str, Message, None],
+        timestamp: Optional[datetime],
+        on_step: Optional[Callable[[List[Message], UsageStatistics], bool]] = None,
     ) -> MemGPTUsageStatistics:
-        """Send the input message through the agent"""
         logger.debug(f"Got input message: {input_message}")
+        memgpt_agent = None
         try:
 
             # Get the agent object (loaded in memory)
@@ -333,29 +452,15 @@ class SyncServer(Server):
                 counter += 1
                 memgpt_agent.interface.step_complete()
 
-                logger.debug("Saving agent state")
-                # save updated state
-                save_agent(memgpt_agent, self.ms)
+                # save updated state (with write-behind enabled, saves are coalesced and flushed when the request ends)
+                if not settings.agent_write_behind:
+                    logger.debug("Saving agent state")
+                    save_agent(memgpt_agent, self.ms)
 
-                # Chain stops
-                if not self.chaining:
-                    logger.debug("No chaining, stopping after one step")
-                    break
-                elif self.max_chaining_steps is not None and counter > self.max_chaining_steps:
-                    logger.debug(f"Hit max chaining steps, stopping after {counter} steps")
+                if on_step is not None and not on_step(new_messages, usage):
                     break
-                # Chain handlers
-                elif token_warning:
-                    next_input_message = system.get_token_limit_warning()
-                    continue  # always chain
-                elif function_failed:
-                    next_input_message = system.get_heartbeat(constants.FUNC_FAILED_HEARTBEAT_MESSAGE)
-                    continue  # always chain
-                elif heartbeat_request:
-                    next_input_message = system.get_heartbeat(constants.REQ_HEARTBEAT_MESSAGE)
-                    continue  # always chain
-                # MemGPT no-op / yield
-                else:
+                next_input_message = self._next_chained_input(counter, token_warning, function_failed, heartbeat_request)
+                if next_input_message is None:
                     break
 
         except Exception as e:
@@ -363,11 +468,35 @@ class SyncServer(Server):
             print(traceback.print_exc())
             raise
         finally:
-            logger.debug("Calling step_yield()")
-            memgpt_agent.interface.step_yield()
+            if memgpt_agent is not None:
+                if settings.agent_write_behind:
+                    logger.debug("Flushing agent state")
+                    save_agent(memgpt_agent, self.ms)
+                logger.debug("Calling step_yield()")
+                memgpt_agent.interface.step_yield()
 
         return MemGPTUsageStatistics(**total_usage.dict(), step_count=step_count)
 
+    def _next_chained_input(self, counter: int, token_warning: bool, function_failed: bool, heartbeat_request: bool) -> Optional[str]:
+        """Input message for the next chained step, None if the agent yields"""
+        # Chain stops
+        if not self.chaining:
+            logger.debug("No chaining, stopping after one step")
+            return None
+        elif self.max_chaining_steps is not None and counter > self.max_chaining_steps:
+            logger.debug(f"Hit max chaining steps, stopping after {counter} steps")
+            return None
+        # Chain handlers
+        elif token_warning:
+            return system.get_token_limit_warning()  # always chain
+        elif function_failed:
+            return system.get_heartbeat(constants.FUNC_FAILED_HEARTBEAT_MESSAGE)  # always chain
+        elif heartbeat_request:
+            return system.get_heartbeat(constants.REQ_HEARTBEAT_MESSAGE)  # always chain
+        # MemGPT no-op / yield
+        else:
+            return None
+
     def _command(self, user_id: str, agent_id: str, command: str) -> MemGPTUsageStatistics:
         """Process a CLI command"""
 
@@ -393,8 +522,7 @@ class SyncServer(Server):
                 raise ValueError(command)
 
             # attach data to agent from source
-            source_connector = StorageConnector.get_storage_connector(TableType.PASSAGES, self.config, user_id=user_id)
-            memgpt_agent.attach_source(data_source, source_connector, self.ms)
+            memgpt_agent.attach_source(data_source, self.ms)
 
         elif command.lower() == "dump" or command.lower().startswith("dump "):
             # Check if there's an additional argument that's an integer
@@ -493,9 +621,17 @@ class SyncServer(Server):
         timestamp: Optional[datetime] = None,
     ) -> MemGPTUsageStatistics:
         """Process an incoming user message and feed it through the MemGPT agent"""
-        if self.ms.get_user(user_id=user_id) is None:
+        packaged_user_message = self._package_user_message(user_id=user_id, agent_id=agent_id, message=message, timestamp=timestamp)
+
+        # Run the agent state forward
+        usage = self._step(user_id=user_id, agent_id=agent_id, input_message=packaged_user_message, timestamp=timestamp)
+        return usage
+
+    def _package_user_message(self, user_id: str, agent_id: str, message: Union[str, Message], timestamp: Optional[datetime]) -> str:
+        """Validate an incoming user message, returns it packaged for the agent"""
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
-        if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+        if not self._agent_exists(user_id, agent_id):
             raise ValueError(f"Agent agent_id={agent_id} does not exist")
 
         # Basic input sanitization
@@ -530,9 +666,7 @@ class SyncServer(Server):
                     text=packaged_user_message,
                 )
 
-        # Run the agent state forward
-        usage = self._step(user_id=user_id, agent_id=agent_id, input_message=packaged_user_message, timestamp=timestamp)
-        return usage
+        return packaged_user_message
 
     def system_message(
         self,
@@ -542,9 +676,16 @@ class SyncServer(Server):
         timestamp: Optional[datetime] = None,
     ) -> MemGPTUsageStatistics:
         """Process an incoming system message and feed it through the MemGPT agent"""
-        if self.ms.get_user(user_id=user_id) is None:
+        packaged_system_message = self._package_system_message(user_id=user_id, agent_id=agent_id, message=message, timestamp=timestamp)
+
+        # Run the agent state forward
+        return self._step(user_id=user_id, agent_id=agent_id, input_message=packaged_system_message, timestamp=timestamp)
+
+    def _package_system_message(self, user_id: str, agent_id: str, message: Union[str, Message], timestamp: Optional[datetime]) -> str:
+        """Validate an incoming system message, returns it packaged for the agent"""
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
-        if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+        if not self._agent_exists(user_id, agent_id):
             raise ValueError(f"Agent agent_id={agent_id} does not exist")
 
         # Basic input sanitization
@@ -592,15 +733,14 @@ class SyncServer(Server):
             # Override the timestamp with what the caller provided
             message.created_at = timestamp
 
-        # Run the agent state forward
-        return self._step(user_id=user_id, agent_id=agent_id, input_message=packaged_system_message, timestamp=timestamp)
+        return packaged_system_message
 
     # @LockingServer.agent_lock_decorator
     def run_command(self, user_id: str, agent_id: str, command: str) -> MemGPTUsageStatistics:
         """Run a command on the agent"""
-        if self.ms.get_user(user_id=user_id) is None:
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
-        if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+        if not self._agent_exists(user_id, agent_id):
             raise ValueError(f"Agent agent_id={agent_id} does not exist")
 
         # If the input begins with a command prefix, attempt to process it as a command
@@ -639,7 +779,7 @@ class SyncServer(Server):
         interface: Union[AgentInterface, None] = None,
     ) -> AgentState:
         """Create a new agent using a config"""
-        if self.ms.get_user(user_id=user_id) is None:
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
 
         if interface is None:
@@ -720,7 +860,7 @@ class SyncServer(Server):
         user_id: str,
     ):
         """Update the agents core memory block, return the new state"""
-        if self.ms.get_user(user_id=user_id) is None:
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
         if self.ms.get_agent(agent_id=request.id) is None:
             raise ValueError(f"Agent agent_id={request.id} does not exist")
@@ -787,9 +927,9 @@ class SyncServer(Server):
     ):
         # TODO: delete agent data
 
-        if self.ms.get_user(user_id=user_id) is None:
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
-        if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+        if not self._agent_exists(user_id, agent_id):
             raise ValueError(f"Agent agent_id={agent_id} does not exist")
 
         # TODO: delete related tables (recall/archival memory)
@@ -800,6 +940,7 @@ class SyncServer(Server):
         agent = self.ms.get_agent(agent_id=agent_id, user_id=user_id)
         if agent is not None:
             self.ms.delete_agent(agent_id=agent_id)
+            self.identity_cache.invalidate_agent(agent_id)
 
     def _agent_state_to_config(self, agent_state: AgentState) -> dict:
         """Convert AgentState to a dict for a JSON response"""
@@ -819,88 +960,73 @@ class SyncServer(Server):
         user_id: str,
     ) -> List[AgentState]:
         """List all available agents to a user"""
-        if self.ms.get_user(user_id=user_id) is None:
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
 
         agents_states = self.ms.list_agents(user_id=user_id)
         return agents_states
 
-    # TODO make return type pydantic
-    def list_agents_legacy(
-        self,
-        user_id: str,
-    ) -> dict:
-        """List all available agents to a user"""
+    def list_agent_summaries(self, user_id: Optional[str]) -> List[AgentSummary]:
+        """Summaries of a user's agents (of all agents if user_id is None), most recently run first
 
-        if user_id is None:
-            agents_states = self.ms.list_all_agents()
-        else:
-            if self.ms.get_user(user_id=user_id) is None:
-                raise ValueError(f"User user_id={user_id} does not exist")
-
-            agents_states = self.ms.list_agents(user_id=user_id)
+        Nothing is loaded: the agents, their tools and sources are read in a few queries, and the recall / archival
+        sizes are counted for all the agents at once.
+        """
+        if user_id is not None and not self._user_exists(user_id):
+            raise ValueError(f"User user_id={user_id} does not exist")
 
-        agents_states_dicts = [self._agent_state_to_config(state) for state in agents_states]
+        summaries = self.ms.list_agent_summaries(user_id=user_id)
 
-        # TODO add a get_message_obj_from_message_id(...) function
-        #      this would allow grabbing Message.created_by without having to load the agent object
-        # all_available_tools = self.ms.list_tools(user_id=user_id) # TODO: add back when user-specific
-        self.ms.list_tools()
+        recall_sizes, archival_sizes = {}, {}
+        if summaries:
+            # the connectors are per agent, but count the records of any agent (of any user)
+            agent_users = {summary.id: summary.user_id for summary in summaries}
+            agent_ids = list(agent_users)
+            recall_storage = StorageConnector.get_storage_connector(
+                TableType.RECALL_MEMORY, self.config, summaries[0].user_id, agent_ids[0]
+            )
+            archival_storage = StorageConnector.get_storage_connector(
+                TableType.ARCHIVAL_MEMORY, self.config, summaries[0].user_id, agent_ids[0]
+            )
+            recall_sizes = recall_storage.size_by_agent(agent_ids, agent_users=agent_users)
+            archival_sizes = archival_storage.size_by_agent(agent_ids, agent_users=agent_users)
+        for summary in summaries:
+            summary.recall_memory_size = recall_sizes.get(summary.id)
+            summary.archival_memory_size = archival_sizes.get(summary.id)
 
-        for agent_state, return_dict in zip(agents_states, agents_states_dicts):
+        summaries.sort(key=lambda summary: summary.last_run, reverse=True)
+        logger.debug(f"Retrieved {len(summaries)} agent summaries for user {user_id}")
+        return summaries
 
-            # Get the agent object (loaded in memory)
-            memgpt_agent = self._get_or_load_agent(user_id=agent_state.user_id, agent_id=agent_state.id)
-
-            # TODO remove this eventually when return type get pydanticfied
-            # this is to add persona_name and human_name so that the columns in UI can populate
-            # TODO hack for frontend, remove
-            # (top level .persona is persona_name, and nested memory.persona is the state)
-            # TODO: eventually modify this to be contained in the metadata
-            return_dict["persona"] = agent_state._metadata.get("persona", None)
-            return_dict["human"] = agent_state._metadata.get("human", None)
-
-            # Add information about tools
-            # TODO memgpt_agent should really have a field of List[ToolModel]
-            #      then we could just pull that field and return it here
-            # return_dict["tools"] = [tool for tool in all_available_tools if tool.json_schema in memgpt_agent.functions]
-
-            # get tool info from agent state
-            tools = []
-            for tool_name in agent_state.tools:
-                tool = self.ms.get_tool(tool_name=tool_name, user_id=user_id)
-                tools.append(tool)
-            return_dict["tools"] = tools
-
-            # Add information about memory (raw core, size of recall, size of archival)
-            core_memory = memgpt_agent.memory
-            recall_memory = memgpt_agent.persistence_manager.recall_memory
-            archival_memory = memgpt_agent.persistence_manager.archival_memory
-            memory_obj = {
-                "core_memory": core_memory.to_flat_dict(),
-                "recall_memory": len(recall_memory) if recall_memory is not None else None,
-                "archival_memory": len(archival_memory) if archival_memory is not None else None,
-            }
-            return_dict["memory"] = memory_obj
-
-            # Add information about last run
-            # NOTE: 'last_run' is just the timestamp on the latest message in the buffer
-            # Retrieve the Message object via the recall storage or by directly access _messages
-            last_msg_obj = memgpt_agent._messages[-1]
-            return_dict["last_run"] = last_msg_obj.created_at
-
-            # Add information about attached sources
-            sources_ids = self.ms.list_attached_sources(agent_id=agent_state.id)
-            sources = [self.ms.get_source(source_id=s_id) for s_id in sources_ids]
-            return_dict["sources"] = [vars(s) for s in sources]
-
-        # Sort agents by "last_run" in descending order, most recent first
-        agents_states_dicts.sort(key=lambda x: x["last_run"], reverse=True)
-
-        logger.debug(f"Retrieved {len(agents_states)} agents for user {user_id}")
+    # TODO make return type pydantic
+    def list_agents_legacy(
+        self,
+        user_id: str,
+    ) -> dict:
+        """List all available agents to a user (in the format of the old agent listing)"""
+        summaries = self.list_agent_summaries(user_id=user_id)
+        agents = []
+        for summary in summaries:
+            agents.append(
+                {
+                    "id": summary.id,
+                    "name": summary.name,
+                    "human": summary.human,
+                    "persona": summary.persona,
+                    "created_at": summary.created_at.isoformat(),
+                    "tools": summary.tools,
+                    "memory": {
+                        "core_memory": summary.core_memory,
+                        "recall_memory": summary.recall_memory_size,
+                        "archival_memory": summary.archival_memory_size,
+                    },
+                    "last_run": summary.last_run,
+                    "sources": [vars(source) for source in summary.sources],
+                }
+            )
         return {
-            "num_agents": len(agents_states),
-            "agents": agents_states_dicts,
+            "num_agents": len(agents),
+            "agents": agents,
         }
 
     # blocks
@@ -992,6 +1118,16 @@ class SyncServer(Server):
         agent = self._get_or_load_agent(agent_id=agent_id)
         return RecallMemorySummary(size=len(agent.persistence_manager.recall_memory))
 
+    def get_context_window_summary(self, agent_id: str) -> ContextWindowSummary:
+        agent = self._get_or_load_agent(agent_id=agent_id)
+        return ContextWindowSummary(
+            num_tokens=agent.token_ledger.total_tokens,
+            context_window=agent.agent_state.llm_config.context_window,
+            message_tokens=agent.token_ledger.message_tokens,
+            function_tokens=agent.token_ledger.function_tokens,
+            num_messages=len(agent._messages),
+        )
+
     def get_in_context_message_ids(self, agent_id: str) -> List[str]:
         """Get the message ids of the in-context messages in the agent's memory"""
         # Get the agent object (loaded in memory)
@@ -1037,15 +1173,13 @@ class SyncServer(Server):
             # json_messages = [{**record.to_json(), "in_context": True} for record in messages]
 
         else:
-            # need to access persistence manager for additional messages
-            db_iterator = memgpt_agent.persistence_manager.recall_memory.storage.get_all_paginated(page_size=count, offset=start)
-
-            # get a single page of messages
-            # TODO: handle stop iteration
-            page = next(db_iterator, [])
+            # need to access persistence manager for additional messages, newest first like the in-context ones
+            db_iterator = memgpt_agent.persistence_manager.recall_memory.storage.get_all_paginated(
+                page_size=count, offset=start, reverse=True
+            )
 
-            # return messages in reverse chronological order
-            messages = sorted(page, key=lambda x: x.created_at, reverse=True)
+            # get a single page of messages (already in reverse chronological order)
+            messages = next(db_iterator, [])
 
             ## Convert to json
             ## Add a tag indicating in-context or not
@@ -1058,9 +1192,9 @@ class SyncServer(Server):
 
     def get_agent_archival(self, user_id: str, agent_id: str, start: int, count: int) -> List[Passage]:
         """Paginated query of all messages in agent archival memory"""
-        if self.ms.get_user(user_id=user_id) is None:
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
-        if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+        if not self._agent_exists(user_id, agent_id):
             raise ValueError(f"Agent agent_id={agent_id} does not exist")
 
         # Get the agent object (loaded in memory)
@@ -1082,10 +1216,15 @@ class SyncServer(Server):
         limit: Optional[int] = 100,
         order_by: Optional[str] = "created_at",
         reverse: Optional[bool] = False,
-    ) -> List[Passage]:
-        if self.ms.get_user(user_id=user_id) is None:
+        return_cursor: bool = False,
+    ) -> Union[List[Passage], Tuple[Optional[str], List[Passage]]]:
+        """Page of archival memory ordered by (order_by, id), after / before the records of earlier pages' cursors
+
+        With return_cursor, the cursor to continue after the page is returned along with the records.
+        """
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
-        if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+        if not self._agent_exists(user_id, agent_id):
             raise ValueError(f"Agent agent_id={agent_id} does not exist")
 
         # Get the agent object (loaded in memory)
@@ -1095,12 +1234,14 @@ class SyncServer(Server):
         cursor, records = memgpt_agent.persistence_manager.archival_memory.storage.get_all_cursor(
             after=after, before=before, limit=limit, order_by=order_by, reverse=reverse
         )
+        if return_cursor:
+            return cursor, records
         return records
 
     def insert_archival_memory(self, user_id: str, agent_id: str, memory_contents: str) -> List[Passage]:
-        if self.ms.get_user(user_id=user_id) is None:
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
-        if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+        if not self._agent_exists(user_id, agent_id):
             raise ValueError(f"Agent agent_id={agent_id} does not exist")
 
         # Get the agent object (loaded in memory)
@@ -1113,9 +1254,9 @@ class SyncServer(Server):
         return [memgpt_agent.persistence_manager.archival_memory.storage.get(id=passage_id) for passage_id in passage_ids]
 
     def delete_archival_memory(self, user_id: str, agent_id: str, memory_id: str):
-        if self.ms.get_user(user_id=user_id) is None:
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
-        if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+        if not self._agent_exists(user_id, agent_id):
             raise ValueError(f"Agent agent_id={agent_id} does not exist")
 
         # TODO: should return a passage
@@ -1125,7 +1266,7 @@ class SyncServer(Server):
 
         # Delete by ID
         # TODO check if it exists first, and throw error if not
-        memgpt_agent.persistence_manager.archival_memory.storage.delete({"id": memory_id})
+        memgpt_agent.persistence_manager.archival_memory.delete(filters={"id": memory_id})
 
         # TODO: return archival memory
 
@@ -1139,10 +1280,15 @@ class SyncServer(Server):
         order_by: Optional[str] = "created_at",
         order: Optional[str] = "asc",
         reverse: Optional[bool] = False,
-    ) -> List[Message]:
-        if self.ms.get_user(user_id=user_id) is None:
+        return_cursor: bool = False,
+    ) -> Union[List[Message], Tuple[Optional[str], List[Message]]]:
+        """Page of recall memory ordered by (order_by, id), after / before the records of earlier pages' cursors
+
+        With return_cursor, the cursor to continue after the page is returned along with the records.
+        """
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
-        if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+        if not self._agent_exists(user_id, agent_id):
             raise ValueError(f"Agent agent_id={agent_id} does not exist")
 
         # Get the agent object (loaded in memory)
@@ -1152,14 +1298,16 @@ class SyncServer(Server):
         cursor, records = memgpt_agent.persistence_manager.recall_memory.storage.get_all_cursor(
             after=after, before=before, limit=limit, order_by=order_by, reverse=reverse
         )
+        if return_cursor:
+            return cursor, records
         return records
 
     def get_agent_state(self, user_id: str, agent_id: Optional[str], agent_name: Optional[str] = None) -> Optional[AgentState]:
         """Return the config of an agent"""
-        if self.ms.get_user(user_id=user_id) is None:
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
         if agent_id:
-            if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+            if not self._agent_exists(user_id, agent_id):
                 return None
         else:
             agent_state = self.ms.get_agent(agent_name=agent_name, user_id=user_id)
@@ -1222,9 +1370,9 @@ class SyncServer(Server):
 
     def update_agent_core_memory(self, user_id: str, agent_id: str, new_memory_contents: dict) -> Memory:
         """Update the agents core memory block, return the new state"""
-        if self.ms.get_user(user_id=user_id) is None:
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
-        if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+        if not self._agent_exists(user_id, agent_id):
             raise ValueError(f"Agent agent_id={agent_id} does not exist")
 
         # Get the agent object (loaded in memory)
@@ -1253,9 +1401,9 @@ class SyncServer(Server):
 
     def rename_agent(self, user_id: str, agent_id: str, new_agent_name: str) -> AgentState:
         """Update the name of the agent in the database"""
-        if self.ms.get_user(user_id=user_id) is None:
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
-        if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+        if not self._agent_exists(user_id, agent_id):
             raise ValueError(f"Agent agent_id={agent_id} does not exist")
 
         # Get the agent object (loaded in memory)
@@ -1276,14 +1424,16 @@ class SyncServer(Server):
         return memgpt_agent.agent_state
 
     def delete_user(self, user_id: str):
-        # TODO: delete user
-        pass
+        """Delete a user along with its agents and sources"""
+        # TODO: delete the agents' recall / archival memory
+        self.ms.delete_user(user_id=user_id)
+        self.identity_cache.invalidate_user(user_id)
 
     def delete_agent(self, user_id: str, agent_id: str):
         """Delete an agent in the database"""
-        if self.ms.get_user(user_id=user_id) is None:
+        if not self._user_exists(user_id):
             raise ValueError(f"User user_id={user_id} does not exist")
-        if self.ms.get_agent(agent_id=agent_id, user_id=user_id) is None:
+        if not self._agent_exists(user_id, agent_id):
             raise ValueError(f"Agent agent_id={agent_id} does not exist")
 
         # Verify that the agent exists and is owned by the user
@@ -1294,9 +1444,8 @@ class SyncServer(Server):
             raise ValueError(f"Could not authorize agent_id={agent_id} with user_id={user_id}")
 
         # First, if the agent is in the in-memory cache we should remove it
-        # List of {'user_id': user_id, 'agent_id': agent_id, 'agent': agent_obj} dicts
         try:
-            self.active_agents = [d for d in self.active_agents if str(d["agent_id"]) != str(agent_id)]
+            self.active_agents.remove(agent_id=agent_id)
         except Exception as e:
             logger.exception(f"Failed to delete agent {agent_id} from cache via ID with:\n{str(e)}")
             raise ValueError(f"Failed to delete agent {agent_id} from cache")
@@ -1307,6 +1456,8 @@ class SyncServer(Server):
         except Exception as e:
             logger.exception(f"Failed to delete agent {agent_id} via ID with:\n{str(e)}")
             raise ValueError(f"Failed to delete agent {agent_id} in database")
+        finally:
+            self.identity_cache.invalidate_agent(agent_id)
 
     def authenticate_user(self) -> str:
         # TODO: Implement actual authentication to enable multi user setup
@@ -1314,10 +1465,14 @@ class SyncServer(Server):
 
     def api_key_to_user(self, api_key: str) -> str:
         """Decode an API key to a user"""
+        user_id = self.identity_cache.get_user_id(api_key)
+        if user_id is not None:
+            return user_id
         user = self.ms.get_user_from_api_key(api_key=api_key)
         if user is None:
             raise HTTPException(status_code=403, detail="Invalid credentials")
         else:
+            self.identity_cache.put_api_key(api_key, user.id)
             return user.id
 
     def create_api_key(self, request: APIKeyCreate) -> APIKey:  # TODO: add other fields
@@ -1336,6 +1491,7 @@ class SyncServer(Server):
         if api_key_obj is None:
             raise ValueError("API key does not exist")
         self.ms.delete_api_key(api_key=api_key)
+        self.identity_cache.invalidate_api_key(api_key)
         return api_key_obj
 
     def create_source(self, request: SourceCreate, user_id: str) -> Source:  # TODO: add other fields
@@ -1404,35 +1560,127 @@ class SyncServer(Server):
     def list_active_jobs(self, user_id: str) -> List[Job]:
         """List all active jobs for a user"""
         jobs = self.ms.list_jobs(user_id=user_id)
-        return [job for job in jobs if job.status in [JobStatus.created, JobStatus.running]]
+        return [job for job in jobs if job.status in [JobStatus.created, JobStatus.pending, JobStatus.running]]
+
+    def submit_file_to_source(self, user_id: str, source_id: str, filename: Optional[str], content: bytes) -> Job:
+        """Create a job that loads the file into the source in the background (see IngestionWorker)"""
+        # only keep the name of the uploaded file, and make sure it stays inside the job's upload dir
+        filename = os.path.basename(filename or "")
+        if filename in ("", ".", ".."):
+            filename = "upload"
+        job = Job(
+            user_id=user_id,
+            status=JobStatus.pending,
+            metadata_={"type": INGESTION_JOB_TYPE, "filename": filename, "source_id": source_id},
+        )
+
+        # keep the file until the job is done, so an interrupted job can be resumed
+        upload_dir = os.path.join(settings.ingestion_upload_dir or os.path.join(constants.MEMGPT_DIR, "uploads"), job.id)
+        os.makedirs(upload_dir, exist_ok=True)
+        file_path = os.path.join(upload_dir, filename)
+        with open(file_path, "wb") as f:
+            f.write(content)
+        job.metadata_["file_path"] = file_path
+
+        self.ms.create_job(job)
+        self.ingestion_worker.submit(job.id)
+        return job
+
+    def create_assistant_run(
+        self,
+        user_id: str,
+        agent_id: str,
+        assistant_id: str,
+        instructions: str,
+        model: Optional[str] = None,
+        metadata: Optional[dict] = None,
+    ) -> Job:
+        """Create a job that runs the agent on the messages added to it in the background (see AssistantRunWorker)"""
+        agent_state = self.ms.get_agent(agent_id=agent_id, user_id=user_id)
+        if agent_state is None:
+            raise ValueError(f"Agent agent_id={agent_id} does not exist")
+        job = Job(
+            user_id=user_id,
+            status=JobStatus.pending,
+            metadata_={
+                "type": ASSISTANT_RUN_JOB_TYPE,
+                "thread_id": agent_id,
+                "assistant_id": assistant_id,
+                "model": model or agent_state.llm_config.model,
+                "instructions": instructions,
+                "run_metadata": metadata,
+                "steps": [],
+            },
+        )
+        self.ms.create_job(job)
+        self.assistant_run_worker.submit(job.id)
+        return job
+
+    def get_assistant_run(self, user_id: str, agent_id: str, run_id: str) -> Job:
+        job = self.ms.get_job(run_id)
+        if (
+            job is None
+            or job.user_id != user_id
+            or (job.metadata_ or {}).get("type") != ASSISTANT_RUN_JOB_TYPE
+            or job.metadata_["thread_id"] != agent_id
+        ):
+            raise ValueError(f"Run run_id={run_id} does not exist")
+        return job
+
+    def list_assistant_runs(self, user_id: str, agent_id: str) -> List[Job]:
+        """Runs on the agent, oldest first"""
+        jobs = [
+            job
+            for job in self.ms.list_jobs(user_id=user_id)
+            if (job.metadata_ or {}).get("type") == ASSISTANT_RUN_JOB_TYPE and job.metadata_["thread_id"] == agent_id
+        ]
+        return sorted(jobs, key=lambda job: job.created_at)
+
+    def cancel_assistant_run(self, user_id: str, agent_id: str, run_id: str) -> Job:
+        self.get_assistant_run(user_id=user_id, agent_id=agent_id, run_id=run_id)
+        return self.assistant_run_worker.cancel(run_id)
 
     def load_file_to_source(self, source_id: str, file_path: str, job_id: str) -> Job:
+        """Load a file into a source, tracking progress in the job
 
+        Continues from the progress saved in the job (documents already loaded are skipped). If loading fails, the job is
+        marked as failed with the error in its metadata.
+        """
         # update job
         job = self.ms.get_job(job_id)
         job.status = JobStatus.running
+        job.metadata_ = job.metadata_ or {}
         self.ms.update_job(job)
 
-        # try:
+        def save_progress(progress: dict):
+            job.metadata_.update(progress)
+            self.ms.update_job(job)
+
         from memgpt.data_sources.connectors import DirectoryConnector
 
-        source = self.ms.get_source(source_id=source_id)
-        connector = DirectoryConnector(input_files=[file_path])
-        num_passages, num_documents = self.load_data(user_id=source.user_id, source_name=source.name, connector=connector)
-        # except Exception as e:
-        #    # job failed with error
-        #    error = str(e)
-        #    print(error)
-        #    job.status = JobStatus.failed
-        #    job.metadata_["error"] = error
-        #    self.ms.update_job(job)
-        #    # TODO: delete any associated passages/documents?
-
-        #    # return failed job
-        #    return job
+        try:
+            source = self.ms.get_source(source_id=source_id)
+            if source is None:
+                raise ValueError(f"Source {source_id} does not exist")
+            connector = DirectoryConnector(input_files=[file_path])
+            num_passages, num_documents = self.load_data(
+                user_id=source.user_id,
+                source_name=source.name,
+                connector=connector,
+                resume_from=job.metadata_,
+                on_progress=save_progress,
+            )
+        except Exception as e:
+            # passages stored so far are kept (they are overwritten if the file is loaded again)
+            logger.error(f"Loading {file_path} into source {source_id} failed: {e}")
+            job.status = JobStatus.failed
+            job.metadata_["error"] = str(e)
+            self.ms.update_job(job)
+            return job
 
         # update job status
         job.status = JobStatus.completed
+        job.completed_at = get_utc_time()
         job.metadata_["num_passages"] = num_passages
         job.metadata_["num_documents"] = num_documents
         self.ms.update_job(job)
@@ -1444,10 +1692,10 @@ class SyncServer(Server):
         user_id: str,
         connector: DataConnector,
         source_name: str,
+        resume_from: Optional[dict] = None,
+        on_progress: Optional[Callable[[dict], None]] = None,
     ) -> Tuple[int, int]:
-        """Load data from a DataConnector into a source for a specified user_id"""
-        # TODO: this should be implemented as a batch job or at least async, since it may take a long time
-
+        """Load data from a DataConnector into a source for a specified user_id (see memgpt.data_sources.connectors.load_data)"""
         # load data from a data source into the document store
         source = self.ms.get_source(source_name=source_name, user_id=user_id)
         if source is None:
@@ -1459,7 +1707,9 @@ class SyncServer(Server):
         document_store = None  # StorageConnector.get_storage_connector(TableType.DOCUMENTS, self.config, user_id=user_id)
 
         # load data into the document store
-        passage_count, document_count = load_data(connector, source, passage_store, document_store)
+        passage_count, document_count = load_data(
+            connector, source, passage_store, document_store, resume_from=resume_from, on_progress=on_progress
+        )
         return passage_count, document_count
 
     def attach_source_to_agent(
@@ -1475,14 +1725,11 @@ class SyncServer(Server):
         if data_source is None:
             raise ValueError(f"Data source id={source_id} name={source_name} does not exist for user_id {user_id}")
 
-        # get connection to data source storage
-        source_connector = StorageConnector.get_storage_connector(TableType.PASSAGES, self.config, user_id=user_id)
-
         # load agent
         agent = self._get_or_load_agent(agent_id=agent_id)
 
-        # attach source to agent
-        agent.attach_source(data_source.id, source_connector, self.ms)
+        # attach source to agent (metadata only, the source passages are searched in place)
+        agent.attach_source(data_source.id, self.ms)
 
         return data_source
 
@@ -1494,8 +1741,19 @@ class SyncServer(Server):
         source_id: Optional[str] = None,
         source_name: Optional[str] = None,
     ) -> Source:
-        # TODO: remove all passages coresponding to source from agent's archival memory
-        raise NotImplementedError
+        # detach a data source from an agent
+        data_source = self.ms.get_source(source_id=source_id, user_id=user_id, source_name=source_name)
+        if data_source is None:
+            raise ValueError(f"Data source id={source_id} name={source_name} does not exist for user_id {user_id}")
+
+        # load agent
+        agent = self._get_or_load_agent(agent_id=agent_id)
+
+        # detach source from agent
+        # NOTE: passages copied into archival memory by older versions of attach_source are not removed
+        agent.detach_source(data_source.id, self.ms)
+
+        return data_source
 
     def list_attached_sources(self, agent_id: str) -> List[Source]:
         # list all attached sources to an agent
@@ -1671,6 +1929,8 @@ class SyncServer(Server):
             tags = [module_name]
             if module_name == "base":
                 tags.append("memgpt-base")
+            if name in getattr(module, "PARALLEL_SAFE_FUNCTIONS", []):
+                tags.append(constants.PARALLEL_SAFE_TOOL_TAG)
 
             # create to tool
             self.create_tool(
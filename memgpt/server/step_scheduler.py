@@ -0,0 +1,151 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple
+
+from memgpt.errors import ServerOverloadedError
+
+
+class StepScheduler:
+    """Schedules agent steps coming from the API
+
+    Steps of the same agent take turns in FIFO order, so two requests never drive the same agent (and its streaming
+    interface) at once. Steps themselves run on a bounded worker pool, and once max_queued steps are waiting new
+    requests are rejected instead of piling up.
+    """
+
+    def __init__(self, max_workers: int, max_queued: int):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="memgpt-step")
+
+        # per-agent turn locks, dropped once no request is holding or waiting on them (only touched from the event loop)
+        self._agent_locks: Dict[str, asyncio.Lock] = {}
+        self._agent_lock_users: Dict[str, int] = {}
+        # turns held by step_in_turn until their step is done (referenced so the tasks aren't garbage collected)
+        self._turn_holders: Set[asyncio.Task] = set()
+
+        # counters are also updated from the worker threads
+        self._counter_lock = threading.Lock()
+        self.waiting = 0  # waiting for their agent's turn or for a free worker
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+
+    def _add_waiting(self, n: int):
+        with self._counter_lock:
+            self.waiting += n
+            self.max_queue_depth = max(self.max_queue_depth, self.waiting)
+
+    def check_capacity(self):
+        """Raise ServerOverloadedError if the queue is full"""
+        with self._counter_lock:
+            if self.waiting >= self.max_queued:
+                self.rejected += 1
+                raise ServerOverloadedError(f"Server is overloaded ({self.waiting} requests queued), try again later")
+
+    @asynccontextmanager
+    async def agent_turn(self, agent_id: str):
+        """Wait until every earlier request for this agent is done"""
+        self.check_capacity()
+        lock = self._agent_locks.setdefault(agent_id, asyncio.Lock())
+        self._agent_lock_users[agent_id] = self._agent_lock_users.get(agent_id, 0) + 1
+        self._add_waiting(1)
+        try:
+            try:
+                await lock.acquire()
+            finally:
+                self._add_waiting(-1)
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            self._agent_lock_users[agent_id] -= 1
+            if self._agent_lock_users[agent_id] == 0:
+                del self._agent_lock_users[agent_id]
+                del self._agent_locks[agent_id]
+
+    @asynccontextmanager
+    async def step_in_turn(self, agent_id: str, start: Callable[[], Tuple[asyncio.Future, Any]]):
+        """Wait for the agent's turn, then start its step with start() (returning the step's future, and anything else)
+
+        Yields what start returned. The turn is held until both the block has exited and the step is done, so a caller that
+        goes away mid-step (e.g. a disconnected streaming client) can't let the agent's next request overlap the step.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+        released = loop.create_future()
+
+        async def hold_turn():
+            try:
+                async with self.agent_turn(agent_id):
+                    result = start()
+                    started.set_result(result)
+                    await asyncio.wait([result[0], released])
+            except BaseException as e:
+                if not started.done():
+                    started.set_exception(e)
+                if not isinstance(e, Exception):
+                    raise
+
+        holder = loop.create_task(hold_turn())
+        self._turn_holders.add(holder)
+        holder.add_done_callback(self._turn_holders.discard)
+        try:
+            try:
+                result = await asyncio.shield(started)
+            except asyncio.CancelledError:
+                # gone before its turn came, so the step is never started
+                if not started.done():
+                    holder.cancel()
+                raise
+            yield result
+        finally:
+            if not released.done():
+                released.set_result(None)
+
+    def run(self, func: Callable[[], Any]) -> asyncio.Future:
+        """Run func on the worker pool"""
+        self._add_waiting(1)
+        return asyncio.get_running_loop().run_in_executor(self.executor, self._run, func)
+
+    def run_async(self, coro: Awaitable) -> asyncio.Task:
+        """Run a coroutine on the event loop instead of the worker pool (for the AsyncServer, counted like the other steps)"""
+        self._add_waiting(1)
+        return asyncio.ensure_future(self._run_async(coro))
+
+    async def _run_async(self, coro: Awaitable) -> Any:
+        with self._counter_lock:
+            self.waiting -= 1
+            self.running += 1
+        try:
+            return await coro
+        finally:
+            with self._counter_lock:
+                self.running -= 1
+                self.completed += 1
+
+    def _run(self, func: Callable[[], Any]) -> Any:
+        with self._counter_lock:
+            self.waiting -= 1
+            self.running += 1
+        try:
+            return func()
+        finally:
+            with self._counter_lock:
+                self.running -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queued": self.max_queued,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_queue_depth,
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
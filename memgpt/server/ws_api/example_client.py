@@ -6,6 +6,7 @@ import websockets
 import memgpt.server.ws_api.protocol as protocol
 from memgpt.server.constants import WS_CLIENT_TIMEOUT, WS_DEFAULT_PORT
 from memgpt.server.utils import condition_to_stop_receiving, print_server_response
+from memgpt.utils import json_dumps, json_loads
 
 # CLEAN_RESPONSES = False  # print the raw server responses (JSON)
 CLEAN_RESPONSES = True  # make the server responses cleaner
@@ -1,8 +1,10 @@
 import asyncio
 import threading
+from typing import Optional
 
 import memgpt.server.ws_api.protocol as protocol
 from memgpt.interface import AgentInterface
+from memgpt.server.rest_api.interface import AsyncStreamQueue
 
 
 class BaseWebSocketInterface(AgentInterface):
@@ -22,6 +24,47 @@ class BaseWebSocketInterface(AgentInterface):
     def step_yield(self):
         pass
 
+    def step_complete(self):
+        pass
+
+
+class WebSocketAgentInterface(BaseWebSocketInterface):
+    """Interface of a single agent, forwards its messages to the connection whose turn is running
+
+    The agent steps on a worker thread, so nothing is sent from here: messages are tagged with the agent ID and put on
+    the connection's outbox, which the connection's sender task drains on the event loop. The server attaches the outbox
+    for the duration of a turn (turns of one agent never overlap, see StepScheduler.agent_turn).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.agent_id: Optional[str] = None
+        self.outbox: Optional[AsyncStreamQueue] = None
+
+    def attach(self, outbox: AsyncStreamQueue, agent_id: str):
+        self.agent_id = agent_id
+        self.outbox = outbox
+
+    def detach(self):
+        self.outbox = None
+
+    def _send(self, msg: str):
+        outbox = self.outbox
+        if outbox is not None:
+            outbox.put(msg)
+
+    def user_message(self, msg, msg_obj=None):
+        pass
+
+    def internal_monologue(self, msg, msg_obj=None):
+        self._send(protocol.server_agent_internal_monologue(msg, agent_id=self.agent_id))
+
+    def assistant_message(self, msg, msg_obj=None):
+        self._send(protocol.server_agent_assistant_message(msg, agent_id=self.agent_id))
+
+    def function_message(self, msg, msg_obj=None):
+        self._send(protocol.server_agent_function_message(msg, agent_id=self.agent_id))
+
 
 class AsyncWebSocketInterface(BaseWebSocketInterface):
     """WebSocket calls are async"""
@@ -24,57 +24,63 @@ def server_command_response(status):
     )
 
 
-def server_agent_response_error(msg):
+def server_agent_response_error(msg, agent_id=None):
     return json_dumps(
         {
             "type": "agent_response_error",
             "message": msg,
+            "agent_id": agent_id,
         }
     )
 
 
-def server_agent_response_start():
+def server_agent_response_start(agent_id=None):
     return json_dumps(
         {
             "type": "agent_response_start",
+            "agent_id": agent_id,
         }
     )
 
 
-def server_agent_response_end():
+def server_agent_response_end(agent_id=None):
     return json_dumps(
         {
             "type": "agent_response_end",
+            "agent_id": agent_id,
         }
     )
 
 
-def server_agent_internal_monologue(msg):
+def server_agent_internal_monologue(msg, agent_id=None):
     return json_dumps(
         {
             "type": "agent_response",
             "message_type": "internal_monologue",
             "message": msg,
+            "agent_id": agent_id,
         }
     )
 
 
-def server_agent_assistant_message(msg):
+def server_agent_assistant_message(msg, agent_id=None):
     return json_dumps(
         {
             "type": "agent_response",
             "message_type": "assistant_message",
             "message": msg,
+            "agent_id": agent_id,
         }
     )
 
 
-def server_agent_function_message(msg):
+def server_agent_function_message(msg, agent_id=None):
     return json_dumps(
         {
             "type": "agent_response",
             "message_type": "function_message",
             "message": msg,
+            "agent_id": agent_id,
         }
     )
 
@@ -82,21 +88,23 @@ def server_agent_function_message(msg):
 # Client -> server
 
 
-def client_user_message(msg, agent_id=None):
+def client_user_message(msg, agent_id=None, user_id=None):
     return json_dumps(
         {
             "type": "user_message",
             "message": msg,
             "agent_id": agent_id,
+            "user_id": user_id,
         }
     )
 
 
-def client_command_create(config):
+def client_command_create(config, user_id=None):
     return json_dumps(
         {
             "type": "command",
             "command": "create_agent",
             "config": config,
+            "user_id": user_id,
         }
     )
@@ -1,23 +1,62 @@
 import asyncio
-import json
 import signal
 import sys
 import traceback
+from functools import partial
+from typing import Coroutine, Optional, Set, Union
 
 import websockets
 
 import memgpt.server.ws_api.protocol as protocol
+from memgpt.errors import ServerOverloadedError
+from memgpt.schemas.agent import CreateAgent
+from memgpt.schemas.message import Message
 from memgpt.server.constants import WS_DEFAULT_PORT
+from memgpt.server.rest_api.interface import AsyncStreamQueue
 from memgpt.server.server import SyncServer
-from memgpt.server.ws_api.interface import SyncWebSocketInterface
+from memgpt.server.ws_api.interface import WebSocketAgentInterface
+from memgpt.settings import settings
+from memgpt.utils import json_loads
+
+
+class WebSocketClient:
+    """A client connection: the messages waiting to be sent to it, and the tasks (agent turns) it has in flight"""
+
+    def __init__(self, websocket, max_turns: int):
+        self.websocket = websocket
+        self.outbox = AsyncStreamQueue()
+        self.tasks: Set[asyncio.Task] = set()
+        self.turn_slots = asyncio.Semaphore(max_turns)
+        self.closed = False
+
+    def send(self, msg: str):
+        """Queue a message for the client (callable from any thread, messages go out in the order they were queued)"""
+        self.outbox.put(msg)
+
+    async def run_sender(self):
+        """Drain the outbox onto the socket, the only place that writes to it"""
+        try:
+            while True:
+                await self.websocket.send(await self.outbox.get())
+        except websockets.exceptions.ConnectionClosed:
+            pass
 
 
 class WebSocketServer:
+    """Serves agents over websockets
+
+    Every message from a client is handled in its own task, so a connection can talk to several agents at once (replies
+    carry the agent ID). Turns of one agent are queued in order (across connections), and steps run on the server's
+    worker pool instead of the event loop. The agents' messages, and the agent_response_start / end markers around each
+    turn, go through the connection's outbox, so the end marker always follows every message of the turn.
+    """
+
     def __init__(self, host="localhost", port=WS_DEFAULT_PORT):
         self.host = host
         self.port = port
-        self.interface = SyncWebSocketInterface()
-        self.server = SyncServer(default_interface=self.interface)
+        # every agent gets its own interface, attached to the connection whose turn is running
+        self.server = SyncServer(default_interface_factory=lambda: WebSocketAgentInterface())
+        self.clients: Set[WebSocketClient] = set()
 
     def shutdown_server(self):
         try:
@@ -25,11 +64,6 @@ class WebSocketServer:
             print(f"Saved agents")
         except Exception as e:
             print(f"Saving agents failed with: {e}")
-        try:
-            self.interface.close()
-            print(f"Closed the WS interface")
-        except Exception as e:
-            print(f"Closing the WS interface failed with: {e}")
 
     def initialize_server(self):
         print("Server is initializing...")
@@ -46,69 +80,96 @@ class WebSocketServer:
     def run(self):
         return self.start_server()  # Return the coroutine
 
-    async def handle_client(self, websocket, path):
-        self.interface.register_client(websocket)
+    async def handle_client(self, websocket, path=None):
+        client = WebSocketClient(websocket, max_turns=settings.ws_max_turns_per_connection)
+        self.clients.add(client)
+        sender = asyncio.create_task(client.run_sender())
         try:
-            # async for message in websocket:
-            while True:
-                message = await websocket.recv()
-
-                # Assuming the message is a JSON string
-                try:
-                    data = json_loads(message)
-                except:
-                    print(f"[server] bad data from client:\n{data}")
-                    await websocket.send(protocol.server_command_response(f"Error: bad data from client - {str(data)}"))
-                    continue
-
-                if "type" not in data:
-                    print(f"[server] bad data from client (JSON but no type):\n{data}")
-                    await websocket.send(protocol.server_command_response(f"Error: bad data from client - {str(data)}"))
-
-                elif data["type"] == "command":
-                    # Create a new agent
-                    if data["command"] == "create_agent":
-                        try:
-                            # self.agent = self.create_new_agent(data["config"])
-                            self.server.create_agent(user_id="NULL", agent_config=data["config"])
-                            await websocket.send(protocol.server_command_response("OK: Agent initialized"))
-                        except Exception as e:
-                            self.agent = None
-                            print(f"[server] self.create_new_agent failed with:\n{e}")
-                            print(f"{traceback.format_exc()}")
-                            await websocket.send(protocol.server_command_response(f"Error: Failed to init agent - {str(e)}"))
-
-                    else:
-                        print(f"[server] unrecognized client command type: {data}")
-                        await websocket.send(protocol.server_error(f"unrecognized client command type: {data}"))
-
-                elif data["type"] == "user_message":
-                    user_message = data["message"]
-
-                    if "agent_id" not in data or data["agent_id"] is None:
-                        await websocket.send(protocol.server_agent_response_error("agent_name was not specified in the request"))
-                        continue
-
-                    await websocket.send(protocol.server_agent_response_start())
+            async for message in websocket:
+                self.handle_message(client, message)
+        except websockets.exceptions.ConnectionClosed:
+            print(f"[server] connection with client was closed")
+        finally:
+            # turns that already started run to completion (their step can't be interrupted), queued ones are dropped
+            client.closed = True
+            self.clients.discard(client)
+            sender.cancel()
+
+    def handle_message(self, client: WebSocketClient, message: Union[str, bytes]):
+        try:
+            data = json_loads(message)
+        except:
+            print(f"[server] bad data from client:\n{message}")
+            client.send(protocol.server_command_response(f"Error: bad data from client - {str(message)}"))
+            return
+
+        if not isinstance(data, dict) or "type" not in data:
+            print(f"[server] bad data from client (JSON but no type):\n{data}")
+            client.send(protocol.server_command_response(f"Error: bad data from client - {str(data)}"))
+
+        elif data["type"] == "command":
+            if data.get("command") == "create_agent":
+                self.start_task(client, self.create_agent(client, user_id=data.get("user_id"), config=data.get("config") or {}))
+            else:
+                print(f"[server] unrecognized client command type: {data}")
+                client.send(protocol.server_error(f"unrecognized client command type: {data}"))
+
+        elif data["type"] == "user_message":
+            if data.get("agent_id") is None:
+                client.send(protocol.server_agent_response_error("agent_id was not specified in the request"))
+                return
+            self.start_task(client, self.run_turn(client, user_id=data.get("user_id"), agent_id=data["agent_id"], message=data["message"]))
+
+        # ... handle other message types as needed ...
+        else:
+            print(f"[server] unrecognized client package data type: {data}")
+            client.send(protocol.server_error(f"unrecognized client package data type: {data}"))
+
+    def start_task(self, client: WebSocketClient, coro: Coroutine):
+        task = asyncio.create_task(coro)
+        client.tasks.add(task)
+        task.add_done_callback(client.tasks.discard)
+
+    async def create_agent(self, client: WebSocketClient, user_id: Optional[str], config: dict):
+        try:
+            request = CreateAgent(**config)
+            agent_state = await self.server.step_scheduler.run(partial(self.server.create_agent, request=request, user_id=user_id))
+            client.send(protocol.server_command_response(f"OK: Agent initialized ({agent_state.id})"))
+        except Exception as e:
+            print(f"[server] self.server.create_agent failed with:\n{e}")
+            print(f"{traceback.format_exc()}")
+            client.send(protocol.server_command_response(f"Error: Failed to init agent - {str(e)}"))
+
+    async def run_turn(self, client: WebSocketClient, user_id: Optional[str], agent_id: str, message: Union[str, Message]):
+        """Run a user message through the agent, between agent_response_start / end markers"""
+        try:
+            # a connection only gets so many turns waiting or running, the rest wait here instead of in the step queue
+            async with client.turn_slots:
+                async with self.server.step_scheduler.agent_turn(agent_id):
+                    if client.closed:
+                        return
+                    client.send(protocol.server_agent_response_start(agent_id=agent_id))
                     try:
-                        # self.run_step(user_message)
-                        self.server.user_message(user_id="NULL", agent_id=data["agent_id"], message=user_message)
+                        await self.server.step_scheduler.run(partial(self.step, client, user_id, agent_id, message))
                     except Exception as e:
                         print(f"[server] self.server.user_message failed with:\n{e}")
                         print(f"{traceback.format_exc()}")
-                        await websocket.send(protocol.server_agent_response_error(f"server.user_message failed with: {e}"))
-                    await asyncio.sleep(1)  # pause before sending the terminating message, w/o this messages may be missed
-                    await websocket.send(protocol.server_agent_response_end())
-
-                # ... handle other message types as needed ...
-                else:
-                    print(f"[server] unrecognized client package data type: {data}")
-                    await websocket.send(protocol.server_error(f"unrecognized client package data type: {data}"))
-
-        except websockets.exceptions.ConnectionClosed:
-            print(f"[server] connection with client was closed")
+                        client.send(protocol.server_agent_response_error(f"server.user_message failed with: {e}", agent_id=agent_id))
+                    # all messages of the step are already in the outbox, ahead of the end marker
+                    client.send(protocol.server_agent_response_end(agent_id=agent_id))
+        except ServerOverloadedError as e:
+            client.send(protocol.server_agent_response_error(str(e), agent_id=agent_id))
+
+    def step(self, client: WebSocketClient, user_id: Optional[str], agent_id: str, message: Union[str, Message]):
+        """Runs on the worker pool, with the agent's interface attached to the client for the duration of the step"""
+        interface = self.server._get_or_load_agent(agent_id=agent_id).interface
+        if not isinstance(interface, WebSocketAgentInterface):
+            raise ValueError(f"Agent has wrong type of interface: {type(interface)}")
+        interface.attach(client.outbox, agent_id)
+        try:
+            return self.server.user_message(user_id=user_id, agent_id=agent_id, message=message)
         finally:
-            self.interface.unregister_client(websocket)
+            interface.detach()
 
 
 def start_server():
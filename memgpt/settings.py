@@ -22,6 +22,72 @@ class Settings(BaseSettings):
     # agent configuration defaults
     default_preset: Optional[str] = "memgpt_chat"
 
+    # in-memory agents held by the server (least recently used / idle agents are saved and unloaded)
+    agent_cache_size: int = 100
+    agent_cache_idle_ttl: Optional[float] = 3600.0  # seconds, None or 0 to disable
+
+    # API key -> user and user / agent existence lookups are cached (seconds, 0 disables the cache)
+    identity_cache_ttl: float = 30.0
+    identity_cache_size: int = 10000
+
+    # agent steps run on a bounded worker pool, requests beyond the queue limit are rejected (429)
+    max_concurrent_steps: int = 8
+    max_queued_steps: int = 64
+
+    # several tool calls in one model response: parallel-safe tools run concurrently on a shared bounded pool
+    parallel_tool_calls: bool = False  # let OpenAI models return more than one tool call per response
+    tool_execution_workers: int = 8
+    tool_execution_timeout: Optional[float] = 60.0  # seconds per parallel-safe tool call, None to disable
+
+    # run the REST API on the AsyncServer (LLM calls are awaited on the event loop instead of holding a worker thread)
+    async_server: bool = False
+    max_concurrent_async_steps: int = 512  # agent turns in flight on the event loop
+
+    # websocket server: agent turns one connection can have waiting or running at once (over all of its agents)
+    ws_max_turns_per_connection: int = 16
+
+    # save agent state once at the end of each request instead of after every chained step
+    agent_write_behind: bool = False
+
+    # recall / archival memory sizes are counted in memory, and re-counted in the database at most this often (seconds)
+    memory_size_reconcile_interval: float = 300.0
+
+    # database connection pool, shared by the metadata store and all storage connectors using the same URI (postgres only)
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0  # seconds to wait for a free connection
+    db_pool_pre_ping: bool = True  # check connections before use (drops connections the server closed)
+    db_pool_recycle: int = 1800  # seconds after which a connection is replaced, -1 to disable
+
+    # pooled keep-alive connections for LLM / embedding API calls (see memgpt/http_pool.py)
+    http_pool_endpoints: int = 10  # number of endpoints (hosts) to keep connection pools for
+    http_pool_connections_per_endpoint: int = 16
+    http_keepalive_expiry: float = 60.0  # seconds an idle connection is kept open
+    http_timeout: Optional[float] = 600.0  # seconds, None to disable
+    http2: bool = True  # used when the h2 package is installed
+
+    # embedding requests (number of texts per request, and number of requests in flight)
+    embedding_batch_size: int = 32
+    embedding_concurrency: int = 4
+
+    # embedding cache (in-process LRU entries in front of a persistent sqlite file, 0 disables the cache)
+    embedding_cache_size: int = 10000
+    embedding_cache_path: Optional[Path] = None  # defaults to ~/.memgpt/embedding_cache.db
+
+    # file uploads are loaded by background workers (parse -> embed -> insert pipeline, see load_data)
+    ingestion_workers: int = 2  # jobs loaded at the same time
+    ingestion_queue_size: int = 4  # embedding groups buffered between pipeline stages
+    ingestion_insert_batch_size: int = 100
+    ingestion_upload_dir: Optional[Path] = None  # uploaded files are kept here until their job is done, defaults to ~/.memgpt/uploads
+
+    # OpenAI Assistants API runs are stepped in the background, queued runs wait for a free worker
+    assistant_run_workers: int = 4
+
+    # local LLM prompts: keep a byte-identical prefix across steps (system prompt + functions + history) by moving the
+    # per-step memory block to the end, so the backend can reuse its KV cache (see memgpt/local_llm/prompt_cache.py)
+    local_llm_cache_friendly_prompt: bool = False
+    local_llm_cache_slots: int = 0  # llama.cpp server slots to pin agents to (0 lets the server pick)
+
     @property
     def memgpt_pg_uri(self) -> str:
         if self.pg_uri:
@@ -0,0 +1,59 @@
+from typing import Dict, List, Optional
+
+from memgpt.local_llm.utils import num_tokens_from_functions, num_tokens_from_message
+from memgpt.schemas.message import Message
+
+# every reply is primed with <|start|>assistant<|message|>
+REPLY_PRIMING_TOKENS = 3
+
+
+class TokenLedger:
+    """Running token count of an agent's context window (in-context messages + function schemas)
+
+    Messages are counted once, when they enter the context window, so the current context size is available without
+    re-encoding the message buffer or calling the LLM.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self._message_tokens: Dict[str, int] = {}  # message id -> number of tokens
+        self.message_tokens = 0
+        self.function_tokens = 0
+
+    def _count(self, message: Message) -> int:
+        openai_message = message.to_openai_dict(put_inner_thoughts_in_kwargs=False)
+        return num_tokens_from_message({k: v for k, v in openai_message.items() if v is not None}, model=self.model)
+
+    def add(self, messages: List[Message]):
+        for message in messages:
+            if message.id in self._message_tokens:
+                continue
+            num_tokens = self._count(message)
+            self._message_tokens[message.id] = num_tokens
+            self.message_tokens += num_tokens
+
+    def remove(self, messages: List[Message]):
+        for message in messages:
+            self.message_tokens -= self._message_tokens.pop(message.id, 0)
+
+    def recount(self, messages: List[Message]):
+        """Recount messages that were edited in place"""
+        self.remove(messages)
+        self.add(messages)
+
+    def reset(self, messages: List[Message]):
+        self._message_tokens = {}
+        self.message_tokens = 0
+        self.add(messages)
+
+    def set_functions(self, functions: Optional[List[dict]]):
+        self.function_tokens = num_tokens_from_functions(functions, model=self.model) if functions else 0
+
+    def message_token_counts(self, messages: List[Message]) -> List[int]:
+        """Tokens used by each of the given messages (counted now if they are not in the ledger)"""
+        return [self._message_tokens[message.id] if message.id in self._message_tokens else self._count(message) for message in messages]
+
+    @property
+    def total_tokens(self) -> int:
+        """Prompt size of the current context window (messages + functions + reply priming)"""
+        return self.message_tokens + self.function_tokens + REPLY_PRIMING_TOKENS
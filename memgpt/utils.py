@@ -11,14 +11,17 @@ import random
 import re
 import subprocess
 import sys
+import threading
 import uuid
+from collections import OrderedDict
 from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
-from functools import wraps
+from functools import lru_cache, wraps
 from typing import List, Union, _GenericAlias, get_type_hints
 from urllib.parse import urljoin, urlparse
 
 import demjson3 as demjson
+import numpy as np
 import pytz
 import tiktoken
 
@@ -28,6 +31,7 @@ from memgpt.constants import (
     CORE_MEMORY_HUMAN_CHAR_LIMIT,
     CORE_MEMORY_PERSONA_CHAR_LIMIT,
     FUNCTION_RETURN_CHAR_LIMIT,
+    MAX_EMBEDDING_DIM,
     MEMGPT_DIR,
     TOOL_CALL_ID_MAX_LEN,
 )
@@ -785,9 +789,17 @@ class OpenAIBackcompatUnpickler(pickle.Unpickler):
         return super().find_class(module, name)
 
 
+@lru_cache(maxsize=64)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """tiktoken encoding for a model (cached per model, models tiktoken doesn't know use cl100k_base)"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
 def count_tokens(s: str, model: str = "gpt-4") -> int:
-    encoding = tiktoken.encoding_for_model(model)
-    return len(encoding.encode(s))
+    return len(get_encoding(model).encode(s))
 
 
 def printd(*args, **kwargs):
@@ -1057,9 +1069,67 @@ def create_uuid_from_string(val: str):
     return uuid.UUID(hex=hex_string)
 
 
+def pad_embedding(embedding) -> np.ndarray:
+    """Zero-pad an embedding to MAX_EMBEDDING_DIM as a float32 array (padded float32 arrays are returned without a copy)"""
+    embedding = np.asarray(embedding, dtype=np.float32)
+    if embedding.ndim != 1 or embedding.shape[0] > MAX_EMBEDDING_DIM:
+        raise ValueError(f"Embedding must be a vector of at most {MAX_EMBEDDING_DIM} dimensions, got shape {embedding.shape}")
+    if embedding.shape[0] == MAX_EMBEDDING_DIM:
+        return embedding
+    padded = np.zeros((MAX_EMBEDDING_DIM,), dtype=np.float32)
+    padded[: embedding.shape[0]] = embedding
+    return padded
+
+
+def embedding_hash(embedding: np.ndarray) -> bytes:
+    """Digest of the raw float32 bytes of a padded embedding (for duplicate detection)"""
+    return hashlib.blake2b(np.ascontiguousarray(embedding, dtype=np.float32), digest_size=16).digest()
+
+
 def json_dumps(data, indent=2):
     return json.dumps(data, indent=indent, ensure_ascii=False)
 
 
 def json_loads(data):
     return json.loads(data, strict=False)
+
+
+class LRUCache:
+    """Thread-safe dict-like cache that evicts the least recently used entry once it holds more than max_size entries"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -14,7 +14,7 @@ from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.client.bot import DefaultBotProperties
 from dotenv import load_dotenv
 
-from memgpt import create_memgpt_user, send_message_to_memgpt, delete_memgpt_user, check_memgpt_server
+from memgpt import create_memgpt_user, send_message_to_memgpt, delete_memgpt_user, check_memgpt_server, close_session
 from db import save_user_pseudonym, get_user_info, get_user_agent_id, check_user_exists, delete_user, save_user_report
 
 load_dotenv()
@@ -237,7 +237,10 @@ async def main():
     
     dp.include_router(router)
     await set_commands(bot)  # Set the bot commands
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await close_session()
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
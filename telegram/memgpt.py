@@ -11,11 +11,26 @@ load_dotenv()
 MEMGPT_ADMIN_API_KEY = os.getenv("MEMGPT_SERVER_PASS")
 MEMGPT_API_URL = "http://localhost:8283/api"
 
+# one session (and keep-alive connection pool) for all requests to the MemGPT server
+_session = None
+
+def get_session():
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=int(os.getenv("MEMGPT_HTTP_POOL_SIZE", "32")), keepalive_timeout=60)
+        _session = aiohttp.ClientSession(connector=connector)
+    return _session
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
 @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
 async def async_request(method, url, **kwargs):
-    async with aiohttp.ClientSession() as session:
-        async with session.request(method, url, **kwargs) as response:
-            return await response.text(), response.status
+    async with get_session().request(method, url, **kwargs) as response:
+        return await response.text(), response.status
 
 async def create_memgpt_user(telegram_user_id: int, pseudonym: str):
     fixie_role = """Name: Genie (GenieTheFixie)
@@ -0,0 +1,102 @@
+import threading
+import time
+from functools import partial
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from memgpt.server.agent_cache import AgentCache
+from memgpt.server.server import SyncServer
+
+
+def test_lru_eviction():
+    """Test that the least recently used agent is evicted (and flushed) once the cache is full"""
+    evicted = []
+    cache = AgentCache(max_size=2, on_evict=evicted.append)
+    cache.put("user", "a", "agent_a")
+    cache.put("user", "b", "agent_b")
+    assert cache.get("user", "a") == "agent_a"  # b is now least recently used
+    assert not cache.put("user", "a", "agent_a_again")
+
+    cache.put("user", "c", "agent_c")
+    assert evicted == ["agent_b"]
+    assert cache.get("user", "b") is None
+    assert cache.get("other_user", "a") is None
+
+    assert cache.hits == 1 and cache.misses == 2 and cache.evictions == 1
+    assert len(cache) == 2
+
+
+def test_idle_eviction():
+    """Test that idle agents are evicted on the next access"""
+    evicted = []
+    cache = AgentCache(max_size=10, idle_ttl=0.05, on_evict=evicted.append)
+    cache.put("user", "a", "agent_a")
+    time.sleep(0.1)
+    cache.put("user", "b", "agent_b")
+    assert cache.get("user", "b") == "agent_b"
+    assert evicted == ["agent_a"]
+
+
+def test_remove():
+    """Test that removed (deleted) agents are dropped without being flushed"""
+    evicted = []
+    cache = AgentCache(max_size=10, on_evict=evicted.append)
+    cache.put("user", "a", "agent_a")
+    assert cache.remove("a") == "agent_a"
+    assert cache.remove("a") is None
+    assert evicted == [] and len(cache) == 0
+
+
+def test_find():
+    """Test that a loaded agent can be found by id alone, without counting as a cache hit or miss"""
+    cache = AgentCache(max_size=2)
+    cache.put("user", "a", "agent_a")
+    cache.put("user", "b", "agent_b")
+    assert cache.find("a") == "agent_a"  # b is now least recently used
+    assert cache.find("c") is None
+    assert cache.hits == 0 and cache.misses == 0
+
+    cache.put("user", "c", "agent_c")
+    assert cache.find("b") is None
+    assert cache.find("a") == "agent_a"
+
+
+def test_busy_agents_are_not_evicted():
+    """Test that agents that can't be locked (mid-step) stay loaded, and the next least recently used one goes instead"""
+    busy = {"agent_a"}
+    evicted = []
+    cache = AgentCache(max_size=2, idle_ttl=0.05, on_evict=evicted.append, try_lock=lambda agent: agent not in busy)
+    cache.put("user", "a", "agent_a")
+    cache.put("user", "b", "agent_b")
+    cache.put("user", "c", "agent_c")
+    assert evicted == ["agent_b"]
+    cache.put("user", "d", "agent_d")
+    assert evicted == ["agent_b", "agent_c"] and len(cache) == 2
+
+    time.sleep(0.1)
+    cache.evict_idle()
+    assert evicted == ["agent_b", "agent_c", "agent_d"] and cache.find("a") == "agent_a"
+
+
+def test_server_evicts_agents_between_steps():
+    """Test that the server doesn't evict an agent while it steps, and drops the agent's step lock once it is evicted"""
+    saved = []
+    server = SimpleNamespace(ms=None, _agent_step_locks={}, _agent_step_locks_lock=threading.Lock())
+    server._acquire_agent_step_lock = partial(SyncServer._acquire_agent_step_lock, server)
+    cache = AgentCache(
+        max_size=1,
+        on_evict=partial(SyncServer._save_evicted_agent, server),
+        try_lock=partial(SyncServer._lock_agent_for_eviction, server),
+    )
+    agent_a, agent_b, agent_c = (SimpleNamespace(agent_state=SimpleNamespace(id=agent_id)) for agent_id in "abc")
+
+    with patch("memgpt.server.server.save_agent", lambda agent, ms: saved.append(agent.agent_state.id)):
+        cache.put("user", "a", agent_a)
+        with SyncServer._agent_step_lock(server, "a"):
+            cache.put("user", "b", agent_b)
+            assert saved == [] and len(cache) == 2
+        cache.put("user", "c", agent_c)
+        assert saved == ["a", "b"]
+    assert server._agent_step_locks == {}
+    with SyncServer._agent_step_lock(server, "a"):
+        assert list(server._agent_step_locks) == ["a"]
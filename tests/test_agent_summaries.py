@@ -0,0 +1,113 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, inspect, text
+
+from memgpt.agent_store.db import SQLLiteStorageConnector
+from memgpt.agent_store.storage import TableType
+from memgpt.metadata import AgentModel, MetadataStore, add_missing_columns
+from memgpt.schemas.agent import AgentState
+from memgpt.schemas.embedding_config import EmbeddingConfig
+from memgpt.schemas.llm_config import LLMConfig
+from memgpt.schemas.memory import ChatMemory
+from memgpt.schemas.message import Message
+from memgpt.schemas.source import Source
+from memgpt.schemas.tool import Tool
+
+
+def create_tool(ms: MetadataStore, name: str, user_id=None) -> Tool:
+    tool = Tool(name=name, user_id=user_id, tags=[], source_type="python", source_code="", json_schema={})
+    ms.create_tool(tool)
+    return tool
+
+
+EMBEDDING_CONFIG = EmbeddingConfig(embedding_endpoint_type="openai", embedding_model="model", embedding_dim=8)
+
+
+def create_agent(ms: MetadataStore, user_id: str, name: str, tools) -> AgentState:
+    agent = AgentState(
+        name=name,
+        user_id=user_id,
+        tools=tools,
+        system="system",
+        memory=ChatMemory(persona="persona", human="human"),
+        llm_config=LLMConfig(model="model", model_endpoint_type="openai", model_endpoint="http://localhost", context_window=8192),
+        embedding_config=EMBEDDING_CONFIG,
+        metadata_={"human": "basic", "persona": "sam"},
+    )
+    ms.create_agent(agent)
+    return agent
+
+
+def test_agent_summaries(tmp_path):
+    """Test that summaries pick up the tools (global and the owner's own), attached sources and last run of each agent"""
+    ms = MetadataStore(SimpleNamespace(metadata_storage_type="sqlite", metadata_storage_path=str(tmp_path)))
+    search = create_tool(ms, "search")
+    mine = create_tool(ms, "mine", user_id="user")
+    create_tool(ms, "other", user_id="other_user")
+    source = Source(name="docs", user_id="user", embedding_config=EMBEDDING_CONFIG)
+    ms.create_source(source)
+
+    agent = create_agent(ms, "user", "agent", tools=["search", "mine", "other", "missing"])
+    create_agent(ms, "user", "idle_agent", tools=[])
+    create_agent(ms, "other_user", "other_agent", tools=["other"])
+    ms.attach_source(user_id="user", agent_id=agent.id, source_id=source.id)
+    last_run = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    ms.save_agent_changes(agent, fields=[], last_run=last_run)
+
+    summaries = ms.list_agent_summaries(user_id="user")
+    assert {summary.name for summary in summaries} == {"agent", "idle_agent"}
+    summary = next(summary for summary in summaries if summary.id == agent.id)
+    assert [tool.id for tool in summary.tools] == [search.id, mine.id]
+    assert [s.id for s in summary.sources] == [source.id]
+    assert summary.core_memory == {"persona": "persona", "human": "human"} and summary.human == "basic"
+    assert summary.last_run.replace(tzinfo=timezone.utc) == last_run
+
+    # agents that never ran report their creation time
+    idle = next(summary for summary in summaries if summary.name == "idle_agent")
+    assert idle.last_run == idle.created_at
+    assert len(ms.list_agent_summaries(user_id=None)) == 3
+
+
+def test_memory_sizes_of_all_agents_in_one_query(tmp_path):
+    storage = SQLLiteStorageConnector(TableType.RECALL_MEMORY, SimpleNamespace(recall_storage_path=str(tmp_path)), "user", "a")
+    storage.insert_many([Message(role="user", text="hi", user_id="user", agent_id=agent_id) for agent_id in ["a", "a", "b"]])
+    assert storage.size_by_agent(["a", "b", "c"]) == {"a": 2, "b": 1, "c": 0}
+
+
+def test_missing_columns_are_added(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE {AgentModel.__tablename__} (id VARCHAR PRIMARY KEY)"))
+    add_missing_columns(engine, AgentModel.__table__)
+    assert "last_run" in {column["name"] for column in inspect(engine).get_columns(AgentModel.__tablename__)}
+
+
+def test_memory_sizes_of_all_users_agents(tmp_path):
+    """Test that the admin listing counts the memories of everyone's agents with one connector per table"""
+    from unittest.mock import patch
+
+    from memgpt.server.server import SyncServer
+
+    summaries = [
+        SimpleNamespace(id="a", user_id="u1", last_run=datetime(2030, 1, 1)),
+        SimpleNamespace(id="b", user_id="u2", last_run=datetime(2030, 1, 2)),
+    ]
+    server = SimpleNamespace(config=None, ms=SimpleNamespace(list_agent_summaries=lambda user_id: summaries))
+    connectors = []
+
+    def get_storage_connector(table_type, config, user_id, agent_id):
+        calls = []
+        connectors.append(calls)
+
+        def size_by_agent(agent_ids, agent_users):
+            calls.append((agent_ids, agent_users))
+            return {agent_id: 1 for agent_id in agent_ids}
+
+        return SimpleNamespace(size_by_agent=size_by_agent)
+
+    with patch("memgpt.server.server.StorageConnector.get_storage_connector", get_storage_connector):
+        SyncServer.list_agent_summaries(server, user_id=None)
+    call = (["a", "b"], {"a": "u1", "b": "u2"})
+    assert connectors == [[call], [call]]
+    assert all(summary.recall_memory_size == 1 and summary.archival_memory_size == 1 for summary in summaries)
@@ -0,0 +1,140 @@
+import threading
+import time
+
+from memgpt.schemas.enums import JobStatus
+from memgpt.schemas.job import Job
+from memgpt.schemas.message import Message
+from memgpt.schemas.openai.chat_completion_response import UsageStatistics
+from memgpt.server.assistant_runs import ASSISTANT_RUN_JOB_TYPE, AssistantRunWorker
+from memgpt.utils import get_utc_time
+
+
+class FakeMetadataStore:
+    def __init__(self):
+        self.jobs = {}
+
+    def get_job(self, job_id):
+        job = self.jobs.get(job_id)
+        return None if job is None else job.model_copy(deep=True)
+
+    def update_job(self, job):
+        self.jobs[job.id] = job.model_copy(deep=True)
+        return job
+
+    def list_jobs_by_status(self, statuses):
+        return [job.model_copy(deep=True) for job in self.jobs.values() if job.status in statuses]
+
+
+class FakeServer:
+    """Steps an agent n_steps times (as if it kept requesting heartbeats), each step waiting for `proceed`"""
+
+    def __init__(self, n_steps: int):
+        self.ms = FakeMetadataStore()
+        self.n_steps = n_steps
+        self.proceed = threading.Semaphore(0)
+
+    def _step(self, user_id, agent_id, input_message, timestamp, on_step=None):
+        for i in range(self.n_steps):
+            self.proceed.acquire()
+            message = Message(role="assistant", text=f"step {i}", user_id=user_id, agent_id=agent_id)
+            if not on_step([message], UsageStatistics(completion_tokens=1, prompt_tokens=10, total_tokens=11)):
+                break
+
+
+def create_run(server: FakeServer, status: JobStatus = JobStatus.pending) -> Job:
+    job = Job(user_id="user", status=status, metadata_={"type": ASSISTANT_RUN_JOB_TYPE, "thread_id": "agent", "steps": []})
+    server.ms.jobs[job.id] = job
+    return job
+
+
+def test_run_is_cancelled_between_steps():
+    """Test that a run records its steps as they complete, and stops before the next step once cancelled"""
+    server = FakeServer(n_steps=5)
+    worker = AssistantRunWorker(server, n_workers=1)
+    job = create_run(server)
+    thread = threading.Thread(target=worker.run_job, args=(job.id,))
+    thread.start()
+
+    server.proceed.release(2)
+    while len(server.ms.get_job(job.id).metadata_["steps"]) < 2:
+        time.sleep(0.01)
+    assert server.ms.get_job(job.id).status == JobStatus.running
+    worker.cancel(job.id)
+    assert worker.is_cancelling(job.id)
+
+    server.proceed.release(3)
+    thread.join()
+    job = server.ms.get_job(job.id)
+    # the step that was running when the cancel came in still completes
+    assert job.status == JobStatus.cancelled and len(job.metadata_["steps"]) == 3
+    assert job.metadata_["steps"][0]["assistant_message_id"] == job.metadata_["steps"][0]["message_ids"][0]
+    assert not worker.is_cancelling(job.id)
+
+
+def test_run_completes():
+    server = FakeServer(n_steps=2)
+    worker = AssistantRunWorker(server, n_workers=1)
+    job = create_run(server)
+    server.proceed.release(2)
+    worker.run_job(job.id)
+    job = server.ms.get_job(job.id)
+    assert job.status == JobStatus.completed and len(job.metadata_["steps"]) == 2
+    assert job.metadata_["completed_at"] >= job.metadata_["started_at"]
+
+
+def test_queued_run_is_cancelled_and_not_run():
+    server = FakeServer(n_steps=1)
+    worker = AssistantRunWorker(server, n_workers=1)
+    job = create_run(server)
+    assert worker.cancel(job.id).status == JobStatus.cancelled
+    worker.run_job(job.id)
+    assert server.ms.get_job(job.id).metadata_["steps"] == []
+
+
+def test_resume():
+    """Test that queued runs are picked up again on restart, while interrupted runs are failed instead of repeated"""
+    server = FakeServer(n_steps=1)
+    worker = AssistantRunWorker(server, n_workers=1)
+    submitted = []
+    worker.submit = submitted.append
+    queued, interrupted = create_run(server), create_run(server, status=JobStatus.running)
+    worker.resume()
+    assert submitted == [queued.id]
+    assert server.ms.get_job(interrupted.id).status == JobStatus.failed
+
+
+def test_messages_only_go_to_own_threads():
+    """Test that a thread can be created and messaged, but not another user's thread (unknown threads are a 404)"""
+    from types import SimpleNamespace
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from memgpt.server.rest_api.openai_assistants.assistants import (
+        setup_openai_assistant_router,
+    )
+
+    appended, created = [], []
+
+    def create_agent(request, user_id):
+        created.append((request, user_id))
+        return SimpleNamespace(id="agent", created_at=get_utc_time())
+
+    server = SimpleNamespace(
+        authenticate_user=lambda: "user",
+        create_agent=create_agent,
+        _agent_exists=lambda user_id, agent_id: (user_id, agent_id) == ("user", "agent"),
+        _agent_step_lock=lambda agent_id: threading.Lock(),
+        _get_or_load_agent=lambda agent_id: SimpleNamespace(_append_to_messages=appended.extend),
+    )
+    app = FastAPI()
+    app.include_router(setup_openai_assistant_router(server, interface=None, password="password"))
+    client = TestClient(app, headers={"Authorization": "Bearer password"})
+
+    assert client.post("/threads", json={}).json()["id"] == "agent"
+    assert created[0][0].tools and created[0][1] == "user"
+
+    response = client.post("/threads/other_users_agent/messages", json={"role": "user", "content": "hi"})
+    assert response.status_code == 404 and appended == []
+    response = client.post("/threads/agent/messages", json={"role": "user", "content": "hi"})
+    assert response.status_code == 200 and [message.text for message in appended] == ["hi"]
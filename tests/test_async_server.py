@@ -0,0 +1,49 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import SimpleNamespace
+
+import pytest
+
+from memgpt.server.async_server import AsyncServer
+from memgpt.server.server import SyncServer
+
+
+def make_server():
+    server = SimpleNamespace(step_executor=ThreadPoolExecutor(max_workers=2), _agent_step_locks={}, _agent_step_locks_lock=threading.Lock())
+    server._acquire_agent_step_lock = partial(SyncServer._acquire_agent_step_lock, server)
+    return server
+
+
+@pytest.mark.asyncio
+async def test_async_turns_wait_for_blocking_steps():
+    """Test that an async turn takes the same step lock as the blocking steps of the agent"""
+    server = make_server()
+    sync_step = server._acquire_agent_step_lock("agent")
+
+    acquiring = asyncio.create_task(AsyncServer._acquire_agent_step_lock_async(server, "agent"))
+    await asyncio.sleep(0.05)
+    assert not acquiring.done()  # the blocking step is still running
+
+    sync_step.release()
+    step_lock = await acquiring
+    assert server._agent_step_locks["agent"] is step_lock and step_lock.locked()
+    step_lock.release()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_turn_releases_step_lock():
+    """Test that a turn cancelled while waiting for the step lock hands it back once it is taken"""
+    server = make_server()
+    sync_step = server._acquire_agent_step_lock("agent")
+
+    acquiring = asyncio.create_task(AsyncServer._acquire_agent_step_lock_async(server, "agent"))
+    await asyncio.sleep(0.05)
+    acquiring.cancel()
+    sync_step.release()
+
+    with pytest.raises(asyncio.CancelledError):
+        await acquiring
+    await asyncio.sleep(0.05)
+    assert not server._agent_step_locks["agent"].locked()
@@ -319,10 +319,11 @@ def test_sources(client, agent):
     print("attached sources", attached_sources)
     assert source.id in [s.id for s in attached_sources], f"Attached sources: {attached_sources}"
 
-    # list archival memory
+    # list archival memory (attached sources are searched in place, not copied into archival memory)
     archival_memories = client.get_archival_memory(agent_id=agent.id)
     # print(archival_memories)
-    assert len(archival_memories) == created_passages
+    assert len(archival_memories) == 0
+    assert created_passages > 0
 
     # check number of passages
     sources = client.list_sources()
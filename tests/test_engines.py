@@ -0,0 +1,29 @@
+import os
+
+from memgpt.agent_store.engines import (
+    dispose_engines,
+    get_engine,
+    reset_setup,
+    run_once,
+)
+
+
+def test_engine_shared_per_uri(tmp_path):
+    """Test that connectors using the same database share one engine, and setup steps run once"""
+    uri = f"sqlite:///{os.path.join(tmp_path, 'sqlite.db')}"
+    other_uri = f"sqlite:///{os.path.join(tmp_path, 'other.db')}"
+    try:
+        assert get_engine(uri) is get_engine(uri)
+        assert get_engine(uri) is not get_engine(other_uri)
+
+        calls = []
+        run_once(uri, "setup", calls.append)
+        run_once(uri, "setup", calls.append)
+        run_once(other_uri, "setup", calls.append)
+        assert calls == [get_engine(uri), get_engine(other_uri)]
+
+        reset_setup(uri, "setup")
+        run_once(uri, "setup", calls.append)
+        assert len(calls) == 3
+    finally:
+        dispose_engines()
@@ -0,0 +1,21 @@
+import memgpt.functions.function_sets.base as base_functions
+from memgpt.local_llm.chat_completion_proxy import generate_grammar_and_documentation
+from memgpt.local_llm.utils import get_available_wrappers
+
+
+def test_grammar_cached_per_tool_set():
+    """Test that the grammar is built once per tool set and inner thoughts placement"""
+    functions_python = {"send_message": base_functions.send_message, "pause_heartbeats": base_functions.pause_heartbeats}
+    param_level = dict(add_inner_thoughts_top_level=False, add_inner_thoughts_param_level=True, allow_only_inner_thoughts=False)
+    top_level = dict(add_inner_thoughts_top_level=True, add_inner_thoughts_param_level=False, allow_only_inner_thoughts=True)
+
+    grammar = generate_grammar_and_documentation(functions_python=functions_python, **param_level)
+    assert generate_grammar_and_documentation(functions_python=dict(functions_python), **param_level) is grammar
+    assert generate_grammar_and_documentation(functions_python=functions_python, **top_level) is not grammar
+
+    functions_python["send_message"] = base_functions.archival_memory_insert
+    assert generate_grammar_and_documentation(functions_python=functions_python, **param_level) != grammar
+
+
+def test_wrappers_shared():
+    assert get_available_wrappers()["chatml"] is get_available_wrappers()["chatml"]
@@ -0,0 +1,63 @@
+import time
+from types import SimpleNamespace
+
+from memgpt.server.identity_cache import IdentityCache
+from memgpt.server.server import SyncServer
+
+
+def test_entries_expire():
+    cache = IdentityCache(ttl=0.05, max_size=10)
+    cache.put_api_key("key", "user")
+    cache.put_agent("user", "agent")
+    assert cache.get_user_id("key") == "user" and cache.has_agent("user", "agent")
+    assert not cache.has_agent("other_user", "agent")
+    time.sleep(0.06)
+    assert cache.get_user_id("key") is None and not cache.has_agent("user", "agent")
+    assert cache.stats()["size"] == 0
+
+
+def test_invalidation():
+    """Test that deleting a user drops its API keys and agents, and deleting an agent drops it for every user"""
+    cache = IdentityCache(ttl=60, max_size=10)
+    cache.put_user("user")
+    cache.put_api_key("key", "user")
+    cache.put_agent("user", "agent")
+    cache.put_agent("admin", "agent")
+    cache.put_api_key("other_key", "other_user")
+
+    cache.invalidate_agent("agent")
+    assert not cache.has_agent("user", "agent") and not cache.has_agent("admin", "agent")
+    cache.invalidate_user("user")
+    assert not cache.has_user("user") and cache.get_user_id("key") is None
+    assert cache.get_user_id("other_key") == "other_user"
+    cache.invalidate_api_key("other_key")
+    assert cache.get_user_id("other_key") is None
+
+
+def test_least_recently_used_are_evicted():
+    cache = IdentityCache(ttl=60, max_size=2)
+    cache.put_user("a")
+    cache.put_user("b")
+    assert cache.has_user("a")
+    cache.put_user("c")
+    assert cache.has_user("a") and cache.has_user("c") and not cache.has_user("b")
+
+
+def test_api_key_to_user_is_cached_until_deleted():
+    calls = []
+
+    def get_user_from_api_key(api_key):
+        calls.append(api_key)
+        return SimpleNamespace(id="user")
+
+    ms = SimpleNamespace(
+        get_user_from_api_key=get_user_from_api_key,
+        get_api_key=lambda api_key: SimpleNamespace(key=api_key),
+        delete_api_key=lambda api_key: None,
+    )
+    server = SimpleNamespace(ms=ms, identity_cache=IdentityCache(ttl=60, max_size=10))
+    assert SyncServer.api_key_to_user(server, "key") == SyncServer.api_key_to_user(server, "key") == "user"
+    assert calls == ["key"]
+    SyncServer.delete_api_key(server, "key")
+    SyncServer.api_key_to_user(server, "key")
+    assert calls == ["key", "key"]
@@ -0,0 +1,97 @@
+import pytest
+
+import memgpt.data_sources.connectors as connectors
+from memgpt.data_sources.connectors import DataConnector, load_data
+from memgpt.schemas.embedding_config import EmbeddingConfig
+from memgpt.schemas.source import Source
+
+
+class FakeConnector(DataConnector):
+    def __init__(self, n_documents: int):
+        self.n_documents = n_documents
+        self.parsed = []
+
+    def generate_documents(self):
+        for i in range(self.n_documents):
+            self.parsed.append(i)
+            yield f"document {i}", {"file_path": f"file_{i}.txt"}
+
+    def generate_passages(self, documents, chunk_size: int = 1024):
+        for document in documents:
+            for j in range(3):
+                yield f"{document.text} passage {j}", None
+
+
+class FakeEmbeddingModel:
+    def __init__(self, fail_on: str = None):
+        self.fail_on = fail_on
+
+    def get_text_embeddings(self, texts):
+        return [self.get_text_embedding(text) for text in texts]
+
+    def get_text_embedding(self, text):
+        if text == self.fail_on:
+            raise ValueError("embedding endpoint is down")
+        return [float(len(text)), 1.0]
+
+
+class FakePassageStore:
+    def __init__(self):
+        self.passages = {}
+
+    def insert_many(self, passages):
+        assert len({passage.id for passage in passages}) == len(passages)
+        self.passages.update({passage.id: passage for passage in passages})
+
+
+@pytest.fixture
+def source():
+    embedding_config = EmbeddingConfig(embedding_endpoint_type="hugging-face", embedding_model="fake", embedding_dim=2)
+    return Source(name="source", user_id="user", embedding_config=embedding_config)
+
+
+def test_load_data_resume(source, monkeypatch):
+    """Test that a load that failed midway is resumed from its last progress, skipping the documents already stored"""
+    monkeypatch.setattr(connectors, "get_embedding_cache", lambda: None)
+    monkeypatch.setattr(connectors.settings, "embedding_batch_size", 2)
+    monkeypatch.setattr(connectors.settings, "embedding_concurrency", 1)
+    store = FakePassageStore()
+
+    # every embedding of a document fails, so the load stops at that document (embed_passages skips failed passages
+    # one at a time, so fail the whole batch instead)
+    monkeypatch.setattr(connectors, "embed_passages", lambda model, texts: model.get_text_embeddings(texts))
+    monkeypatch.setattr(connectors, "embedding_model", lambda config: FakeEmbeddingModel(fail_on="document 3 passage 1"))
+    progress = []
+    with pytest.raises(ValueError, match="endpoint is down"):
+        load_data(FakeConnector(5), source, store, on_progress=progress.append)
+    assert 0 < progress[-1]["num_documents"] <= 3
+    assert progress[-1]["num_passages"] == len(store.passages)
+    assert [p["num_documents"] for p in progress] == sorted(p["num_documents"] for p in progress)
+
+    monkeypatch.setattr(connectors, "embedding_model", lambda config: FakeEmbeddingModel())
+    connector = FakeConnector(5)
+    num_passages, num_documents = load_data(connector, source, store, resume_from=progress[-1])
+    assert num_documents == 5
+    assert num_passages == len(store.passages) == 15
+    # documents are still parsed in order, but only the ones not stored yet are embedded and inserted
+    assert connector.parsed == list(range(5))
+    assert num_passages - progress[-1]["num_passages"] == 3 * (5 - progress[-1]["num_documents"])
+
+
+@pytest.mark.parametrize(
+    "filename, stored_name", [("notes.txt", "notes.txt"), ("../../notes.txt", "notes.txt"), ("..", "upload"), (None, "upload")]
+)
+def test_uploads_stay_in_the_job_dir(tmp_path, monkeypatch, filename, stored_name):
+    """Test that an uploaded file is written inside its job's upload dir, whatever name the client sent"""
+    import os
+    from types import SimpleNamespace
+
+    from memgpt.server.server import SyncServer
+    from memgpt.settings import settings
+
+    monkeypatch.setattr(settings, "ingestion_upload_dir", str(tmp_path))
+    server = SimpleNamespace(ms=SimpleNamespace(create_job=lambda job: None), ingestion_worker=SimpleNamespace(submit=lambda job_id: None))
+    job = SyncServer.submit_file_to_source(server, user_id="user", source_id="source", filename=filename, content=b"content")
+    assert job.metadata_["file_path"] == os.path.join(tmp_path, job.id, stored_name)
+    with open(job.metadata_["file_path"], "rb") as f:
+        assert f.read() == b"content"
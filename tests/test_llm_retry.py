@@ -0,0 +1,38 @@
+import pytest
+import requests
+
+import memgpt.llm_api.llm_api_tools as llm_api_tools
+from memgpt.llm_api.llm_api_tools import backoff_delays, retry_with_exponential_backoff
+
+
+def rate_limit_error(status_code: int = 429) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(response=response)
+
+
+def test_backoff_delays():
+    """Test that the delays grow exponentially and run out after max_retries"""
+    delays = backoff_delays(initial_delay=1, exponential_base=2, jitter=False, max_retries=3)
+    assert [next(delays) for _ in range(3)] == [2, 4, 8]
+    with pytest.raises(Exception, match="Maximum number of retries"):
+        next(delays)
+
+
+def test_retry_on_rate_limit(monkeypatch):
+    """Test that rate limited requests are retried, and other errors are raised"""
+    slept = []
+    monkeypatch.setattr(llm_api_tools.time, "sleep", slept.append)
+    errors = [rate_limit_error(), rate_limit_error()]
+
+    def request():
+        if errors:
+            raise errors.pop()
+        return "response"
+
+    assert retry_with_exponential_backoff(request, jitter=False)() == "response"
+    assert slept == [2, 4]
+
+    errors = [rate_limit_error(500)]
+    with pytest.raises(requests.exceptions.HTTPError):
+        retry_with_exponential_backoff(request)()
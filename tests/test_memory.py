@@ -63,3 +63,38 @@ def test_memory_limit_validation(sample_memory: Memory):
 
     with pytest.raises(ValueError):
         sample_memory.get_block("persona").value = "x" * 3000
+
+
+def test_archival_search_includes_attached_sources(tmp_path):
+    """Test that archival search merges the passages of attached sources with the agent's own by distance, without duplicates"""
+    from types import SimpleNamespace
+
+    from memgpt.agent_store.db import SQLLiteStorageConnector
+    from memgpt.agent_store.storage import TableType
+    from memgpt.memory import EmbeddingArchivalMemory
+    from memgpt.schemas.passage import Passage
+
+    config = SimpleNamespace(archival_storage_path=str(tmp_path))
+    agent_state = SimpleNamespace(id="agent", user_id="user", embedding_config=SimpleNamespace(embedding_chunk_size=300))
+    memory = EmbeddingArchivalMemory(agent_state)
+    memory._storage = SQLLiteStorageConnector(TableType.ARCHIVAL_MEMORY, config, user_id="user", agent_id="agent")
+    memory._source_storage = SQLLiteStorageConnector(TableType.PASSAGES, config, user_id="user")
+    memory._embed_model = SimpleNamespace(get_text_embedding=lambda text: [1.0, 0.0])
+
+    def passage(text, embedding, agent_id=None, source_id=None, id=None):
+        passage = Passage(text=text, user_id="user", agent_id=agent_id, source_id=source_id, embedding=embedding, embedding_config=None)
+        return passage if id is None else passage.model_copy(update={"id": id})
+
+    closest = passage("closest", [1.0, 0.0], source_id="source")
+    memory._source_storage.insert_many([closest, passage("farthest", [0.0, 1.0], source_id="source")])
+    memory._source_storage.insert(passage("other source", [0.9, 0.1], source_id="other_source"))
+    # agents that attached the source before sources were shared hold a copy of its passages
+    memory._storage.insert_many(
+        [passage("own", [0.6, 0.8], agent_id="agent"), passage("closest", [1.0, 0.0], agent_id="agent", id=closest.id)]
+    )
+
+    assert [result["content"] for result in memory.search("query")[0]] == ["closest", "own"]
+    memory.attach_source("source")
+    assert [result["content"] for result in memory.search("query")[0]] == ["closest", "own", "farthest"]
+    memory.detach_source("source")
+    assert [result["content"] for result in memory.search("query")[0]] == ["closest", "own"]
@@ -349,10 +349,10 @@ def test_sources(client, agent):
     # attach a source
     client.attach_source_to_agent(source_id=source.id, agent_id=agent.id)
 
-    # list archival memory
+    # list archival memory (attached sources are searched in place, not copied into archival memory)
     archival_memories = client.get_archival_memory(agent_id=agent.id)
     # print(archival_memories)
-    assert len(archival_memories) == 20 or len(archival_memories) == 21
+    assert len(archival_memories) == 0
 
     # check number of passages
     sources = client.list_sources()
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import inspect
+
+from memgpt.agent_store.db import SQLLiteStorageConnector
+from memgpt.agent_store.storage import (
+    TableType,
+    cursor_record_id,
+    decode_cursor,
+    encode_cursor,
+)
+from memgpt.schemas.message import Message
+
+
+@pytest.fixture
+def recall_storage(tmp_path):
+    config = SimpleNamespace(recall_storage_path=str(tmp_path))
+    storage = SQLLiteStorageConnector(TableType.RECALL_MEMORY, config, user_id="user", agent_id="agent")
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    # pairs of messages share a timestamp, so the ID has to break ties
+    messages = [
+        Message(role="user", text=str(i), user_id="user", agent_id="agent", created_at=start + timedelta(seconds=i // 2)) for i in range(10)
+    ]
+    storage.insert_many(messages)
+    return storage
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 1, 1, 12, 30, 1, 5, tzinfo=timezone.utc)
+    cursor = encode_cursor("created_at", created_at, "message-1")
+    assert decode_cursor(cursor) == ("created_at", created_at, "message-1")
+    assert decode_cursor(encode_cursor("text", "a", "message-2")) == ("text", "a", "message-2")
+    assert decode_cursor("message-1") is None and cursor_record_id(cursor) == cursor_record_id("message-1") == "message-1"
+    with pytest.raises(ValueError):
+        decode_cursor("c1.not a cursor")
+
+
+def test_keyset_pages(recall_storage):
+    """Test that following the cursors visits every record once, in (created_at, id) order, both ways"""
+    expected = sorted(recall_storage.get_all(), key=lambda m: (m.created_at, m.id))
+    for reverse in (False, True):
+        seen, cursor = [], None
+        while True:
+            if reverse:
+                cursor, records = recall_storage.get_all_cursor(before=cursor, limit=3, reverse=True)
+            else:
+                cursor, records = recall_storage.get_all_cursor(after=cursor, limit=3)
+            if not records:
+                break
+            seen += records
+        assert [m.id for m in seen] == [m.id for m in (expected[::-1] if reverse else expected)]
+
+    # record IDs still work as cursors
+    cursor, records = recall_storage.get_all_cursor(after=expected[3].id, limit=2)
+    assert [m.id for m in records] == [m.id for m in expected[4:6]] and cursor_record_id(cursor) == expected[5].id
+    with pytest.raises(ValueError):
+        recall_storage.get_all_cursor(after=cursor, order_by="text")
+
+    pages = list(recall_storage.get_all_paginated(page_size=4, offset=1, reverse=True))
+    assert [m.id for page in pages for m in page] == [m.id for m in expected[::-1][1:]] and len(pages) == 3
+
+
+def test_keyset_index(recall_storage):
+    indexes = {index["name"]: index["column_names"] for index in inspect(recall_storage.engine).get_indexes(recall_storage.table_name)}
+    assert indexes[f"{recall_storage.table_name}_idx_keyset"] == ["agent_id", "created_at", "id"]
+
+
+def test_bad_cursor_is_rejected(recall_storage):
+    """Test that listing with an unknown or malformed cursor is a 400, and listing a missing agent a 404"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from memgpt.server.rest_api.agents.memory import setup_agents_memory_router
+    from memgpt.server.rest_api.agents.message import setup_agents_message_router
+
+    def get_cursor(user_id, agent_id, before=None, after=None, limit=None, **kwargs):
+        if agent_id != "agent":
+            raise ValueError(f"Agent agent_id={agent_id} does not exist")
+        return None, recall_storage.get_all_cursor(before=before, after=after, limit=limit)
+
+    server = SimpleNamespace(authenticate_user=lambda: "user", get_agent_recall_cursor=get_cursor, get_agent_archival_cursor=get_cursor)
+    interface = SimpleNamespace(clear=lambda: None)
+    app = FastAPI()
+    app.include_router(setup_agents_message_router(server, interface, password="password"))
+    app.include_router(setup_agents_memory_router(server, interface, password="password"))
+    client = TestClient(app, headers={"Authorization": "Bearer password"})
+
+    for url in ["/agents/agent/messages", "/agents/agent/archival"]:
+        for cursor in ["message-unknown", "c1.", "c1.not-base64"]:
+            response = client.get(url, params={"before": cursor})
+            assert response.status_code == 400, (url, cursor, response.text)
+        assert client.get(url.replace("/agent/", "/missing/")).status_code == 404
@@ -0,0 +1,40 @@
+import json
+
+import numpy as np
+
+from memgpt.constants import MAX_EMBEDDING_DIM
+from memgpt.schemas.passage import Passage
+from memgpt.utils import embedding_hash, pad_embedding
+
+
+def test_passage_embedding_is_padded_float32():
+    """Test that passage embeddings are held as padded float32 arrays, and only become lists in JSON"""
+    passage = Passage(text="text", embedding=[0.1, 0.2, 0.3], embedding_config=None)
+    assert passage.embedding.dtype == np.float32 and passage.embedding.shape == (MAX_EMBEDDING_DIM,)
+    assert not passage.embedding[3:].any()
+
+    # padded float32 arrays (e.g. loaded from the database) are not copied
+    assert Passage(text="text", embedding=passage.embedding, embedding_config=None).embedding is passage.embedding
+
+    data = json.loads(passage.model_dump_json())
+    assert len(data["embedding"]) == MAX_EMBEDDING_DIM
+    assert np.array_equal(Passage(**data).embedding, passage.embedding)
+
+
+def test_embedding_hash():
+    embedding = pad_embedding([0.1, 0.2, 0.3])
+    assert embedding_hash(embedding) == embedding_hash(pad_embedding(embedding.tolist()))
+    assert embedding_hash(embedding) != embedding_hash(pad_embedding([0.1, 0.2, 0.30001]))
+
+
+def test_passage_equality_and_dump():
+    """Test that passages compare by value (embedding included) and dump to plain lists"""
+    passage = Passage(text="text", embedding=[0.1, 0.2, 0.3], embedding_config=None)
+    assert passage == passage.model_copy() and passage in [passage.model_copy()]
+    assert passage != passage.model_copy(update={"embedding": pad_embedding([0.1, 0.2, 0.4])})
+    assert passage != passage.model_copy(update={"embedding": None})
+    assert passage != passage.model_copy(update={"text": "other"})
+
+    data = passage.model_dump()
+    assert isinstance(data["embedding"], list) and len(data["embedding"]) == MAX_EMBEDDING_DIM
+    json.dumps(data, default=str)
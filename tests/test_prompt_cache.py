@@ -0,0 +1,36 @@
+from memgpt.constants import IN_CONTEXT_MEMORY_HEADER
+from memgpt.local_llm.prompt_cache import (
+    PromptPrefixTracker,
+    cache_friendly_messages,
+    get_slot_id,
+    split_system_message,
+)
+from memgpt.utils import json_loads
+
+SYSTEM = f"You are MemGPT.\n\n{IN_CONTEXT_MEMORY_HEADER} 2024-01-01 12:00:00 PM]\n0 previous messages\n<persona>\nI am Sam.\n</persona>"
+
+
+def test_cache_friendly_messages():
+    """Test that the memory block is moved from the system message to the end of the conversation"""
+    stable, memory = split_system_message(SYSTEM)
+    assert stable == "You are MemGPT."
+    assert memory.startswith(IN_CONTEXT_MEMORY_HEADER) and memory.endswith("</persona>")
+    assert split_system_message("no memory here") == ("no memory here", "")
+
+    messages = [{"role": "system", "content": SYSTEM}, {"role": "user", "content": "hi"}]
+    reordered = cache_friendly_messages(messages)
+    assert reordered[0] == {"role": "system", "content": stable}
+    assert reordered[1] == messages[1]
+    assert json_loads(reordered[-1]["content"]) == {"type": "system_alert", "message": memory}
+    assert messages[0]["content"] == SYSTEM  # input is left untouched
+
+
+def test_prompt_prefix_tracker():
+    tracker = PromptPrefixTracker()
+    assert tracker.record("agent", "abcd") is None
+    assert tracker.record("agent", "abcdefgh") == 0.5
+    assert tracker.record(None, "abcdefgh") is None
+    assert tracker.stats()["steps"] == 1
+
+    assert get_slot_id("agent", 0) is None
+    assert get_slot_id("agent", 4) == get_slot_id("agent", 4) < 4
@@ -0,0 +1,20 @@
+from types import SimpleNamespace
+
+from memgpt.functions.function_sets.base import send_message
+from memgpt.schemas.message import Message
+from memgpt.server.rest_api.interface import QueuingInterface
+
+
+def test_send_message_through_queuing_interface():
+    """Test that send_message (which passes no msg_obj) picks up the metadata of the function call before it"""
+    interface = QueuingInterface(debug=False)
+    msg_obj = Message(role="assistant", text="thinking", user_id="user-1", agent_id="agent-1")
+    interface.internal_monologue("thinking", msg_obj=msg_obj)
+    interface.function_message("Running send_message(message='hi')", msg_obj=msg_obj)
+
+    send_message(SimpleNamespace(interface=interface), "hi")
+    interface.step_yield()
+
+    messages = interface.to_list(style="api")
+    assert messages[-1] == {"assistant_message": "hi", "id": str(msg_obj.id), "date": msg_obj.created_at.isoformat()}
+    assert interface.to_list(style="obj") == []  # drained
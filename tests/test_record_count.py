@@ -0,0 +1,33 @@
+import time
+
+from memgpt.memory import RecordCount
+
+
+def test_record_count():
+    """Test that the running count only queries the database on first read, after an unknown delete, or when stale"""
+    rows = [1, 2, 3]
+    counts = []
+
+    def count():
+        counts.append(len(rows))
+        return len(rows)
+
+    size = RecordCount(count)
+    assert size.get() == 3
+    rows += [4, 5]
+    size.add(2)
+    rows.pop()
+    size.remove(1)
+    assert size.get() == 4
+    assert len(counts) == 1
+
+    rows.clear()
+    size.remove(None)
+    assert size.get() == 0
+    assert len(counts) == 2
+
+    stale = RecordCount(count, reconcile_interval=0.01)
+    stale.get()
+    time.sleep(0.05)
+    stale.get()
+    assert len(counts) == 4
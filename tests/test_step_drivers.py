@@ -0,0 +1,38 @@
+import asyncio
+
+import memgpt.agent as agent_module
+from memgpt.agent import arun_step_steps, run_step_steps
+
+
+def fake_steps(fail_first: bool = True):
+    """Stands in for Agent._step_steps: two LLM calls, the second one overflows once and the step is retried"""
+    try:
+        first = yield {"n": 1}
+        second = yield {"n": 2, "fail": fail_first}
+        return first + second
+    except ValueError:
+        return (yield from fake_steps(fail_first=False))
+
+
+def fake_create(n: int, fail: bool = False):
+    if fail:
+        raise ValueError("maximum context length")
+    return n * 10
+
+
+async def fake_acreate(n: int, fail: bool = False):
+    await asyncio.sleep(0.01)
+    return fake_create(n, fail)
+
+
+def test_step_drivers(monkeypatch):
+    """Test that the blocking and the async driver run the same step generator to the same result (errors are thrown into the step)"""
+    monkeypatch.setattr(agent_module, "create", fake_create)
+    monkeypatch.setattr(agent_module, "acreate", fake_acreate)
+
+    assert run_step_steps(fake_steps()) == 30
+
+    async def run_many():
+        return await asyncio.gather(*[arun_step_steps(fake_steps()) for _ in range(50)])
+
+    assert asyncio.run(run_many()) == [30] * 50
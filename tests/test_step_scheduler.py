@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from memgpt.errors import ServerOverloadedError
+from memgpt.server.step_scheduler import StepScheduler
+
+
+@pytest.mark.asyncio
+async def test_steps_of_same_agent_run_in_order():
+    """Test that steps of one agent never overlap and run in arrival order"""
+    scheduler = StepScheduler(max_workers=4, max_queued=10)
+    active, order = set(), []
+    lock = threading.Lock()
+
+    def step(i):
+        with lock:
+            assert "agent" not in active
+            active.add("agent")
+        time.sleep(0.01)
+        with lock:
+            active.remove("agent")
+            order.append(i)
+
+    async def send(i):
+        async with scheduler.agent_turn("agent"):
+            await scheduler.run(lambda: step(i))
+
+    await asyncio.gather(*[send(i) for i in range(5)])
+    assert order == list(range(5))
+    assert scheduler.stats()["completed"] == 5 and scheduler.stats()["queue_depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_overload_is_rejected():
+    """Test that requests beyond the queue limit are rejected"""
+    scheduler = StepScheduler(max_workers=1, max_queued=1)
+    release = threading.Event()
+
+    async def send():
+        async with scheduler.agent_turn("agent"):
+            await scheduler.run(release.wait)
+
+    first = asyncio.create_task(send())
+    await asyncio.sleep(0.05)  # first request is running
+    second = asyncio.create_task(send())
+    await asyncio.sleep(0.05)  # second request is waiting for its turn
+
+    with pytest.raises(ServerOverloadedError):
+        scheduler.check_capacity()
+    assert scheduler.stats()["rejected"] == 1
+
+    release.set()
+    await asyncio.gather(first, second)
+
+
+@pytest.mark.asyncio
+async def test_turn_is_held_until_step_is_done():
+    """Test that a caller going away mid-step doesn't hand the agent's turn to the next request"""
+    scheduler = StepScheduler(max_workers=2, max_queued=10)
+    release = threading.Event()
+    started = asyncio.Event()
+
+    async def stream():
+        async with scheduler.step_in_turn("agent", lambda: (scheduler.run(release.wait), None)):
+            started.set()
+            await asyncio.sleep(10)  # e.g. still streaming when the client disconnects
+
+    first = asyncio.create_task(stream())
+    await started.wait()
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+
+    async def send():
+        async with scheduler.agent_turn("agent"):
+            return release.is_set()
+
+    second = asyncio.create_task(send())
+    await asyncio.sleep(0.05)
+    assert not second.done()  # the first step is still running
+
+    release.set()
+    assert await second
@@ -0,0 +1,50 @@
+import json
+
+from memgpt.local_llm.llm_chat_completion_wrappers.chatml import (
+    ChatMLInnerMonologueWrapper,
+    ChatMLOuterInnerMonologueWrapper,
+)
+from memgpt.local_llm.stream_parser import (
+    StreamingFunctionCallParser,
+    get_assistant_prefix,
+)
+
+
+def parse_stream(wrapper, output: str, piece_size: int = 3):
+    """Feed the output in small pieces, returns (inner thoughts, function name, function arguments) as streamed"""
+    parser = StreamingFunctionCallParser(assistant_prefix=get_assistant_prefix(wrapper))
+    deltas = []
+    for i in range(0, len(output), piece_size):
+        deltas += parser.feed(output[i : i + piece_size])
+    deltas += parser.finish()
+    assert parser.text == output
+
+    content = "".join(d.content for d in deltas if d.content is not None)
+    tool_calls = [d.tool_calls[0] for d in deltas if d.tool_calls]
+    names = [t.function.name for t in tool_calls if t.function.name]
+    arguments = "".join(t.function.arguments for t in tool_calls)
+    return content, names, arguments
+
+
+def test_stream_inner_thoughts_in_params():
+    output = ' "send_message",\n  "params": {\n    "inner_thoughts": "User said \\"hi\\".",\n    "message": "Hello!\\nHow are you?"\n  }\n}'
+    content, names, arguments = parse_stream(ChatMLInnerMonologueWrapper(), output)
+    assert content == 'User said "hi".'
+    assert names == ["send_message"]
+    assert json.loads(arguments) == {"message": "Hello!\nHow are you?"}
+
+
+def test_stream_inner_thoughts_top_level():
+    output = ' "Thinking...",\n  "function": "pause_heartbeats",\n  "params": {"minutes": 5, "extra": [1, {"a": null}]}\n}'
+    content, names, arguments = parse_stream(ChatMLOuterInnerMonologueWrapper(), output, piece_size=1)
+    assert content == "Thinking..."
+    assert names == ["pause_heartbeats"]
+    assert json.loads(arguments) == {"minutes": 5, "extra": [1, {"a": None}]}
+
+
+def test_stream_repeated_prefix_and_no_function():
+    # the model repeats the prefix that was already in the prompt, and doesn't call a function
+    output = '\n{\n  "inner_thoughts": "Nothing to do.", "function": null, "params": null}'
+    content, names, arguments = parse_stream(ChatMLOuterInnerMonologueWrapper(), output)
+    assert content == "Nothing to do."
+    assert names == [] and arguments == ""
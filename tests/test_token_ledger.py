@@ -0,0 +1,43 @@
+from memgpt.local_llm.utils import num_tokens_from_functions, num_tokens_from_messages
+from memgpt.schemas.message import Message
+from memgpt.token_ledger import TokenLedger
+
+
+def make_message(role: str, text: str) -> Message:
+    return Message.dict_to_message(user_id="user", agent_id="agent", model="gpt-4", openai_message_dict={"role": role, "content": text})
+
+
+def test_ledger_matches_full_count():
+    """Test that the running count matches re-encoding the whole message buffer"""
+    functions = [
+        {
+            "name": "send_message",
+            "description": "Sends a message to the human user.",
+            "parameters": {"type": "object", "properties": {"message": {"type": "string", "description": "Message contents."}}},
+        }
+    ]
+    messages = [make_message("system", "You are MemGPT."), make_message("user", "hello there"), make_message("user", "how are you?")]
+
+    ledger = TokenLedger(model="gpt-4")
+    ledger.set_functions(functions)
+    ledger.add(messages[:2])
+    ledger.add(messages[2:])
+    openai_messages = [msg.to_openai_dict() for msg in messages]
+    assert ledger.total_tokens == num_tokens_from_messages(openai_messages, model="gpt-4") + num_tokens_from_functions(
+        functions, model="gpt-4"
+    )
+
+    # adding a message twice doesn't double count it
+    ledger.add(messages[2:])
+    ledger.remove(messages[1:2])
+    assert ledger.total_tokens == num_tokens_from_messages(
+        [openai_messages[0], openai_messages[2]], model="gpt-4"
+    ) + num_tokens_from_functions(functions, model="gpt-4")
+
+    # edited messages are recounted
+    messages[2].text = "how are you doing today, and what are you up to?"
+    ledger.recount(messages[2:])
+    assert ledger.message_token_counts(messages[2:]) == [num_tokens_from_messages([messages[2].to_openai_dict()], model="gpt-4") - 3]
+
+    ledger.reset([])
+    assert ledger.message_tokens == 0
@@ -0,0 +1,26 @@
+import threading
+import time
+
+from memgpt.functions.executor import run_tool_calls
+
+
+def test_run_tool_calls():
+    """Test that tool calls run concurrently, and results (errors, timeouts) come back in the order of the calls"""
+    barrier = threading.Barrier(2, timeout=5)
+
+    def wait_for_other_call():
+        barrier.wait()  # only returns if both calls run at the same time
+        return "ok"
+
+    def fail():
+        raise ValueError("bad args")
+
+    results = run_tool_calls([wait_for_other_call, fail, wait_for_other_call])
+    assert results[0] == ("ok", None) and results[2] == ("ok", None)
+    assert results[1][0] is None and isinstance(results[1][1], ValueError)
+
+    start = time.monotonic()
+    results = run_tool_calls([lambda: time.sleep(2), lambda: "fast"], timeout=0.2)
+    assert time.monotonic() - start < 1
+    assert isinstance(results[0][1], TimeoutError)
+    assert results[1] == ("fast", None)
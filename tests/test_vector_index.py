@@ -0,0 +1,106 @@
+import base64
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from memgpt.agent_store.db import SQLiteVectorIndex, SQLLiteStorageConnector
+from memgpt.agent_store.storage import TableType
+from memgpt.constants import MAX_EMBEDDING_DIM
+from memgpt.schemas.passage import Passage
+
+
+@pytest.fixture
+def index():
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((100, 8), dtype=np.float32)
+    # pad like Passage does, the index should only keep the used columns
+    padded = np.zeros((100, MAX_EMBEDDING_DIM), dtype=np.float32)
+    padded[:, :8] = embeddings
+    index = SQLiteVectorIndex()
+    index.add([str(i) for i in range(100)], padded)
+    return index, embeddings
+
+
+def brute_force(embeddings, query, top_k, ids=None):
+    ids = ids if ids is not None else list(range(len(embeddings)))
+    distances = [np.linalg.norm(embeddings[i] - query) for i in ids]
+    return [str(ids[i]) for i in np.argsort(distances)[:top_k]]
+
+
+def test_query_matches_brute_force(index):
+    """Test that the top-k matches an exact L2 search"""
+    index, embeddings = index
+    query = np.random.default_rng(1).standard_normal(8, dtype=np.float32)
+    assert index._matrix.shape[1] == 8
+    assert index.query(query, top_k=5) == brute_force(embeddings, query, 5)
+    assert len(index.query(query, top_k=500)) == 100
+
+
+def test_query_with_allowed_ids(index):
+    """Test that filtered queries only return allowed rows"""
+    index, embeddings = index
+    query = np.random.default_rng(2).standard_normal(8, dtype=np.float32)
+    allowed = list(range(0, 100, 3))
+    assert index.query(query, top_k=5, allowed_ids=[str(i) for i in allowed]) == brute_force(embeddings, query, 5, ids=allowed)
+    assert index.query(query, top_k=5, allowed_ids=["missing"]) == []
+
+
+def test_remove_and_replace(index):
+    """Test that removed rows are never returned and replaced rows use the new embedding"""
+    index, embeddings = index
+    query = embeddings[42]
+    assert index.query(query, top_k=1) == ["42"]
+    index.remove(["42", "missing"])
+    assert len(index) == 99
+    assert "42" not in index.query(query, top_k=99)
+
+    index.add(["7"], query[None, :])
+    assert index.query(query, top_k=1) == ["7"]
+    assert len(index) == 99
+
+
+def test_connector_index_sees_writes_made_elsewhere(tmp_path):
+    """Test that a built partition index picks up writes made through other connectors and directly in the database"""
+    config = SimpleNamespace(archival_storage_path=str(tmp_path))
+    storage = SQLLiteStorageConnector(TableType.ARCHIVAL_MEMORY, config, user_id="user", agent_id="a")
+    other_storage = SQLLiteStorageConnector(TableType.ARCHIVAL_MEMORY, config, user_id="user", agent_id="b")
+
+    def passage(text, agent_id, embedding):
+        return Passage(text=text, user_id="user", agent_id=agent_id, embedding=embedding, embedding_config=None)
+
+    first = passage("first", "a", [1.0, 0.0])
+    storage.insert(first)
+    assert [p.id for p in storage.query("", [1.0, 0.0], top_k=5)] == [first.id]
+
+    # written through another agent's connector, but into this agent's partition
+    second = passage("second", "a", [0.0, 1.0])
+    other_storage.insert(second)
+    assert storage.query("", [0.0, 1.0], top_k=1)[0].id == second.id
+
+    # written by another process
+    third = passage("third", "a", [-1.0, 0.0])
+    with storage.engine.begin() as conn:
+        conn.execute(storage.db_model.__table__.insert(), [vars(third)])
+    assert storage.query("", [-1.0, 0.0], top_k=1)[0].id == third.id
+    with storage.engine.begin() as conn:
+        conn.execute(storage.db_model.__table__.delete().where(storage.db_model.id == third.id))
+    assert third.id not in [p.id for p in storage.query("", [-1.0, 0.0], top_k=5)]
+
+
+def test_legacy_base64_rows_are_read(tmp_path):
+    """Test that embeddings stored base64-encoded by older versions read back as vectors, next to raw float32 rows"""
+    storage = SQLLiteStorageConnector(TableType.ARCHIVAL_MEMORY, SimpleNamespace(archival_storage_path=str(tmp_path)), "user", "agent")
+    new = Passage(text="new", user_id="user", agent_id="agent", embedding=[1.0, 0.0], embedding_config=None)
+    old = Passage(text="old", user_id="user", agent_id="agent", embedding=[0.0, 1.0], embedding_config=None)
+    storage.insert(new)
+    storage.insert(old)
+    with storage.engine.begin() as conn:
+        conn.exec_driver_sql(
+            f"UPDATE {storage.table_name} SET embedding = ? WHERE id = ?", (base64.b64encode(old.embedding.tobytes()), old.id)
+        )
+
+    legacy = storage.get(old.id)
+    assert np.array_equal(legacy.embedding, old.embedding)
+    assert {p.id for p in storage.get_all()} == {new.id, old.id}
+    assert storage.query("", [0.0, 1.0], top_k=1)[0].id == old.id
@@ -1,11 +1,16 @@
 import asyncio
+import socket
+import time
 
 import pytest
 import websockets
 
+import memgpt.server.ws_api.protocol as protocol
+import memgpt.server.ws_api.server as ws_server
 from memgpt.server.constants import WS_DEFAULT_PORT
+from memgpt.server.step_scheduler import StepScheduler
 from memgpt.server.ws_api.server import WebSocketServer
-from memgpt.utils import json_dumps
+from memgpt.utils import json_dumps, json_loads
 
 
 @pytest.mark.asyncio
@@ -13,6 +18,64 @@ async def test_dummy():
     assert True
 
 
+class FakeAgent:
+    def __init__(self, interface):
+        self.interface = interface
+
+
+class FakeServer:
+    def __init__(self, default_interface_factory):
+        self.default_interface_factory = default_interface_factory
+        self.step_scheduler = StepScheduler(max_workers=4, max_queued=16)
+        self.agents = {}
+
+    def _get_or_load_agent(self, agent_id):
+        return self.agents.setdefault(agent_id, FakeAgent(self.default_interface_factory()))
+
+    def user_message(self, user_id, agent_id, message):
+        interface = self.agents[agent_id].interface
+        interface.internal_monologue(f"thinking about {message}")
+        time.sleep(0.1)
+        interface.assistant_message(message)
+
+
+@pytest.mark.asyncio
+async def test_agents_multiplexed_over_one_socket(monkeypatch):
+    """Test that turns of several agents run concurrently over one connection, each between its start / end markers"""
+    monkeypatch.setattr(ws_server, "SyncServer", FakeServer)
+    server = WebSocketServer(host="127.0.0.1")
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    async with websockets.serve(server.handle_client, "127.0.0.1", port):
+        async with websockets.connect(f"ws://127.0.0.1:{port}") as websocket:
+            for agent_id, message in (("agent_a", "first"), ("agent_b", "hello"), ("agent_a", "second")):
+                await websocket.send(protocol.client_user_message(message, agent_id=agent_id, user_id="user"))
+
+            responses = []
+            while sum(response["type"] == "agent_response_end" for response in responses) < 3:
+                responses.append(json_loads(await asyncio.wait_for(websocket.recv(), 5)))
+
+    by_agent = {}
+    for response in responses:
+        by_agent.setdefault(response["agent_id"], []).append((response["type"], response.get("message")))
+
+    def turn(message):
+        return [
+            ("agent_response_start", None),
+            ("agent_response", f"thinking about {message}"),
+            ("agent_response", message),
+            ("agent_response_end", None),
+        ]
+
+    assert by_agent["agent_a"] == turn("first") + turn("second")
+    assert by_agent["agent_b"] == turn("hello")
+    # agent_b didn't wait for agent_a's turns
+    ends = [response["agent_id"] for response in responses if response["type"] == "agent_response_end"]
+    assert ends.index("agent_b") < 2
+
+
 @pytest.mark.skip(reason="websockets is temporarily unsupported in 0.2.12")
 @pytest.mark.asyncio
 async def test_websocket_server():